@@ -1,39 +1,48 @@
 import streamlit as st
 import os, re
 from urllib.parse import urlencode
-import firebase_admin
-from firebase_admin import credentials, auth, firestore
-from dotenv import load_dotenv
-import requests
 from datetime import datetime
 import time
-load_dotenv()
+from servicios.collection_stats import clear_stats_cache
+from servicios.assets import inject_css, logo
+from servicios.sidecar import start_sidecar
+from servicios.store import get_store
+from servicios.session_store import persist_session, sync_session
+from servicios.environment import load_environment
+from servicios.firestore_metrics import begin_run
+from servicios.profiler import begin_profile, profiled, render_profile_panel
+
+# Variables de .env (solo la primera ejecución del proceso lee el fichero)
+load_environment()
+
+# Servidor de recursos estáticos y /healthz (solo si SIDECAR_PORT está definido)
+start_sidecar()
 
 # Configuración de la página
 st.set_page_config(
     page_title="ADRIANA TOUZ",
-    page_icon="logo.jpg",  # Ruta relativa a la imagen
+    page_icon=logo('favicon'),  # Variante pequeña del logo (URL o bytes en memoria)
     layout="wide",
     initial_sidebar_state="collapsed"
 )
 
 # CSS personalizado para el diseño de lujo
-with open("estilos/css_login.html", "r") as file:
-    html_content = file.read()
-st.markdown(html_content, unsafe_allow_html=True)
+inject_css("login")
+
+# Métricas de Firestore y perfil (si está activo) de esta ejecución
+begin_run('app')
+begin_profile('app')
+
+# Acceso a datos (Firestore, SQLite o memoria según STORAGE_BACKEND)
+store = get_store()
 
 # Se ejecuta una única vez cuando carga la aplicación
 if 'has_run' not in st.session_state:
     st.session_state.has_run = True
-    service_account_key_path = 'serviceAccountKey.json'
     collection_name = "usuarios"
     st.session_state.redirect_uri = "http://localhost:8501"
 
-    # --- Inicialización de Firebase ADMIN SDK ---
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(service_account_key_path)
-        firebase_admin.initialize_app(cred)
-    st.session_state.db = firestore.client()
+    # El cliente de Firestore no va en la sesión: es del proceso (get_store())
 
     # Inicia el Cliente de Google
     st.session_state.google_client_id = os.environ.get("GOOGLE_CLIENT_ID")
@@ -42,6 +51,9 @@ if 'has_run' not in st.session_state:
     #Inicializa el carrito de compras
     st.session_state.cart = []
 
+# Login y carrito guardados si el navegador viene de otro proceso (tools.cluster)
+sync_session()
+
 # Autenticación con Google
 def google_auth():
     # URL de autorización de Google
@@ -58,8 +70,13 @@ def google_auth():
     return google_auth_url
 
 # Intercambiar código por token
+@profiled('google_token')
 def exchange_code_for_tokens(auth_code):
-    token_url = "https://oauth2.googleapis.com/token"
+    # requests solo se carga al volver del login de Google
+    import requests
+    
+    # GOOGLE_TOKEN_URL permite apuntar a un Google falso (pruebas de carga)
+    token_url = os.environ.get("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
     data = {
         "client_id": st.session_state.google_client_id,
         "client_secret": st.session_state.google_client_secret,
@@ -77,8 +94,11 @@ def exchange_code_for_tokens(auth_code):
         return None
 
 # Obtener datos del usuario
+@profiled('google_userinfo')
 def get_user_info(access_token):
-    user_info_url = "https://www.googleapis.com/oauth2/v2/userinfo"
+    import requests
+    
+    user_info_url = os.environ.get("GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v2/userinfo")
     
     headers = {
         "Authorization": f"Bearer {access_token}"
@@ -93,6 +113,7 @@ def get_user_info(access_token):
         return None
 
 # Verificar o crear usuario en Firebase
+@profiled('login_google')
 def verificar_o_crear_usuario(code):
     try:
         # 1. Intercambiar código por tokens
@@ -122,17 +143,15 @@ def verificar_o_crear_usuario(code):
             return None
         
         # 4. Verificar si el usuario ya existe en Firebase
-        doc_ref = st.session_state.db.collection('usuarios').document(google_id)
-        doc = doc_ref.get()
+        usuario_data = store.get_user(google_id)
         
-        if doc.exists:
+        if usuario_data:
             # Usuario existente - cargar datos y actualizar último login
-            usuario_data = doc.to_dict()
             usuario_data['last_login'] = datetime.now()
             usuario_data['uid'] = google_id
             
             # Actualizar último login en Firebase
-            doc_ref.update({'last_login': datetime.now()})
+            store.touch_login(google_id)
             
             return usuario_data
         else:
@@ -149,7 +168,7 @@ def verificar_o_crear_usuario(code):
             }
             
             # Guardar en Firebase
-            doc_ref.set(nuevo_usuario)
+            store.create_user(google_id, nuevo_usuario)
             
             return nuevo_usuario
             
@@ -171,31 +190,21 @@ def google_login_button():
     return f"""<a href="{google_auth()}" target="_self" style="text-decoration: none;">{button_html}</a>"""
 
 # Función para recuperar el usuario basado en session_id
+@profiled('usuario_pago')
 def get_user_from_firestore(session_id):
-    """Recupera el usuario desde Firestore usando session_id del carrito"""
+    """Recupera el usuario desde la sesión de pago (una sola lectura, cacheada para compraok)"""
     try:
-        # Buscar el documento del carrito por session_id
-        cart_doc = st.session_state.db.collection('carts').document(session_id).get()
-        
-        if cart_doc.exists:
-            cart_data = cart_doc.to_dict()
-            user_id = cart_data.get('user_id')
-            
-            if user_id:
-                # Buscar el usuario en la colección usuarios
-                user_doc = st.session_state.db.collection('usuarios').document(user_id).get()
-                
-                if user_doc.exists:
-                    user_data = user_doc.to_dict()
-                    return user_data
-                else:
-                    st.error("Usuario no encontrado en la base de datos")
-                    return None
+        checkout_session = store.get_checkout_session(session_id)
+
+        if checkout_session:
+            user_data = checkout_session.get('user')
+            if user_data:
+                return user_data
             else:
-                st.error("No se encontró user_id en los datos del carrito")
+                st.error("No se encontraron datos del usuario en la sesión de pago")
                 return None
         else:
-            st.error("No se encontró el carrito con ese session_id")
+            st.error("No se encontró la sesión de pago con ese session_id")
             return None
             
     except Exception as e:
@@ -203,30 +212,22 @@ def get_user_from_firestore(session_id):
         return None
 # AGREGAR ESTAS FUNCIONES AL FINAL DE app.py (antes de la lógica principal)
 
-def debug_firebase_collections():
-    """Función para depurar las colecciones de Firebase"""
+def debug_firebase_collections(status_breakdown=True):
+    """Función para depurar las colecciones de Firebase (conteos por agregación, sin descargar documentos)"""
     try:
         st.write("### 🔍 Estado de Firebase Collections")
         
-        # Verificar colección de productos
-        products_ref = st.session_state.db.collection('products')
-        products_count = len(list(products_ref.stream()))
-        st.write(f"📦 Productos: {products_count}")
-        
-        # Verificar colección de carritos
-        carts_ref = st.session_state.db.collection('carts')
-        carts_count = len(list(carts_ref.stream()))
-        st.write(f"🛒 Carritos: {carts_count}")
-        
-        # Verificar colección de órdenes
-        orders_ref = st.session_state.db.collection('orders')
-        orders_count = len(list(orders_ref.stream()))
-        st.write(f"📋 Órdenes: {orders_count}")
+        stats = store.collection_stats(
+            ['products', 'carts', 'orders', 'usuarios'],
+            status_breakdown=status_breakdown
+        )
         
-        # Verificar colección de usuarios
-        users_ref = st.session_state.db.collection('usuarios')
-        users_count = len(list(users_ref.stream()))
-        st.write(f"👥 Usuarios: {users_count}")
+        st.write(f"📦 Productos: {stats['products']['total']}")
+        st.write(f"🛒 Carritos: {stats['carts']['total']}")
+        st.write(f"📋 Órdenes: {stats['orders']['total']}")
+        for status, count in stats['orders'].get('by_status', {}).items():
+            st.write(f"   • {status}: {count}")
+        st.write(f"👥 Usuarios: {stats['usuarios']['total']}")
         
         return True
         
@@ -255,9 +256,10 @@ def create_test_data():
         }
         
         # Guardar orden de prueba
-        doc_ref = st.session_state.db.collection('orders').add(test_order)
+        doc_ref = store.add_order(test_order)
         
         if doc_ref:
+            clear_stats_cache()
             st.success("✅ Datos de prueba creados exitosamente")
             return True
         else:
@@ -271,27 +273,9 @@ def create_test_data():
 def check_firebase_permissions():
     """Verifica los permisos de Firebase"""
     try:
-        # Intentar operaciones básicas
-        test_ref = st.session_state.db.collection('test_permissions')
-        
-        # Crear
-        doc_ref = test_ref.add({'test': 'create', 'timestamp': datetime.now()})
-        st.success("✅ Permiso CREATE: OK")
-        
-        # Leer
-        if doc_ref and len(doc_ref) > 1:
-            doc_id = doc_ref[1].id
-            doc = test_ref.document(doc_id).get()
-            if doc.exists:
-                st.success("✅ Permiso READ: OK")
-                
-                # Actualizar
-                test_ref.document(doc_id).update({'test': 'update'})
-                st.success("✅ Permiso UPDATE: OK")
-                
-                # Eliminar
-                test_ref.document(doc_id).delete()
-                st.success("✅ Permiso DELETE: OK")
+        # Intentar operaciones básicas (crear, leer, actualizar y eliminar)
+        for operation in store.check_permissions():
+            st.success(f"✅ Permiso {operation}: OK")
         
         return True
         
@@ -313,9 +297,13 @@ if 'payment' in query_params:
         st.session_state['payment_success'] = True
         st.session_state.usuario = get_user_from_firestore(st.session_state['stripe_session_id'])
         st.session_state.login = True
+        persist_session()
         st.query_params.clear()
         st.switch_page("pages/compraok.py")
     elif query_params['payment'] == 'cancelled':
+        # Devolver al catálogo las unidades retenidas para este pago
+        if query_params.get('reservation'):
+            store.release_reservation(query_params['reservation'])
         st.warning("⚠️ El pago fue cancelado. Puedes continuar comprando.")
         st.query_params.clear()
         st.rerun()
@@ -345,9 +333,13 @@ if not st.session_state.usuario:
     else:
         with st.spinner('Verificando autenticación, espere por favor...'):
             st.session_state.usuario = verificar_o_crear_usuario(code)
+            persist_session()
             st.query_params.clear()
             st.rerun()
 else:
     with st.spinner('Todo listo! Redireccionando a la plataforma...'):
         st.session_state.login = True
-        st.switch_page('pages/catalogo.py')
\ No newline at end of file
+        st.switch_page('pages/catalogo.py')
+
+# Desglose del perfil (solo con el perfilado activo; el resto de ramas cambian de página)
+render_profile_panel()
@@ -0,0 +1,290 @@
+import streamlit as st
+from servicios.admin import is_admin
+from servicios.assets import inject_css
+from servicios.catalog import invalidate_catalog
+from servicios.collection_stats import KNOWN_STATUSES
+from servicios.firestore_metrics import begin_run, metrics
+from servicios.profiler import begin_profile, render_profile_panel, span
+from servicios.store import get_store
+from servicios.session_store import sync_session
+
+# Sesión guardada si el navegador viene de otro proceso (tools.cluster)
+sync_session()
+
+# Verificar si el usuario está logueado
+if 'login' not in st.session_state:
+    st.switch_page('app.py')
+
+# Métricas de Firestore y perfil (si está activo) de esta ejecución
+begin_run('admin')
+begin_profile('admin')
+
+# Acceso a datos (Firestore, SQLite o memoria según STORAGE_BACKEND)
+store = get_store()
+
+# CSS personalizado para el diseño de lujo
+inject_css("catalogo")
+
+# Solo administradores
+if not is_admin(st.session_state.get('usuario')):
+    st.error("❌ No tienes permisos para ver el panel de administración.")
+    if st.button("🔙 Volver al Catálogo"):
+        st.switch_page('pages/catalogo.py')
+    st.stop()
+
+def display_sales_dashboard(days):
+    """Muestra ventas diarias y productos top leyendo solo los rollups"""
+    try:
+        rollups = store.daily_sales(days=days)
+
+        revenue = sum(day['revenue'] for day in rollups)
+        orders = sum(day['orders'] for day in rollups)
+        units = sum(day['units'] for day in rollups)
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("💰 Ingresos", f"${revenue:,.2f}")
+        col2.metric("📋 Órdenes", orders)
+        col3.metric("📦 Unidades", units)
+        col4.metric("🧾 Ticket medio", f"${(revenue / orders if orders else 0):,.2f}")
+
+        st.markdown("### 📈 Ingresos por día")
+        st.bar_chart({
+            'Fecha': [day['date'] for day in rollups],
+            'Ingresos': [day['revenue'] for day in rollups]
+        }, x='Fecha', y='Ingresos')
+
+        st.markdown("### 🏆 Productos más vendidos")
+        top_products = store.top_products(limit=10)
+        if top_products:
+            st.dataframe([{
+                'Producto': product.get('name', ''),
+                'Ingresos': round(product.get('revenue', 0.0), 2),
+                'Unidades': product.get('units', 0),
+                'Órdenes': product.get('orders', 0)
+            } for product in top_products], use_container_width=True, hide_index=True)
+        else:
+            st.info("Todavía no hay ventas registradas.")
+
+    except Exception as e:
+        st.error(f"❌ Error al cargar el dashboard: {str(e)}")
+
+def display_collection_counters():
+    """Muestra los conteos de colecciones (agregaciones count(), tiempo constante)"""
+    try:
+        stats = store.collection_stats(
+            ['products', 'carts', 'orders', 'usuarios', 'checkout_sessions'],
+            status_breakdown=True
+        )
+
+        labels = {
+            'products': "📦 Productos",
+            'carts': "🛒 Carritos",
+            'orders': "📋 Órdenes",
+            'usuarios': "👥 Usuarios",
+            'checkout_sessions': "💳 Sesiones de pago"
+        }
+        cols = st.columns(len(stats))
+        for col, (collection_name, collection_stats) in zip(cols, stats.items()):
+            col.metric(labels[collection_name], collection_stats['total'])
+            for status, count in collection_stats.get('by_status', {}).items():
+                col.caption(f"{status}: {count}")
+
+    except Exception as e:
+        st.error(f"❌ Error al verificar colecciones: {str(e)}")
+
+def display_latest_orders(status, limit):
+    """Muestra las últimas órdenes leyendo solo las filas visibles"""
+    try:
+        orders = store.latest_orders(limit=limit, status=status)
+        if orders:
+            st.dataframe([{
+                'Número': order.get('order_number', order['id']),
+                'Cliente': order.get('user_name', ''),
+                'Total': round(order.get('total', 0.0), 2),
+                'Estado': order.get('status', ''),
+                'Creada': order.get('created_at')
+            } for order in orders], use_container_width=True, hide_index=True)
+        else:
+            st.info("No hay órdenes con ese estado.")
+
+    except Exception as e:
+        st.error(f"❌ Error al cargar órdenes: {str(e)}")
+
+def display_firestore_metrics():
+    """Muestra las operaciones de Firestore por página y las últimas ejecuciones del proceso"""
+    try:
+        summary = metrics.summary()
+        if not summary:
+            st.info("Todavía no se han registrado operaciones (¿FIRESTORE_METRICS=0?).")
+            return
+
+        st.dataframe([{
+            'Página': row['page'],
+            'Operación': row['operation'],
+            'Llamadas': row['calls'],
+            'Documentos': row['documents'],
+            'Errores': row['errors'],
+            'Media (ms)': row['avg_ms'],
+            'p95 (ms)': row['p95_ms']
+        } for row in summary], use_container_width=True, hide_index=True)
+
+        st.markdown("#### Últimas ejecuciones")
+        st.dataframe([{
+            'Página': run['page'] + (f" / {run['fragment']}" if run['fragment'] else ''),
+            'Sesión': run['session'][:8],
+            'Lecturas': run['reads'],
+            'Consultas': run['queries'],
+            'Agregaciones': run['aggregations'],
+            'Escrituras': run['writes'],
+            'Firestore (ms)': run['firestore_ms']
+        } for run in metrics.last_runs(limit=25)], use_container_width=True, hide_index=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("⬇️ Exportar (Prometheus)", metrics.prometheus(),
+                               file_name="firestore_metrics.prom", mime="text/plain")
+        with col2:
+            if st.button("🔄 Reiniciar métricas", key="admin_reset_metrics"):
+                metrics.reset()
+                st.rerun()
+
+    except Exception as e:
+        st.error(f"❌ Error al cargar las métricas: {str(e)}")
+
+def display_catalog_maintenance():
+    """Vaciar, republicar y cambiar precios o stock del catálogo en lotes"""
+    try:
+        status = store.catalog_status()
+        if status:
+            st.caption(f"Versión publicada: {status['version']} · {status['products']} productos · "
+                       f"{status['published_at']:%d/%m/%Y %H:%M}")
+        else:
+            st.caption("El catálogo todavía no tiene versiones publicadas.")
+
+        categories = sorted({product.get('category', 'general') for product in store.catalog()})
+        category = st.selectbox("Categoría", ["Todas"] + categories, key="admin_catalog_category")
+        category = None if category == "Todas" else category
+
+        col1, col2 = st.columns(2)
+        with col1:
+            percent = st.number_input("Cambio de precio (%)", min_value=-90.0, max_value=500.0, value=0.0,
+                                      step=5.0, key="admin_price_percent")
+            if st.button("💲 Aplicar precios", key="admin_apply_prices", disabled=percent == 0):
+                with st.status("Actualizando precios...") as progress:
+                    store.adjust_prices(percent, category, progress=progress.write)
+                    progress.update(label="✅ Precios actualizados", state="complete")
+        with col2:
+            stock = st.number_input("Stock", min_value=0, value=10, step=1, key="admin_stock_value")
+            if st.button("📦 Fijar stock", key="admin_apply_stock"):
+                with st.status("Actualizando stock...") as progress:
+                    store.set_stock(stock=int(stock), category=category, progress=progress.write)
+                    progress.update(label="✅ Stock actualizado", state="complete")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🔄 Republicar productos de ejemplo", key="admin_reseed"):
+                with st.status("Publicando catálogo...") as progress:
+                    result = store.reseed_catalog(progress=progress.write)
+                    progress.update(label=f"✅ Versión {result['version']} publicada", state="complete")
+        with col2:
+            confirm = st.checkbox("Confirmo que quiero borrar todos los productos", key="admin_confirm_truncate")
+            if st.button("🗑️ Vaciar catálogo", key="admin_truncate", disabled=not confirm):
+                with st.status("Borrando productos...") as progress:
+                    store.truncate_catalog(progress=progress.write)
+                    progress.update(label="✅ Catálogo vacío", state="complete")
+
+    except Exception as e:
+        st.error(f"❌ Error en el mantenimiento del catálogo: {str(e)}")
+
+def display_hot_products():
+    """Pasa productos entre stock en un documento y stock repartido en shards"""
+    try:
+        products = {product['name']: product for product in store.catalog()}
+        name = st.selectbox("Producto", sorted(products), key="admin_hot_product")
+        if not name:
+            return
+        product = products[name]
+
+        if product.get('stock_shards'):
+            st.caption(f"🔥 Stock repartido en {product['stock_shards']} shards · {product.get('stock', 0)} unidades")
+            if st.button("❄️ Volver a un solo documento", key="admin_demote"):
+                with st.spinner("Sumando los shards al producto..."):
+                    store.demote_product(product['id'])
+                invalidate_catalog()
+                st.rerun()
+        else:
+            st.caption(f"Stock en un solo documento · {product.get('stock', 0)} unidades")
+            shards = st.number_input("Shards", min_value=2, max_value=100, value=10, key="admin_shards")
+            if st.button("🔥 Marcar como producto caliente", key="admin_promote"):
+                store.promote_product(product['id'], int(shards))
+                invalidate_catalog()
+                st.rerun()
+
+    except Exception as e:
+        st.error(f"❌ Error al cambiar el modo de stock: {str(e)}")
+
+def display_backorders():
+    """Muestra las unidades cobradas que no tenían stock al confirmar el pago"""
+    try:
+        backorders = store.pending_backorders()
+        if backorders:
+            st.dataframe([{
+                'Orden': backorder.get('order_number') or '',
+                'Producto': backorder['name'],
+                'Unidades': backorder['quantity'],
+                'Fecha': backorder.get('created_at')
+            } for backorder in backorders], use_container_width=True, hide_index=True)
+        else:
+            st.info("No hay pedidos pendientes de stock.")
+
+    except Exception as e:
+        st.error(f"❌ Error al cargar pedidos pendientes: {str(e)}")
+
+# --- LÓGICA PRINCIPAL ---
+st.markdown('''
+<div class="main-header">
+    <h1>ADRIANA TOUZ</h1>
+    <p>Panel de Administración</p>
+</div>
+''', unsafe_allow_html=True)
+
+with st.sidebar:
+    st.markdown(f"### 👤 {st.session_state['usuario']['nombre']}")
+    if st.button("🔙 Volver al Catálogo"):
+        st.switch_page('pages/catalogo.py')
+
+days = st.selectbox("Periodo", [7, 30, 90], index=1, format_func=lambda d: f"Últimos {d} días", key="admin_period")
+with span('ventas'):
+    display_sales_dashboard(days)
+
+st.markdown("---")
+st.markdown("### 🧾 Últimas órdenes")
+col1, col2 = st.columns(2)
+with col1:
+    status = st.selectbox("Estado", KNOWN_STATUSES['orders'], key="admin_orders_status")
+with col2:
+    limit = st.selectbox("Mostrar", [10, 25, 50], key="admin_orders_limit")
+with span('ultimas_ordenes'):
+    display_latest_orders(status, limit)
+
+st.markdown("### 📮 Pedidos pendientes de stock")
+display_backorders()
+
+st.markdown("---")
+st.markdown("### 🔍 Estado de Firebase Collections")
+with span('colecciones'):
+    display_collection_counters()
+
+st.markdown("---")
+st.markdown("### 🛠️ Mantenimiento del catálogo")
+display_catalog_maintenance()
+
+st.markdown("### 🔥 Productos calientes")
+display_hot_products()
+
+st.markdown("---")
+st.markdown("### 🔬 Operaciones de Firestore")
+display_firestore_metrics()
+
+# Desglose del perfil (solo con el perfilado activo)
+render_profile_panel()
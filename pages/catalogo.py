@@ -1,27 +1,53 @@
 import streamlit as st
-import stripe
 import os
 from datetime import datetime, timedelta
 import time
-from collections import Counter
-import random
+from servicios.admin import is_admin
+from servicios.preferences import get_preference_scores, top_k
+from servicios.recommendations import load_model
+from servicios.offers import get_offer_set, offer_discount, seeded_rng
+from servicios.sales_rollups import product_key
+from servicios.fragments import CART_FRAGMENT_KEY, fragment_run, rerun_fragment, set_cart_notice, pop_cart_notice
+from servicios.firestore_metrics import begin_run, session_runs
+from servicios.profiler import begin_profile, render_profile_panel, span
+from servicios.assets import inject_css, logo
+from servicios.catalog import invalidate_catalog
+from servicios.cart_validation import OK, OUT_OF_STOCK, UNAVAILABLE, offer_name
+from servicios.currency import BASE_CURRENCY, add_price_columns, convert, item_price, minor_units, price_formatter, user_currency
+from servicios.reservations import InsufficientStock, available_stock, checkout_expires_at
+from servicios.store import get_store
+from servicios.session_store import forget_session, sync_session
+from servicios.payments import get_stripe
+
+# Sesión guardada si el navegador viene de otro proceso (tools.cluster)
+sync_session()
 
 if 'login' not in st.session_state:
     st.switch_page('app.py')
 
+# Métricas de Firestore y perfil (si está activo) de esta ejecución
+begin_run('catalogo')
+begin_profile('catalogo')
+
+# Acceso a datos (Firestore, SQLite o memoria según STORAGE_BACKEND)
+store = get_store()
+
 # CSS personalizado para el diseño de lujo
-with open("estilos/css_catalogo.html", "r") as file:
-    html_content = file.read()
-st.markdown(html_content, unsafe_allow_html=True)
+inject_css("catalogo")
+
+# Moneda y formato de precios del usuario (los precios de cada moneda ya vienen calculados en el catálogo)
+fx_rates, fx_stamp = store.fx_rates_with_stamp()
+currency = user_currency(st.session_state.get('usuario'), fx_rates)
+format_price = price_formatter(currency, (st.session_state.get('usuario') or {}).get('locale'))
 
-# Configuración de Stripe
-stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
+# Segundos que tarda el pago simulado (0 en benchmarks)
+SIMULATED_PAYMENT_DELAY = float(os.environ.get("SIMULATED_PAYMENT_DELAY", "2"))
 
 def simulate_payment_processing():
     """Simula el procesamiento de pago"""
     import time
     with st.spinner('Procesando pago...'):
-        time.sleep(2)  # Simular tiempo de procesamiento
+        time.sleep(SIMULATED_PAYMENT_DELAY)  # Simular tiempo de procesamiento
     return True
 
 def create_simulated_order(items, user_data):
@@ -30,8 +56,9 @@ def create_simulated_order(items, user_data):
         # Generar un número de orden único
         order_number = f"SIM-{int(time.time())}-{user_data['uid'][:8]}"
         
-        # Calcular total
+        # Calcular total (en la moneda base y en la del cobro)
         total = sum(item['price'] * item['quantity'] for item in items)
+        charged_total = sum(item_price(item, currency, fx_rates) * item['quantity'] for item in items)
         
         # Formatear items
         formatted_items = []
@@ -41,7 +68,8 @@ def create_simulated_order(items, user_data):
                 'price': float(item['price']),
                 'quantity': int(item['quantity']),
                 'image': item.get('image', ''),
-                'subtotal': float(item['price']) * int(item['quantity'])
+                'subtotal': float(item['price']) * int(item['quantity']),
+                'charged_price': float(item_price(item, currency, fx_rates))
             })
         
         # Crear datos de la orden
@@ -55,14 +83,16 @@ def create_simulated_order(items, user_data):
             'status': 'completed',
             'payment_method': 'simulated',
             'created_at': datetime.now(),
-            'currency': 'USD',
+            'currency': BASE_CURRENCY,
+            'charged_currency': currency,
+            'charged_total': float(charged_total),
             'simulation': True  # Marca para identificar órdenes simuladas
         }
         
-        # Guardar en Firestore
-        doc_ref = st.session_state.db.collection('orders').add(order_data)
+        # Guardar en Firestore junto con los rollups de ventas
+        doc_ref = store.record_order(order_data)
         
-        if doc_ref and len(doc_ref) > 1:
+        if doc_ref:
             st.success(f"✅ Orden simulada creada: {order_number}")
             return order_number, order_data
         else:
@@ -85,7 +115,7 @@ def process_simulated_checkout_improved():
         
         # 2. Simular procesamiento de pago
         with st.spinner('Procesando pago simulado...'):
-            time.sleep(2)  # Simular tiempo de procesamiento
+            time.sleep(SIMULATED_PAYMENT_DELAY)  # Simular tiempo de procesamiento
         
         # 3. Crear orden
         order_number, order_data = create_simulated_order(
@@ -95,7 +125,7 @@ def process_simulated_checkout_improved():
         
         if order_number:
             # 4. Actualizar stock
-            update_product_stock(cart_backup)
+            update_product_stock(cart_backup, order_number)
             
             # 5. Registrar productos para ofertas
             track_user_product_preferences(st.session_state['usuario']['uid'], cart_backup)
@@ -142,12 +172,9 @@ def clear_cart_after_purchase():
         # 2. Limpiar en Firebase
         if 'usuario' in st.session_state and st.session_state.usuario:
             user_id = st.session_state.usuario['uid']
-            cart_ref = st.session_state.db.collection('carts').document(user_id)
             
-            # Eliminar documento del carrito o vaciarlo
-            cart_doc = cart_ref.get()
-            if cart_doc.exists:
-                cart_ref.delete()  # Eliminar completamente
+            # Eliminar documento del carrito (si existe)
+            if store.delete_cart(user_id, only_if_exists=True):
                 st.success("✅ Carrito limpiado tras compra exitosa")
         
         return True
@@ -171,63 +198,30 @@ def show_purchase_confirmation(order_number, order_data):
             st.write(f"**Fecha:** {order_data['created_at'].strftime('%d/%m/%Y %H:%M')}")
         
         with col2:
-            st.write(f"**Total:** ${order_data['total']:.2f}")
+            st.write(f"**Total:** {format_price(order_data['charged_total'])}")
             st.write(f"**Método de pago:** Simulado")
             st.write(f"**Estado:** ✅ Completado")
         
         st.write("**Productos comprados:**")
         for item in order_data['items']:
-            st.write(f"• {item['name']} - Cantidad: {item['quantity']} - ${item['subtotal']:.2f}")
+            st.write(f"• {item['name']} - Cantidad: {item['quantity']} - {format_price(item['charged_price'] * item['quantity'])}")
 
 # ========== SISTEMA DE OFERTAS BASADO EN PREFERENCIAS ==========
 
 def track_user_product_preferences(user_id, cart_items):
     """Registra las preferencias del usuario basadas en productos del carrito"""
     try:
-        # Obtener categorías de los productos en el carrito
-        categories = []
-        product_names = []
-        
-        for item in cart_items:
-            product_names.append(item['name'])
-            # Buscar la categoría del producto
-            products_ref = st.session_state.db.collection('products')
-            query = products_ref.where('name', '==', item['name'])
-            docs = list(query.stream())
-            
-            for doc in docs:
-                product_data = doc.to_dict()
-                category = product_data.get('category', 'general')
-                categories.extend([category] * item['quantity'])  # Peso por cantidad
-        
-        # Guardar/actualizar preferencias del usuario
-        preferences_ref = st.session_state.db.collection('user_preferences').document(user_id)
-        preferences_doc = preferences_ref.get()
-        
-        if preferences_doc.exists:
-            # Actualizar preferencias existentes
-            current_prefs = preferences_doc.to_dict()
-            current_categories = current_prefs.get('preferred_categories', [])
-            current_products = current_prefs.get('preferred_products', [])
-            
-            # Agregar nuevas preferencias
-            current_categories.extend(categories)
-            current_products.extend(product_names)
-            
-            preferences_ref.update({
-                'preferred_categories': current_categories,
-                'preferred_products': current_products,
-                'last_updated': datetime.now()
-            })
-        else:
-            # Crear nuevas preferencias
-            preferences_ref.set({
-                'user_id': user_id,
-                'preferred_categories': categories,
-                'preferred_products': product_names,
-                'created_at': datetime.now(),
-                'last_updated': datetime.now()
-            })
+        # Completar la categoría de los productos que no la traen en el carrito
+        missing_names = list({item['name'] for item in cart_items if not item.get('category')})
+        categories_by_name = store.categories_by_name(missing_names)
+        
+        items = [
+            dict(item, category=item.get('category') or categories_by_name.get(item['name'], 'general'))
+            for item in cart_items
+        ]
+        
+        # Sumar al mapa de preferencias en el servidor (sin leer ni reescribir el documento)
+        store.record_purchase(user_id, items)
         
         st.success("✅ Preferencias actualizadas para ofertas personalizadas")
         
@@ -237,13 +231,7 @@ def track_user_product_preferences(user_id, cart_items):
 def get_user_preferences(user_id):
     """Obtiene las preferencias del usuario"""
     try:
-        preferences_ref = st.session_state.db.collection('user_preferences').document(user_id)
-        preferences_doc = preferences_ref.get()
-        
-        if preferences_doc.exists:
-            return preferences_doc.to_dict()
-        else:
-            return None
+        return store.get_preferences(user_id)
             
     except Exception as e:
         st.error(f"❌ Error al obtener preferencias: {str(e)}")
@@ -257,62 +245,82 @@ def generate_personalized_offers(user_id, products):
         
         if not preferences:
             # Si no hay preferencias, mostrar ofertas aleatorias
-            return generate_random_offers(products)
+            return generate_random_offers(products, user_id)
         
-        # Contar categorías más frecuentes
-        categories = preferences.get('preferred_categories', [])
-        category_counts = Counter(categories)
-        top_category = category_counts.most_common(1)[0][0] if category_counts else None
+        # Categoría y producto con mayor puntuación (decaída en el tiempo)
+        scores = get_preference_scores(preferences)
+        top_categories = top_k(scores['categories'], 1)
+        top_category = top_categories[0][0] if top_categories else None
         
-        # Contar productos más frecuentes
-        product_names = preferences.get('preferred_products', [])
-        product_counts = Counter(product_names)
+        top_products = top_k(scores['products'], 1)
+        most_liked_product = None
+        if top_products:
+            most_liked_key = top_products[0][0]
+            most_liked_product = preferences.get('product_names', {}).get(most_liked_key)
+            if not most_liked_product:
+                most_liked_product = next((p['name'] for p in products if product_key(p['name']) == most_liked_key), None)
         
         offers = []
+        offered_keys = set()
+        products_by_key = {product_key(p['name']): p for p in products}
+        
+        # Ofertas del modelo de co-compra (si se ha construido)
+        model = load_model()
+        if model and scores['products']:
+            for key in model.recommend(scores['products'], k=3):
+                product = products_by_key.get(key)
+                if product:
+                    offers.append({
+                        'product': product,
+                        'discount': offer_discount(user_id, product['name'], 15, 40),
+                        'reason': 'Quienes compran lo mismo que tú también eligieron esto'
+                    })
+                    offered_keys.add(key)
         
         # Generar ofertas basadas en categoría preferida
-        if top_category:
-            category_products = [p for p in products if p.get('category') == top_category]
+        if top_category and len(offers) < 3:
+            category_products = [p for p in products
+                                 if p.get('category') == top_category and product_key(p['name']) not in offered_keys]
             for product in category_products[:2]:  # Máximo 2 ofertas por categoría
-                discount = random.randint(15, 40)
+                discount = offer_discount(user_id, product['name'], 15, 40)
                 offers.append({
                     'product': product,
                     'discount': discount,
                     'reason': f'¡Te encanta la categoría {top_category.title()}!'
                 })
+                offered_keys.add(product_key(product['name']))
         
-        # Generar ofertas basadas en productos similares
-        if product_counts:
-            most_liked_product = product_counts.most_common(1)[0][0]
-            # Buscar productos de la misma categoría que el más gustado
+        # Generar ofertas basadas en productos similares (misma categoría que el más gustado)
+        liked_product = products_by_key.get(product_key(most_liked_product)) if most_liked_product else None
+        if liked_product:
+            liked_category = liked_product.get('category')
             for product in products:
-                if product['name'] != most_liked_product and len(offers) < 3:
-                    # Buscar categoría del producto más gustado
-                    for p in products:
-                        if p['name'] == most_liked_product:
-                            liked_category = p.get('category')
-                            if product.get('category') == liked_category:
-                                discount = random.randint(10, 35)
-                                offers.append({
-                                    'product': product,
-                                    'discount': discount,
-                                    'reason': f'Similar a {most_liked_product} que te gusta'
-                                })
-                            break
+                if len(offers) >= 3:
+                    break
+                key = product_key(product['name'])
+                if product['name'] != most_liked_product and key not in offered_keys \
+                        and product.get('category') == liked_category:
+                    discount = offer_discount(user_id, product['name'], 10, 35)
+                    offers.append({
+                        'product': product,
+                        'discount': discount,
+                        'reason': f'Similar a {most_liked_product} que te gusta'
+                    })
+                    offered_keys.add(key)
         
         return offers[:3]  # Máximo 3 ofertas
         
     except Exception as e:
         st.error(f"❌ Error al generar ofertas: {str(e)}")
-        return generate_random_offers(products)
+        return generate_random_offers(products, user_id)
 
-def generate_random_offers(products):
-    """Genera ofertas aleatorias como fallback"""
+def generate_random_offers(products, user_id):
+    """Genera ofertas aleatorias (estables durante el día) como fallback"""
     offers = []
-    selected_products = random.sample(products, min(3, len(products)))
+    selected_products = seeded_rng(user_id, 'random_offers').sample(products, min(3, len(products)))
     
     for product in selected_products:
-        discount = random.randint(10, 30)
+        discount = offer_discount(user_id, product['name'], 10, 30)
         offers.append({
             'product': product,
             'discount': discount,
@@ -321,9 +329,18 @@ def generate_random_offers(products):
     
     return offers
 
-def display_personalized_offers(user_id, products):
+def with_offer_prices(offers):
+    """Precio de oferta (base y en cada moneda) calculado una sola vez, al generar las ofertas"""
+    for offer in offers or []:
+        offer['price'] = offer['product']['price'] * (1 - offer['discount'] / 100)
+    return add_price_columns(offers, fx_rates)
+
+def display_personalized_offers(user_id, products, catalog_stamp=()):
     """Muestra las ofertas personalizadas de manera llamativa"""
-    offers = generate_personalized_offers(user_id, products)
+    # Las ofertas se calculan una vez por usuario y día; el resto de ejecuciones las sirve la caché
+    # mientras no cambien la marca de precios del catálogo (republicación o ajuste de precios) ni los tipos de cambio
+    offers = get_offer_set(user_id, lambda: with_offer_prices(generate_personalized_offers(user_id, products)),
+                           version=(catalog_stamp, fx_stamp))
     
     if offers:
         st.markdown("""
@@ -345,8 +362,6 @@ def display_personalized_offers(user_id, products):
             with cols[idx]:
                 product = offer['product']
                 discount = offer['discount']
-                original_price = product['price']
-                discounted_price = original_price * (1 - discount / 100)
                 
                 st.markdown(f"""
                 <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -368,11 +383,11 @@ def display_personalized_offers(user_id, products):
                         </p>
                         <div style="margin: 8px 0;">
                             <span style="text-decoration: line-through; color: #ff7675;">
-                                ${original_price:.2f}
+                                {format_price(item_price(product, currency, fx_rates))}
                             </span>
                             <br>
                             <span style="font-size: 18px; font-weight: bold; color: #00b894;">
-                                ${discounted_price:.2f}
+                                {format_price(item_price(offer, currency, fx_rates))}
                             </span>
                         </div>
                     </div>
@@ -380,26 +395,29 @@ def display_personalized_offers(user_id, products):
                 """, unsafe_allow_html=True)
                 
                 # Botón de agregar al carrito con precio de oferta
-                if st.button(f"🛒 ¡Aprovecha la Oferta!", key=f"offer_{idx}"):
-                    # Crear producto con precio de oferta
-                    offer_product = product.copy()
-                    offer_product['price'] = discounted_price
-                    offer_product['name'] = f"{product['name']} (OFERTA -{discount}%)"
-                    
-                    if add_to_cart_improved(offer_product, st.session_state.usuario['uid']):
-                        st.success(f"🎉 ¡Oferta aprovechada! {offer_product['name']} agregado al carrito")
-                        st.rerun()
+                # Crear producto con precio de oferta
+                offer_product = product.copy()
+                offer_product['price'] = offer['price']
+                offer_product['prices'] = offer['prices']
+                offer_product['name'] = offer_name(product['name'], discount)
+                offer_product['discount'] = discount
+                
+                st.button(f"🛒 ¡Aprovecha la Oferta!", key=f"offer_{idx}",
+                          on_click=on_add_to_cart, args=(offer_product,),
+                          kwargs={'notice': f"🎉 ¡Oferta aprovechada! {offer_product['name']} agregado al carrito"})
+
+@st.fragment
+@fragment_run('catalogo', 'offers')
+def render_offers_strip(user_id, products, catalog_stamp):
+    """Fragmento de ofertas: sus botones no reejecutan el resto de la página"""
+    display_personalized_offers(user_id, products, catalog_stamp)
 
 def clear_existing_products():
-    """Elimina todos los productos existentes de Firestore"""
+    """Elimina todos los productos existentes en lotes paralelos"""
     try:
-        products_ref = st.session_state.db.collection('products')
-        docs = products_ref.stream()
+        summary = store.truncate_catalog()
         
-        for doc in docs:
-            doc.reference.delete()
-        
-        st.success("Productos existentes eliminados")
+        st.success(f"{summary['writes']} productos eliminados")
         return True
     
     except Exception as e:
@@ -407,15 +425,12 @@ def clear_existing_products():
         return False
 
 def force_refresh_products():
-    """Fuerza la actualización de productos"""
+    """Publica de nuevo los productos de ejemplo como una versión nueva del catálogo"""
     try:
-        # Eliminar productos existentes
-        clear_existing_products()
-        
-        # Los nuevos productos se crearán automáticamente 
-        # cuando get_products() no encuentre productos
+        # Los compradores siguen viendo el catálogo anterior hasta que se publica el nuevo
+        result = store.reseed_catalog()
         
-        st.success("Productos actualizados correctamente")
+        st.success(f"Productos actualizados correctamente (versión {result['version']})")
         st.rerun()
         
     except Exception as e:
@@ -425,142 +440,27 @@ def force_refresh_products():
 def test_firebase_connection():
     """Prueba la conexión a Firebase"""
     try:
-        # Intentar leer/escribir en una colección de prueba
-        test_ref = st.session_state.db.collection('test')
-        test_doc = test_ref.document('connection_test')
-        test_doc.set({
-            'timestamp': datetime.now(),
-            'status': 'connected'
-        })
-        
-        # Leer el documento para confirmar
-        doc = test_doc.get()
-        if doc.exists:
-            # Eliminar el documento de prueba
-            test_doc.delete()
-            return True
-        return False
+        # Escribir, leer y eliminar un documento de prueba
+        return store.ping()
     except Exception as e:
         st.error(f"Error de conexión a Firebase: {str(e)}")
         return False
 
 # Funciones de Firestore
 def get_products():
-    """Obtiene productos desde Firestore"""
+    """Obtiene productos y su marca de precios desde la caché del catálogo (Firestore como mucho cada pocos segundos)"""
     try:
-        products_ref = st.session_state.db.collection('products')
-        docs = products_ref.stream()
-        
-        products = []
-        for doc in docs:
-            product = doc.to_dict()
-            product['id'] = doc.id
-            products.append(product)
-        
-        # Si no hay productos, crear algunos de ejemplo
-        if not products:
-            sample_products = [
-                {
-                    "name": "Vestido Elegante",
-                    "price": 89.99,
-                    "image": "https://i.imgur.com/TRmtJwn.jpg",
-                    "description": "Vestido elegante, perfecto para ocasiones especiales",
-                    "category": "vestidos",
-                    "stock": 15
-                },
-                {
-                    "name": "Blusa Casual",
-                    "price": 45.99,
-                    "image": "https://i.imgur.com/NqHc7ri.jpg",
-                    "description": "Blusa cómoda y versátil para el día a día",
-                    "category": "blusas",
-                    "stock": 25
-                },
-                {
-                    "name": "Pantalon palazo",
-                    "price": 79.99,
-                    "image": "https://i.imgur.com/oS0BYH1.jpg",
-                    "description": "pantalón palazo de alta calidad, ideal para combinar",
-                    "category": "pantalones",
-                    "stock": 20
-                },
-                {
-                    "name": "Blazer",
-                    "price": 129.99,
-                    "image": "https://i.imgur.com/yCMtdfa.jpg",
-                    "description": "Blazer elegante de calidad, ideal para ocasiones especiales",
-                    "category": "chaquetas",
-                    "stock": 8
-                },
-                {
-                    "name": "Zapatos Elegantes",
-                    "price": 95.99,
-                    "image": "https://i.imgur.com/uKfw8iR.jpg",
-                    "description": "Zapatos elegantes para completar tu look",
-                    "category": "zapatos",
-                    "stock": 12
-                },
-                {
-                    "name": "Bolso de Mano",
-                    "price": 65.99,
-                    "image": "https://i.imgur.com/T99kfQS.jpg",
-                    "description": "Bolso de mano versátil y elegante para cualquier ocasión",
-                    "category": "accesorios",
-                    "stock": 18
-                }
-            ]
-            
-            # Agregar productos de ejemplo a Firestore
-            for product in sample_products:
-                st.session_state.db.collection('products').add(product)
-            
-            return sample_products
-        
-        return products
+        return store.catalog_with_stamp()
     
     except Exception as e:
         st.error(f"Error al obtener productos: {str(e)}")
-        return []
+        return [], ()
 
 # FUNCIÓN CORREGIDA
 def add_to_cart(product_id, user_id):
     """Agrega producto al carrito en Firebase"""
     try:
-        cart_ref = st.session_state.db.collection('carts').document(user_id)
-        cart_doc = cart_ref.get()
-        
-        if cart_doc.exists:
-            cart_data = cart_doc.to_dict()
-            items = cart_data.get('items', [])
-            
-            # Verificar si el producto ya está en el carrito
-            product_exists = False
-            for item in items:
-                if item['product_id'] == product_id:
-                    item['quantity'] += 1
-                    product_exists = True
-                    break
-            
-            if not product_exists:
-                items.append({
-                    'product_id': product_id,
-                    'quantity': 1,
-                    'added_at': datetime.now()
-                })
-            
-            cart_ref.update({'items': items})
-        else:
-            # CORREGIDO: Usar set() en lugar de document().add()
-            cart_ref.set({
-                'user_id': user_id,  # Agregar user_id
-                'items': [{
-                    'product_id': product_id,
-                    'quantity': 1,
-                    'added_at': datetime.now()
-                }],
-                'created_at': datetime.now()
-            })
-        
+        store.add_cart_product(user_id, product_id)
         return True
     
     except Exception as e:
@@ -570,83 +470,78 @@ def add_to_cart(product_id, user_id):
 def get_cart(user_id):
     """Obtiene el carrito del usuario"""
     try:
-        cart_ref = st.session_state.db.collection('carts').document(user_id)
-        cart_doc = cart_ref.get()
-        
-        if cart_doc.exists:
-            return cart_doc.to_dict().get('items', [])
-        return []
+        cart = store.get_cart(user_id)
+        return cart.get('items', []) if cart else []
     
     except Exception as e:
         st.error(f"Error al obtener carrito: {str(e)}")
         return []
 
 # Funciones de Stripe
-def create_checkout_session(items, user_email):
-    """Crea una sesión de pago con Stripe"""
+def create_checkout_session(items, user_email, reservation=None):
+    """Crea una sesión de pago con Stripe (que caduca con la retención de stock)"""
     try:
         line_items = []
         for item in items:
             line_items.append({
                 'price_data': {
-                    'currency': 'usd',
+                    'currency': currency.lower(),
                     'product_data': {
                         'name': item['name'],
                         'images': [item['image']],
                     },
-                    'unit_amount': int(item['price'] * 100),
+                    'unit_amount': minor_units(item_price(item, currency, fx_rates), currency),
                 },
                 'quantity': item['quantity'],
             })
         
-        checkout_session = stripe.checkout.Session.create(
+        params = {}
+        cancel_url = 'http://localhost:8501?payment=cancelled'
+        if reservation:
+            # No se puede pagar una vez liberadas las unidades retenidas
+            params['expires_at'] = checkout_expires_at(reservation)
+            cancel_url += f"&reservation={reservation['id']}"
+        
+        checkout_session = get_stripe().checkout.Session.create(
             payment_method_types=['card'],
             line_items=line_items,
             mode='payment',
             success_url='http://localhost:8501?payment=success&session_id={CHECKOUT_SESSION_ID}',
-            cancel_url='http://localhost:8501?payment=cancelled',
+            cancel_url=cancel_url,
             customer_email=user_email,
             metadata={
                 'user_id': st.session_state['usuario']['uid'],
-                'user_name': st.session_state['usuario']['nombre']
-            }
+                'user_name': st.session_state['usuario']['nombre'],
+                'reservation_id': reservation['id'] if reservation else ''
+            },
+            **params
         )
         
         return checkout_session.url, checkout_session.id
     
     except Exception as e:
         st.error(f"Error al crear sesión de pago: {str(e)}")
-        return None
+        return None, None
 
 # FUNCIÓN CORREGIDA
-def save_cart_to_firestore(session_id, user_id, cart_items):
-    """Guarda el carrito en Firestore antes de ir a Stripe"""
+def save_cart_to_firestore(session_id, user_id, cart_items, reservation=None):
+    """Guarda la sesión de pago (usuario, carrito y totales) en Firestore antes de ir a Stripe; devuelve si se guardó"""
     try:
-        # Convertir items del carrito al formato correcto
-        formatted_items = []
-        for item in cart_items:
-            formatted_items.append({
-                'name': item['name'],
-                'price': item['price'],
-                'quantity': item['quantity'],
-                'image': item.get('image', ''),
-                'added_at': datetime.now()
-            })
-        
-        cart_data = {
-            'session_id': session_id,
-            'user_id': user_id,
-            'items': formatted_items,
-            'created_at': datetime.now(),
-            'status': 'pending_payment'
-        }
-        
-        # CORREGIDO: Usar set() con document específico
-        st.session_state.db.collection('carts').document(session_id).set(cart_data)
+        usuario = dict(st.session_state['usuario'], uid=user_id)
+        store.save_checkout_session(session_id, usuario, cart_items, reservation=reservation, currency=currency)
         st.success("Carrito guardado en Firebase")
+        return True
         
     except Exception as e:
         st.error(f"Error al guardar carrito: {str(e)}")
+        return False
+
+def expire_checkout_session(session_id):
+    """Caduca en Stripe una sesión que no se podrá procesar al volver del pago"""
+    try:
+        get_stripe().checkout.Session.expire(session_id)
+    except Exception as e:
+        st.error(f"Error al cancelar la sesión de pago: {str(e)}")
 
 # Funciones para manejar el carrito (agregar a catalogo.py)
 def remove_from_cart(product_name):
@@ -658,25 +553,9 @@ def remove_from_cart(product_name):
         # 2. Actualizar en Firebase
         if 'usuario' in st.session_state and st.session_state.usuario:
             user_id = st.session_state.usuario['uid']
-            cart_ref = st.session_state.db.collection('carts').document(user_id)
-            
-            # Convertir session_state.cart a formato Firebase
-            firebase_items = []
-            for item in st.session_state.cart:
-                firebase_items.append({
-                    'name': item['name'],
-                    'price': item['price'],
-                    'quantity': item['quantity'],
-                    'image': item.get('image', ''),
-                    'product_id': item.get('product_id', item['name']),  # usar name como fallback
-                    'added_at': datetime.now()
-                })
             
-            # Actualizar el documento completo
-            cart_ref.update({
-                'items': firebase_items,
-                'updated_at': datetime.now()
-            })
+            # Reescribir las líneas del carrito guardado
+            store.replace_cart_items(user_id, st.session_state.cart)
             
             st.success(f"✅ '{product_name}' eliminado del carrito (Firebase actualizado)")
         
@@ -702,25 +581,9 @@ def update_cart_quantity(product_name, new_quantity):
         # 2. Actualizar en Firebase
         if 'usuario' in st.session_state and st.session_state.usuario:
             user_id = st.session_state.usuario['uid']
-            cart_ref = st.session_state.db.collection('carts').document(user_id)
-            
-            # Convertir session_state.cart a formato Firebase
-            firebase_items = []
-            for item in st.session_state.cart:
-                firebase_items.append({
-                    'name': item['name'],
-                    'price': item['price'],
-                    'quantity': item['quantity'],
-                    'image': item.get('image', ''),
-                    'product_id': item.get('product_id', item['name']),
-                    'added_at': datetime.now()
-                })
             
-            # Actualizar el documento completo
-            cart_ref.update({
-                'items': firebase_items,
-                'updated_at': datetime.now()
-            })
+            # Reescribir las líneas del carrito guardado
+            store.replace_cart_items(user_id, st.session_state.cart)
             
             if new_quantity <= 0:
                 st.success(f"✅ '{product_name}' eliminado (Firebase actualizado)")
@@ -742,18 +605,9 @@ def clear_entire_cart():
         # 2. Limpiar en Firebase
         if 'usuario' in st.session_state and st.session_state.usuario:
             user_id = st.session_state.usuario['uid']
-            cart_ref = st.session_state.db.collection('carts').document(user_id)
-            
-            # Verificar si existe el documento antes de actualizarlo
-            cart_doc = cart_ref.get()
             
-            if cart_doc.exists:
-                # Actualizar con carrito vacío
-                cart_ref.update({
-                    'items': [],
-                    'updated_at': datetime.now(),
-                    'cleared_at': datetime.now()
-                })
+            # Vaciar el carrito guardado (si existe)
+            if store.empty_cart(user_id):
                 st.success("✅ Carrito vaciado completamente (Firebase actualizado)")
             else:
                 st.info("ℹ️ No había carrito en Firebase para limpiar")
@@ -771,28 +625,9 @@ def sync_cart_with_firebase():
             return False
             
         user_id = st.session_state.usuario['uid']
-        cart_ref = st.session_state.db.collection('carts').document(user_id)
-        
-        # Convertir session_state.cart a formato Firebase
-        firebase_items = []
-        for item in st.session_state.cart:
-            firebase_items.append({
-                'name': item['name'],
-                'price': item['price'],
-                'quantity': item['quantity'],
-                'image': item.get('image', ''),
-                'product_id': item.get('product_id', item['name']),
-                'added_at': datetime.now()
-            })
         
         # Actualizar o crear el documento
-        cart_data = {
-            'user_id': user_id,
-            'items': firebase_items,
-            'updated_at': datetime.now()
-        }
-        
-        cart_ref.set(cart_data, merge=True)
+        store.save_cart(user_id, st.session_state.cart)
         return True
         
     except Exception as e:
@@ -806,11 +641,9 @@ def load_cart_from_firebase():
             return []
             
         user_id = st.session_state.usuario['uid']
-        cart_ref = st.session_state.db.collection('carts').document(user_id)
-        cart_doc = cart_ref.get()
+        cart_data = store.get_cart(user_id)
         
-        if cart_doc.exists:
-            cart_data = cart_doc.to_dict()
+        if cart_data:
             firebase_items = cart_data.get('items', [])
             
             # Convertir de formato Firebase a formato session_state
@@ -821,10 +654,13 @@ def load_cart_from_firebase():
                     'price': item.get('price', 0),
                     'quantity': item.get('quantity', 1),
                     'image': item.get('image', ''),
-                    'product_id': item.get('product_id', item.get('name', ''))
+                    'product_id': item.get('product_id', item.get('name', '')),
+                    'category': item.get('category', ''),
+                    'discount': item.get('discount', 0)
                 })
             
-            return session_items
+            # Precios de cada moneda para todo el carrito de una vez
+            return add_price_columns(session_items, fx_rates)
         
         return []
         
@@ -841,7 +677,10 @@ def add_to_cart_improved(product, user_id):
             'price': product['price'],
             'quantity': 1,
             'image': product['image'],
-            'product_id': product.get('id', product['name'])
+            'product_id': product.get('id', product['name']),
+            'category': product.get('category', ''),
+            'discount': product.get('discount', 0),
+            'prices': product.get('prices', {})
         }
         
         # Verificar si ya existe en el carrito
@@ -862,6 +701,28 @@ def add_to_cart_improved(product, user_id):
         st.error(f"❌ Error al agregar al carrito: {str(e)}")
         return False
 
+def on_add_to_cart(product, notice=None):
+    """Callback de los botones de agregar: actualiza el carrito y reejecuta solo su fragmento"""
+    try:
+        if available_stock(product) <= 0:
+            set_cart_notice("❌ Producto sin stock disponible")
+        elif add_to_cart_improved(product, st.session_state.usuario['uid']):
+            existing_item = next((item for item in st.session_state.cart 
+                                if item['name'] == product['name']), None)
+            
+            if notice:
+                set_cart_notice(notice)
+            elif existing_item and existing_item['quantity'] > 1:
+                set_cart_notice(f"✅ Cantidad actualizada: {product['name']} (x{existing_item['quantity']})")
+            else:
+                set_cart_notice(f"✅ {product['name']} agregado al carrito!")
+        else:
+            set_cart_notice("❌ Error al agregar producto")
+    except Exception as e:
+        set_cart_notice(f"❌ Error al agregar producto: {str(e)}")
+    
+    st.rerun(CART_FRAGMENT_KEY)
+
 # Funciones adicionales para debugging
 def show_cart_debug_info():
     """Muestra información de debug del carrito"""
@@ -869,13 +730,23 @@ def show_cart_debug_info():
     st.write(f"**Session Cart Length:** {len(st.session_state.cart)}")
     st.write(f"**Session Cart:** {st.session_state.cart}")
     
+    # Operaciones de Firestore de las últimas ejecuciones de esta sesión
+    last_runs = session_runs(limit=5)
+    if last_runs:
+        st.write("**Firestore (últimas ejecuciones):**")
+        st.dataframe([{
+            'Página': run['page'] + (f" / {run['fragment']}" if run['fragment'] else ''),
+            'Lecturas': run['reads'],
+            'Consultas': run['queries'],
+            'Escrituras': run['writes'],
+            'ms': run['firestore_ms']
+        } for run in last_runs], hide_index=True)
+    
     if 'usuario' in st.session_state and st.session_state.usuario:
         user_id = st.session_state.usuario['uid']
         try:
-            cart_ref = st.session_state.db.collection('carts').document(user_id)
-            cart_doc = cart_ref.get()
-            if cart_doc.exists:
-                firebase_cart = cart_doc.to_dict()
+            firebase_cart = store.get_cart(user_id)
+            if firebase_cart:
                 st.write(f"**Firebase Cart:** {firebase_cart}")
             else:
                 st.write("**Firebase Cart:** No existe")
@@ -891,8 +762,7 @@ def emergency_cart_cleanup():
         # Forzar limpieza en Firebase
         if 'usuario' in st.session_state and st.session_state.usuario:
             user_id = st.session_state.usuario['uid']
-            cart_ref = st.session_state.db.collection('carts').document(user_id)
-            cart_ref.delete()
+            store.delete_cart(user_id)
         
         # Limpiar otros posibles estados relacionados
         for key in list(st.session_state.keys()):
@@ -933,30 +803,265 @@ def force_cart_refresh():
         st.error(f"❌ Error forzando refresh: {str(e)}")
         return False
 
-def update_product_stock(items):
+def update_product_stock(items, order_number=None):
     """Actualiza el stock de productos después de la compra"""
     try:
         for item in items:
-            # Buscar producto por nombre
-            products_ref = st.session_state.db.collection('products')
-            query = products_ref.where('name', '==', item['name'])
-            docs = list(query.stream())
-            
-            for doc in docs:
-                product_data = doc.to_dict()
-                current_stock = product_data.get('stock', 0)
-                new_stock = max(0, current_stock - item['quantity'])
-                
-                doc.reference.update({
-                    'stock': new_stock,
-                    'last_updated': datetime.now()
-                })
-                
-                st.info(f"📦 Stock actualizado: {item['name']} ({current_stock} → {new_stock})")
+            # Descontar el stock de los productos con ese nombre; lo que falte queda pendiente
+            try:
+                for current_stock, new_stock, pending in store.decrement_stock(item['name'], item['quantity'], order_number):
+                    st.info(f"📦 Stock actualizado: {item['name']} ({current_stock} → {new_stock})")
+                    if pending:
+                        st.warning(f"⚠️ Faltan {pending} unidades de {item['name']}: quedan pendientes de revisión")
+            except Exception as e:
+                st.error(f"❌ Error actualizando {item['name']}: {str(e)}")
+        
+        # El catálogo en caché ya no refleja el stock
+        invalidate_catalog()
                 
     except Exception as e:
         st.error(f"❌ Error actualizando stock: {str(e)}")
 
+def validate_cart_before_payment():
+    """Revisa el carrito contra el catálogo actual; si algo cambió lo ajusta y devuelve False"""
+    try:
+        result = store.validate_cart(st.session_state.cart)
+        if not result['changed']:
+            st.session_state.pop('checkout_diff', None)
+            return True
+        
+        # Precios y cantidades actuales; las líneas sin stock o retiradas se quitan
+        st.session_state.cart = add_price_columns(result['items'], fx_rates)
+        sync_cart_with_firebase()
+        st.session_state.checkout_diff = result
+        return False
+    
+    except Exception as e:
+        # Se muestra en la siguiente ejecución del carrito
+        set_cart_notice(f"❌ Error al validar el carrito: {str(e)}")
+        return False
+
+def show_checkout_diff():
+    """Muestra qué líneas del carrito cambiaron en la última validación"""
+    result = st.session_state.get('checkout_diff')
+    if not result:
+        return
+    
+    st.warning("⚠️ Algunos productos cambiaron desde que los agregaste. Revisa tu carrito antes de pagar.")
+    for line in result['lines']:
+        if line['status'] == OK:
+            continue
+        if line['status'] == UNAVAILABLE:
+            st.caption(f"❌ {line['name']}: ya no está disponible, se quitó del carrito")
+        elif line['status'] == OUT_OF_STOCK:
+            st.caption(f"❌ {line['name']}: sin stock, se quitó del carrito")
+        else:
+            if line['quantity'] < line['old_quantity']:
+                st.caption(f"📦 {line['name']}: solo quedan {line['quantity']} (tenías {line['old_quantity']})")
+            if line['price'] != line['old_price']:
+                st.caption(f"💲 {line['name']}: {format_price(convert(line['old_price'], currency, fx_rates))} → "
+                           f"{format_price(convert(line['price'], currency, fx_rates))}")
+    st.caption(f"Total: {format_price(convert(result['old_total'], currency, fx_rates))} → "
+               f"{format_price(convert(result['total'], currency, fx_rates))}")
+
+def reserve_cart_stock(items):
+    """Retiene el stock del carrito mientras se paga en Stripe"""
+    try:
+        reservation = store.reserve_stock(items, st.session_state['usuario']['uid'])
+        
+        # El catálogo en caché ya no refleja las unidades disponibles
+        invalidate_catalog()
+        return reservation
+    
+    except InsufficientStock as e:
+        for line in e.lines:
+            st.error(f"❌ {line['name']}: solo quedan {line['available']} unidades disponibles")
+        return None
+    
+    except Exception as e:
+        st.error(f"❌ Error al reservar el stock: {str(e)}")
+        return None
+
+# CARRITO MEJORADO (fragmento: sus botones solo reejecutan el carrito)
+@st.fragment(key=CART_FRAGMENT_KEY)
+@fragment_run('catalogo', CART_FRAGMENT_KEY)
+def render_improved_sidebar_cart():
+    """Renderiza el carrito en sidebar con manejo mejorado"""
+    notice = pop_cart_notice()
+    if notice:
+        if notice.startswith("❌"):
+            st.error(notice)
+        else:
+            st.success(notice)
+
+    # Botón de debug (solo mostrar en desarrollo)
+    if st.button("🔍 Debug Carrito", key="debug_cart"):
+        show_cart_debug_info()
+
+    # Botón de limpieza de emergencia
+    if st.button("🚨 Limpiar Carrito (Emergencia)", key="emergency_clean"):
+        if emergency_cart_cleanup():
+            rerun_fragment()
+
+    st.markdown("### 🛒 Carrito")
+    show_checkout_diff()
+
+    # Verificar si hay trigger para actualizar
+    refresh_trigger = st.session_state.get('cart_refresh_trigger', 0)
+
+    if st.session_state.cart:
+        total = 0
+
+        st.markdown('<div class="clear-cart-btn">', unsafe_allow_html=True)
+        if st.button("🗑️ Vaciar Todo", key=f"clear_all_{refresh_trigger}"):
+            if clear_entire_cart():
+                st.success("✅ Carrito vaciado")
+                rerun_fragment()
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown("---")
+
+        # Mostrar items del carrito
+        for idx, item in enumerate(st.session_state.cart):
+            unit_price = item_price(item, currency, fx_rates)
+            st.markdown(f"""
+            <div class="cart-item">
+                <strong>{item['name']}</strong><br>
+                <small>{format_price(unit_price)} c/u</small><br>
+                <span style="color: #5D4037;">Subtotal: {format_price(unit_price * item['quantity'])}</span>
+            </div>
+            """, unsafe_allow_html=True)
+
+            col1, col2, col3 = st.columns([1, 1, 1])
+
+            with col1:
+                if st.button("➖", key=f"decrease_{idx}_{refresh_trigger}"):
+                    new_quantity = item['quantity'] - 1
+                    if update_cart_quantity(item['name'], new_quantity):
+                        rerun_fragment()
+
+            with col2:
+                st.markdown(f"""
+                <div class="quantity-display">
+                    {item['quantity']}
+                </div>
+                """, unsafe_allow_html=True)
+
+            with col3:
+                if st.button("➕", key=f"increase_{idx}_{refresh_trigger}"):
+                    new_quantity = item['quantity'] + 1
+                    if update_cart_quantity(item['name'], new_quantity):
+                        rerun_fragment()
+
+            st.markdown('<div class="remove-item-btn">', unsafe_allow_html=True)
+            if st.button(f"🗑️ Quitar", key=f"remove_{idx}_{refresh_trigger}"):
+                if remove_from_cart(item['name']):
+                    rerun_fragment()
+            st.markdown('</div>', unsafe_allow_html=True)
+
+            st.markdown("<br>", unsafe_allow_html=True)
+            total += unit_price * item['quantity']
+
+        # Mostrar total
+        st.markdown(f"""
+        <div class="cart-total">
+            💰 Total: {format_price(total)}
+        </div>
+        """, unsafe_allow_html=True)
+
+        # Botones de compra
+        st.markdown("### 💳 Métodos de Pago")
+
+        # Botón mejorado de compra simulada
+        st.markdown('<div class="simulated-checkout-btn">', unsafe_allow_html=True)
+        if st.button("🛒 Comprar Ahora (Simulado)", key=f"simulated_checkout_{refresh_trigger}", use_container_width=True):
+            if not validate_cart_before_payment():
+                rerun_fragment()  # Mostrar el carrito ajustado antes de cobrar
+            if process_simulated_checkout_improved():
+                st.rerun()  # Recargar toda la página: carrito vacío y stock actualizado
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        # Separador
+        st.markdown('<div class="payment-separator">O con Stripe</div>', unsafe_allow_html=True)
+
+        # Botón original con Stripe
+        if st.button("💳 Pagar con Stripe", key=f"stripe_checkout_{refresh_trigger}", use_container_width=True):
+            if not validate_cart_before_payment():
+                rerun_fragment()
+            reservation = reserve_cart_stock(st.session_state.cart)
+            if reservation:
+                checkout_url, session_id = create_checkout_session(st.session_state.cart, st.session_state['usuario']['email'], reservation)
+                # Sin checkout_sessions/{id} la vuelta del pago no podría guardar la orden
+                if checkout_url and session_id and save_cart_to_firestore(session_id, st.session_state['usuario']['uid'], st.session_state.cart, reservation):
+                    st.link_button("🔗 Ir a Stripe Checkout", checkout_url, use_container_width=True)
+                    st.success("¡Sesión de pago creada! Haz clic en el botón para continuar.")
+                    st.caption(f"⏳ Reservamos tus productos hasta las {reservation['expires_at']:%H:%M}")
+                else:
+                    if session_id:
+                        expire_checkout_session(session_id)
+                    store.release_reservation(reservation['id'])
+    else:
+        # Carrito vacío
+        st.markdown("""
+        <div class="empty-cart">
+            <img src="https://images.unsplash.com/photo-1556742049-0cfed4f6a45d?w=200&h=200&fit=crop" 
+                 alt="Carrito vacío">
+            <p><strong>Tu carrito está vacío</strong></p>
+            <p style="font-size: 0.9rem;">¡Comienza a agregar productos!</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+@st.fragment
+@fragment_run('catalogo', 'product_grid')
+def render_product_grid(products):
+    """Filtros y grid de productos (fragmento: cambiar de categoría no reejecuta la página)"""
+    # Filtros - ARREGLADO CON KEY ÚNICO
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        categories = ["todos", "vestidos", "blusas", "pantalones", "chaquetas", "zapatos", "accesorios"]
+        selected_category = st.selectbox("Categoría", categories, key="category_filter_main")
+    
+    # Filtrar por categoría
+    if selected_category != "todos":
+        products = [p for p in products if p.get('category') == selected_category]
+    
+    if not products:
+        st.info("No se encontraron productos en esta categoría.")
+        return
+    
+    # Crear grid responsivo
+    cols = st.columns(3)
+    
+    for idx, product in enumerate(products):
+        with cols[idx % 3]:
+            # Crear contenedor con altura uniforme
+            st.markdown(f"""
+            <div class="product-card">
+                <div class="product-image-container">
+                    <img src="{product['image']}" alt="{product['name']}">
+                </div>
+                <div class="product-content">
+                    <div>
+                        <h3 class="product-title">{product['name']}</h3>
+                        <p class="product-description">{product['description']}</p>
+                    </div>
+                    <div class="product-pricing">
+                        <div class="price-tag">{format_price(item_price(product, currency, fx_rates))}</div>
+                        <p class="stock-info">Stock: {available_stock(product)} unidades</p>
+                    </div>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # Botón fuera del HTML para mantener funcionalidad (el callback solo reejecuta el carrito)
+            st.button(f"🛒 Agregar al Carrito", 
+                      key=f"add_product_{product.get('id', idx)}_{idx}",
+                      use_container_width=True,
+                      on_click=on_add_to_cart, args=(product,))
+            
+            # Espaciado adicional entre productos
+            st.markdown("<br>", unsafe_allow_html=True)
+
 # --- LÓGICA PRINCIPAL DE LA PÁGINA ---
 
 # Header principal 
@@ -968,14 +1073,15 @@ st.markdown('''
 ''', unsafe_allow_html=True)
 
 # Sidebar con logo, información del usuario y carrito
-with st.sidebar:
+with st.sidebar, span('sidebar'):
     # Logo en la sidebar
-    st.image("logo.jpg", width=150)
+    st.image(logo(), width=150)
     st.markdown("<br>", unsafe_allow_html=True)
     
     # CARGAR CARRITO DESDE FIREBASE AL INICIAR
     if 'cart_loaded' not in st.session_state:
-        firebase_cart = load_cart_from_firebase()
+        with span('cargar_carrito'):
+            firebase_cart = load_cart_from_firebase()
         if firebase_cart:
             st.session_state.cart = firebase_cart
             st.success(f"✅ Carrito cargado: {len(firebase_cart)} productos")
@@ -997,120 +1103,21 @@ with st.sidebar:
     # Información del usuario
     st.markdown(f"### 👤 {st.session_state['usuario']['nombre']}")
     
+    if st.button("📦 Mis Pedidos"):
+        st.session_state.orders_cursors = [None]
+        st.switch_page('pages/mis_pedidos.py')
+    
+    if is_admin(st.session_state['usuario']):
+        if st.button("📊 Panel de Administración"):
+            st.switch_page('pages/admin.py')
+    
     if st.button("🚪 Cerrar Sesión"):
+        forget_session()
         st.session_state.clear()
         st.rerun()
     
     st.markdown("---")
     
-    # CARRITO MEJORADO
-    def render_improved_sidebar_cart():
-        """Renderiza el carrito en sidebar con manejo mejorado"""
-        
-        # Botón de debug (solo mostrar en desarrollo)
-        if st.button("🔍 Debug Carrito", key="debug_cart"):
-            show_cart_debug_info()
-        
-        # Botón de limpieza de emergencia
-        if st.button("🚨 Limpiar Carrito (Emergencia)", key="emergency_clean"):
-            if emergency_cart_cleanup():
-                st.rerun()
-        
-        st.markdown("### 🛒 Carrito")
-        
-        # Verificar si hay trigger para actualizar
-        refresh_trigger = st.session_state.get('cart_refresh_trigger', 0)
-        
-        if st.session_state.cart:
-            total = 0
-            
-            st.markdown('<div class="clear-cart-btn">', unsafe_allow_html=True)
-            if st.button("🗑️ Vaciar Todo", key=f"clear_all_{refresh_trigger}"):
-                if clear_entire_cart():
-                    st.success("✅ Carrito vaciado")
-                    st.rerun()
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            st.markdown("---")
-            
-            # Mostrar items del carrito
-            for idx, item in enumerate(st.session_state.cart):
-                st.markdown(f"""
-                <div class="cart-item">
-                    <strong>{item['name']}</strong><br>
-                    <small>${item['price']:.2f} c/u</small><br>
-                    <span style="color: #5D4037;">Subtotal: ${item['price'] * item['quantity']:.2f}</span>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                col1, col2, col3 = st.columns([1, 1, 1])
-                
-                with col1:
-                    if st.button("➖", key=f"decrease_{idx}_{refresh_trigger}"):
-                        new_quantity = item['quantity'] - 1
-                        if update_cart_quantity(item['name'], new_quantity):
-                            st.rerun()
-                
-                with col2:
-                    st.markdown(f"""
-                    <div class="quantity-display">
-                        {item['quantity']}
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col3:
-                    if st.button("➕", key=f"increase_{idx}_{refresh_trigger}"):
-                        new_quantity = item['quantity'] + 1
-                        if update_cart_quantity(item['name'], new_quantity):
-                            st.rerun()
-                
-                st.markdown('<div class="remove-item-btn">', unsafe_allow_html=True)
-                if st.button(f"🗑️ Quitar", key=f"remove_{idx}_{refresh_trigger}"):
-                    if remove_from_cart(item['name']):
-                        st.rerun()
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                st.markdown("<br>", unsafe_allow_html=True)
-                total += item['price'] * item['quantity']
-            
-            # Mostrar total
-            st.markdown(f"""
-            <div class="cart-total">
-                💰 Total: ${total:.2f}
-            </div>
-            """, unsafe_allow_html=True)
-
-            # Botones de compra
-            st.markdown("### 💳 Métodos de Pago")
-            
-            # Botón mejorado de compra simulada
-            st.markdown('<div class="simulated-checkout-btn">', unsafe_allow_html=True)
-            if st.button("🛒 Comprar Ahora (Simulado)", key=f"simulated_checkout_{refresh_trigger}", use_container_width=True):
-                if process_simulated_checkout_improved():
-                    st.rerun()  # Recargar para mostrar carrito vacío
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            # Separador
-            st.markdown('<div class="payment-separator">O con Stripe</div>', unsafe_allow_html=True)
-            
-            # Botón original con Stripe
-            if st.button("💳 Pagar con Stripe", key=f"stripe_checkout_{refresh_trigger}", use_container_width=True):
-                checkout_url, session_id = create_checkout_session(st.session_state.cart, st.session_state['usuario']['email'])
-                if checkout_url and session_id:
-                    save_cart_to_firestore(session_id, st.session_state['usuario']['uid'], st.session_state.cart)
-                    st.link_button("🔗 Ir a Stripe Checkout", checkout_url, use_container_width=True)
-                    st.success("¡Sesión de pago creada! Haz clic en el botón para continuar.")
-        else:
-            # Carrito vacío
-            st.markdown("""
-            <div class="empty-cart">
-                <img src="https://images.unsplash.com/photo-1556742049-0cfed4f6a45d?w=200&h=200&fit=crop" 
-                     alt="Carrito vacío">
-                <p><strong>Tu carrito está vacío</strong></p>
-                <p style="font-size: 0.9rem;">¡Comienza a agregar productos!</p>
-            </div>
-            """, unsafe_allow_html=True)
-
     # Llamar a la función para renderizar el carrito
     render_improved_sidebar_cart()
 
@@ -1118,76 +1125,13 @@ with st.sidebar:
 st.markdown("## Catálogo de Productos")
 
 # Obtener productos
-products = get_products()
+with span('productos'):
+    products, catalog_stamp = get_products()
 
 if products:
-    display_personalized_offers(st.session_state['usuario']['uid'], products)
+    render_offers_strip(st.session_state['usuario']['uid'], products, catalog_stamp)
 
-# Filtros - ARREGLADO CON KEY ÚNICO
-col1, col2 = st.columns([1, 3])
-with col1:
-    categories = ["todos", "vestidos", "blusas", "pantalones", "chaquetas", "zapatos", "accesorios"]
-    selected_category = st.selectbox("Categoría", categories, key="category_filter_main")
-
-# Filtrar por categoría
-if selected_category != "todos":
-    products = [p for p in products if p.get('category') == selected_category]
-
-# Mostrar productos en grid - VERSIÓN CORREGIDA
-if products:
-    # Crear grid responsivo
-    cols = st.columns(3)
-    
-    for idx, product in enumerate(products):
-        with cols[idx % 3]:
-            # Crear contenedor con altura uniforme
-            st.markdown(f"""
-            <div class="product-card">
-                <div class="product-image-container">
-                    <img src="{product['image']}" alt="{product['name']}">
-                </div>
-                <div class="product-content">
-                    <div>
-                        <h3 class="product-title">{product['name']}</h3>
-                        <p class="product-description">{product['description']}</p>
-                    </div>
-                    <div class="product-pricing">
-                        <div class="price-tag">${product['price']:.2f}</div>
-                        <p class="stock-info">Stock: {product.get('stock', 0)} unidades</p>
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Botón fuera del HTML para mantener funcionalidad
-            if st.button(f"🛒 Agregar al Carrito", 
-                        key=f"add_product_{product.get('id', idx)}_{idx}",
-                        use_container_width=True):
-                try:
-                    if product.get('stock', 0) <= 0:
-                        st.error("❌ Producto sin stock disponible")
-                    else:
-                        if add_to_cart_improved(product, st.session_state.usuario['uid']):
-                            existing_item = next((item for item in st.session_state.cart 
-                                                if item['name'] == product['name']), None)
-                            
-                            if existing_item and existing_item['quantity'] > 1:
-                                st.success(f"✅ Cantidad actualizada: {product['name']} (x{existing_item['quantity']})")
-                            else:
-                                st.success(f"✅ {product['name']} agregado al carrito!")
-                            
-                            st.rerun()
-                        else:
-                            st.error("❌ Error al agregar producto")
-                            
-                except Exception as e:
-                    st.error(f"❌ Error al agregar producto: {str(e)}")
-            
-            # Espaciado adicional entre productos
-            st.markdown("<br>", unsafe_allow_html=True)
-
-else:
-    st.info("No se encontraron productos en esta categoría.")
+render_product_grid(products)
 
 # Footer
 st.markdown("---")
@@ -1196,4 +1140,7 @@ st.markdown("""
     <p>ADRIANA TOUZ - Tu estilo, nuestra pasión</p>
     <p>Desarrollado usando Streamlit, Firebase y Stripe</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Desglose del perfil (solo con el perfilado activo)
+render_profile_panel()
\ No newline at end of file
@@ -1,25 +1,38 @@
 import streamlit as st
-import stripe
-import os
 from datetime import datetime
 import time
+from servicios.assets import inject_css
+from servicios.catalog import invalidate_catalog
+from servicios.currency import BASE_CURRENCY, item_price, price_formatter
+from servicios.reservations import CONVERTED
+from servicios.store import get_store
+from servicios.session_store import sync_session
+from servicios.payments import get_stripe
+from servicios.firestore_metrics import begin_run
+from servicios.profiler import begin_profile, render_profile_panel, span
+
+# Sesión guardada si el navegador viene de otro proceso (tools.cluster)
+sync_session()
 
 # Verificar si el usuario está logueado
 if 'login' not in st.session_state:
     st.switch_page('app.py')
 
-# Configuración de Stripe
-stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
+# Métricas de Firestore y perfil (si está activo) de esta ejecución
+begin_run('compraok')
+begin_profile('compraok')
+
+# Acceso a datos (Firestore, SQLite o memoria según STORAGE_BACKEND)
+store = get_store()
 
 # CSS personalizado para el diseño de lujo
-with open("estilos/css_compra.html", "r") as file:
-    html_content = file.read()
-st.markdown(html_content, unsafe_allow_html=True)
+inject_css("compra")
 
 # FUNCIÓN COMPLETAMENTE CORREGIDA
-def save_order_to_firestore(session_id, user_id, items, total):
+def save_order_to_firestore(session_id, user_id, items, total, currency=BASE_CURRENCY):
     """Guarda la orden en Firestore - VERSIÓN CORREGIDA"""
     try:
+        fx_rates = store.fx_rates()
         # Formatear items correctamente
         formatted_items = []
         for item in items:
@@ -28,7 +41,8 @@ def save_order_to_firestore(session_id, user_id, items, total):
                 'price': float(item['price']),  # Asegurar que sea float
                 'quantity': int(item['quantity']),  # Asegurar que sea int
                 'image': item.get('image', ''),
-                'subtotal': float(item['price']) * int(item['quantity'])
+                'subtotal': float(item['price']) * int(item['quantity']),
+                'charged_price': float(item_price(item, currency, fx_rates))  # Precio cobrado
             })
         
         order_number = f"ORD-{int(time.time())}-{user_id[:8]}"
@@ -44,15 +58,17 @@ def save_order_to_firestore(session_id, user_id, items, total):
             'status': 'completed',
             'created_at': datetime.now(),
             'payment_method': 'stripe',
-            'currency': 'USD'
+            # Total y rollups en la moneda base; el cobro, en la moneda del usuario
+            'currency': BASE_CURRENCY,
+            'charged_currency': currency,
+            'charged_total': sum(item['charged_price'] * item['quantity'] for item in formatted_items)
         }
         
-        # CORREGIDO: Usar add() que retorna DocumentReference
-        doc_ref = st.session_state.db.collection('orders').add(order_data)
+        # Guardar la orden y actualizar los rollups de ventas en la misma escritura
+        document_ref = store.record_order(order_data)
         
         # Verificar que se creó correctamente
-        if doc_ref and len(doc_ref) > 1:  # add() retorna (timestamp, doc_ref)
-            document_ref = doc_ref[1]
+        if document_ref:
             st.success(f"✅ Orden guardada con ID: {document_ref.id}")
             return order_number
         else:
@@ -64,18 +80,12 @@ def save_order_to_firestore(session_id, user_id, items, total):
         return None
 
 # FUNCIÓN MEJORADA
-def clear_user_cart(session_id):
+def clear_user_cart(session_id, order_number):
     """Limpia el carrito del usuario después de la compra - MEJORADO"""
     try:
-        # Verificar si el documento existe antes de eliminarlo
-        cart_ref = st.session_state.db.collection('carts').document(session_id)
-        cart_doc = cart_ref.get()
-        
-        if cart_doc.exists:
-            cart_ref.delete()
-            st.success("✅ Carrito limpiado en Firebase")
-        else:
-            st.warning("⚠️ No se encontró carrito en Firebase para limpiar")
+        # Marcar la sesión de pago como completada con su orden (sin releer el documento)
+        store.complete_checkout_session(session_id, order_number)
+        st.success("✅ Carrito limpiado en Firebase")
         
         # Limpiar carrito en session_state
         if 'cart' in st.session_state:
@@ -88,48 +98,40 @@ def clear_user_cart(session_id):
 def get_stripe_session_details(session_id):
     """Obtiene los detalles de la sesión de Stripe"""
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
+        session = get_stripe().checkout.Session.retrieve(session_id)
         return session
     except Exception as e:
         st.error(f"Error al obtener detalles de Stripe: {str(e)}")
         return None
 
 # FUNCIÓN MEJORADA
-def update_product_stock(items):
+def update_product_stock(items, order_number=None):
     """Actualiza el stock de los productos comprados - MEJORADO"""
     try:
         updates_count = 0
         
         for item in items:
             try:
-                # Buscar el producto por nombre
-                products_ref = st.session_state.db.collection('products')
-                query = products_ref.where('name', '==', item['name'])
-                docs = list(query.stream())  # Convertir a lista
+                # Descontar el stock de los productos con ese nombre
+                changes = store.decrement_stock(item['name'], item['quantity'], order_number)
                 
-                if not docs:
+                if not changes:
                     st.warning(f"⚠️ Producto '{item['name']}' no encontrado para actualizar stock")
                     continue
                 
-                for doc in docs:
-                    product_data = doc.to_dict()
-                    current_stock = product_data.get('stock', 0)
-                    new_stock = max(0, current_stock - item['quantity'])
-                    
-                    # Actualizar stock
-                    doc.reference.update({
-                        'stock': new_stock,
-                        'last_updated': datetime.now()
-                    })
-                    
+                for current_stock, new_stock, pending in changes:
                     updates_count += 1
                     st.info(f"📦 Stock actualizado para '{item['name']}': {current_stock} → {new_stock}")
+                    if pending:
+                        st.warning(f"⚠️ Faltan {pending} unidades de '{item['name']}': quedan pendientes de revisión")
                     
             except Exception as item_error:
                 st.error(f"❌ Error actualizando '{item['name']}': {str(item_error)}")
                 continue
         
         if updates_count > 0:
+            # El catálogo en caché ya no refleja el stock
+            invalidate_catalog()
             st.success(f"✅ {updates_count} productos actualizados")
         else:
             st.warning("⚠️ No se actualizó ningún producto")
@@ -137,21 +139,42 @@ def update_product_stock(items):
     except Exception as e:
         st.error(f"❌ Error general al actualizar stock: {str(e)}")
 
+def fulfill_reservation(session_id):
+    """Convierte en venta el stock retenido para este pago; False si hay que descontarlo sin retención"""
+    try:
+        checkout_session = store.get_checkout_session(session_id)
+        reservation_id = (checkout_session or {}).get('reservation_id')
+        if not reservation_id:
+            return False
+        
+        if store.convert_reservation(reservation_id) == CONVERTED:
+            # El catálogo en caché ya no refleja el stock
+            invalidate_catalog()
+            st.success("✅ Stock descontado de la reserva del pago")
+            return True
+        
+        st.warning("⚠️ La reserva de stock ya no estaba activa; se descuenta el stock disponible")
+        return False
+    
+    except Exception as e:
+        st.error(f"❌ Error al confirmar la reserva de stock: {str(e)}")
+        return False
+
 # FUNCIÓN MEJORADA
 def restore_cart_from_firestore(session_id):
-    """Restaura el carrito desde Firestore - MEJORADO"""
+    """Restaura el carrito desde la sesión de pago (cacheada desde app.py) - MEJORADO"""
     try:
         if not session_id:
             st.error("❌ Session ID no válido")
             return []
 
-        # Intentar desde la colección 'carts'
-        cart_ref = st.session_state.db.collection('carts').document(session_id)
-        cart_doc = cart_ref.get()
+        checkout_session = store.get_checkout_session(session_id)
 
-        if cart_doc.exists:
-            cart_data = cart_doc.to_dict()
-            items = cart_data.get('items', [])
+        if checkout_session:
+            currency = checkout_session.get('currency', BASE_CURRENCY)
+            # El precio cobrado de cada línea queda como su columna en la moneda del pago
+            items = [dict(item, prices={currency: item.get('charged_price', item['price'])})
+                     for item in checkout_session.get('items', [])]
 
             if items:
                 st.success(f"✅ Carrito restaurado: {len(items)} productos")
@@ -167,24 +190,14 @@ def restore_cart_from_firestore(session_id):
         st.error(f"❌ Error al restaurar carrito: {str(e)}")
         return []
     
-# Verificar estado de la orden
-def verify_order_creation(order_number):
-    """Verifica que la orden se haya creado correctamente"""
+def get_payment_currency(session_id):
+    """Moneda en la que se cobró el pago (guardada con la sesión de pago)"""
     try:
-        orders_ref = st.session_state.db.collection('orders')
-        query = orders_ref.where('order_number', '==', order_number)
-        docs = list(query.stream())
-        
-        if docs:
-            st.success(f"✅ Orden verificada en Firebase: {order_number}")
-            return True
-        else:
-            st.error(f"❌ Orden no encontrada en Firebase: {order_number}")
-            return False
-            
+        checkout_session = store.get_checkout_session(session_id)
+        return (checkout_session or {}).get('currency', BASE_CURRENCY)
     except Exception as e:
-        st.error(f"❌ Error verificando orden: {str(e)}")
-        return False
+        st.error(f"❌ Error al leer la moneda del pago: {str(e)}")
+        return BASE_CURRENCY
 
 # --- LÓGICA PRINCIPAL ---
 st.markdown('''
@@ -219,7 +232,8 @@ if not session_id:
     st.stop()
 
 # Obtener detalles de la sesión de Stripe
-session = get_stripe_session_details(session_id)
+with span('sesion_stripe'):
+    session = get_stripe_session_details(session_id)
 
 if not session:
     st.error("❌ No se pudieron obtener los detalles del pago.")
@@ -240,9 +254,15 @@ st.markdown(f'''
 </div>
 ''', unsafe_allow_html=True)
 
+# Precios en la moneda del cobro, con el formato del usuario
+payment_currency = get_payment_currency(session_id)
+format_price = price_formatter(payment_currency, st.session_state['usuario'].get('locale'))
+fx_rates = store.fx_rates()
+
 # Restaurar carrito si no está en session_state o está vacío
 if not st.session_state.get('cart') or len(st.session_state.cart) == 0:
-    st.session_state.cart = restore_cart_from_firestore(session_id)
+    with span('restaurar_carrito'):
+        st.session_state.cart = restore_cart_from_firestore(session_id)
 
 # Verificar si tenemos productos para mostrar
 if not st.session_state.cart or len(st.session_state.cart) == 0:
@@ -256,49 +276,63 @@ if not st.session_state.cart or len(st.session_state.cart) == 0:
 st.markdown('<h3>Productos Comprados</h3>', unsafe_allow_html=True)
 
 # Construir HTML de productos
-products_html = ""
-total = 0
-for item in st.session_state.cart:
-    products_html += f'''
-    <div class="order-item">
-        <div>
-            <strong>{item['name']}</strong><br>
-            <small>Cantidad: {item['quantity']}</small>
+with span('resumen_productos'):
+    products_html = ""
+    total = 0
+    charged_total = 0
+    for item in st.session_state.cart:
+        unit_price = item_price(item, payment_currency, fx_rates)
+        products_html += f'''
+        <div class="order-item">
+            <div>
+                <strong>{item['name']}</strong><br>
+                <small>Cantidad: {item['quantity']}</small>
+            </div>
+            <div>{format_price(unit_price)}</div>
         </div>
-        <div>${item['price']:.2f}</div>
-    </div>
-    '''
-    total += item['price'] * item['quantity']
-
-# Mostrar productos y total
-st.markdown(products_html, unsafe_allow_html=True)
-st.markdown(f'<div class="total-amount">Total: ${total:.2f}</div>', unsafe_allow_html=True)
-
-# Guardar orden en Firestore
-order_number = save_order_to_firestore(
-    session_id, 
-    st.session_state['usuario']['uid'], 
-    st.session_state.cart, 
-    total
-)
-
-if order_number:
-    st.success(f"📝 Número de orden: {order_number}")
-    
-    # Verificar que la orden se creó correctamente
-    verify_order_creation(order_number)
-    
-    # Actualizar stock de productos
-    update_product_stock(st.session_state.cart)
-    
-    # Limpiar carrito después de guardar la orden
-    clear_user_cart(session_id)
-    
-    # Mostrar mensaje de confirmación
-    st.info("📧 Se ha enviado un email de confirmación a tu dirección de correo.")
-    
+        '''
+        total += item['price'] * item['quantity']
+        charged_total += unit_price * item['quantity']
+
+    # Mostrar productos y total
+    st.markdown(products_html, unsafe_allow_html=True)
+    st.markdown(f'<div class="total-amount">Total: {format_price(charged_total)}</div>', unsafe_allow_html=True)
+
+# Una recarga de la página con el pago ya procesado no repite la orden ni el descuento de stock
+completed_session = store.get_checkout_session(session_id) or {}
+if completed_session.get('status') == 'completed':
+    if completed_session.get('order_number'):
+        st.success(f"📝 Número de orden: {completed_session['order_number']}")
+    st.info("ℹ️ Este pago ya estaba procesado.")
+
 else:
-    st.error("❌ Hubo un problema al guardar la orden. Por favor, contacta al soporte.")
+    # Guardar orden en Firestore
+    with span('guardar_orden'):
+        order_number = save_order_to_firestore(
+            session_id, 
+            st.session_state['usuario']['uid'], 
+            st.session_state.cart, 
+            total,
+            payment_currency
+        )
+
+    if order_number:
+        st.success(f"📝 Número de orden: {order_number}")
+        
+        # Actualizar stock de productos
+        with span('actualizar_stock'):
+            if not fulfill_reservation(session_id):
+                update_product_stock(st.session_state.cart, order_number)
+        
+        # Limpiar carrito después de guardar la orden
+        with span('limpiar_carrito'):
+            clear_user_cart(session_id, order_number)
+        
+        # Mostrar mensaje de confirmación
+        st.info("📧 Se ha enviado un email de confirmación a tu dirección de correo.")
+        
+    else:
+        st.error("❌ Hubo un problema al guardar la orden. Por favor, contacta al soporte.")
 
 # Botón para continuar comprando
 st.markdown('''
@@ -317,3 +351,6 @@ st.markdown("""
     <p>ADRIANA TOUZ - Gracias por confiar en nosotros</p>
 </div>
 """, unsafe_allow_html=True)
+
+# Desglose del perfil (solo con el perfilado activo)
+render_profile_panel()
@@ -0,0 +1,105 @@
+import streamlit as st
+from servicios.assets import inject_css
+from servicios.currency import BASE_CURRENCY, price_formatter
+from servicios.firestore_metrics import begin_run
+from servicios.profiler import begin_profile, render_profile_panel
+from servicios.store import get_store
+from servicios.session_store import sync_session
+
+# Sesión guardada si el navegador viene de otro proceso (tools.cluster)
+sync_session()
+
+# Verificar si el usuario está logueado
+if 'login' not in st.session_state:
+    st.switch_page('app.py')
+
+# Métricas de Firestore y perfil (si está activo) de esta ejecución
+begin_run('mis_pedidos')
+begin_profile('mis_pedidos')
+
+# Acceso a datos (Firestore, SQLite o memoria según STORAGE_BACKEND)
+store = get_store()
+
+# CSS personalizado para el diseño de lujo
+inject_css("compra")
+
+PAGE_SIZE = 10
+
+# Pila de cursores: el último elemento es el cursor de la página actual
+if 'orders_cursors' not in st.session_state:
+    st.session_state.orders_cursors = [None]
+
+def load_orders_page():
+    """Carga solo las órdenes de la página actual"""
+    try:
+        return store.user_orders(
+            st.session_state['usuario']['uid'],
+            limit=PAGE_SIZE,
+            cursor=st.session_state.orders_cursors[-1]
+        )
+    except Exception as e:
+        st.error(f"❌ Error al cargar tus pedidos: {str(e)}")
+        return [], None
+
+def display_order(order):
+    """Muestra una orden en un bloque desplegable"""
+    created_at = order.get('created_at')
+    fecha = created_at.strftime('%d/%m/%Y %H:%M') if created_at else 'N/A'
+    # Importes en la moneda en que se cobró la orden (las antiguas, en la moneda base)
+    currency = order.get('charged_currency', order.get('currency', BASE_CURRENCY))
+    format_price = price_formatter(currency, st.session_state['usuario'].get('locale'))
+    total = order.get('charged_total', order.get('total', 0))
+
+    with st.expander(f"📦 {order.get('order_number', order['id'])} — {fecha} — {format_price(total)}"):
+        products_html = ""
+        for item in order.get('items', []):
+            products_html += f'''
+            <div class="order-item">
+                <div>
+                    <strong>{item['name']}</strong><br>
+                    <small>Cantidad: {item['quantity']}</small>
+                </div>
+                <div>{format_price(item.get('charged_price', item['price']))}</div>
+            </div>
+            '''
+        st.markdown(products_html, unsafe_allow_html=True)
+        st.markdown(f'<div class="total-amount">Total: {format_price(total)}</div>', unsafe_allow_html=True)
+
+# --- LÓGICA PRINCIPAL ---
+st.markdown('''
+<div class="success-container">
+    <div class="success-icon">📦</div>
+    <h1>Mis Pedidos</h1>
+    <p>Historial de tus compras en ADRIANA TOUZ</p>
+</div>
+''', unsafe_allow_html=True)
+
+orders, next_cursor = load_orders_page()
+
+if orders:
+    for order in orders:
+        display_order(order)
+else:
+    st.info("Todavía no tienes pedidos.")
+
+# Paginación por cursores
+col1, col2, col3 = st.columns([1, 2, 1])
+with col1:
+    if len(st.session_state.orders_cursors) > 1:
+        if st.button("⬅️ Anteriores", key="orders_prev"):
+            st.session_state.orders_cursors.pop()
+            st.rerun()
+with col2:
+    st.markdown(f"<div style='text-align: center;'>Página {len(st.session_state.orders_cursors)}</div>", unsafe_allow_html=True)
+with col3:
+    if next_cursor is not None:
+        if st.button("Siguientes ➡️", key="orders_next"):
+            st.session_state.orders_cursors.append(next_cursor)
+            st.rerun()
+
+if st.button("🔙 Volver al Catálogo", key="orders_back"):
+    st.session_state.orders_cursors = [None]
+    st.switch_page('pages/catalogo.py')
+
+# Desglose del perfil (solo con el perfilado activo)
+render_profile_panel()
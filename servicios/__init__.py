@@ -0,0 +1 @@
+"""Servicios compartidos por las páginas de ADRIANA TOUZ"""
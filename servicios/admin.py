@@ -0,0 +1,11 @@
+import os
+
+
+def get_admin_emails():
+    """Lee los emails con acceso al panel de administración (ADMIN_EMAILS, separados por comas)"""
+    return {email.strip().lower() for email in os.environ.get("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+
+def is_admin(usuario):
+    """Indica si el usuario logueado es administrador"""
+    return bool(usuario) and usuario.get('email', '').lower() in get_admin_emails()
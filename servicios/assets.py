@@ -0,0 +1,168 @@
+"""CSS y logo servidos como recursos estáticos con huella (fingerprint).
+
+tools/build_assets.py minifica los bloques <style> de estilos/*.html y genera
+las variantes del logo en static/, con el hash del contenido en el nombre y
+un static/manifest.json. Si ASSETS_BASE_URL está definida (el sidecar de
+servicios/sidecar.py, un proxy o un CDN) las páginas referencian los
+recursos por URL y el navegador los cachea; si no, se insertan en línea
+desde una caché en memoria del proceso. En ningún caso se lee el disco en
+cada ejecución de la página.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+
+import streamlit as st
+
+STYLES_DIR = 'estilos'
+STATIC_DIR = 'static'
+MANIFEST_PATH = os.path.join(STATIC_DIR, 'manifest.json')
+LOGO_PATH = 'logo.jpg'
+
+# Hojas de estilo conocidas: nombre lógico -> estilos/css_<nombre>.html
+STYLESHEETS = ['login', 'catalogo', 'compra']
+
+# Variantes del logo: nombre -> (ancho en px, formato)
+LOGO_VARIANTS = {
+    'logo-150': (150, 'JPEG'),
+    'logo-300': (300, 'JPEG'),
+    'favicon': (64, 'PNG')
+}
+
+_STYLE_BLOCK = re.compile(r'<style[^>]*>(.*?)</style>', re.S | re.I)
+_LINK_TAG = re.compile(r'<link\b[^>]*>', re.I)
+
+# Caché del proceso: clave -> markup / bytes ya preparados
+_cache = {}
+_lock = threading.Lock()
+
+
+def base_url():
+    """URL base de los recursos estáticos (None = insertar en línea)"""
+    url = os.environ.get('ASSETS_BASE_URL')
+    return url.rstrip('/') if url else None
+
+
+def fingerprint(content):
+    """Hash corto del contenido para el nombre del fichero"""
+    return hashlib.sha256(content).hexdigest()[:10]
+
+
+def minify_css(css):
+    """Elimina comentarios y espacios innecesarios de una hoja de estilos"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    return css.strip()
+
+
+def parse_stylesheet(html):
+    """Separa un fichero de estilos/ en (css_minificado, etiquetas_link)"""
+    css = '\n'.join(_STYLE_BLOCK.findall(html))
+    links = [re.sub(r'\s+"', '"', tag) for tag in _LINK_TAG.findall(html)]
+    return minify_css(css), links
+
+
+def read_stylesheet(name):
+    """Lee y procesa estilos/css_<nombre>.html"""
+    with open(os.path.join(STYLES_DIR, f"css_{name}.html"), 'r', encoding='utf-8') as file:
+        return parse_stylesheet(file.read())
+
+
+def render_logo(width, image_format, source=LOGO_PATH):
+    """Redimensiona el logo y devuelve los bytes codificados"""
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image = image.convert('RGB')
+        height = round(image.height * width / image.width)
+        image = image.resize((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if image_format == 'JPEG':
+            image.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+        else:
+            image.save(buffer, image_format, optimize=True)
+        return buffer.getvalue()
+
+
+def load_manifest():
+    """Manifiesto generado por tools/build_assets.py ({} si no se ha construido)"""
+    with _lock:
+        if 'manifest' not in _cache:
+            try:
+                with open(MANIFEST_PATH, 'r') as file:
+                    _cache['manifest'] = json.load(file)
+            except (OSError, ValueError):
+                _cache['manifest'] = {}
+        return _cache['manifest']
+
+
+def _cached(key, build):
+    with _lock:
+        if key in _cache:
+            return _cache[key]
+    value = build()
+    with _lock:
+        _cache[key] = value
+    return value
+
+
+def _build_css_markup(name):
+    entry = load_manifest().get('css', {}).get(name)
+    url = base_url()
+    if entry and url:
+        links = entry['links'] + [f'<link rel="stylesheet" href="{url}/{entry["file"]}">']
+        return '\n'.join(links)
+
+    if entry:
+        with open(os.path.join(STATIC_DIR, entry['file']), 'r', encoding='utf-8') as file:
+            css, links = file.read(), entry['links']
+    else:
+        css, links = read_stylesheet(name)
+    return '\n'.join(links + [f'<style>{css}</style>'])
+
+
+def css_markup(name):
+    """HTML para cargar la hoja de estilos `name` (link o <style> en línea)"""
+    return _cached(('css', name), lambda: _build_css_markup(name))
+
+
+def inject_css(name):
+    """Aplica la hoja de estilos `name` a la página actual"""
+    st.markdown(css_markup(name), unsafe_allow_html=True)
+
+
+def _build_image(variant):
+    entry = load_manifest().get('images', {}).get(variant)
+    url = base_url()
+    if entry and url:
+        return f"{url}/{entry}"
+    if entry:
+        with open(os.path.join(STATIC_DIR, entry), 'rb') as file:
+            return file.read()
+    width, image_format = LOGO_VARIANTS[variant]
+    return render_logo(width, image_format)
+
+
+def logo(variant='logo-300'):
+    """Logo para st.image / page_icon: URL si hay ASSETS_BASE_URL, bytes en memoria si no"""
+    return _cached(('image', variant), lambda: _build_image(variant))
+
+
+def warm_assets():
+    """Prepara todas las hojas de estilo y variantes del logo en la caché"""
+    for name in STYLESHEETS:
+        css_markup(name)
+    for variant in LOGO_VARIANTS:
+        logo(variant)
+
+
+def clear_assets_cache():
+    """Vacía la caché (p. ej. tras reconstruir los recursos)"""
+    with _lock:
+        _cache.clear()
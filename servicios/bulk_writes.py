@@ -0,0 +1,190 @@
+"""Escrituras masivas en lotes de 500 operaciones enviados en paralelo.
+
+BulkLoader agrupa las escrituras en lotes (db.batch()) de hasta
+MAX_BATCH_SIZE operaciones y los confirma desde un pool de hilos, con un
+máximo de lotes en vuelo para no acumular memoria. Los errores transitorios
+de Firestore se reintentan con espera exponencial. Con method='bulk_writer'
+se usa el BulkWriter de google-cloud-firestore (solo clientes reales o el
+emulador), que aplica su propio control de ritmo (500/50/5).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.api_core.exceptions import Aborted, DeadlineExceeded, ResourceExhausted, ServiceUnavailable
+
+# Límite de operaciones por lote de Firestore
+MAX_BATCH_SIZE = 500
+
+# Hilos que confirman lotes a la vez
+DEFAULT_WORKERS = 8
+
+# Reintentos de un lote ante errores transitorios
+MAX_RETRIES = 5
+
+_TRANSIENT_ERRORS = (Aborted, DeadlineExceeded, ResourceExhausted, ServiceUnavailable)
+
+
+def _collection_name(reference):
+    return reference.parent.id
+
+
+class BulkLoader:
+    """Acumula escrituras y las confirma en lotes paralelos; close() devuelve el resumen"""
+
+    def __init__(self, db, batch_size=MAX_BATCH_SIZE, workers=DEFAULT_WORKERS, method='batch', progress=None):
+        if not 0 < batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"batch_size debe estar entre 1 y {MAX_BATCH_SIZE}")
+        if method == 'bulk_writer' and not hasattr(db, 'bulk_writer'):
+            raise ValueError("El cliente no tiene BulkWriter; usa method='batch'")
+
+        self.db = db
+        self.batch_size = batch_size
+        self.method = method
+        self.progress = progress
+        self.stats = {'writes': 0, 'batches': 0, 'retries': 0, 'by_collection': {}}
+        self._lock = threading.Lock()
+        self._pending = []
+        self._futures = []
+        self._errors = []
+        self._start = time.perf_counter()
+        self._last_report = self._start
+
+        if method == 'bulk_writer':
+            self._writer = db.bulk_writer()
+            self._writer.on_write_result(lambda reference, result, writer: self._count([reference]))
+            self._writer.on_batch_result(lambda batch, response, writer: self._count_batch())
+            self._executor = None
+        else:
+            self._writer = None
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk-writes')
+            # Lotes en vuelo como máximo (confirmándose o en cola)
+            self._slots = threading.BoundedSemaphore(workers * 2)
+
+    def set(self, reference, data, merge=False):
+        self._add('set', reference, data, merge)
+
+    def update(self, reference, field_updates):
+        self._add('update', reference, field_updates)
+
+    def delete(self, reference):
+        self._add('delete', reference)
+
+    def _add(self, kind, reference, data=None, merge=False):
+        if self._writer is not None:
+            if kind == 'set':
+                self._writer.set(reference, data, merge=merge)
+            elif kind == 'update':
+                self._writer.update(reference, data)
+            else:
+                self._writer.delete(reference)
+            return
+
+        self._pending.append((kind, reference, data, merge))
+        if len(self._pending) >= self.batch_size:
+            self._submit()
+
+    def _submit(self):
+        operations, self._pending = self._pending, []
+        if not operations:
+            return
+        if self._errors:
+            raise self._errors[0]
+        self._slots.acquire()
+        future = self._executor.submit(self._commit, operations)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+        self._futures = [f for f in self._futures if not f.done()]
+
+    def _commit(self, operations):
+        delay = 0.5
+        for attempt in range(MAX_RETRIES + 1):
+            batch = self.db.batch()
+            for kind, reference, data, merge in operations:
+                if kind == 'set':
+                    batch.set(reference, data, merge=merge)
+                elif kind == 'update':
+                    batch.update(reference, data)
+                else:
+                    batch.delete(reference)
+            try:
+                batch.commit()
+                break
+            except _TRANSIENT_ERRORS as e:
+                if attempt == MAX_RETRIES:
+                    self._errors.append(e)
+                    raise
+                with self._lock:
+                    self.stats['retries'] += 1
+                time.sleep(delay)
+                delay *= 2
+            except Exception as e:
+                self._errors.append(e)
+                raise
+
+        self._count_batch()
+        self._count([reference for _, reference, _, _ in operations])
+
+    def _count_batch(self):
+        with self._lock:
+            self.stats['batches'] += 1
+
+    def _count(self, references):
+        with self._lock:
+            self.stats['writes'] += len(references)
+            by_collection = self.stats['by_collection']
+            for reference in references:
+                name = _collection_name(reference)
+                by_collection[name] = by_collection.get(name, 0) + 1
+
+            now = time.perf_counter()
+            if self.progress and now - self._last_report >= 2:
+                self._last_report = now
+                elapsed = now - self._start
+                self.progress(f"   {self.stats['writes']:,} escrituras · {self.stats['writes'] / elapsed:,.0f} docs/s")
+
+    def flush(self):
+        """Envía lo pendiente y espera a que terminen todos los lotes"""
+        if self._writer is not None:
+            self._writer.flush()
+            return
+        self._submit()
+        for future in list(self._futures):
+            future.result()
+        self._futures = []
+
+    def close(self):
+        """Confirma todo lo pendiente, libera los hilos y devuelve el resumen"""
+        try:
+            if self._writer is not None:
+                self._writer.close()
+            else:
+                self.flush()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+        if self._errors:
+            raise self._errors[0]
+        return self.summary()
+
+    def summary(self):
+        elapsed = time.perf_counter() - self._start
+        with self._lock:
+            return {
+                'writes': self.stats['writes'],
+                'batches': self.stats['batches'],
+                'retries': self.stats['retries'],
+                'by_collection': dict(self.stats['by_collection']),
+                'seconds': round(elapsed, 2),
+                'docs_per_second': round(self.stats['writes'] / elapsed, 1) if elapsed > 0 else 0.0
+            }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        return False
@@ -0,0 +1,137 @@
+"""Validación del carrito contra el catálogo vivo antes de pagar.
+
+Los precios, nombres y stock del carrito vienen de session_state y pueden
+haber cambiado desde que se añadió cada línea. validate_cart() lee en un solo
+get_all() el puntero del catálogo y todos los productos referenciados, ajusta
+precio y cantidad de cada línea y devuelve las diferencias para mostrarlas
+antes del pago. Solo si alguna línea apunta a un producto que ya no existe
+(p. ej. tras publicar una versión nueva del catálogo) se hace una consulta
+más, por nombre, para reenlazarla.
+"""
+from servicios.catalog import catalog_pointer
+from servicios.reservations import available_stock
+from servicios.stock_shards import with_sharded_stock
+
+# Estados de cada línea del diff
+OK = 'ok'
+PRICE_CHANGED = 'price_changed'
+QUANTITY_REDUCED = 'quantity_reduced'
+OUT_OF_STOCK = 'out_of_stock'
+UNAVAILABLE = 'unavailable'
+
+# Valores admitidos por un filtro 'in' de Firestore
+MAX_IN_VALUES = 30
+
+
+def offer_name(name, discount):
+    """Nombre con el que se añade al carrito un producto en oferta"""
+    return f"{name} (OFERTA -{discount}%)"
+
+
+def _base_name(item):
+    discount = item.get('discount', 0)
+    suffix = offer_name('', discount)
+    if discount and item['name'].endswith(suffix):
+        return item['name'][:-len(suffix)]
+    return item['name']
+
+
+def _line_price(product, item):
+    """Precio actual de la línea (con el descuento de la oferta, si lo tiene)"""
+    price = float(product.get('price', 0.0))
+    discount = item.get('discount', 0)
+    return price * (1 - discount / 100) if discount else price
+
+
+def _fetch_by_id(db, items):
+    """Puntero y productos referenciados en un único get_all: (versión, {product_id: (ref, datos)})"""
+    pointer = catalog_pointer(db)
+    references = {}
+    for item in items:
+        product_id = item.get('product_id')
+        if product_id and '/' not in product_id:
+            references.setdefault(product_id, db.collection('products').document(product_id))
+
+    version, products = None, {}
+    for doc in db.get_all([pointer] + list(references.values())):
+        if doc.reference.path == pointer.path:
+            version = doc.to_dict().get('version') if doc.exists else None
+        elif doc.exists:
+            products[doc.id] = (doc.reference, with_sharded_stock(db, doc.id, doc.to_dict()))
+    return version, products
+
+
+def _fetch_by_name(db, names, version):
+    """Productos publicados con esos nombres: {nombre: (ref, datos)}"""
+    names = list(names)
+    products = {}
+    for start in range(0, len(names), MAX_IN_VALUES):
+        query = db.collection('products').where('name', 'in', names[start:start + MAX_IN_VALUES])
+        for doc in query.stream():
+            product = doc.to_dict()
+            if product.get('catalog_version') == version:
+                products[product['name']] = (doc.reference, with_sharded_stock(db, doc.id, product))
+    return products
+
+
+def validate_cart(db, items):
+    """Reconcilia el carrito con el catálogo; devuelve {'items', 'lines', 'changed', 'old_total', 'total'}"""
+    version, by_id = _fetch_by_id(db, items)
+
+    # Solo cuentan los productos de la versión publicada (o todos si no hay versiones)
+    live = {product_id: entry for product_id, entry in by_id.items()
+            if entry[1].get('catalog_version') == version}
+    missing = {_base_name(item) for item in items if item.get('product_id') not in live}
+    by_name = _fetch_by_name(db, missing, version) if missing else {}
+
+    remaining_stock = {}
+    reconciled, lines = [], []
+    for item in items:
+        entry = live.get(item.get('product_id')) or by_name.get(_base_name(item))
+        line = {
+            'name': item['name'],
+            'old_price': item['price'],
+            'price': item['price'],
+            'old_quantity': item['quantity'],
+            'quantity': 0,
+            'status': UNAVAILABLE
+        }
+        lines.append(line)
+        if entry is None:
+            continue
+
+        reference, product = entry
+        # El stock se reparte entre las líneas del mismo producto (normal y en oferta)
+        stock = remaining_stock.setdefault(reference.id, available_stock(product))
+        quantity = min(item['quantity'], stock)
+        remaining_stock[reference.id] = stock - quantity
+        price = round(_line_price(product, item), 2)
+
+        line.update(price=price, quantity=quantity, stock=stock)
+        if quantity == 0:
+            line['status'] = OUT_OF_STOCK
+            continue
+        if quantity < item['quantity']:
+            line['status'] = QUANTITY_REDUCED
+        elif abs(price - round(float(item['price']), 2)) >= 0.01:
+            line['status'] = PRICE_CHANGED
+        else:
+            line['status'] = OK
+            price = item['price']
+
+        reconciled.append({
+            **item,
+            'price': price,
+            'quantity': quantity,
+            'product_id': reference.id,
+            'image': product.get('image', item.get('image', '')),
+            'category': product.get('category', item.get('category', ''))
+        })
+
+    return {
+        'items': reconciled,
+        'lines': lines,
+        'changed': any(line['status'] != OK for line in lines),
+        'old_total': sum(item['price'] * item['quantity'] for item in items),
+        'total': sum(item['price'] * item['quantity'] for item in reconciled)
+    }
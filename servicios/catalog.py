@@ -0,0 +1,189 @@
+"""Caché del catálogo de productos compartida por todas las sesiones del proceso.
+
+El catálogo completo se lee de Firestore como mucho una vez cada `ttl`
+segundos (y se invalida al actualizar stock), en lugar de en cada ejecución
+de la página. warm_up() lo carga al arrancar el servidor.
+
+Si existe el puntero settings/catalog solo se leen los productos de la
+versión publicada (ver servicios/catalog_maintenance.py), de modo que un
+catálogo nuevo aparece completo o no aparece.
+
+Con CATALOG_SNAPSHOT_DIR definido el catálogo no se guarda en cada proceso
+sino en una instantánea mapeada en memoria que comparten todos los procesos
+del nodo (ver servicios/catalog_snapshot.py).
+
+Cada carga calcula también los precios de cada moneda (product['prices'],
+ver servicios/currency.py), así que mostrarlos no convierte nada, y guarda
+la marca de precios del puntero (versión publicada y último ajuste de
+precios) con la que se leyó, que get_catalog_with_stamp() devuelve junto a
+los productos sin leer nada más.
+"""
+import threading
+import time
+
+from servicios import catalog_snapshot
+from servicios.currency import add_price_columns, get_rates
+from servicios.stock_shards import is_sharded, with_sharded_stock
+
+# Segundos que se reutiliza el catálogo antes de volver a leer Firestore
+DEFAULT_TTL = 30
+
+# Productos de ejemplo para una base de datos vacía
+SAMPLE_PRODUCTS = [
+    {
+        "name": "Vestido Elegante",
+        "price": 89.99,
+        "image": "https://i.imgur.com/TRmtJwn.jpg",
+        "description": "Vestido elegante, perfecto para ocasiones especiales",
+        "category": "vestidos",
+        "stock": 15
+    },
+    {
+        "name": "Blusa Casual",
+        "price": 45.99,
+        "image": "https://i.imgur.com/NqHc7ri.jpg",
+        "description": "Blusa cómoda y versátil para el día a día",
+        "category": "blusas",
+        "stock": 25
+    },
+    {
+        "name": "Pantalon palazo",
+        "price": 79.99,
+        "image": "https://i.imgur.com/oS0BYH1.jpg",
+        "description": "pantalón palazo de alta calidad, ideal para combinar",
+        "category": "pantalones",
+        "stock": 20
+    },
+    {
+        "name": "Blazer",
+        "price": 129.99,
+        "image": "https://i.imgur.com/yCMtdfa.jpg",
+        "description": "Blazer elegante de calidad, ideal para ocasiones especiales",
+        "category": "chaquetas",
+        "stock": 8
+    },
+    {
+        "name": "Zapatos Elegantes",
+        "price": 95.99,
+        "image": "https://i.imgur.com/uKfw8iR.jpg",
+        "description": "Zapatos elegantes para completar tu look",
+        "category": "zapatos",
+        "stock": 12
+    },
+    {
+        "name": "Bolso de Mano",
+        "price": 65.99,
+        "image": "https://i.imgur.com/T99kfQS.jpg",
+        "description": "Bolso de mano versátil y elegante para cualquier ocasión",
+        "category": "accesorios",
+        "stock": 18
+    }
+]
+
+# Documento con la versión publicada del catálogo
+POINTER_COLLECTION = 'settings'
+POINTER_DOCUMENT = 'catalog'
+
+# Caché: id(db) -> (db, expira_en, productos, marca de precios)
+_cache = {}
+_lock = threading.Lock()
+
+
+def catalog_pointer(db):
+    return db.collection(POINTER_COLLECTION).document(POINTER_DOCUMENT)
+
+
+def price_stamp(db):
+    """[versión publicada, último ajuste de precios] del puntero: cambia si cambian los precios"""
+    doc = catalog_pointer(db).get()
+    pointer = doc.to_dict() if doc.exists else {}
+    updated_at = pointer.get('prices_updated_at')
+    return [pointer.get('version'), updated_at.isoformat() if updated_at else None]
+
+
+def current_version(db):
+    """Versión publicada del catálogo o None si los productos no tienen versión"""
+    doc = catalog_pointer(db).get()
+    return doc.to_dict().get('version') if doc.exists else None
+
+
+def load_products(db):
+    """Lee los productos de la versión publicada (todos si no hay puntero)"""
+    while True:
+        version = current_version(db)
+        query = db.collection('products')
+        if version:
+            query = query.where('catalog_version', '==', version)
+
+        products = []
+        for doc in query.stream():
+            product = doc.to_dict()
+            # Sin puntero, los productos con versión son de una publicación que aún no ha terminado
+            if not version and 'catalog_version' in product:
+                continue
+            # Productos calientes: el stock incluye la suma (cacheada) de sus shards
+            if is_sharded(product):
+                product = with_sharded_stock(db, doc.id, product)
+            product['id'] = doc.id
+            products.append(product)
+
+        # Si se publicó otra versión mientras se leía, la anterior puede estar a medio borrar
+        if current_version(db) == version:
+            return products
+
+
+def seed_sample_products(db):
+    """Crea los productos de ejemplo en un único batch y los devuelve con su id"""
+    batch = db.batch()
+    products = []
+    for sample in SAMPLE_PRODUCTS:
+        product_ref = db.collection('products').document()
+        batch.set(product_ref, sample)
+        products.append({**sample, 'id': product_ref.id})
+    batch.commit()
+    return products
+
+
+def _load_or_seed(db):
+    """(productos, marca de precios); la marca se lee antes para no adelantarse a los productos"""
+    stamp = price_stamp(db)
+    products = load_products(db)
+    # Si no hay productos, crear algunos de ejemplo
+    products = products or seed_sample_products(db)
+    # Columnas de precios por moneda, una vez por carga del catálogo (con los tipos recién leídos)
+    return add_price_columns(products, get_rates(db, refresh=True)), stamp
+
+
+def _cached_catalog(db, ttl):
+    """(productos, marca) desde la instantánea del nodo, la caché del proceso o Firestore"""
+    directory = catalog_snapshot.snapshot_dir()
+    if directory:
+        return catalog_snapshot.get_products(directory, lambda: _load_or_seed(db), ttl)
+
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(id(db))
+        if not (entry and entry[0] is db and entry[1] > now):
+            products, stamp = _load_or_seed(db)
+            entry = _cache[id(db)] = (db, now + ttl, products, stamp)
+        return [dict(product) for product in entry[2]], entry[3]
+
+
+def get_catalog(db, ttl=DEFAULT_TTL):
+    """Devuelve el catálogo (copias de cada producto) desde la caché o Firestore"""
+    return _cached_catalog(db, ttl)[0]
+
+
+def get_catalog_with_stamp(db, ttl=DEFAULT_TTL):
+    """(catálogo, marca de precios de esa misma carga), p. ej. para la clave de las ofertas cacheadas"""
+    products, stamp = _cached_catalog(db, ttl)
+    return products, tuple(stamp or ())
+
+
+def invalidate_catalog():
+    """Descarta el catálogo en caché (p. ej. tras actualizar stock)"""
+    with _lock:
+        _cache.clear()
+    directory = catalog_snapshot.snapshot_dir()
+    if directory:
+        catalog_snapshot.invalidate(directory)
@@ -0,0 +1,178 @@
+"""Mantenimiento masivo del catálogo: vaciar, republicar y cambiar precios o stock.
+
+Todas las operaciones escriben con BulkLoader (lotes de 500 confirmados en
+paralelo, o el BulkWriter de Firestore) en lugar de un documento por vuelta.
+Publicar un catálogo es atómico para el comprador: los productos nuevos se
+escriben con un catalog_version que todavía no está publicado, después se
+cambia el puntero settings/catalog en una sola escritura y por último se
+borran las versiones anteriores. load_products() solo lee la versión del
+puntero, así que nadie ve un catálogo a medias.
+
+`progress` recibe mensajes de texto y se llama siempre desde el hilo que
+lanza la operación (se puede pasar st.write o el write de un st.status).
+"""
+from datetime import datetime
+
+from servicios.catalog import SAMPLE_PRODUCTS, catalog_pointer, current_version, invalidate_catalog
+from servicios.stock_shards import is_sharded, shard_collection, shard_totals
+
+# Cada cuántas operaciones se informa del avance
+PROGRESS_EVERY = 5000
+
+
+def _silent(message):
+    pass
+
+
+def new_version(now=None):
+    """Identificador de versión ordenable por fecha"""
+    return (now or datetime.now()).strftime('v%Y%m%d-%H%M%S-%f')
+
+
+def _write_all(db, operations, label, loader_options=None, progress=None):
+    """Aplica una secuencia de (tipo, referencia, datos) con BulkLoader y devuelve el resumen"""
+    # Solo el mantenimiento escribe en lotes: las páginas no cargan google.api_core al importar
+    from servicios.bulk_writes import BulkLoader
+
+    progress = progress or _silent
+    with BulkLoader(db, **(loader_options or {})) as loader:
+        for count, (kind, reference, data) in enumerate(operations, 1):
+            if kind == 'set':
+                loader.set(reference, data)
+            elif kind == 'update':
+                loader.update(reference, data)
+            else:
+                loader.delete(reference)
+            if count % PROGRESS_EVERY == 0:
+                progress(f"{label}: {count:,} operaciones enviadas")
+    summary = loader.summary()
+    progress(f"✅ {label}: {summary['writes']:,} documentos en {summary['seconds']:.1f}s "
+             f"({summary['docs_per_second']:,.0f} docs/s)")
+    return summary
+
+
+def _published_products(db, category=None):
+    """Consulta de los productos de la versión publicada (y de una categoría)"""
+    query = db.collection('products')
+    version = current_version(db)
+    if version:
+        query = query.where('catalog_version', '==', version)
+    if category:
+        query = query.where('category', '==', category)
+    return query
+
+
+def catalog_status(db):
+    """Puntero del catálogo publicado (vacío si los productos no tienen versión)"""
+    doc = catalog_pointer(db).get()
+    return doc.to_dict() if doc.exists else {}
+
+
+def truncate_catalog(db, loader_options=None, progress=None):
+    """Borra todos los productos y el puntero; get_catalog() vuelve a sembrar los de ejemplo"""
+    progress = progress or _silent
+    progress("🗑️ Borrando productos...")
+    summary = _write_all(db, (('delete', reference, None) for reference in db.collection('products').list_documents()),
+                         'Productos borrados', loader_options, progress)
+    catalog_pointer(db).delete()
+    invalidate_catalog()
+    return summary
+
+
+def publish_catalog(db, products, loader_options=None, progress=None):
+    """Escribe una versión nueva del catálogo, la publica y retira las anteriores"""
+    progress = progress or _silent
+    products = list(products)
+    if not products:
+        raise ValueError("El catálogo nuevo no tiene productos")
+
+    now = datetime.now()
+    version = new_version(now)
+    previous = current_version(db)
+    collection = db.collection('products')
+
+    progress(f"📦 Escribiendo {len(products):,} productos en la versión {version}...")
+    written = _write_all(db, (
+        ('set', collection.document(), {**{k: v for k, v in product.items() if k != 'id'},
+                                        'catalog_version': version, 'last_updated': now})
+        for product in products
+    ), 'Productos escritos', loader_options, progress)
+
+    # Una sola escritura: a partir de aquí los compradores leen la versión nueva
+    catalog_pointer(db).set({
+        'version': version,
+        'previous_version': previous,
+        'products': len(products),
+        'published_at': datetime.now()
+    })
+    invalidate_catalog()
+    progress(f"🚀 Versión {version} publicada")
+
+    def retired_documents():
+        for doc in collection.stream():
+            product = doc.to_dict()
+            if product.get('catalog_version') == version:
+                continue
+            # Los shards de stock de los productos calientes se van con ellos
+            if is_sharded(product):
+                for shard in shard_collection(db, doc.id).list_documents():
+                    yield 'delete', shard, None
+            yield 'delete', doc.reference, None
+
+    progress("🧹 Retirando versiones anteriores...")
+    retired = _write_all(db, retired_documents(), 'Productos retirados', loader_options, progress)
+
+    return {'version': version, 'previous_version': previous, 'written': written, 'retired': retired}
+
+
+def reseed_catalog(db, loader_options=None, progress=None):
+    """Publica los productos de ejemplo como una versión nueva"""
+    return publish_catalog(db, SAMPLE_PRODUCTS, loader_options, progress)
+
+
+def update_products(db, changes, category=None, label='Productos actualizados', loader_options=None, progress=None,
+                    pointer_fields=None):
+    """Aplica changes(producto) -> campos a actualizar (o None) a los productos publicados
+
+    `pointer_fields` se añaden al puntero settings/catalog al terminar (p. ej. la fecha del ajuste de precios).
+    """
+    now = datetime.now()
+
+    def operations():
+        for doc in _published_products(db, category).stream():
+            product = doc.to_dict()
+            shard_stock = shard_totals(db, doc.id, ttl=0).get('stock', 0) if is_sharded(product) else 0
+            fields = changes({**product, 'stock': product.get('stock', 0) + shard_stock})
+            if fields:
+                if 'stock' in fields:
+                    # En productos calientes el documento guarda solo lo que no está en los shards
+                    fields['stock'] -= shard_stock
+                yield 'update', doc.reference, {**fields, 'last_updated': now}
+
+    summary = _write_all(db, operations(), label, loader_options, progress)
+    if pointer_fields:
+        catalog_pointer(db).set(pointer_fields, merge=True)
+    invalidate_catalog()
+    return summary
+
+
+def adjust_prices(db, percent, category=None, loader_options=None, progress=None):
+    """Sube o baja un `percent` % el precio de los productos (de una categoría o todos)"""
+    if percent <= -100:
+        raise ValueError("El porcentaje debe ser mayor que -100")
+    factor = 1 + percent / 100
+    # La nueva fecha en el puntero cambia la marca de precios del catálogo (y recalcula las ofertas cacheadas)
+    return update_products(db, lambda product: {'price': round(product.get('price', 0.0) * factor, 2)},
+                           category, 'Precios actualizados', loader_options, progress,
+                           pointer_fields={'prices_updated_at': datetime.now()})
+
+
+def set_stock(db, stock=None, delta=None, category=None, loader_options=None, progress=None):
+    """Fija el stock a `stock` o le suma `delta` (sin bajar de 0)"""
+    if (stock is None) == (delta is None):
+        raise ValueError("Indica stock o delta, no ambos")
+    if stock is not None:
+        changes = lambda product: {'stock': max(0, stock)}
+    else:
+        changes = lambda product: {'stock': max(0, product.get('stock', 0) + delta)}
+    return update_products(db, changes, category, 'Stock actualizado', loader_options, progress)
@@ -0,0 +1,247 @@
+"""Instantánea del catálogo en un fichero mapeado en memoria, compartida por los procesos de un nodo.
+
+Con CATALOG_SNAPSHOT_DIR definido, get_catalog() no guarda el catálogo en
+cada proceso: un solo proceso del nodo (el que consigue el flock de
+catalog.lock) lo lee de Firestore y lo escribe en catalog.snap, y todos lo
+leen con mmap desde la caché de páginas del sistema, así que Firestore se
+recorre una vez por nodo. Cada proceso decodifica cada versión de la
+instantánea una sola vez y guarda esos diccionarios (como la caché en
+proceso); las lecturas siguientes solo hacen copias superficiales.
+
+Formato (little-endian, sin dependencias):
+
+    cabecera  MAGIC, FORMAT, n.º de monedas, versión (ns), creado (epoch),
+              n.º de productos y (offset, longitud) de la marca de precios
+              (JSON, ver servicios/catalog.py)
+    monedas   código ISO (3 bytes) de cada columna de precios
+    tabla     un registro por producto: price, stock, reserved,
+              stock_shards, shard_writes, (offset, longitud) de id, name,
+              category, image, description, catalog_version y extra (JSON
+              con el resto de campos, vacío casi siempre) y un double por
+              moneda (product['prices'], ver servicios/currency.py)
+    heap      textos UTF-8
+
+Las fechas de mantenimiento (last_updated...) no viajan en la instantánea:
+la tienda no las muestra y decodificarlas costaría más que todo lo demás.
+
+Cada versión se escribe en un fichero temporal y se publica con os.replace
+(atómico): los lectores que aún tienen mapeada la anterior la siguen leyendo
+hasta soltarla. invalidate() toca catalog.invalidated para que la siguiente
+lectura de cualquier proceso del nodo refresque la instantánea.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin instantánea compartida
+    fcntl = None
+
+MAGIC = b'ATCS'
+FORMAT = 3
+HEADER = struct.Struct('<4sHHQdIII')
+RECORD = struct.Struct('<dqqI?14I')
+
+SNAPSHOT_FILE = 'catalog.snap'
+LOCK_FILE = 'catalog.lock'
+INVALIDATED_FILE = 'catalog.invalidated'
+
+# Campos con sitio fijo en el registro; el resto va en 'extra'
+TEXT_FIELDS = ('id', 'name', 'category', 'image', 'description', 'catalog_version')
+FIXED_FIELDS = set(TEXT_FIELDS) | {'price', 'stock', 'reserved', 'stock_shards', 'shard_writes', 'prices'}
+
+# Instantánea mapeada por este proceso: (ruta) -> CatalogSnapshot
+_mapped = {}
+_lock = threading.Lock()
+
+
+def snapshot_dir():
+    """Directorio de la instantánea compartida (None si no está activada)"""
+    directory = os.environ.get('CATALOG_SNAPSHOT_DIR')
+    return directory if directory and fcntl is not None else None
+
+
+def record_struct(currency_count):
+    """Registro de un producto con `currency_count` columnas de precios"""
+    return struct.Struct(RECORD.format + 'd' * currency_count)
+
+
+def encode(products, created_at=None, stamp=None):
+    """Serializa los productos (y la marca de precios con la que se leyeron) en el formato de la instantánea"""
+    version = time.time_ns()
+    # Todas las cargas calculan las mismas columnas para todos los productos
+    currencies = list(products[0].get('prices') or {}) if products else []
+    record = record_struct(len(currencies))
+    heap = bytearray()
+    table = bytearray()
+    table_start = HEADER.size + 3 * len(currencies)
+    heap_start = table_start + record.size * len(products)
+
+    def text(value):
+        data = value.encode('utf-8')
+        offset = heap_start + len(heap)
+        heap.extend(data)
+        return offset, len(data)
+
+    for product in products:
+        extra = {key: value for key, value in product.items()
+                 if key not in FIXED_FIELDS and not isinstance(value, datetime)}
+        spans = [text(str(product.get(field) or '')) for field in TEXT_FIELDS]
+        spans.append(text(json.dumps(extra, default=str, ensure_ascii=False)) if extra else (0, 0))
+        prices = product.get('prices') or {}
+        table.extend(record.pack(float(product.get('price', 0.0)), int(product.get('stock', 0)),
+                                 int(product.get('reserved', 0)), int(product.get('stock_shards', 0)),
+                                 bool(product.get('shard_writes')), *[n for span in spans for n in span],
+                                 *[float(prices.get(currency, 'nan')) for currency in currencies]))
+
+    stamp_span = text(json.dumps(stamp, default=str)) if stamp is not None else (0, 0)
+    header = HEADER.pack(MAGIC, FORMAT, len(currencies), version, created_at or time.time(), len(products),
+                         *stamp_span)
+    return bytes(header + ''.join(currencies).encode('ascii') + table + heap)
+
+
+class CatalogSnapshot:
+    """Instantánea mapeada en memoria (solo lectura)"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, file_format, currency_count, self.version, self.created_at, self.count, stamp_at, stamp_len = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or file_format != FORMAT:
+            raise ValueError(f"{path} no es una instantánea del catálogo (formato {file_format})")
+        self.stamp = json.loads(self._map[stamp_at:stamp_at + stamp_len]) if stamp_len else None
+        codes = self._map[HEADER.size:HEADER.size + 3 * currency_count].decode('ascii')
+        self.currencies = tuple(codes[index:index + 3] for index in range(0, len(codes), 3))
+        self._record = record_struct(currency_count)
+        self._table_start = HEADER.size + 3 * currency_count
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        self._decoded = None
+        self._decode_lock = threading.Lock()
+
+    def products(self):
+        """Copias de los productos (se decodifican una vez por versión de la instantánea)"""
+        with self._decode_lock:
+            if self._decoded is None:
+                self._decoded = self.decode()
+        return [dict(product) for product in self._decoded]
+
+    def decode(self):
+        """Productos como diccionarios nuevos (el fichero no se copia entero)"""
+        data = self._map
+        currencies = self.currencies
+        table = memoryview(data)[self._table_start:self._table_start + self._record.size * self.count]
+        products = []
+        for (price, stock, reserved, shards, shard_writes, id_at, id_len, name_at, name_len, category_at,
+             category_len, image_at, image_len, description_at, description_len, version_at, version_len,
+             extra_at, extra_len, *prices) in self._record.iter_unpack(table):
+            product = {
+                'id': data[id_at:id_at + id_len].decode('utf-8'),
+                'name': data[name_at:name_at + name_len].decode('utf-8'),
+                'category': data[category_at:category_at + category_len].decode('utf-8'),
+                'image': data[image_at:image_at + image_len].decode('utf-8'),
+                'description': data[description_at:description_at + description_len].decode('utf-8'),
+                'price': price,
+                'stock': stock,
+                'reserved': reserved
+            }
+            if currencies:
+                product['prices'] = dict(zip(currencies, prices))
+            # Los campos opcionales solo aparecen si el producto los tenía
+            if version_len:
+                product['catalog_version'] = data[version_at:version_at + version_len].decode('utf-8')
+            if shards:
+                product['stock_shards'] = shards
+                product['shard_writes'] = shard_writes
+            if extra_len:
+                product.update(json.loads(data[extra_at:extra_at + extra_len]))
+            products.append(product)
+        table.release()
+        return products
+
+
+def write_snapshot(directory, products, created_at=None, stamp=None):
+    """Escribe una versión nueva y la publica de forma atómica"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(encode(products, created_at, stamp))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def read_snapshot(directory):
+    """Instantánea vigente del nodo (la remapea si se ha publicado otra) o None"""
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    with _lock:
+        snapshot = _mapped.get(path)
+        if snapshot is None or snapshot.identity != (stat.st_ino, stat.st_mtime_ns):
+            try:
+                # La anterior se libera cuando nadie la está leyendo
+                snapshot = _mapped[path] = CatalogSnapshot(path)
+            except ValueError:
+                # Instantánea de un formato anterior: se vuelve a escribir
+                _mapped.pop(path, None)
+                return None
+        return snapshot
+
+
+def _invalidated_at(directory):
+    try:
+        return os.stat(os.path.join(directory, INVALIDATED_FILE)).st_mtime
+    except FileNotFoundError:
+        return 0
+
+
+def is_fresh(snapshot, directory, ttl):
+    return snapshot.created_at + ttl > time.time() and snapshot.created_at > _invalidated_at(directory)
+
+
+def invalidate(directory):
+    """Marca la instantánea del nodo como caducada"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, INVALIDATED_FILE), 'a'):
+        pass
+    os.utime(os.path.join(directory, INVALIDATED_FILE))
+
+
+def get_products(directory, load, ttl):
+    """(productos, marca) de la instantánea; si ha caducado, la refresca un único proceso del nodo.
+
+    `load()` devuelve (productos, marca) leídos de Firestore.
+    """
+    snapshot = read_snapshot(directory)
+    if snapshot is not None and is_fresh(snapshot, directory, ttl):
+        return snapshot.products(), snapshot.stamp
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'a+') as lock:
+        try:
+            # Con una instantánea (aunque sea vieja) no se espera a quien ya la está refrescando
+            fcntl.flock(lock, fcntl.LOCK_EX | (fcntl.LOCK_NB if snapshot is not None else 0))
+        except BlockingIOError:
+            return snapshot.products(), snapshot.stamp
+        try:
+            snapshot = read_snapshot(directory)
+            if snapshot is None or not is_fresh(snapshot, directory, ttl):
+                # Se fecha al empezar a leer: una invalidación durante la lectura la deja caducada
+                started = time.time()
+                products, stamp = load()
+                write_snapshot(directory, products, started, stamp)
+                return products, stamp
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return snapshot.products(), snapshot.stamp
@@ -0,0 +1,117 @@
+import streamlit as st
+from datetime import datetime
+
+from servicios.currency import BASE_CURRENCY
+
+# Colección con un documento por sesión de Stripe. Contiene todo lo que
+# necesita el retorno del pago, de modo que basta con una sola lectura.
+COLLECTION = 'checkout_sessions'
+
+# Clave de session_state donde se guarda el documento ya leído
+CACHE_KEY = 'checkout_session'
+
+
+def build_checkout_session(session_id, usuario, cart_items, currency=BASE_CURRENCY, reservation=None):
+    """Construye el documento desnormalizado de la sesión de pago"""
+    items = []
+    for item in cart_items:
+        # Precio en la moneda del pago (ya calculado en la línea del carrito)
+        charged_price = (item.get('prices') or {}).get(currency, item['price'])
+        items.append({
+            'name': item['name'],
+            'price': float(item['price']),
+            'quantity': int(item['quantity']),
+            'image': item.get('image', ''),
+            'product_id': item.get('product_id', item['name']),
+            'category': item.get('category', ''),
+            'subtotal': float(item['price']) * int(item['quantity']),
+            'charged_price': float(charged_price)
+        })
+
+    total = sum(item['subtotal'] for item in items)
+
+    return {
+        'session_id': session_id,
+        'user_id': usuario['uid'],
+        'user': {
+            'uid': usuario['uid'],
+            'nombre': usuario.get('nombre', ''),
+            'email': usuario.get('email', ''),
+            'foto': usuario.get('foto', ''),
+            'locale': usuario.get('locale', 'en')
+        },
+        'items': items,
+        'item_count': sum(item['quantity'] for item in items),
+        'total': float(total),
+        'currency': currency,
+        'charged_total': sum(item['charged_price'] * item['quantity'] for item in items),
+        'status': 'pending_payment',
+        # Retención de stock mientras se paga (servicios/reservations.py)
+        'reservation_id': reservation['id'] if reservation else None,
+        'created_at': datetime.now()
+    }
+
+
+def save_checkout_session(db, session_id, usuario, cart_items, reservation=None, currency=BASE_CURRENCY):
+    """Escribe (una única vez) el documento de la sesión de pago"""
+    checkout_data = build_checkout_session(session_id, usuario, cart_items, currency, reservation=reservation)
+    db.collection(COLLECTION).document(session_id).set(checkout_data)
+    st.session_state[CACHE_KEY] = checkout_data
+    return checkout_data
+
+
+def _load_legacy_checkout_session(db, session_id):
+    """Reconstruye la sesión desde 'carts' y 'usuarios' (pagos iniciados antes de la migración)"""
+    cart_doc = db.collection('carts').document(session_id).get()
+    if not cart_doc.exists:
+        return None
+
+    cart_data = cart_doc.to_dict()
+    user_id = cart_data.get('user_id')
+    if not user_id:
+        return None
+
+    user_doc = db.collection('usuarios').document(user_id).get()
+    if not user_doc.exists:
+        return None
+
+    usuario = user_doc.to_dict()
+    usuario.setdefault('uid', user_id)
+    checkout_data = build_checkout_session(session_id, usuario, cart_data.get('items', []))
+    checkout_data['legacy'] = True
+    return checkout_data
+
+
+def get_checkout_session(db, session_id):
+    """Devuelve la sesión de pago, leyendo Firestore solo la primera vez en el flujo"""
+    cached = st.session_state.get(CACHE_KEY)
+    if cached and cached.get('session_id') == session_id:
+        return cached
+
+    doc = db.collection(COLLECTION).document(session_id).get()
+    if doc.exists:
+        checkout_data = doc.to_dict()
+    else:
+        checkout_data = _load_legacy_checkout_session(db, session_id)
+
+    if checkout_data:
+        st.session_state[CACHE_KEY] = checkout_data
+    return checkout_data
+
+
+def complete_checkout_session(db, session_id, order_number=None):
+    """Marca la sesión como completada (con su orden) sin volver a leerla"""
+    db.collection(COLLECTION).document(session_id).set({
+        'status': 'completed',
+        'order_number': order_number,
+        'completed_at': datetime.now()
+    }, merge=True)
+
+    cached = st.session_state.get(CACHE_KEY)
+    if cached and cached.get('session_id') == session_id:
+        cached['status'] = 'completed'
+        cached['order_number'] = order_number
+        # Los pagos antiguos guardaban el carrito en 'carts/{session_id}'
+        if cached.get('legacy'):
+            db.collection('carts').document(session_id).delete()
+
@@ -0,0 +1,59 @@
+import time
+
+# Segundos que se reutiliza un conteo antes de volver a consultar Firestore
+DEFAULT_TTL = 30
+
+# Estados conocidos por colección, para el desglose opcional
+KNOWN_STATUSES = {
+    'orders': ['completed', 'test'],
+    'checkout_sessions': ['pending_payment', 'completed']
+}
+
+# Caché en memoria del proceso: (id(db), colección, estado) -> (db, expira_en, conteo)
+_cache = {}
+
+
+def _run_count(db, collection_name, status=None):
+    """Ejecuta una agregación count() en el servidor (no descarga documentos)"""
+    query = db.collection(collection_name)
+    if status is not None:
+        query = query.where('status', '==', status)
+
+    result = query.count(alias='total').get()
+    return int(result[0][0].value)
+
+
+def count_documents(db, collection_name, status=None, ttl=DEFAULT_TTL):
+    """Cuenta los documentos de una colección (opcionalmente por estado) con caché TTL (ttl=0 la lee siempre)"""
+    key = (id(db), collection_name, status)
+    now = time.monotonic()
+
+    # Cada cliente (memoria, SQLite, Firestore) tiene sus propios conteos
+    cached = _cache.get(key)
+    if ttl and cached and cached[0] is db and cached[1] > now:
+        return cached[2]
+
+    count = _run_count(db, collection_name, status)
+    _cache[key] = (db, now + ttl, count)
+    return count
+
+
+def get_collection_stats(db, collections, status_breakdown=False, ttl=DEFAULT_TTL):
+    """Devuelve {colección: {'total': n, 'by_status': {estado: n}}} usando solo agregaciones"""
+    stats = {}
+    for collection_name in collections:
+        collection_stats = {'total': count_documents(db, collection_name, ttl=ttl)}
+
+        if status_breakdown and collection_name in KNOWN_STATUSES:
+            collection_stats['by_status'] = {
+                status: count_documents(db, collection_name, status=status, ttl=ttl)
+                for status in KNOWN_STATUSES[collection_name]
+            }
+
+        stats[collection_name] = collection_stats
+    return stats
+
+
+def clear_stats_cache():
+    """Invalida los conteos cacheados (por ejemplo tras crear datos de prueba)"""
+    _cache.clear()
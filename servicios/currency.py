@@ -0,0 +1,190 @@
+"""Precios en varias monedas a partir de una tabla de tipos de cambio cacheada.
+
+Los precios del catálogo están en BASE_CURRENCY. La tabla de tipos vive en
+settings/fx_rates ({'base', 'rates': {'EUR': 0.92, ...}, 'updated_at'}) y
+cada proceso la guarda en memoria `ttl` segundos. Al cargar el catálogo (o
+al cambiar los tipos, que lo invalida) add_price_columns() calcula de una
+vez, con numpy, la columna de precios de cada moneda y la deja en
+product['prices']; las páginas solo buscan el precio ya convertido y lo
+formatean con price_formatter(), que se crea una vez por moneda y locale.
+
+Sin tabla de tipos todo se muestra y se cobra en BASE_CURRENCY.
+"""
+import functools
+import os
+import threading
+import time
+from datetime import datetime
+
+BASE_CURRENCY = 'USD'
+
+# Monedas admitidas: símbolo y decimales (los mismos que usa Stripe)
+CURRENCIES = {
+    'USD': ('$', 2),
+    'EUR': ('€', 2),
+    'GBP': ('£', 2),
+    'MXN': ('MX$', 2),
+    'COP': ('COL$', 2),
+    'PEN': ('S/ ', 2),
+    'CLP': ('CLP$', 0)
+}
+
+# Moneda de cada región del locale del usuario ('es-MX' -> MXN)
+REGION_CURRENCIES = {
+    'US': 'USD', 'PR': 'USD', 'EC': 'USD', 'SV': 'USD',
+    'ES': 'EUR', 'FR': 'EUR', 'DE': 'EUR', 'IT': 'EUR', 'PT': 'EUR', 'NL': 'EUR', 'IE': 'EUR',
+    'GB': 'GBP', 'MX': 'MXN', 'CO': 'COP', 'PE': 'PEN', 'CL': 'CLP'
+}
+
+# Moneda de un locale sin región ('fr'): solo idiomas que se hablan sobre todo
+# en la zona euro. 'es', 'en' y 'pt' abarcan demasiados países y usan DEFAULT_CURRENCY
+LANGUAGE_CURRENCIES = {'fr': 'EUR', 'de': 'EUR', 'it': 'EUR', 'nl': 'EUR'}
+
+# Idiomas que escriben 1.234,56 salvo en las regiones que usan el punto decimal
+COMMA_DECIMAL_LANGUAGES = {'es', 'pt', 'fr', 'de', 'it', 'nl'}
+DOT_DECIMAL_REGIONS = {'MX', 'US', 'PR', 'PE', 'GT', 'DO', 'HN', 'NI', 'PA', 'SV', 'GB', 'IE'}
+
+# Documento con la tabla de tipos de cambio
+RATES_COLLECTION = 'settings'
+RATES_DOCUMENT = 'fx_rates'
+
+# Segundos que se reutiliza la tabla antes de volver a leer Firestore
+DEFAULT_TTL = 300
+
+# Caché: id(db) -> (db, expira_en, tipos, updated_at de la tabla)
+_cache = {}
+_lock = threading.Lock()
+
+
+def rates_ref(db):
+    return db.collection(RATES_COLLECTION).document(RATES_DOCUMENT)
+
+
+def _supported(rates):
+    """Tipos de las monedas admitidas, con la moneda base siempre a 1"""
+    supported = {currency: float(rate) for currency, rate in (rates or {}).items()
+                 if currency in CURRENCIES and float(rate) > 0}
+    supported[BASE_CURRENCY] = 1.0
+    return supported
+
+
+def get_rates(db, ttl=DEFAULT_TTL, refresh=False):
+    """Tipos de cambio {moneda: unidades por 1 BASE_CURRENCY} desde la caché o Firestore"""
+    return get_rates_with_stamp(db, ttl, refresh)[0]
+
+
+def get_rates_with_stamp(db, ttl=DEFAULT_TTL, refresh=False):
+    """(tipos, updated_at de la tabla o None): la fecha cambia cada vez que cambian los tipos"""
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(id(db))
+        if entry and entry[0] is db and entry[1] > now and not refresh:
+            return entry[2], entry[3]
+
+    doc = rates_ref(db).get()
+    data = doc.to_dict() if doc.exists else {}
+    rates = _supported(data.get('rates') if data.get('base', BASE_CURRENCY) == BASE_CURRENCY else None)
+    updated_at = data.get('updated_at')
+
+    with _lock:
+        _cache[id(db)] = (db, now + ttl, rates, updated_at)
+    return rates, updated_at
+
+
+def set_rates(db, rates, source='manual'):
+    """Guarda la tabla de tipos y descarta las cachés (tipos y catálogo con sus columnas)"""
+    from servicios.catalog import invalidate_catalog
+
+    unknown = sorted(set(rates) - set(CURRENCIES))
+    if unknown:
+        raise ValueError(f"Monedas no admitidas: {', '.join(unknown)}")
+    supported = _supported(rates)
+    rates_ref(db).set({
+        'base': BASE_CURRENCY,
+        'rates': supported,
+        'source': source,
+        'updated_at': datetime.now()
+    })
+    forget_rates()
+    invalidate_catalog()
+    return supported
+
+
+def forget_rates():
+    with _lock:
+        _cache.clear()
+
+
+def price_columns(prices, rates):
+    """Convierte una columna de precios base a cada moneda: {moneda: [precios]}"""
+    import numpy as np
+
+    base = np.asarray(prices, dtype=float)
+    return {currency: np.round(base * rate, CURRENCIES[currency][1]).tolist()
+            for currency, rate in rates.items()}
+
+
+def add_price_columns(items, rates):
+    """Añade item['prices'] ({moneda: precio}) a cada producto o línea, en una sola pasada"""
+    if not items:
+        return items
+    columns = price_columns([item.get('price', 0.0) for item in items], rates)
+    currencies = list(columns)
+    for item, row in zip(items, zip(*columns.values())):
+        item['prices'] = dict(zip(currencies, row))
+    return items
+
+
+def convert(amount, currency, rates):
+    """Conversión suelta (solo cuando falta la columna ya calculada)"""
+    return round(float(amount) * rates[currency], CURRENCIES[currency][1])
+
+
+def item_price(item, currency, rates):
+    """Precio del producto o línea en `currency`, normalmente ya calculado en item['prices']"""
+    prices = item.get('prices')
+    if prices and currency in prices:
+        return prices[currency]
+    return convert(item['price'], currency, rates)
+
+
+def split_locale(locale):
+    """('es', 'MX') para 'es-MX' o 'es_MX'; la región es None si no es un país ('es-419')"""
+    language, _, region = (locale or '').replace('_', '-').partition('-')
+    region = region.split('-')[0].upper()
+    return language.lower(), region if len(region) == 2 and region.isalpha() else None
+
+
+def user_currency(usuario, rates):
+    """Moneda del usuario: la elegida, la de la región de su locale, la de su idioma o DEFAULT_CURRENCY"""
+    usuario = usuario or {}
+    language, region = split_locale(usuario.get('locale'))
+    candidates = (usuario.get('currency'),
+                  REGION_CURRENCIES.get(region) if region else LANGUAGE_CURRENCIES.get(language),
+                  os.environ.get('DEFAULT_CURRENCY', BASE_CURRENCY).upper())
+    return next((currency for currency in candidates if currency in rates), BASE_CURRENCY)
+
+
+@functools.lru_cache(maxsize=256)
+def price_formatter(currency, locale=None):
+    """Función que formatea importes en `currency` según el locale (se crea una vez por par)"""
+    symbol, decimals = CURRENCIES.get(currency, (f"{currency} ", 2))
+    language, region = split_locale(locale)
+    comma_decimal = language in COMMA_DECIMAL_LANGUAGES and region not in DOT_DECIMAL_REGIONS
+    swap = str.maketrans(',.', '.,')
+    pattern = f"{{:,.{decimals}f}}"
+
+    def format_price(amount):
+        text = pattern.format(amount)
+        if not comma_decimal:
+            return f"{symbol}{text}"
+        text = text.translate(swap)
+        # El euro va detrás en los países que escriben con coma decimal
+        return f"{text} {symbol}" if currency == 'EUR' else f"{symbol}{text}"
+
+    return format_price
+
+
+def minor_units(amount, currency):
+    """Importe en la unidad mínima de la moneda (céntimos; pesos chilenos sin decimales) para Stripe"""
+    return int(round(float(amount) * 10 ** CURRENCIES[currency][1]))
@@ -0,0 +1,10 @@
+_loaded = False
+
+
+def load_environment():
+    """Carga las variables de .env una sola vez por proceso"""
+    global _loaded
+    if not _loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _loaded = True
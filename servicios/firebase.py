@@ -0,0 +1,38 @@
+import os
+
+SERVICE_ACCOUNT_KEY_PATH = 'serviceAccountKey.json'
+
+
+def firestore_sdk():
+    """Módulo firebase_admin.firestore (Increment, Query...), importado solo cuando se usa"""
+    from firebase_admin import firestore
+    return firestore
+
+
+def get_firestore_client(service_account_key_path=SERVICE_ACCOUNT_KEY_PATH):
+    """Devuelve un cliente de Firestore (usa el emulador si FIRESTORE_EMULATOR_HOST está definido)"""
+    if os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        from google.auth.credentials import AnonymousCredentials
+        from google.cloud import firestore as gcloud_firestore
+        project = os.environ.get("GCLOUD_PROJECT", "demo-adriana-touz")
+        return gcloud_firestore.Client(project=project, credentials=AnonymousCredentials())
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(service_account_key_path)
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+
+def run_transaction(db, function):
+    """Ejecuta function(transaction) en una transacción y devuelve su resultado.
+
+    En Firestore las lecturas con get(transaction=transaction) bloquean esos
+    documentos y la función se reintenta si hay conflicto; los motores locales
+    (memoria, SQLite) la ejecutan una vez con el cliente bloqueado.
+    """
+    if hasattr(db, 'run_transaction'):
+        return db.run_transaction(function)
+    return firestore_sdk().transactional(function)(db.transaction())
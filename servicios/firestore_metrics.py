@@ -0,0 +1,393 @@
+"""Instrumentación del cliente de Firestore: operaciones, documentos y latencia.
+
+instrument(db) devuelve un envoltorio transparente del cliente (real o
+MemoryFirestore) que registra cada operación terminal (get, stream, set,
+update, delete, add, commit, get_all, count) por página y tipo, con un
+histograma de latencias. Las páginas marcan el inicio de cada ejecución con
+begin_run(), de modo que también se guardan los totales por ejecución.
+Las métricas se exportan en formato Prometheus en /metrics del sidecar.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from servicios.sidecar import register_route
+
+# Límites de los buckets del histograma de latencia (segundos)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Ejecuciones recientes que se conservan para el panel de depuración
+MAX_RECENT_RUNS = 200
+
+# Tipo de referencia que devuelve cada método encadenable
+_CHAINABLE = {
+    'collection': 'query',
+    'document': 'document',
+    'where': 'query',
+    'order_by': 'query',
+    'limit': 'query',
+    'limit_to_last': 'query',
+    'offset': 'query',
+    'start_after': 'query',
+    'start_at': 'query',
+    'end_before': 'query',
+    'end_at': 'query',
+    'select': 'query',
+    'count': 'aggregation',
+    'sum': 'aggregation',
+    'avg': 'aggregation'
+}
+
+# Operaciones terminales por tipo de referencia: método -> tipo de operación
+_TERMINAL = {
+    'client': {'get_all': 'read'},
+    'document': {'get': 'read', 'set': 'write', 'update': 'write', 'delete': 'write', 'create': 'write'},
+    'query': {'get': 'query', 'stream': 'query', 'add': 'write', 'list_documents': 'query'},
+    'aggregation': {'get': 'aggregation', 'stream': 'aggregation'}
+}
+
+def metrics_enabled():
+    """La instrumentación está activa salvo con FIRESTORE_METRICS=0"""
+    return os.environ.get('FIRESTORE_METRICS', '1') != '0'
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        # Los lotes de BulkLoader se confirman desde hilos sin contexto de Streamlit
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except ImportError:
+        ctx = None
+    return ctx.session_id if ctx else 'offline'
+
+
+class FirestoreMetrics:
+    """Contadores e histogramas por (página, operación) y totales por ejecución"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.operations = {}
+            self.recent_runs = deque(maxlen=MAX_RECENT_RUNS)
+            self._current_runs = {}
+
+    def begin_run(self, page, fragment=None):
+        """Cierra la ejecución anterior de la sesión y abre una nueva"""
+        session_id = _session_id()
+        with self._lock:
+            self._finish_run(session_id)
+            self._current_runs[session_id] = {
+                'session': session_id,
+                'page': page,
+                'fragment': fragment,
+                'started_at': time.time(),
+                'operations': 0,
+                'reads': 0,
+                'queries': 0,
+                'aggregations': 0,
+                'writes': 0,
+                'documents': 0,
+                'firestore_ms': 0.0
+            }
+
+    def _finish_run(self, session_id):
+        run = self._current_runs.pop(session_id, None)
+        if run is not None:
+            run['firestore_ms'] = round(run['firestore_ms'], 2)
+            self.recent_runs.append(run)
+
+    def record(self, operation, seconds, documents=0, error=False):
+        """Registra una operación terminal en la ejecución actual y en los totales"""
+        session_id = _session_id()
+        with self._lock:
+            run = self._current_runs.get(session_id)
+            page = run['page'] if run else 'offline'
+
+            stats = self.operations.setdefault((page, operation), {
+                'calls': 0,
+                'documents': 0,
+                'errors': 0,
+                'seconds': 0.0,
+                'buckets': [0] * len(LATENCY_BUCKETS)
+            })
+            stats['calls'] += 1
+            stats['documents'] += documents
+            stats['errors'] += int(error)
+            stats['seconds'] += seconds
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats['buckets'][index] += 1
+                    break
+
+            if run:
+                run['operations'] += 1
+                run['documents'] += documents
+                run['firestore_ms'] += seconds * 1000
+                if operation == 'write':
+                    run['writes'] += documents
+                elif operation == 'aggregation':
+                    run['aggregations'] += 1
+                else:
+                    run['reads'] += documents
+                    if operation == 'query':
+                        run['queries'] += 1
+
+    def current_run(self):
+        """Totales (parciales) de la ejecución actual de la sesión"""
+        with self._lock:
+            run = self._current_runs.get(_session_id())
+            return dict(run) if run else None
+
+    def last_runs(self, session_id=None, limit=20):
+        """Ejecuciones terminadas más recientes (de una sesión, si se indica)"""
+        with self._lock:
+            runs = [run for run in self.recent_runs if session_id is None or run['session'] == session_id]
+        return list(reversed(runs[-limit:]))
+
+    def summary(self):
+        """Totales por (página, operación) con latencia media y p95 aproximado"""
+        with self._lock:
+            rows = []
+            for (page, operation), stats in sorted(self.operations.items()):
+                rows.append({
+                    'page': page,
+                    'operation': operation,
+                    'calls': stats['calls'],
+                    'documents': stats['documents'],
+                    'errors': stats['errors'],
+                    'avg_ms': round(stats['seconds'] / stats['calls'] * 1000, 2),
+                    'p95_ms': _bucket_quantile(stats['buckets'], stats['calls'], 0.95)
+                })
+            return rows
+
+    def prometheus(self):
+        """Métricas en formato de texto de Prometheus"""
+        lines = [
+            '# HELP firestore_operations_total Operaciones de Firestore por página y tipo',
+            '# TYPE firestore_operations_total counter'
+        ]
+        with self._lock:
+            operations = {key: dict(stats, buckets=list(stats['buckets'])) for key, stats in self.operations.items()}
+
+        def labels(page, operation, **extra):
+            pairs = [('page', page), ('operation', operation)] + list(extra.items())
+            return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+        for (page, operation), stats in sorted(operations.items()):
+            lines.append(f"firestore_operations_total{labels(page, operation)} {stats['calls']}")
+        lines += ['# HELP firestore_documents_total Documentos leídos o escritos',
+                  '# TYPE firestore_documents_total counter']
+        for (page, operation), stats in sorted(operations.items()):
+            lines.append(f"firestore_documents_total{labels(page, operation)} {stats['documents']}")
+        lines += ['# HELP firestore_errors_total Operaciones que lanzaron una excepción',
+                  '# TYPE firestore_errors_total counter']
+        for (page, operation), stats in sorted(operations.items()):
+            lines.append(f"firestore_errors_total{labels(page, operation)} {stats['errors']}")
+        lines += ['# HELP firestore_operation_duration_seconds Latencia de las operaciones de Firestore',
+                  '# TYPE firestore_operation_duration_seconds histogram']
+        for (page, operation), stats in sorted(operations.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+                cumulative += count
+                lines.append(f"firestore_operation_duration_seconds_bucket{labels(page, operation, le=bound)} {cumulative}")
+            lines.append(f"firestore_operation_duration_seconds_bucket{labels(page, operation, le='+Inf')} {stats['calls']}")
+            lines.append(f"firestore_operation_duration_seconds_sum{labels(page, operation)} {stats['seconds']:.6f}")
+            lines.append(f"firestore_operation_duration_seconds_count{labels(page, operation)} {stats['calls']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _bucket_quantile(buckets, total, quantile):
+    """Límite superior (ms) del bucket donde cae el cuantil"""
+    if not total:
+        return 0.0
+    target = quantile * total
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, buckets):
+        cumulative += count
+        if cumulative >= target:
+            return bound * 1000
+    return float('inf')
+
+
+# Registro del proceso
+metrics = FirestoreMetrics()
+
+
+def _unwrap(value):
+    """Devuelve el objeto real de Firestore (para pasarlo de vuelta al SDK)"""
+    if isinstance(value, (_Proxy, _SnapshotProxy, _BatchProxy)):
+        return value._target
+    if isinstance(value, list):
+        return [_unwrap(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_unwrap(item) for item in value)
+    return value
+
+
+def _wrap_snapshot(snapshot):
+    return _SnapshotProxy(snapshot) if snapshot is not None else None
+
+
+class _SnapshotProxy:
+    """Snapshot cuya .reference sigue instrumentada"""
+
+    def __init__(self, target):
+        self._target = target
+
+    @property
+    def reference(self):
+        return _Proxy(self._target.reference, 'document')
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+class _Proxy:
+    """Envoltorio de cliente, referencia, consulta o lote que mide las operaciones terminales"""
+
+    def __init__(self, target, kind):
+        self._target = target
+        self._kind = kind
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        if name in _CHAINABLE:
+            kind = _CHAINABLE[name]
+
+            def chain(*args, **kwargs):
+                return _Proxy(attribute(*_unwrap(args), **{key: _unwrap(value) for key, value in kwargs.items()}), kind)
+            return chain
+
+        if self._kind == 'client' and name in ('batch', 'transaction'):
+            return lambda *args, **kwargs: _BatchProxy(attribute(*args, **kwargs))
+
+        operation = _TERMINAL.get(self._kind, {}).get(name)
+        if operation is None:
+            return attribute
+        return self._measured(name, attribute, operation)
+
+    def _measured(self, name, method, operation):
+        def call(*args, **kwargs):
+            args = _unwrap(args)
+            kwargs = {key: _unwrap(value) for key, value in kwargs.items()}
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except Exception:
+                metrics.record(operation, time.perf_counter() - start, error=True)
+                raise
+
+            if name in ('stream', 'get_all', 'list_documents'):
+                return self._measured_iterator(result, operation, start, snapshots=name != 'list_documents')
+
+            elapsed = time.perf_counter() - start
+            if operation == 'write':
+                metrics.record(operation, elapsed, documents=1)
+                if name == 'add':
+                    update_time, reference = result
+                    return update_time, _Proxy(reference, 'document')
+                return result
+            if operation == 'read':
+                metrics.record(operation, elapsed, documents=int(getattr(result, 'exists', True)))
+                return _wrap_snapshot(result)
+            if operation == 'aggregation':
+                metrics.record(operation, elapsed, documents=len(result))
+                return result
+            # Consulta con get(): lista de snapshots
+            metrics.record(operation, elapsed, documents=len(result))
+            return [_wrap_snapshot(snapshot) for snapshot in result]
+        return call
+
+    def _measured_iterator(self, iterator, operation, start, snapshots=True):
+        # Se registra al agotar (o cerrar) el iterador: la latencia incluye todas las páginas
+        documents = 0
+        error = False
+        try:
+            for item in iterator:
+                if not snapshots:
+                    documents += 1
+                    yield _Proxy(item, 'document')
+                    continue
+                if getattr(item, 'exists', True):
+                    documents += 1
+                yield _wrap_snapshot(item)
+        except Exception:
+            error = True
+            raise
+        finally:
+            metrics.record(operation, time.perf_counter() - start, documents=documents, error=error)
+
+
+class _BatchProxy:
+    """Lote o transacción: cuenta las escrituras y las registra al hacer commit"""
+
+    def __init__(self, target):
+        self._target = target
+        self._pending = 0
+
+    def _queue(self, method):
+        def call(*args, **kwargs):
+            self._pending += 1
+            method(*_unwrap(args), **{key: _unwrap(value) for key, value in kwargs.items()})
+            return self
+        return call
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if name in ('set', 'update', 'delete', 'create'):
+            return self._queue(attribute)
+        if name == '_clean_up':
+            # transactional() vuelve a empezar la transacción en cada reintento
+            self._pending = 0
+        # y la confirma con _commit()
+        if name in ('commit', '_commit'):
+            def commit(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = attribute(*args, **kwargs)
+                except Exception:
+                    metrics.record('write', time.perf_counter() - start, error=True)
+                    raise
+                metrics.record('write', time.perf_counter() - start, documents=self._pending)
+                self._pending = 0
+                return result
+            return commit
+        return attribute
+
+
+def instrument(db):
+    """Envuelve un cliente de Firestore (idempotente; sin efecto con FIRESTORE_METRICS=0)"""
+    if db is None or isinstance(db, _Proxy) or not metrics_enabled():
+        return db
+    return _Proxy(db, 'client')
+
+
+def unwrap_client(db):
+    """Cliente real detrás del envoltorio"""
+    return _unwrap(db)
+
+
+def begin_run(page, fragment=None):
+    """Marca el inicio de una ejecución de `page` (o de uno de sus fragmentos)"""
+    if metrics_enabled():
+        metrics.begin_run(page, fragment)
+
+
+def session_runs(limit=5):
+    """Últimas ejecuciones terminadas de la sesión actual"""
+    return metrics.last_runs(session_id=_session_id(), limit=limit)
+
+
+def metrics_endpoint():
+    """Ruta /metrics del sidecar"""
+    return 200, 'text/plain; version=0.0.4; charset=utf-8', metrics.prometheus()
+
+
+register_route('/metrics', metrics_endpoint)
@@ -0,0 +1,58 @@
+from functools import wraps
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from servicios.firestore_metrics import begin_run
+from servicios.profiler import begin_profile, finish_profile, span
+from servicios.session_store import persist_session
+
+# Clave del fragmento del carrito en la sidebar (para reejecutarlo desde otros fragmentos)
+CART_FRAGMENT_KEY = "sidebar_cart"
+
+
+def is_fragment_rerun():
+    """Indica si la ejecución actual es solo de uno o varios fragmentos"""
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+
+def fragment_run(page, fragment):
+    """Decorador del cuerpo de un fragmento: cuando solo se ejecuta el fragmento abre
+    su propia ejecución en las métricas de Firestore y en el perfilador (y al final
+    guarda la sesión); siempre es una sección del perfil"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_fragment_rerun():
+                with span(fragment):
+                    return func(*args, **kwargs)
+
+            begin_run(page, fragment=fragment)
+            begin_profile(page, fragment=fragment)
+            try:
+                with span(fragment):
+                    return func(*args, **kwargs)
+            finally:
+                finish_profile()
+                # Una ejecución del fragmento no pasa por el principio de la página
+                persist_session()
+        return wrapper
+    return decorator
+
+
+def rerun_fragment():
+    """Reejecuta solo el fragmento actual (o toda la página si se está ejecutando completa)"""
+    if is_fragment_rerun():
+        st.rerun(scope="fragment")
+    st.rerun()
+
+
+def set_cart_notice(message):
+    """Guarda un mensaje para mostrarlo en la próxima ejecución del carrito"""
+    st.session_state.cart_notice = message
+
+
+def pop_cart_notice():
+    """Devuelve (y elimina) el mensaje pendiente del carrito"""
+    return st.session_state.pop('cart_notice', None)
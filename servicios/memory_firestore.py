@@ -0,0 +1,546 @@
+"""Sustituto en memoria del cliente de Firestore para pruebas y herramientas offline.
+
+Implementa el subconjunto de la API de google-cloud-firestore que usa la
+aplicación: colecciones y subcolecciones, documentos (get/set/update/delete),
+consultas con where/order_by (también por '__name__')/limit/start_after, agregaciones count() y sum(),
+lotes de escritura, get_all y las transformaciones Increment/DELETE_FIELD/
+SERVER_TIMESTAMP.
+"""
+import copy
+import random
+import string
+import threading
+from datetime import datetime
+from functools import cmp_to_key
+
+from google.api_core.exceptions import Conflict, InvalidArgument, NotFound
+from google.cloud.firestore_v1 import transforms
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+# Campo especial con el ID del documento (FieldPath.document_id())
+DOCUMENT_ID = '__name__'
+
+# Límite de operaciones por lote, igual que en Firestore
+MAX_BATCH_SIZE = 500
+
+
+def _auto_id():
+    """Genera un ID de documento aleatorio de 20 caracteres, como Firestore"""
+    alphabet = string.ascii_letters + string.digits
+    return ''.join(random.choice(alphabet) for _ in range(20))
+
+
+def _get_field(data, field_path):
+    """Lee un campo anidado ('a.b.c'); devuelve (existe, valor)"""
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _resolve_value(current, value):
+    """Aplica una transformación de Firestore sobre el valor actual"""
+    if isinstance(value, transforms.Increment):
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + value.value
+    if value is transforms.SERVER_TIMESTAMP:
+        return datetime.now()
+    if isinstance(value, transforms.ArrayUnion):
+        base = list(current) if isinstance(current, list) else []
+        return base + [v for v in value.values if v not in base]
+    if isinstance(value, transforms.ArrayRemove):
+        base = list(current) if isinstance(current, list) else []
+        return [v for v in base if v not in value.values]
+    return copy.deepcopy(value)
+
+
+def _merge(target, updates):
+    """Mezcla `updates` en `target` a nivel de hoja (semántica de set(..., merge=True))"""
+    for key, value in updates.items():
+        if value is transforms.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict):
+            child = target.get(key)
+            if not isinstance(child, dict):
+                child = {}
+                target[key] = child
+            _merge(child, value)
+        else:
+            target[key] = _resolve_value(target.get(key), value)
+
+
+def _replace(updates):
+    """Construye un documento nuevo resolviendo transformaciones (set sin merge)"""
+    result = {}
+    _merge(result, updates)
+    return result
+
+
+def _apply_field_paths(target, updates):
+    """Aplica un update() con rutas de campo separadas por puntos"""
+    for field_path, value in updates.items():
+        parts = field_path.split('.')
+        parent = target
+        for part in parts[:-1]:
+            child = parent.get(part)
+            if not isinstance(child, dict):
+                child = {}
+                parent[part] = child
+            parent = child
+        if value is transforms.DELETE_FIELD:
+            parent.pop(parts[-1], None)
+        elif isinstance(value, dict):
+            parent[parts[-1]] = _replace(value)
+        else:
+            parent[parts[-1]] = _resolve_value(parent.get(parts[-1]), value)
+
+
+def _type_rank(value):
+    """Orden entre tipos de valor (nulos < booleanos < números < fechas < textos < resto)"""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    return 5
+
+
+def _compare_values(a, b):
+    """Compara dos valores de campo con un orden total aproximado al de Firestore"""
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 5:
+        a, b = repr(a), repr(b)
+    if rank_a == 3 and (a.tzinfo is None) != (b.tzinfo is None):
+        a, b = a.replace(tzinfo=None), b.replace(tzinfo=None)
+    if a == b:
+        return 0
+    return -1 if a < b else 1
+
+
+def _matches(data, field_path, op, value):
+    """Evalúa un filtro where() sobre los datos de un documento"""
+    exists, current = _get_field(data, field_path)
+    if op == '!=':
+        return exists and current is not None and _compare_values(current, value) != 0
+    if op == 'not-in':
+        return exists and current is not None and all(_compare_values(current, v) != 0 for v in value)
+    if not exists:
+        return False
+    if op == '==':
+        return _compare_values(current, value) == 0
+    if op == 'in':
+        return any(_compare_values(current, v) == 0 for v in value)
+    if op == 'array_contains':
+        return isinstance(current, list) and value in current
+    if op == 'array_contains_any':
+        return isinstance(current, list) and any(v in current for v in value)
+    # Los operadores de rango solo comparan valores del mismo tipo
+    if _type_rank(current) != _type_rank(value):
+        return False
+    comparison = _compare_values(current, value)
+    return {
+        '<': comparison < 0,
+        '<=': comparison <= 0,
+        '>': comparison > 0,
+        '>=': comparison >= 0
+    }[op]
+
+
+def stage_operations(operations, load):
+    """Calcula el estado final de cada documento tras un lote de escrituras.
+
+    `load(collection_path, document_id)` devuelve una copia de los datos
+    actuales del documento. Devuelve {(colección, id): datos o None si se
+    borra}; lanza Conflict/NotFound sin haber aplicado nada.
+    """
+    staged = {}
+    for kind, reference, data, merge in operations:
+        key = (reference._collection_path, reference.id)
+        existing = staged[key] if key in staged else load(*key)
+        if kind == 'create':
+            if existing is not None:
+                raise Conflict(f"Document already exists: {reference.path}")
+            staged[key] = _replace(data)
+        elif kind == 'set':
+            if merge and existing is not None:
+                _merge(existing, data)
+                staged[key] = existing
+            else:
+                staged[key] = _replace(data)
+        elif kind == 'update':
+            if existing is None:
+                raise NotFound(f"No document to update: {reference.path}")
+            _apply_field_paths(existing, data)
+            staged[key] = existing
+        elif kind == 'delete':
+            staged[key] = None
+    return staged
+
+
+class MemoryDocumentSnapshot:
+    """Instantánea de un documento en un momento dado"""
+
+    def __init__(self, reference, data):
+        self.reference = reference
+        self._data = data
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        _, value = _get_field(self._data or {}, field_path)
+        return copy.deepcopy(value)
+
+
+class MemoryDocumentReference:
+    """Referencia a un documento de MemoryFirestore"""
+
+    def __init__(self, client, collection_path, document_id):
+        self._client = client
+        self._collection_path = collection_path
+        self.id = document_id
+
+    @property
+    def path(self):
+        return f"{self._collection_path}/{self.id}"
+
+    @property
+    def parent(self):
+        return self._client._collection_reference(self._collection_path)
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocumentReference) and self.path == other.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def collection(self, name):
+        return self._client._collection_reference(f"{self.path}/{name}")
+
+    def get(self, transaction=None):
+        return self._client._get(self)
+
+    def set(self, document_data, merge=False):
+        self._client._commit([('set', self, document_data, merge)])
+
+    def create(self, document_data):
+        self._client._commit([('create', self, document_data, False)])
+
+    def update(self, field_updates):
+        self._client._commit([('update', self, field_updates, False)])
+
+    def delete(self):
+        self._client._commit([('delete', self, None, False)])
+
+
+class MemoryAggregationResult:
+    """Resultado de una agregación (mismo formato que AggregationResult)"""
+
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = value
+
+
+class MemoryAggregationQuery:
+    """Una o varias agregaciones count()/sum() sobre una consulta"""
+
+    def __init__(self, query):
+        self._query = query
+        self._aggregations = []
+
+    def _add(self, alias, compute):
+        self._aggregations.append((alias or f"field_{len(self._aggregations) + 1}", compute))
+        return self
+
+    def count(self, alias=None):
+        return self._add(alias, lambda query: query._count())
+
+    def sum(self, field_ref, alias=None):
+        return self._add(alias, lambda query: query._sum(field_ref))
+
+    def get(self, transaction=None):
+        results = [MemoryAggregationResult(alias, compute(self._query)) for alias, compute in self._aggregations]
+        self._query._client._record('aggregations', 1)
+        return [results]
+
+
+class MemoryQuery:
+    """Consulta inmutable sobre una colección"""
+
+    def __init__(self, client, collection_path, filters=(), orders=(), limit=None, cursor=None):
+        self._client = client
+        self._collection_path = collection_path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        params = {
+            'filters': self._filters,
+            'orders': self._orders,
+            'limit': self._limit,
+            'cursor': self._cursor
+        }
+        params.update(changes)
+        return self._client._query(self._collection_path, **params)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def count(self, alias=None):
+        return MemoryAggregationQuery(self).count(alias)
+
+    def sum(self, field_ref, alias=None):
+        return MemoryAggregationQuery(self).sum(field_ref, alias)
+
+    def _count(self):
+        return len(self._run(count_reads=False))
+
+    def _sum(self, field_path):
+        """Suma de un campo; como Firestore, ignora los valores que no son números"""
+        total = 0
+        for snapshot in self._run(count_reads=False):
+            exists, value = _get_field(snapshot.to_dict(), field_path)
+            if exists and isinstance(value, (int, float)) and not isinstance(value, bool):
+                total += value
+        return total
+
+    def _sort_key(self, doc_id, data):
+        """Clave de ordenación: campos de order_by y, al final, el ID del documento"""
+        values = [doc_id if field == DOCUMENT_ID else _get_field(data, field)[1] for field, _ in self._orders]
+        return values + [doc_id]
+
+    def _compare_keys(self, a, b):
+        last_direction = self._orders[-1][1] if self._orders else ASCENDING
+        directions = [direction for _, direction in self._orders] + [last_direction]
+        for value_a, value_b, direction in zip(a, b, directions):
+            comparison = _compare_values(value_a, value_b)
+            if comparison:
+                return -comparison if direction == DESCENDING else comparison
+        return 0
+
+    def _cursor_key(self):
+        cursor = self._cursor
+        if isinstance(cursor, MemoryDocumentSnapshot):
+            return self._sort_key(cursor.id, cursor._data or {})
+        if isinstance(cursor, dict):
+            # Como en Firestore, un cursor parcial solo compara los primeros campos de order_by,
+            # y '__name__' puede venir como ID o como referencia
+            key = []
+            for field, _ in self._orders:
+                if field not in cursor:
+                    break
+                key.append(getattr(cursor[field], 'id', cursor[field]) if field == DOCUMENT_ID else cursor[field])
+            return key
+        return list(cursor)
+
+    def _run(self, count_reads=True):
+        with self._client._lock:
+            documents = self._client._collections.get(self._collection_path, {})
+            candidates = list(documents.items())
+
+        results = []
+        for doc_id, data in candidates:
+            if not all(_matches(data, field, op, value) for field, op, value in self._filters):
+                continue
+            # Firestore excluye los documentos que no tienen los campos de order_by
+            if not all(field == DOCUMENT_ID or _get_field(data, field)[0] for field, _ in self._orders):
+                continue
+            results.append((doc_id, data))
+
+        keyed = [(self._sort_key(doc_id, data), doc_id, data) for doc_id, data in results]
+        keyed.sort(key=cmp_to_key(lambda a, b: self._compare_keys(a[0], b[0])))
+
+        if self._cursor is not None:
+            cursor_key = self._cursor_key()
+            keyed = [entry for entry in keyed
+                     if self._compare_keys(entry[0][:len(cursor_key)], cursor_key) > 0]
+
+        if self._limit is not None:
+            keyed = keyed[:self._limit]
+
+        snapshots = [
+            MemoryDocumentSnapshot(
+                MemoryDocumentReference(self._client, self._collection_path, doc_id),
+                copy.deepcopy(data)
+            )
+            for _, doc_id, data in keyed
+        ]
+        if count_reads:
+            self._client._record('queries', 1)
+            self._client._record('reads', max(1, len(snapshots)))
+        return snapshots
+
+    def stream(self, transaction=None):
+        return iter(self._run())
+
+    def get(self, transaction=None):
+        return self._run()
+
+
+class MemoryCollectionReference(MemoryQuery):
+    """Referencia a una colección (también actúa como consulta sin filtros)"""
+
+    def __init__(self, client, collection_path):
+        super().__init__(client, collection_path)
+
+    @property
+    def id(self):
+        return self._collection_path.rsplit('/', 1)[-1]
+
+    def document(self, document_id=None):
+        return MemoryDocumentReference(self._client, self._collection_path, document_id or _auto_id())
+
+    def add(self, document_data, document_id=None):
+        reference = self.document(document_id)
+        reference.create(document_data)
+        return datetime.now(), reference
+
+    def list_documents(self):
+        with self._client._lock:
+            ids = list(self._client._collections.get(self._collection_path, {}))
+        return [self.document(doc_id) for doc_id in ids]
+
+
+class MemoryWriteBatch:
+    """Lote de escrituras que se aplica de forma atómica en commit()"""
+
+    def __init__(self, client):
+        self._client = client
+        self._operations = []
+
+    def __len__(self):
+        return len(self._operations)
+
+    def set(self, reference, document_data, merge=False):
+        self._operations.append(('set', reference, document_data, merge))
+        return self
+
+    def create(self, reference, document_data):
+        self._operations.append(('create', reference, document_data, False))
+        return self
+
+    def update(self, reference, field_updates):
+        self._operations.append(('update', reference, field_updates, False))
+        return self
+
+    def delete(self, reference):
+        self._operations.append(('delete', reference, None, False))
+        return self
+
+    def commit(self):
+        if len(self._operations) > MAX_BATCH_SIZE:
+            raise InvalidArgument(f"maximum {MAX_BATCH_SIZE} writes allowed per request")
+        self._client._commit(self._operations)
+        results = [datetime.now()] * len(self._operations)
+        self._operations = []
+        return results
+
+
+class MemoryFirestore:
+    """Cliente de Firestore en memoria (thread-safe) con contadores de operaciones"""
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.RLock()
+        self.stats = {'reads': 0, 'writes': 0, 'queries': 0, 'aggregations': 0, 'commits': 0}
+
+    def _record(self, name, amount):
+        with self._lock:
+            self.stats[name] += amount
+
+    def reset_stats(self):
+        """Pone a cero los contadores de operaciones"""
+        with self._lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def collection(self, name):
+        return self._collection_reference(name)
+
+    def document(self, path):
+        collection_path, document_id = path.rsplit('/', 1)
+        return MemoryDocumentReference(self, collection_path, document_id)
+
+    def _collection_reference(self, collection_path):
+        return MemoryCollectionReference(self, collection_path)
+
+    def _query(self, collection_path, **params):
+        return MemoryQuery(self, collection_path, **params)
+
+    def batch(self):
+        return MemoryWriteBatch(self)
+
+    def run_transaction(self, function):
+        """Ejecuta function(transaction) con el cliente bloqueado; sus escrituras se aplican juntas al final"""
+        with self._lock:
+            transaction = MemoryWriteBatch(self)
+            result = function(transaction)
+            transaction.commit()
+        return result
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for reference in references:
+            yield self._get(reference)
+
+    def collections(self):
+        with self._lock:
+            names = [path for path in self._collections if '/' not in path]
+        return [self.collection(name) for name in names]
+
+    def _get(self, reference):
+        with self._lock:
+            data = self._collections.get(reference._collection_path, {}).get(reference.id)
+            snapshot = MemoryDocumentSnapshot(reference, copy.deepcopy(data))
+        self._record('reads', 1)
+        return snapshot
+
+    def _load(self, collection_path, document_id):
+        """Copia de los datos guardados de un documento (None si no existe)"""
+        return copy.deepcopy(self._collections.get(collection_path, {}).get(document_id))
+
+    def _commit(self, operations):
+        """Aplica una lista de escrituras; si alguna falla no se aplica ninguna"""
+        with self._lock:
+            staged = stage_operations(operations, self._load)
+
+            for (collection_path, document_id), data in staged.items():
+                documents = self._collections.setdefault(collection_path, {})
+                if data is None:
+                    documents.pop(document_id, None)
+                else:
+                    documents[document_id] = data
+
+            self.stats['writes'] += len(operations)
+            self.stats['commits'] += 1
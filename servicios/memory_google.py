@@ -0,0 +1,102 @@
+"""Google OAuth falso en un servidor HTTP local, para pruebas de carga offline.
+
+Atiende los dos endpoints que usa app.py: POST /token (código -> access
+token) y GET /userinfo (perfil del usuario). Cualquier código se acepta y
+produce un usuario estable derivado de él. Se activa apuntando
+GOOGLE_TOKEN_URL y GOOGLE_USERINFO_URL a las URLs de MemoryGoogleOAuth.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+def user_for_code(code):
+    """Perfil de Google que corresponde a un código de autorización"""
+    return {
+        'id': f"google-{code}",
+        'email': f"{code}@loadtest.example.com",
+        'verified_email': True,
+        'name': f"Usuario {code}",
+        'picture': f"https://example.com/avatars/{code}.png",
+        'locale': 'es'
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'MemoryGoogleOAuth'
+
+    def do_POST(self):
+        if self.path.split('?', 1)[0] != '/token':
+            self._send(404, {'error': 'not_found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        code = (form.get('code') or [''])[0]
+        if not code:
+            self._send(400, {'error': 'invalid_grant'})
+            return
+        self.server.stats['token'] += 1
+        self._send(200, {'access_token': f"token-{code}", 'token_type': 'Bearer', 'expires_in': 3599})
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/userinfo':
+            self._send(404, {'error': 'not_found'})
+            return
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('Bearer token-'):
+            self._send(401, {'error': 'invalid_token'})
+            return
+        self.server.stats['userinfo'] += 1
+        self._send(200, user_for_code(authorization[len('Bearer token-'):]))
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MemoryGoogleOAuth:
+    """Servidor OAuth falso en 127.0.0.1 (puerto libre) con contadores de peticiones"""
+
+    def __init__(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stats = {'token': 0, 'userinfo': 0}
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def token_url(self):
+        return f"{self.base_url}/token"
+
+    @property
+    def userinfo_url(self):
+        return f"{self.base_url}/userinfo"
+
+    @property
+    def stats(self):
+        return self._server.stats
+
+    def start(self):
+        """Arranca el servidor en un hilo (idempotente)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name='memory-google-oauth', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
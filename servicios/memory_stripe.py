@@ -0,0 +1,104 @@
+"""Sustituto en memoria del SDK de Stripe para benchmarks y pruebas offline.
+
+Implementa lo que usa la aplicación: checkout.Session.create(),
+checkout.Session.retrieve() y checkout.Session.expire(). Las sesiones se crean ya pagadas. Se instala
+con servicios.payments.use_stripe_client(MemoryStripe()).
+"""
+import itertools
+import threading
+import time
+
+# Ventana de expires_at que admite Stripe (segundos desde la creación de la sesión)
+MIN_EXPIRY_SECONDS = 30 * 60
+MAX_EXPIRY_SECONDS = 24 * 3600
+
+
+class InvalidRequestError(Exception):
+    """Equivalente a stripe.error.InvalidRequestError"""
+
+
+class MemoryCheckoutSession(dict):
+    """Sesión de Checkout con acceso por atributo, como los objetos de Stripe"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class _SessionResource:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, **params):
+        expires_at = params.get('expires_at')
+        if expires_at is not None:
+            # Como Stripe: la sesión debe caducar entre 30 min y 24 h después de crearla
+            remaining = expires_at - time.time()
+            if not MIN_EXPIRY_SECONDS <= remaining <= MAX_EXPIRY_SECONDS:
+                raise InvalidRequestError(f"expires_at must be between 30 minutes and 24 hours "
+                                          f"from Checkout Session creation ({remaining:.0f}s)")
+        with self._client._lock:
+            session_id = f"cs_test_{next(self._client._ids):08d}"
+            amount_total = sum(item['price_data']['unit_amount'] * item['quantity']
+                               for item in params.get('line_items', []))
+            session = MemoryCheckoutSession(
+                id=session_id,
+                object='checkout.session',
+                url=f"https://checkout.stripe.test/pay/{session_id}",
+                mode=params.get('mode', 'payment'),
+                customer_email=params.get('customer_email'),
+                metadata=params.get('metadata', {}),
+                line_items=params.get('line_items', []),
+                amount_total=amount_total,
+                currency=(params.get('line_items') or [{}])[0].get('price_data', {}).get('currency', 'usd'),
+                payment_status='paid',
+                status='complete',
+                success_url=params.get('success_url', '').replace('{CHECKOUT_SESSION_ID}', session_id)
+            )
+            self._client.sessions[session_id] = session
+            self._client.stats['create'] += 1
+            return session
+
+    def retrieve(self, session_id):
+        with self._client._lock:
+            self._client.stats['retrieve'] += 1
+            if session_id not in self._client.sessions:
+                raise InvalidRequestError(f"No such checkout.session: '{session_id}'")
+            return self._client.sessions[session_id]
+
+    def expire(self, session_id):
+        """Caduca una sesión que aún no se ha pagado (como Stripe, falla si ya está completa)"""
+        with self._client._lock:
+            self._client.stats['expire'] += 1
+            session = self._client.sessions.get(session_id)
+            if session is None:
+                raise InvalidRequestError(f"No such checkout.session: '{session_id}'")
+            if session['status'] != 'open':
+                raise InvalidRequestError(f"Only Checkout Sessions with a status of open can be expired "
+                                          f"({session['status']})")
+            session['status'] = 'expired'
+            return session
+
+
+class _Checkout:
+    def __init__(self, client):
+        self.Session = _SessionResource(client)
+
+
+class MemoryStripe:
+    """Cliente falso con la misma forma que el módulo `stripe`"""
+
+    def __init__(self):
+        self.api_key = 'sk_test_memory'
+        self.sessions = {}
+        self.stats = {'create': 0, 'retrieve': 0, 'expire': 0}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.checkout = _Checkout(self)
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self.stats:
+                self.stats[name] = 0
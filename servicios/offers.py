@@ -0,0 +1,82 @@
+"""Caché de ofertas personalizadas por usuario y día.
+
+Las ofertas se calculan una vez por usuario, día y versión (del catálogo y
+de los tipos de cambio, que fijan sus precios) y se sirven desde memoria en
+el resto de ejecuciones de la página. Los descuentos salen de un
+generador con semilla (usuario, día, producto), de modo que el precio
+mostrado y el que se añade al carrito siempre coinciden, incluso si el
+proceso se reinicia.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from servicios.sales_rollups import product_key
+
+# Máximo de conjuntos de ofertas en memoria (se expulsan los menos usados)
+MAX_ENTRIES = 10_000
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def offer_day(now=None):
+    """Día de validez de las ofertas ('YYYY-MM-DD')"""
+    return (now or datetime.now()).strftime('%Y-%m-%d')
+
+
+def seeded_rng(user_id, *parts, day=None):
+    """Generador aleatorio determinista para un usuario y día"""
+    seed = ':'.join([user_id, day or offer_day()] + [str(part) for part in parts])
+    return random.Random(seed)
+
+
+def offer_discount(user_id, product_name, low, high, day=None):
+    """Descuento estable (en %) para un producto, usuario y día"""
+    return seeded_rng(user_id, product_key(product_name), low, high, day=day).randint(low, high)
+
+
+def _seconds_until_midnight(now):
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+def _evict_expired(now_monotonic):
+    expired = [key for key, (expires_at, _) in _cache.items() if expires_at <= now_monotonic]
+    for key in expired:
+        del _cache[key]
+
+
+def get_offer_set(user_id, compute_offers, now=None, version=None):
+    """Devuelve las ofertas del día del usuario; `compute_offers()` solo se llama si no están en caché.
+
+    `version` (hashable) identifica los datos de los que salen los precios: si cambia, se recalculan.
+    """
+    now = now or datetime.now()
+    key = (user_id, offer_day(now), version)
+    now_monotonic = time.monotonic()
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry[0] > now_monotonic:
+            _cache.move_to_end(key)
+            return entry[1]
+
+    offers = compute_offers()
+
+    with _lock:
+        _evict_expired(now_monotonic)
+        _cache[key] = (now_monotonic + _seconds_until_midnight(now), offers)
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return offers
+
+
+def invalidate_offers(user_id=None):
+    """Elimina las ofertas cacheadas de un usuario (o todas)"""
+    with _lock:
+        for key in [key for key in _cache if user_id is None or key[0] == user_id]:
+            del _cache[key]
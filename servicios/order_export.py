@@ -0,0 +1,296 @@
+"""Exportación incremental de 'orders' a ficheros por bloques (Parquet o CSV).
+
+Las órdenes se leen por páginas con cursores (start_after) ordenadas por
+created_at y, a igual fecha, por ID, y las filas se escriben en bloques de
+`chunk_rows`, de modo que la memoria usada no depende del tamaño de la
+colección. Se generan dos tablas: `orders` (una fila por orden) y
+`line_items` (una fila por producto). La marca de agua es el par (created_at,
+ID) de la última orden exportada, así que no se pierden las órdenes que
+comparten fecha con ella.
+"""
+import csv
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from firebase_admin import firestore
+
+STATE_FILE = 'export_state.json'
+
+# Subdirectorios de las tablas exportadas
+TABLES = ('orders', 'line_items')
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_CHUNK_ROWS = 50_000
+
+ORDER_COLUMNS = [
+    ('order_id', 'string'),
+    ('order_number', 'string'),
+    ('user_id', 'string'),
+    ('user_name', 'string'),
+    ('user_email', 'string'),
+    ('status', 'string'),
+    ('payment_method', 'string'),
+    ('currency', 'string'),
+    ('session_id', 'string'),
+    ('total', 'double'),
+    ('item_count', 'int64'),
+    ('units', 'int64'),
+    ('simulation', 'bool'),
+    ('test_mode', 'bool'),
+    ('created_at', 'timestamp')
+]
+
+LINE_ITEM_COLUMNS = [
+    ('order_id', 'string'),
+    ('order_number', 'string'),
+    ('line_number', 'int64'),
+    ('name', 'string'),
+    ('price', 'double'),
+    ('quantity', 'int64'),
+    ('subtotal', 'double'),
+    ('created_at', 'timestamp')
+]
+
+
+def _to_utc_naive(value):
+    """Normaliza fechas a UTC sin zona horaria (Firestore trata las fechas naive como UTC)"""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def iter_orders(db, since=None, since_id=None, page_size=DEFAULT_PAGE_SIZE):
+    """Recorre 'orders' por páginas de `page_size` en orden de (created_at, ID), después de (`since`, `since_id`)"""
+    query = (db.collection('orders')
+             .order_by('created_at', direction=firestore.Query.ASCENDING)
+             .order_by('__name__', direction=firestore.Query.ASCENDING))
+
+    # Marcas antiguas sin ID: todo lo posterior a la fecha
+    cursor = None
+    if since is not None:
+        cursor = {'created_at': since, '__name__': since_id} if since_id else {'created_at': since}
+    while True:
+        page_query = query.limit(page_size)
+        if cursor is not None:
+            page_query = page_query.start_after(cursor)
+
+        docs = list(page_query.stream())
+        for doc in docs:
+            yield doc
+
+        if len(docs) < page_size:
+            break
+        cursor = docs[-1]
+
+
+def flatten_order(doc):
+    """Convierte un documento de orden en (fila_orden, filas_de_productos)"""
+    order = doc.to_dict()
+    created_at = _to_utc_naive(order.get('created_at'))
+    items = order.get('items', [])
+
+    order_row = {
+        'order_id': doc.id,
+        'order_number': order.get('order_number'),
+        'user_id': order.get('user_id'),
+        'user_name': order.get('user_name'),
+        'user_email': order.get('user_email'),
+        'status': order.get('status'),
+        'payment_method': order.get('payment_method'),
+        'currency': order.get('currency'),
+        'session_id': order.get('session_id'),
+        'total': float(order.get('total', 0.0)),
+        'item_count': len(items),
+        'units': sum(int(item.get('quantity', 0)) for item in items),
+        'simulation': bool(order.get('simulation', False)),
+        'test_mode': bool(order.get('test_mode', False)),
+        'created_at': created_at
+    }
+
+    line_rows = []
+    for line_number, item in enumerate(items, 1):
+        price = float(item.get('price', 0.0))
+        quantity = int(item.get('quantity', 0))
+        line_rows.append({
+            'order_id': doc.id,
+            'order_number': order.get('order_number'),
+            'line_number': line_number,
+            'name': item.get('name'),
+            'price': price,
+            'quantity': quantity,
+            'subtotal': float(item.get('subtotal', price * quantity)),
+            'created_at': created_at
+        })
+
+    return order_row, line_rows
+
+
+class ChunkedTableWriter:
+    """Escribe filas en ficheros `<tabla>/<run>-part-NNNNN.<ext>` de como mucho `chunk_rows` filas"""
+
+    def __init__(self, out_dir, table, columns, file_format, chunk_rows, run_id):
+        self.directory = os.path.join(out_dir, table)
+        self.columns = columns
+        self.file_format = file_format
+        self.chunk_rows = chunk_rows
+        self.run_id = run_id
+        self.rows = []
+        self.files = []
+        self.total_rows = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        path = os.path.join(self.directory, f"{self.run_id}-part-{len(self.files):05d}.{self.file_format}")
+        if self.file_format == 'parquet':
+            self._write_parquet(path)
+        else:
+            self._write_csv(path)
+        self.files.append(path)
+        self.total_rows += len(self.rows)
+        self.rows = []
+
+    def _write_csv(self, path):
+        names = [name for name, _ in self.columns]
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=names)
+            writer.writeheader()
+            for row in self.rows:
+                writer.writerow({
+                    name: row[name].isoformat() if isinstance(row[name], datetime) else row[name]
+                    for name in names
+                })
+
+    def _write_parquet(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {
+            'string': pa.string(),
+            'double': pa.float64(),
+            'int64': pa.int64(),
+            'bool': pa.bool_(),
+            'timestamp': pa.timestamp('us')
+        }
+        schema = pa.schema([(name, types[kind]) for name, kind in self.columns])
+        pq.write_table(pa.Table.from_pylist(self.rows, schema=schema), path, compression='snappy')
+
+    def close(self):
+        self.flush()
+        return self.files
+
+
+def resolve_format(file_format):
+    """'auto' usa Parquet si pyarrow está instalado y CSV en caso contrario"""
+    if file_format != 'auto':
+        return file_format
+    try:
+        import pyarrow  # noqa: F401
+        return 'parquet'
+    except ImportError:
+        return 'csv'
+
+
+def load_export_state(out_dir):
+    """Lee la marca de agua de la última exportación (o None si no hay)"""
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def save_export_state(out_dir, state):
+    """Guarda la marca de agua de forma atómica"""
+    path = os.path.join(out_dir, STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(state, file, indent=2)
+    os.replace(tmp_path, path)
+
+
+def existing_export(out_dir):
+    """Ficheros de una exportación anterior en `out_dir` (tablas y marca de agua)"""
+    found = [os.path.join(out_dir, STATE_FILE)] if os.path.exists(os.path.join(out_dir, STATE_FILE)) else []
+    for table in TABLES:
+        directory = os.path.join(out_dir, table)
+        if os.path.isdir(directory):
+            found += [os.path.join(directory, name) for name in os.listdir(directory)]
+    return found
+
+
+def clear_export(out_dir):
+    """Borra las tablas y la marca de agua de `out_dir` (nada más)"""
+    for table in TABLES:
+        shutil.rmtree(os.path.join(out_dir, table), ignore_errors=True)
+    if os.path.exists(os.path.join(out_dir, STATE_FILE)):
+        os.remove(os.path.join(out_dir, STATE_FILE))
+
+
+def export_orders(db, out_dir, file_format='auto', page_size=DEFAULT_PAGE_SIZE,
+                  chunk_rows=DEFAULT_CHUNK_ROWS, incremental=True, progress=None, overwrite=False):
+    """Exporta las órdenes (nuevas, si `incremental`) y devuelve un resumen de la ejecución.
+
+    Una exportación completa sobre un directorio con otra anterior duplicaría
+    filas: lanza ValueError salvo con `overwrite`, que la borra antes.
+    """
+    file_format = resolve_format(file_format)
+    if not incremental and existing_export(out_dir):
+        if not overwrite:
+            raise ValueError(f"{out_dir} ya contiene una exportación; usa otro directorio o bórrala (--overwrite)")
+        clear_export(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    state = load_export_state(out_dir) if incremental else None
+    since = None
+    since_id = None
+    if state and state.get('last_created_at'):
+        since = datetime.fromisoformat(state['last_created_at'])
+        since_id = state.get('last_order_id')
+
+    # Con microsegundos: dos ejecuciones en el mismo segundo no se pisan los ficheros
+    run_id = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    orders_writer = ChunkedTableWriter(out_dir, 'orders', ORDER_COLUMNS, file_format, chunk_rows, run_id)
+    items_writer = ChunkedTableWriter(out_dir, 'line_items', LINE_ITEM_COLUMNS, file_format, chunk_rows, run_id)
+
+    exported = 0
+    last_created_at = since
+    last_order_id = since_id
+    for doc in iter_orders(db, since=since, since_id=since_id, page_size=page_size):
+        order_row, line_rows = flatten_order(doc)
+        orders_writer.write(order_row)
+        for line_row in line_rows:
+            items_writer.write(line_row)
+
+        exported += 1
+        if order_row['created_at'] is not None:
+            last_created_at = order_row['created_at']
+            last_order_id = doc.id
+        if progress and exported % page_size == 0:
+            progress(f"📦 {exported} órdenes exportadas...")
+
+    files = orders_writer.close() + items_writer.close()
+
+    new_state = {
+        'last_created_at': last_created_at.isoformat() if last_created_at else None,
+        'last_order_id': last_order_id,
+        'exported_orders': (state or {}).get('exported_orders', 0) + exported,
+        'last_run': run_id,
+        'format': file_format
+    }
+    save_export_state(out_dir, new_state)
+
+    return {
+        'orders': exported,
+        'line_items': items_writer.total_rows,
+        'files': files,
+        'since': since,
+        'state': new_state
+    }
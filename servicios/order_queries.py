@@ -0,0 +1,50 @@
+from servicios.firebase import firestore_sdk
+
+# Consultas sobre 'orders' respaldadas por los índices compuestos de
+# firestore.indexes.json: (user_id, created_at desc) y (status, created_at desc).
+
+DEFAULT_PAGE_SIZE = 10
+
+
+def _orders_query(db, user_id=None, status=None, cursor=None):
+    query = db.collection('orders')
+    if user_id is not None:
+        query = query.where('user_id', '==', user_id)
+    if status is not None:
+        query = query.where('status', '==', status)
+
+    query = query.order_by('created_at', direction=firestore_sdk().Query.DESCENDING)
+    if cursor is not None:
+        query = query.start_after(cursor)
+    return query
+
+
+def _with_id(doc):
+    order = doc.to_dict()
+    order['id'] = doc.id
+    return order
+
+
+def query_orders(db, user_id=None, status=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """Devuelve (órdenes, cursor_siguiente) ordenadas de la más reciente a la más antigua.
+
+    Se leen `limit` + 1 documentos: el de más solo indica si hay otra página.
+    `cursor` es el snapshot devuelto por la página anterior; cursor_siguiente
+    es None cuando no hay más resultados.
+    """
+    docs = list(_orders_query(db, user_id, status, cursor).limit(limit + 1).stream())
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    next_cursor = docs[-1] if has_more else None
+    return [_with_id(doc) for doc in docs], next_cursor
+
+
+def latest_orders(db, limit=5, status=None):
+    """Devuelve las últimas `limit` órdenes (opcionalmente filtradas por estado; sin paginación)"""
+    return [_with_id(doc) for doc in _orders_query(db, status=status).limit(limit).stream()]
+
+
+def user_orders(db, user_id, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """Historial de órdenes de un usuario, paginado"""
+    return query_orders(db, user_id=user_id, limit=limit, cursor=cursor)
@@ -0,0 +1,19 @@
+import os
+
+_stripe = None
+
+
+def get_stripe():
+    """SDK de Stripe configurado con STRIPE_SECRET_KEY (se importa la primera vez que se usa)"""
+    global _stripe
+    if _stripe is None:
+        import stripe
+        stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
+        _stripe = stripe
+    return _stripe
+
+
+def use_stripe_client(client):
+    """Sustituye el SDK de Stripe (p. ej. por MemoryStripe en benchmarks y pruebas)"""
+    global _stripe
+    _stripe = client
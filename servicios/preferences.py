@@ -0,0 +1,99 @@
+"""Preferencias de compra como mapas acotados categoría→puntuación y producto→puntuación.
+
+Cada compra suma `cantidad * decay_weight(ahora)` con Increment en el
+servidor, sin leer ni reescribir el documento. Como el peso crece de forma
+exponencial con el tiempo (forward decay), las compras antiguas pierden
+importancia relativa sin tener que reescribirlas: para obtener el valor
+decaído basta con dividir por decay_weight(ahora) al leer. Los mapas están
+acotados por el número de categorías y de productos del catálogo.
+"""
+import heapq
+from collections import Counter
+from datetime import datetime
+from operator import itemgetter
+
+from servicios.firebase import firestore_sdk
+from servicios.sales_rollups import product_base_name, product_key
+
+COLLECTION = 'user_preferences'
+
+# Vida media de una compra: pasados estos días pesa la mitad
+HALF_LIFE_DAYS = 90
+
+# Origen fijo de los pesos (con vida media de 90 días el peso cabe en un
+# float durante más de 200 años)
+DECAY_EPOCH = datetime(2024, 1, 1)
+
+
+def decay_weight(when=None):
+    """Peso de un evento ocurrido en `when` (2 ** (días desde el origen / vida media))"""
+    when = when or datetime.now()
+    if when.tzinfo is not None:
+        when = when.replace(tzinfo=None)
+    elapsed_days = (when - DECAY_EPOCH).total_seconds() / 86400
+    return 2 ** (elapsed_days / HALF_LIFE_DAYS)
+
+
+def record_purchase(db, user_id, cart_items, when=None):
+    """Suma las compras del carrito a las preferencias del usuario con una sola escritura"""
+    firestore = firestore_sdk()
+    weight = decay_weight(when)
+
+    category_scores = Counter()
+    product_scores = Counter()
+    product_names = {}
+    for item in cart_items:
+        key = product_key(item['name'])
+        category_scores[item.get('category') or 'general'] += weight * item['quantity']
+        product_scores[key] += weight * item['quantity']
+        product_names[key] = product_base_name(item['name'])
+
+    db.collection(COLLECTION).document(user_id).set({
+        'user_id': user_id,
+        'category_scores': {
+            category: firestore.Increment(score) for category, score in category_scores.items()
+        },
+        'product_scores': {
+            key: firestore.Increment(score) for key, score in product_scores.items()
+        },
+        'product_names': product_names,
+        'purchases': firestore.Increment(1),
+        # 'last_updated' fecha las listas del formato anterior: no se toca
+        'scores_updated': datetime.now()
+    }, merge=True)
+
+
+def _legacy_scores(values, last_updated):
+    """Convierte las listas del formato anterior en puntuaciones (fechadas en su última actualización)
+
+    Las compras nuevas escriben 'scores_updated', así que 'last_updated' sigue
+    siendo la fecha original de las listas y estas decaen como el resto.
+    """
+    weight = decay_weight(last_updated) if last_updated else 1.0
+    return {value: count * weight for value, count in Counter(values).items()}
+
+
+def get_preference_scores(preferences, when=None):
+    """Devuelve {'categories': {...}, 'products': {...}} con las puntuaciones decaídas a `when`"""
+    preferences = preferences or {}
+    category_scores = dict(preferences.get('category_scores', {}))
+    product_scores = dict(preferences.get('product_scores', {}))
+
+    # Documentos antiguos: listas 'preferred_categories' / 'preferred_products'
+    last_updated = preferences.get('last_updated')
+    for category, score in _legacy_scores(preferences.get('preferred_categories', []), last_updated).items():
+        category_scores[category] = category_scores.get(category, 0) + score
+    for name, score in _legacy_scores(preferences.get('preferred_products', []), last_updated).items():
+        key = product_key(name)
+        product_scores[key] = product_scores.get(key, 0) + score
+
+    now_weight = decay_weight(when)
+    return {
+        'categories': {category: score / now_weight for category, score in category_scores.items()},
+        'products': {key: score / now_weight for key, score in product_scores.items()}
+    }
+
+
+def top_k(scores, k):
+    """Las `k` entradas con mayor puntuación como [(clave, puntuación), ...]"""
+    return heapq.nlargest(k, scores.items(), key=itemgetter(1))
@@ -0,0 +1,272 @@
+"""Perfilado opcional de cada ejecución por secciones de la página.
+
+Se activa con PAGE_PROFILER=1 (o =cprofile) para todo el proceso, o por
+sesión con ?profile=1 / ?profile=cprofile en la URL si el usuario es
+administrador (?profile=0 lo desactiva). Las páginas llaman a
+begin_profile() al principio, marcan sus secciones con `with span('...')` y
+muestran el desglose con render_profile_panel() al final. Por sección se
+mide el tiempo total, el de Firestore (según servicios.firestore_metrics),
+el de emisión de elementos de Streamlit y el resto (Python/HTML). Con el
+perfilado desactivado span() devuelve un contexto vacío compartido.
+"""
+import io
+import marshal
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from servicios.admin import is_admin
+from servicios.firestore_metrics import metrics
+
+# Ejecuciones perfiladas que se conservan por sesión
+MAX_PROFILE_RUNS = 10
+
+# Líneas del informe de cProfile
+CPROFILE_LINES = 30
+
+_MODES = {'1': 'spans', 'spans': 'spans', 'cprofile': 'cprofile'}
+
+_NULL_SPAN = nullcontext()
+_local = threading.local()
+
+# Ejecución perfilada abierta de cada sesión (puede terminar con st.rerun o switch_page)
+_open_runs = {}
+_lock = threading.Lock()
+
+
+def profiling_mode():
+    """'spans', 'cprofile' o None para la ejecución actual"""
+    mode = _MODES.get(os.environ.get('PAGE_PROFILER', '').lower())
+    if mode:
+        return mode
+
+    # ?profile=... solo para administradores; se recuerda en la sesión
+    requested = st.query_params.get('profile')
+    if requested is not None and is_admin(st.session_state.get('usuario')):
+        st.session_state.profile_mode = _MODES.get(requested.lower())
+    return st.session_state.get('profile_mode')
+
+
+def _firestore_ms():
+    run = metrics.current_run()
+    return run['firestore_ms'] if run else 0.0
+
+
+class _Span:
+    def __init__(self, run, name):
+        self.run = run
+        self.name = name
+
+    def __enter__(self):
+        run = self.run
+        parent = run['stack'][-1] if run['stack'] else None
+        self.record = {
+            'name': self.name,
+            'path': f"{parent['path']};{self.name}" if parent else self.name,
+            'depth': len(run['stack']),
+            'ms': 0.0,
+            'firestore_ms': 0.0,
+            'emit_ms': 0.0,
+            'elements': 0,
+            'children_ms': 0.0
+        }
+        run['spans'].append(self.record)
+        run['stack'].append(self.record)
+        self.firestore_start = _firestore_ms()
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc_info):
+        elapsed = (time.perf_counter() - self.start) * 1000
+        run = self.run
+        record = self.record
+        record['ms'] = elapsed
+        record['firestore_ms'] = _firestore_ms() - self.firestore_start
+        run['stack'].pop()
+        if run['stack']:
+            run['stack'][-1]['children_ms'] += elapsed
+        run['last_activity'] = time.perf_counter()
+        return False
+
+
+def span(name):
+    """Sección medida de la ejecución actual (contexto vacío si no se perfila)"""
+    run = getattr(_local, 'run', None)
+    if run is None:
+        return _NULL_SPAN
+    return _Span(run, name)
+
+
+def profiled(name):
+    """Decorador: la llamada completa es una sección `name`"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _timed_enqueue(ctx, run):
+    enqueue = type(ctx).enqueue
+
+    def timed(msg):
+        start = time.perf_counter()
+        enqueue(ctx, msg)
+        elapsed = (time.perf_counter() - start) * 1000
+        # Se atribuye a todas las secciones abiertas (los tiempos son inclusivos)
+        for record in run['stack']:
+            record['emit_ms'] += elapsed
+            if msg.HasField('delta'):
+                record['elements'] += 1
+    return timed
+
+
+def _session_id(ctx):
+    return ctx.session_id if ctx is not None else 'offline'
+
+
+def begin_profile(page, fragment=None):
+    """Cierra la ejecución perfilada anterior y abre otra si el perfilado está activo"""
+    ctx = get_script_run_ctx()
+    finish_profile()
+
+    mode = profiling_mode()
+    if not mode:
+        return
+
+    run = {
+        'page': page,
+        'fragment': fragment,
+        'started_at': time.time(),
+        'start': time.perf_counter(),
+        'last_activity': time.perf_counter(),
+        'spans': [],
+        'stack': [],
+        'profiler': None
+    }
+    _local.run = run
+    with _lock:
+        _open_runs[_session_id(ctx)] = run
+    if ctx is not None:
+        ctx.enqueue = _timed_enqueue(ctx, run)
+    if mode == 'cprofile':
+        # cProfile y pstats solo se cargan con el modo cprofile activo
+        import cProfile
+
+        run['profiler'] = cProfile.Profile()
+        run['profiler'].enable()
+
+
+def finish_profile(end=None):
+    """Cierra la ejecución perfilada abierta de la sesión y la guarda en el historial.
+
+    Sin `end`, la ejecución terminó antes de tiempo (st.rerun, switch_page,
+    st.stop) y se toma como final la última sección cerrada.
+    """
+    _local.run = None
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        # El envoltorio de emisión no debe sobrevivir a la ejecución perfilada
+        ctx.__dict__.pop('enqueue', None)
+    with _lock:
+        run = _open_runs.pop(_session_id(ctx), None)
+    if run is None:
+        return None
+
+    profiler = run['profiler']
+    if profiler is not None:
+        profiler.disable()
+
+    result = {
+        'page': run['page'],
+        'fragment': run['fragment'],
+        'started_at': run['started_at'],
+        'total_ms': round(((end or run['last_activity']) - run['start']) * 1000, 1),
+        'spans': [{
+            'name': record['name'],
+            'path': record['path'],
+            'depth': record['depth'],
+            'ms': round(record['ms'], 1),
+            'firestore_ms': round(record['firestore_ms'], 1),
+            'emit_ms': round(record['emit_ms'], 1),
+            'elements': record['elements'],
+            'self_ms': round(max(0.0, record['ms'] - record['children_ms']), 1)
+        } for record in run['spans']],
+        'cprofile_text': None,
+        'cprofile_data': None
+    }
+
+    if profiler is not None:
+        import pstats
+
+        profiler.create_stats()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(CPROFILE_LINES)
+        result['cprofile_text'] = output.getvalue()
+        # Mismo formato que pstats.dump_stats (.prof para snakeviz o pstats)
+        result['cprofile_data'] = marshal.dumps(profiler.stats)
+
+    runs = st.session_state.setdefault('profile_runs', [])
+    runs.append(result)
+    del runs[:-MAX_PROFILE_RUNS]
+    return result
+
+
+def collapsed_stacks(result):
+    """Perfil en formato de pilas plegadas (flamegraph.pl, speedscope): 'a;b;c ms'"""
+    lines = [f"{result['page']} {round(result['total_ms'] - sum(s['ms'] for s in result['spans'] if s['depth'] == 0))}"]
+    lines += [f"{result['page']};{record['path']} {round(record['self_ms'])}" for record in result['spans']]
+    return '\n'.join(lines) + '\n'
+
+
+def render_profile_panel():
+    """Cierra la ejecución actual y muestra el desglose de las últimas ejecuciones perfiladas"""
+    if getattr(_local, 'run', None) is None:
+        return
+    finish_profile(end=time.perf_counter())
+
+    runs = st.session_state.get('profile_runs', [])
+    if not runs:
+        return
+
+    import pandas as pd
+
+    with st.expander("⏱️ Perfil de la ejecución", expanded=True):
+        labels = [f"{run['page']}{' / ' + run['fragment'] if run['fragment'] else ''} · "
+                  f"{time.strftime('%H:%M:%S', time.localtime(run['started_at']))} · {run['total_ms']:.0f} ms"
+                  for run in runs]
+        index = st.selectbox("Ejecución", range(len(runs)), index=len(runs) - 1,
+                             format_func=lambda i: labels[i], key="profile_run_select")
+        result = runs[index]
+
+        rows = [{
+            'Sección': '    ' * record['depth'] + record['name'],
+            'Total (ms)': record['ms'],
+            'Firestore (ms)': record['firestore_ms'],
+            'Emisión (ms)': record['emit_ms'],
+            'Resto (ms)': round(max(0.0, record['ms'] - record['firestore_ms'] - record['emit_ms']), 1),
+            'Elementos': record['elements']
+        } for record in result['spans']]
+        st.caption(f"Total de la ejecución: {result['total_ms']:.1f} ms")
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("📥 Pilas plegadas (flame graph)", collapsed_stacks(result),
+                               file_name=f"perfil_{result['page']}.folded", mime="text/plain",
+                               key="profile_download_folded")
+        with col2:
+            if result['cprofile_data']:
+                st.download_button("📥 cProfile (.prof)", result['cprofile_data'],
+                                   file_name=f"perfil_{result['page']}.prof", mime="application/octet-stream",
+                                   key="profile_download_cprofile")
+        if result['cprofile_text']:
+            st.code(result['cprofile_text'], language=None)
@@ -0,0 +1,173 @@
+"""Modelo de co-compra producto→producto para las ofertas personalizadas.
+
+El modelo se construye offline (tools/build_recommendations.py) a partir de
+'orders': se cuentan los pares de productos comprados juntos como una
+matriz dispersa en formato COO (una clave de 64 bits por par, agregadas con np.unique), se
+normaliza con similitud coseno y se guardan solo los `top_n` vecinos de
+cada producto en un .npz compacto. En la web el modelo se carga una vez por
+proceso y las recomendaciones son búsquedas en memoria. NumPy se importa
+solo al construir o cargar el modelo, no al importar el módulo.
+"""
+import heapq
+import os
+from operator import itemgetter
+
+from servicios.sales_rollups import product_base_name, product_key
+
+MODEL_PATH = os.environ.get("RECOMMENDATIONS_PATH", "models/copurchase.npz")
+
+DEFAULT_TOP_N = 20
+
+# Modelo cargado en memoria: (ruta, mtime, modelo)
+_loaded = None
+
+
+class CoPurchaseMatrixBuilder:
+    """Acumula pares de productos por órdenes y genera la tabla de vecinos"""
+
+    def __init__(self):
+        import numpy as np
+
+        self.index = {}
+        self.names = []
+        self.item_counts = []
+        self._pending = []
+        self._pair_keys = np.empty(0, dtype=np.int64)
+        self._pair_counts = np.empty(0, dtype=np.int64)
+
+    def _item_id(self, name):
+        key = product_key(name)
+        if key not in self.index:
+            self.index[key] = len(self.names)
+            self.names.append(product_base_name(name))
+            self.item_counts.append(0)
+        return self.index[key]
+
+    def add_order(self, items):
+        """Registra los productos distintos de una orden"""
+        ids = sorted({self._item_id(item['name']) for item in items})
+        for item_id in ids:
+            self.item_counts[item_id] += 1
+        for position, i in enumerate(ids):
+            for j in ids[position + 1:]:
+                self._pending.append((i, j))
+        if len(self._pending) >= 200_000:
+            self._compact()
+
+    def _compact(self):
+        """Agrega los pares pendientes en la matriz dispersa acumulada"""
+        if not self._pending:
+            return
+        import numpy as np
+
+        pairs = np.array(self._pending, dtype=np.int64)
+        # Clave de 64 bits por par (i < j); 2**31 productos como máximo
+        keys = (pairs[:, 0] << 31) | pairs[:, 1]
+        keys = np.concatenate([self._pair_keys, keys])
+        counts = np.concatenate([self._pair_counts, np.ones(len(pairs), dtype=np.int64)])
+        self._pair_keys, inverse = np.unique(keys, return_inverse=True)
+        self._pair_counts = np.bincount(inverse, weights=counts).astype(np.int64)
+        self._pending = []
+
+    def build(self, top_n=DEFAULT_TOP_N, min_support=1):
+        """Devuelve (claves, nombres, vecinos, puntuaciones) con similitud coseno"""
+        import numpy as np
+
+        self._compact()
+        n_items = len(self.names)
+        keys = np.array(list(self.index), dtype=object)
+        neighbors = np.full((n_items, top_n), -1, dtype=np.int32)
+        scores = np.zeros((n_items, top_n), dtype=np.float32)
+
+        support = self._pair_counts >= min_support
+        pair_keys = self._pair_keys[support]
+        pair_counts = self._pair_counts[support].astype(np.float64)
+        if len(pair_keys) == 0:
+            return keys, np.array(self.names, dtype=object), neighbors, scores
+
+        i = (pair_keys >> 31).astype(np.int64)
+        j = (pair_keys & ((1 << 31) - 1)).astype(np.int64)
+        item_counts = np.array(self.item_counts, dtype=np.float64)
+        similarity = pair_counts / np.sqrt(item_counts[i] * item_counts[j])
+
+        # La matriz es simétrica: cada par aporta un vecino a i y otro a j
+        rows = np.concatenate([i, j])
+        cols = np.concatenate([j, i])
+        values = np.concatenate([similarity, similarity])
+
+        # Ordenar por fila y, dentro de cada fila, por similitud descendente
+        order = np.lexsort((-values, rows))
+        rows, cols, values = rows[order], cols[order], values[order]
+        row_starts = np.searchsorted(rows, np.arange(n_items))
+        rank = np.arange(len(rows)) - row_starts[rows]
+        keep = rank < top_n
+
+        neighbors[rows[keep], rank[keep]] = cols[keep]
+        scores[rows[keep], rank[keep]] = values[keep]
+        return keys, np.array(self.names, dtype=object), neighbors, scores
+
+
+def save_model(path, keys, names, neighbors, scores):
+    """Guarda el modelo como .npz comprimido (escritura atómica)"""
+    import numpy as np
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        keys=keys.astype(str),
+        names=names.astype(str),
+        neighbors=neighbors,
+        scores=scores
+    )
+    os.replace(tmp_path, path)
+
+
+class CoPurchaseModel:
+    """Tabla de vecinos en memoria"""
+
+    def __init__(self, keys, names, neighbors, scores):
+        self.keys = [str(key) for key in keys]
+        self.names = [str(name) for name in names]
+        self.index = {key: position for position, key in enumerate(self.keys)}
+        self.neighbors = neighbors
+        self.scores = scores
+
+    def recommend(self, seed_scores, k=3, exclude=()):
+        """Top-`k` claves de producto a partir de {clave: peso} de lo que el usuario ya compró"""
+        excluded = set(exclude) | set(seed_scores)
+        candidates = {}
+        for key, weight in heapq.nlargest(10, seed_scores.items(), key=itemgetter(1)):
+            position = self.index.get(key)
+            if position is None:
+                continue
+            for neighbor, score in zip(self.neighbors[position], self.scores[position]):
+                if neighbor < 0:
+                    break
+                neighbor_key = self.keys[neighbor]
+                if neighbor_key not in excluded:
+                    candidates[neighbor_key] = candidates.get(neighbor_key, 0.0) + weight * float(score)
+        return [key for key, _ in heapq.nlargest(k, candidates.items(), key=itemgetter(1))]
+
+    def name_of(self, key):
+        position = self.index.get(key)
+        return self.names[position] if position is not None else None
+
+
+def load_model(path=MODEL_PATH):
+    """Carga el modelo una vez por proceso (se recarga si el fichero cambia); None si no existe"""
+    global _loaded
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    if _loaded and _loaded[0] == path and _loaded[1] == mtime:
+        return _loaded[2]
+
+    import numpy as np
+
+    with np.load(path, allow_pickle=False) as data:
+        model = CoPurchaseModel(data['keys'], data['names'], data['neighbors'], data['scores'])
+    _loaded = (path, mtime, model)
+    return model
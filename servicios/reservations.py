@@ -0,0 +1,304 @@
+"""Retenciones de stock con caducidad mientras el cliente paga en Stripe.
+
+Al crear la sesión de pago se retienen las unidades del carrito: cada
+producto lleva un contador `reserved` y cada retención es un documento de
+stock_reservations con sus líneas y expires_at. Lo disponible para vender es
+stock - reserved (available_stock()), que es lo que muestra el catálogo.
+
+* reserve(): suma las líneas a `reserved` (Increment, un lote) y comprueba
+  después que ningún producto quede sobrerreservado; si alguno lo está,
+  deshace la retención y lanza InsufficientStock.
+* convert_reservation(): al volver del pago descuenta stock y reserved.
+* release_reservation(): pago cancelado.
+* sweep_expired(): libera en lotes las retenciones caducadas (hilo del
+  proceso con start_sweeper() o python -m tools.sweep_reservations).
+
+Convertir y liberar crean reservation_settlements/{id} en el mismo lote que
+los contadores, así que cada retención se liquida una sola vez aunque varios
+procesos lo intenten a la vez. Cada línea guarda en 'target' el documento
+(producto o shard) que recibió su Increment, y la liquidación escribe ahí sin
+volver a leer los productos.
+"""
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from servicios.firebase import firestore_sdk
+from servicios.stock_shards import with_sharded_stock, write_target
+
+COLLECTION = 'stock_reservations'
+SETTLEMENTS = 'reservation_settlements'
+
+# Estados de una retención
+HELD = 'held'
+CONVERTED = 'converted'
+RELEASED = 'released'
+MISSING = 'missing'
+
+# Minutos que dura una retención. Stripe exige que la sesión caduque entre 30 min
+# y 24 h después de crearla, y la sesión se crea unos segundos después de retener
+DEFAULT_TTL_MINUTES = 31
+MIN_TTL_MINUTES = 31
+MAX_TTL_MINUTES = 24 * 60
+
+# Ventana de expires_at que admite Stripe al crear la sesión
+STRIPE_MIN_EXPIRY = timedelta(minutes=30)
+STRIPE_MAX_EXPIRY = timedelta(hours=24)
+
+# Margen tras expires_at antes de liberar, para pagos que terminan justo al caducar
+SWEEP_GRACE = timedelta(minutes=5)
+
+# Segundos entre barridos del hilo del proceso (0 lo desactiva)
+DEFAULT_SWEEP_SECONDS = 60
+
+# Escrituras por lote de Firestore
+MAX_BATCH_WRITES = 500
+
+_sweeper = {'thread': None, 'runs': 0, 'released': 0, 'last_error': None}
+_sweeper_lock = threading.Lock()
+
+
+class InsufficientStock(Exception):
+    """No hay unidades disponibles para alguna línea; `lines` indica cuáles"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        super().__init__(", ".join(f"{line['name']} ({line['available']} disponibles)" for line in lines))
+
+
+def reservation_ttl():
+    """Duración de las retenciones (RESERVATION_TTL_MINUTES, entre 31 min y 24 h)"""
+    minutes = float(os.environ.get('RESERVATION_TTL_MINUTES', DEFAULT_TTL_MINUTES))
+    if not MIN_TTL_MINUTES <= minutes <= MAX_TTL_MINUTES:
+        raise ValueError(f"RESERVATION_TTL_MINUTES debe estar entre {MIN_TTL_MINUTES} y {MAX_TTL_MINUTES} "
+                         f"(Stripe solo admite sesiones que caduquen entre 30 min y 24 h): {minutes:g}")
+    return timedelta(minutes=minutes)
+
+
+def checkout_expires_at(reservation, now=None):
+    """expires_at (epoch) de la sesión de Stripe: el de la retención, dentro de la ventana de Stripe.
+
+    Si la retención caduca antes de 30 min (p. ej. la sesión se crea tarde),
+    la sesión dura lo mínimo que admite Stripe; el barrido espera SWEEP_GRACE
+    después de expires_at, así que las unidades siguen retenidas hasta entonces.
+    """
+    now = now or datetime.now()
+    expires_at = max(reservation['expires_at'], now + STRIPE_MIN_EXPIRY + timedelta(seconds=30))
+    return math.ceil(min(expires_at, now + STRIPE_MAX_EXPIRY).timestamp())
+
+
+def available_stock(product):
+    """Unidades que se pueden vender: stock menos las retenidas en pagos en curso"""
+    return max(0, int(product.get('stock', 0)) - int(product.get('reserved', 0)))
+
+
+def _product_ref(db, product_id):
+    return db.collection('products').document(product_id)
+
+
+def _lines(items):
+    """Unidades por producto del carrito: [{'product_id', 'name', 'quantity'}]"""
+    lines = {}
+    for item in items:
+        product_id = item.get('product_id')
+        if not product_id or '/' in product_id:
+            continue
+        line = lines.setdefault(product_id, {'product_id': product_id, 'name': item['name'], 'quantity': 0})
+        line['quantity'] += int(item['quantity'])
+    return list(lines.values())
+
+
+def reserve(db, items, user_id, ttl=None, now=None):
+    """Retiene las unidades del carrito y devuelve la retención (con 'id')"""
+    lines = _lines(items)
+    now = now or datetime.now()
+    reservation_ref = db.collection(COLLECTION).document()
+    reservation = {
+        'user_id': user_id,
+        'lines': lines,
+        'status': HELD,
+        'created_at': now,
+        'expires_at': now + (ttl or reservation_ttl())
+    }
+
+    requested = {line['product_id']: line for line in lines}
+    products = _existing_products(db, [reservation])
+
+    batch = db.batch()
+    for line in lines:
+        product_ref = _product_ref(db, line['product_id'])
+        # Un producto que no existe hace fallar el lote entero, como antes
+        target = write_target(db, product_ref, products[product_ref.path]) if product_ref.path in products else product_ref
+        batch.update(target, {'reserved': firestore_sdk().Increment(line['quantity'])})
+        # Documento que recibió el Increment: la liquidación escribe en él sin leer el producto
+        line['target'] = target.path
+    batch.set(reservation_ref, reservation)
+    batch.commit()
+
+    # Los Increment de otras retenciones pueden haber llegado a la vez: si alguna
+    # línea supera el stock, esta retención se deshace entera
+    shortages = []
+    for doc in db.get_all([_product_ref(db, product_id) for product_id in requested]):
+        product = with_sharded_stock(db, doc.id, doc.to_dict() or {}, ttl=0)
+        line = requested[doc.id]
+        if product.get('reserved', 0) > product.get('stock', 0):
+            shortages.append({
+                'name': line['name'],
+                'requested': line['quantity'],
+                'available': max(0, product.get('stock', 0) - (product.get('reserved', 0) - line['quantity']))
+            })
+    if shortages:
+        release_reservation(db, reservation_ref.id)
+        raise InsufficientStock(shortages)
+
+    return {**reservation, 'id': reservation_ref.id}
+
+
+def _existing_products(db, reservations):
+    """Datos de los productos de esas retenciones que siguen existiendo, por ruta"""
+    references = {line['product_id']: _product_ref(db, line['product_id'])
+                  for reservation in reservations for line in reservation['lines']}
+    if not references:
+        return {}
+    return {doc.reference.path: doc.to_dict() for doc in db.get_all(list(references.values())) if doc.exists}
+
+
+def _settlement_writes(db, reservation_id, reservation, outcome, now, existing=None):
+    """Escrituras que liquidan una retención (la marca de liquidación va primero).
+
+    Sin `existing` (productos leídos) cada línea escribe en el documento que
+    recibió su Increment al retener; si ya no existe, el lote falla con NotFound.
+    """
+    writes = [
+        ('create', db.collection(SETTLEMENTS).document(reservation_id), {'outcome': outcome, 'settled_at': now}),
+        ('update', db.collection(COLLECTION).document(reservation_id), {'status': outcome, 'settled_at': now})
+    ]
+    for line in reservation['lines']:
+        product_ref = _product_ref(db, line['product_id'])
+        if existing is None:
+            target = db.document(line['target']) if line.get('target') else product_ref
+        elif product_ref.path in existing:
+            target = write_target(db, product_ref, existing[product_ref.path])
+        else:
+            # Un catálogo republicado ya no tiene el producto (ni sus retenciones)
+            continue
+        fields = {'reserved': firestore_sdk().Increment(-line['quantity'])}
+        if outcome == CONVERTED:
+            fields['stock'] = firestore_sdk().Increment(-line['quantity'])
+        if target.path == product_ref.path and outcome == CONVERTED:
+            fields['last_updated'] = now
+        writes.append(('update', target, fields))
+    return writes
+
+
+def _commit(db, writes):
+    batch = db.batch()
+    for kind, reference, data in writes:
+        getattr(batch, kind)(reference, data)
+    batch.commit()
+
+
+def _settle(db, reservation_id, outcome):
+    """Liquida la retención; devuelve (resultado, si lo aplicó esta llamada)"""
+    from google.api_core.exceptions import Conflict, NotFound
+
+    doc = db.collection(COLLECTION).document(reservation_id).get()
+    if not doc.exists:
+        return MISSING, False
+    reservation = doc.to_dict()
+    now = datetime.now()
+    try:
+        try:
+            # Sin leer los productos: cada línea a su documento de la retención
+            _commit(db, _settlement_writes(db, reservation_id, reservation, outcome, now))
+        except NotFound:
+            # Algún producto se borró o dejó de tener shards: con los productos actuales
+            _commit(db, _settlement_writes(db, reservation_id, reservation, outcome, now,
+                                           _existing_products(db, [reservation])))
+        return outcome, True
+    except Conflict:
+        # Ya estaba liquidada: se devuelve lo que se hizo entonces
+        settlement = db.collection(SETTLEMENTS).document(reservation_id).get()
+        return (settlement.to_dict().get('outcome') if settlement.exists else MISSING), False
+
+
+def convert_reservation(db, reservation_id):
+    """Convierte la retención en venta; devuelve CONVERTED, RELEASED (se liberó antes) o MISSING"""
+    outcome, _ = _settle(db, reservation_id, CONVERTED)
+    return outcome
+
+
+def release_reservation(db, reservation_id):
+    """Devuelve las unidades retenidas; True si esta llamada las liberó"""
+    _, applied = _settle(db, reservation_id, RELEASED)
+    return applied
+
+
+def sweep_expired(db, now=None, grace=SWEEP_GRACE, limit=MAX_BATCH_WRITES):
+    """Libera las retenciones caducadas (hasta `limit`) en lotes; devuelve cuántas liberó"""
+    now = now or datetime.now()
+    query = (db.collection(COLLECTION)
+             .where('status', '==', HELD)
+             .where('expires_at', '<', now - grace)
+             .limit(limit))
+    expired = [(doc.id, doc.to_dict()) for doc in query.stream()]
+    if not expired:
+        return 0
+
+    # Varias retenciones por lote, sin pasar de MAX_BATCH_WRITES escrituras
+    existing = _existing_products(db, [reservation for _, reservation in expired])
+    chunks, size = [[]], 0
+    for reservation_id, reservation in expired:
+        writes = _settlement_writes(db, reservation_id, reservation, RELEASED, now, existing)
+        if chunks[-1] and size + len(writes) > MAX_BATCH_WRITES:
+            chunks.append([])
+            size = 0
+        chunks[-1].append((reservation_id, writes))
+        size += len(writes)
+
+    from google.api_core.exceptions import Conflict
+
+    released = 0
+    for chunk in chunks:
+        try:
+            _commit(db, [write for _, writes in chunk for write in writes])
+            released += len(chunk)
+        except Conflict:
+            # Alguna se liquidó mientras tanto (pago completado o otro barrido): una a una
+            released += sum(1 for reservation_id, _ in chunk if release_reservation(db, reservation_id))
+    return released
+
+
+def _sweep_forever(db, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            released = sweep_expired(db)
+            with _sweeper_lock:
+                _sweeper['runs'] += 1
+                _sweeper['released'] += released
+                _sweeper['last_error'] = None
+        except Exception as e:
+            with _sweeper_lock:
+                _sweeper['last_error'] = str(e)
+
+
+def start_sweeper(db, interval=None):
+    """Arranca (una vez por proceso) el hilo que libera retenciones caducadas"""
+    interval = interval if interval is not None else float(os.environ.get('RESERVATION_SWEEP_SECONDS',
+                                                                          DEFAULT_SWEEP_SECONDS))
+    with _sweeper_lock:
+        if interval <= 0 or _sweeper['thread'] is not None:
+            return _sweeper['thread']
+        _sweeper['thread'] = threading.Thread(target=_sweep_forever, args=(db, interval),
+                                              name='reservation-sweeper', daemon=True)
+        _sweeper['thread'].start()
+        return _sweeper['thread']
+
+
+def sweeper_status():
+    """Barridos hechos, retenciones liberadas y último error del hilo"""
+    with _sweeper_lock:
+        return {key: value for key, value in _sweeper.items() if key != 'thread'}
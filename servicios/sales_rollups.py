@@ -0,0 +1,126 @@
+import random
+import re
+import unicodedata
+from datetime import datetime, timedelta
+
+from servicios.firebase import firestore_sdk
+
+# Rollups diarios ('YYYY-MM-DD-n', campo 'date') y uno por producto (acumulado histórico)
+DAILY_COLLECTION = 'sales_daily'
+PRODUCT_COLLECTION = 'sales_by_product'
+
+# Documentos en que se reparte el rollup de cada día: todas las órdenes del día
+# escriben en él y Firestore admite ~1 escritura sostenida por segundo por documento
+DAILY_SHARDS = 10
+
+# Los productos en oferta se guardan como "Nombre (OFERTA -20%)"
+_OFFER_SUFFIX = re.compile(r"\s*\(OFERTA -\d+%\)$")
+
+
+def product_base_name(name):
+    """Nombre del producto sin el sufijo de oferta"""
+    return _OFFER_SUFFIX.sub("", name)
+
+
+def product_key(name):
+    """Convierte el nombre de un producto en un ID de documento estable"""
+    base_name = product_base_name(name)
+    ascii_name = unicodedata.normalize('NFKD', base_name).encode('ascii', 'ignore').decode()
+    return re.sub(r"[^a-z0-9]+", "-", ascii_name.lower()).strip("-") or "producto"
+
+
+def _aggregate_items(items):
+    """Agrupa las líneas de la orden por producto"""
+    products = {}
+    for item in items:
+        key = product_key(item['name'])
+        entry = products.setdefault(key, {
+            'name': product_base_name(item['name']),
+            'revenue': 0.0,
+            'units': 0
+        })
+        entry['revenue'] += float(item['price']) * int(item['quantity'])
+        entry['units'] += int(item['quantity'])
+    return products
+
+
+def record_order(db, order_data):
+    """Guarda la orden y actualiza los rollups de ventas en una sola escritura atómica"""
+    firestore = firestore_sdk()
+    created_at = order_data.get('created_at') or datetime.now()
+    day = created_at.strftime('%Y-%m-%d')
+    products = _aggregate_items(order_data['items'])
+    units = sum(product['units'] for product in products.values())
+
+    batch = db.batch()
+
+    order_ref = db.collection('orders').document()
+    batch.set(order_ref, order_data)
+
+    # Rollup diario con el desglose por producto del día, en un shard al azar
+    batch.set(db.collection(DAILY_COLLECTION).document(daily_shard_id(day)), {
+        'date': day,
+        'revenue': firestore.Increment(float(order_data['total'])),
+        'orders': firestore.Increment(1),
+        'units': firestore.Increment(units),
+        'products': {
+            key: {
+                'name': product['name'],
+                'revenue': firestore.Increment(product['revenue']),
+                'units': firestore.Increment(product['units'])
+            }
+            for key, product in products.items()
+        },
+        'updated_at': datetime.now()
+    }, merge=True)
+
+    # Rollup histórico por producto
+    for key, product in products.items():
+        batch.set(db.collection(PRODUCT_COLLECTION).document(key), {
+            'name': product['name'],
+            'revenue': firestore.Increment(product['revenue']),
+            'orders': firestore.Increment(1),
+            'units': firestore.Increment(product['units']),
+            'last_sold_at': created_at
+        }, merge=True)
+
+    batch.commit()
+    return order_ref
+
+
+def daily_shard_id(day, shard=None):
+    """ID del shard `shard` (al azar si es None) del rollup del día"""
+    return f"{day}-{random.randrange(DAILY_SHARDS) if shard is None else shard}"
+
+
+def get_daily_rollups(db, days=30, today=None):
+    """Suma los shards de los últimos `days` días con una consulta por rango de fechas (días sin ventas en cero)"""
+    today = today or datetime.now()
+    dates = [(today - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days - 1, -1, -1)]
+
+    # También trae los documentos de un solo día sin shard (sales_daily/{día})
+    query = (db.collection(DAILY_COLLECTION)
+             .where('date', '>=', dates[0])
+             .where('date', '<=', dates[-1]))
+    rollups = {day: {'date': day, 'revenue': 0.0, 'orders': 0, 'units': 0, 'products': {}} for day in dates}
+    for doc in query.stream():
+        data = doc.to_dict()
+        rollup = rollups.get(data.get('date'))
+        if rollup is None:
+            continue
+        for field in ('revenue', 'orders', 'units'):
+            rollup[field] += data.get(field, 0)
+        for key, product in data.get('products', {}).items():
+            entry = rollup['products'].setdefault(key, {'name': product.get('name', key), 'revenue': 0.0, 'units': 0})
+            entry['revenue'] += product.get('revenue', 0.0)
+            entry['units'] += product.get('units', 0)
+    return [rollups[day] for day in dates]
+
+
+def get_top_products(db, limit=10):
+    """Devuelve los productos con más ingresos acumulados"""
+    firestore = firestore_sdk()
+    query = (db.collection(PRODUCT_COLLECTION)
+             .order_by('revenue', direction=firestore.Query.DESCENDING)
+             .limit(limit))
+    return [doc.to_dict() for doc in query.stream()]
@@ -0,0 +1,148 @@
+"""Estado de sesión fuera del proceso de Streamlit, para servir con varios procesos.
+
+st.session_state vive en la memoria del proceso que tiene el websocket del
+navegador. Con varios procesos detrás de servicios/sticky_proxy.py, cada
+navegador lleva la cookie COOKIE_NAME (la pone el proxy) y las claves de
+PERSISTED_KEYS se guardan en un SQLite local compartido por los procesos del
+nodo. Si el proceso de un comprador se reinicia, el navegador se reconecta
+(al mismo proceso o a otro) y sync_session() recupera el login y el carrito.
+
+Se activa con SESSION_STORE=sqlite (SESSION_STORE_PATH, por defecto
+data/sesiones.db). Sin cookie o sin SESSION_STORE todo es un no-op.
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+import streamlit as st
+
+COOKIE_NAME = 'atz_session'
+
+DEFAULT_PATH = os.path.join('data', 'sesiones.db')
+
+# Horas que se conserva una sesión sin actividad
+DEFAULT_TTL_HOURS = 24
+
+# Claves que sobreviven a un reinicio del proceso. El cliente de Firestore, los
+# cursores de paginación (snapshots) y los perfiles se reconstruyen solos.
+PERSISTED_KEYS = ('usuario', 'login', 'cart', 'stripe_session_id', 'payment_success', 'profile_mode')
+
+# Claves internas en session_state
+_RESTORED_KEY = '_session_restored'
+_SAVED_KEY = '_session_saved'
+
+_stores = {}
+_lock = threading.Lock()
+
+
+class SQLiteSessionStore:
+    """Sesiones serializadas con pickle en una tabla SQLite (varios procesos, un nodo)"""
+
+    def __init__(self, path=DEFAULT_PATH, ttl_hours=DEFAULT_TTL_HOURS):
+        # sqlite3 solo se carga con SESSION_STORE activado
+        import sqlite3
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl_hours * 3600
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " updated_at REAL NOT NULL"
+            ")"
+        )
+        self.purge()
+
+    def get(self, session_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM sessions WHERE id = ? AND updated_at > ?", (session_id, time.time() - self.ttl)
+            ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def put(self, session_id, data):
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO sessions (id, data, updated_at) VALUES (?, ?, ?)",
+                                     (session_id, data, time.time()))
+
+    def delete(self, session_id):
+        with self._lock:
+            self._connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def purge(self):
+        """Borra las sesiones caducadas; devuelve cuántas"""
+        with self._lock:
+            return self._connection.execute("DELETE FROM sessions WHERE updated_at <= ?",
+                                            (time.time() - self.ttl,)).rowcount
+
+
+def get_session_store():
+    """Almacén de sesiones del proceso (None si SESSION_STORE no está definido)"""
+    if os.environ.get('SESSION_STORE', '').lower() != 'sqlite':
+        return None
+    path = os.environ.get('SESSION_STORE_PATH', DEFAULT_PATH)
+    with _lock:
+        if path not in _stores:
+            _stores[path] = SQLiteSessionStore(path, float(os.environ.get('SESSION_TTL_HOURS', DEFAULT_TTL_HOURS)))
+        return _stores[path]
+
+
+def browser_session_id():
+    """Identificador del navegador (cookie del proxy) o None"""
+    try:
+        session_id = st.context.cookies.get(COOKIE_NAME)
+    except Exception:
+        return None
+    # Fuera de un servidor (AppTest, modo bare) las cookies no son un diccionario real
+    return session_id if isinstance(session_id, str) and session_id else None
+
+
+def _persisted_state():
+    return {key: st.session_state[key] for key in PERSISTED_KEYS if key in st.session_state}
+
+
+def persist_session():
+    """Guarda las claves persistentes de la sesión si han cambiado desde la última vez"""
+    store = get_session_store()
+    session_id = browser_session_id()
+    if store is None or not session_id:
+        return
+    data = pickle.dumps(_persisted_state(), protocol=pickle.HIGHEST_PROTOCOL)
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    if st.session_state.get(_SAVED_KEY) != digest:
+        store.put(session_id, data)
+        st.session_state[_SAVED_KEY] = digest
+
+
+def sync_session():
+    """Al empezar una sesión recupera el estado guardado; después guarda los cambios.
+
+    Se llama al principio de cada página (y al final de las ejecuciones de un
+    fragmento), así que lo que cambió en la ejecución anterior, incluidos los
+    callbacks de los widgets, queda guardado antes de seguir.
+    """
+    store = get_session_store()
+    session_id = browser_session_id()
+    if store is None or not session_id:
+        return
+    if not st.session_state.get(_RESTORED_KEY):
+        st.session_state[_RESTORED_KEY] = True
+        saved = store.get(session_id)
+        if saved:
+            st.session_state.update(saved)
+    persist_session()
+
+
+def forget_session():
+    """Borra el estado guardado del navegador (al cerrar sesión)"""
+    store = get_session_store()
+    session_id = browser_session_id()
+    if store is not None and session_id:
+        store.delete(session_id)
@@ -0,0 +1,110 @@
+"""Servidor HTTP auxiliar que sirve static/ con cabeceras de caché de larga duración.
+
+Streamlit sirve /app/static sin Cache-Control, así que los recursos con
+huella se sirven desde este servidor (en un hilo del mismo proceso) con
+`Cache-Control: public, max-age=31536000, immutable`. Otras rutas se pueden
+registrar con register_route().
+
+Escucha solo en 127.0.0.1 salvo que SIDECAR_HOST diga otra cosa (p. ej.
+0.0.0.0 detrás de un proxy), porque /metrics y /healthz describen el
+proceso. Solo /static lleva Access-Control-Allow-Origin.
+"""
+import mimetypes
+import os
+import re
+import threading
+
+from servicios.assets import STATIC_DIR
+
+DEFAULT_PORT = 8502
+
+# Interfaz por defecto: /metrics no debe quedar abierto a la red
+DEFAULT_HOST = '127.0.0.1'
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Ficheros con huella: nombre.<hash de 10 hex>.ext
+_FINGERPRINTED = re.compile(r'\.[0-9a-f]{10}\.[a-z0-9]+$')
+
+# Rutas adicionales: path -> función() que devuelve (status, content_type, cuerpo)
+_routes = {}
+
+_server = None
+_lock = threading.Lock()
+
+
+def register_route(path, handler):
+    """Registra una ruta GET servida por el sidecar"""
+    _routes[path] = handler
+
+
+class _SidecarRoutes:
+    """Métodos del handler; la clase base (http.server) se añade al arrancar el sidecar"""
+    server_version = 'AdrianaTouzSidecar'
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path in _routes:
+            status, content_type, body = _routes[path]()
+            self._send(status, content_type, body.encode('utf-8') if isinstance(body, str) else body, 'no-store')
+        elif path.startswith('/static/'):
+            self._send_static(path[len('/static/'):])
+        else:
+            self._send(404, 'text/plain', b'Not found', 'no-store')
+
+    def _send_static(self, relative_path):
+        root = os.path.realpath(STATIC_DIR)
+        full_path = os.path.realpath(os.path.join(root, relative_path))
+        if not full_path.startswith(root + os.sep) or not os.path.isfile(full_path):
+            self._send(404, 'text/plain', b'Not found', 'no-store')
+            return
+
+        with open(full_path, 'rb') as file:
+            body = file.read()
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        cache_control = IMMUTABLE if _FINGERPRINTED.search(full_path) else 'no-cache'
+        # Las fuentes y el CSS se piden desde el origen de Streamlit
+        self._send(200, content_type, body, cache_control, cors=True)
+
+    def _send(self, status, content_type, body, cache_control, cors=False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', cache_control)
+        if cors:
+            self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def sidecar_port():
+    """Puerto configurado en SIDECAR_PORT (None = sidecar desactivado)"""
+    port = os.environ.get('SIDECAR_PORT')
+    return int(port) if port else None
+
+
+def sidecar_host():
+    """Interfaz configurada en SIDECAR_HOST (por defecto solo local)"""
+    return os.environ.get('SIDECAR_HOST') or DEFAULT_HOST
+
+
+def start_sidecar(port=None, host=None):
+    """Arranca el sidecar una sola vez por proceso; devuelve el servidor o None si está desactivado"""
+    global _server
+    port = port or sidecar_port()
+    if not port:
+        return None
+
+    # http.server solo se carga si el sidecar está activado (las páginas no lo pagan al importar)
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    with _lock:
+        if _server is None:
+            handler = type('SidecarHandler', (_SidecarRoutes, BaseHTTPRequestHandler), {})
+            _server = ThreadingHTTPServer((host or sidecar_host(), port), handler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name='sidecar', daemon=True).start()
+        return _server
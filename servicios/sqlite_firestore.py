@@ -0,0 +1,392 @@
+"""Motor de almacenamiento SQLite con la misma API que el cliente de Firestore.
+
+Para despliegues de un solo nodo y benchmarks locales. Cada documento es una
+fila (colección, id, JSON) de la tabla `documents`; las consultas where/
+order_by/limit/start_after y count() se traducen a SQL sobre json_extract().
+Se crean índices de expresión con los índices compuestos de
+firestore.indexes.json más los de un solo campo que usan las consultas de la
+aplicación (SINGLE_FIELD_INDEXES), así que las lecturas van por índice igual
+que en Firestore. Las escrituras (lotes, merge, Increment, DELETE_FIELD...)
+reutilizan la semántica de MemoryFirestore y se aplican en una transacción.
+Las fechas se guardan como texto '@dt:<ISO 8601>' para que se ordenen bien.
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from servicios.memory_firestore import (
+    DESCENDING,
+    DOCUMENT_ID,
+    MemoryCollectionReference,
+    MemoryDocumentReference,
+    MemoryDocumentSnapshot,
+    MemoryFirestore,
+    MemoryQuery,
+    stage_operations
+)
+
+# Índices compuestos compartidos con Firestore
+INDEXES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'firestore.indexes.json')
+
+# Campos consultados por la aplicación que en Firestore tienen índice automático
+SINGLE_FIELD_INDEXES = {
+    'products': ['name', 'category', 'catalog_version'],
+    'orders': ['order_number', 'created_at'],
+    'sales_daily': ['date'],
+    'sales_by_product': ['revenue']
+}
+
+_DATETIME_PREFIX = '@dt:'
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return _DATETIME_PREFIX + value.isoformat(timespec='microseconds')
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, str) and value.startswith(_DATETIME_PREFIX):
+        return datetime.fromisoformat(value[len(_DATETIME_PREFIX):])
+    if isinstance(value, dict):
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def dumps(data):
+    return json.dumps(_encode(data), ensure_ascii=False, separators=(',', ':'))
+
+
+def loads(text):
+    return _decode(json.loads(text))
+
+
+def _json_path(field_path):
+    parts = field_path.split('.')
+    if any('"' in part or "'" in part for part in parts):
+        raise ValueError(f"Ruta de campo no soportada en SQLite: {field_path}")
+    return "'$." + '.'.join(f'"{part}"' for part in parts) + "'"
+
+
+def field_sql(field_path):
+    """Expresión SQL del valor de un campo (la misma que usan los índices)"""
+    return f"json_extract(data, {_json_path(field_path)})"
+
+
+def _type_sql(field_path):
+    return f"json_type(data, {_json_path(field_path)})"
+
+
+def _param(value):
+    if isinstance(value, bool):
+        return int(value)
+    return _encode(value)
+
+
+def _json_types(value):
+    """Tipos JSON comparables con `value` (Firestore no compara entre tipos)"""
+    if value is None:
+        return ('null',)
+    if isinstance(value, bool):
+        return ('true', 'false')
+    if isinstance(value, (int, float)):
+        return ('integer', 'real')
+    return ('text',)
+
+
+def _types_clause(field_path, values):
+    types = sorted({json_type for value in values for json_type in _json_types(value)})
+    clause = f"{_type_sql(field_path)} IN ({', '.join(repr(t) for t in types)})"
+    if all(isinstance(value, datetime) for value in values):
+        clause += f" AND {field_sql(field_path)} LIKE '{_DATETIME_PREFIX}%'"
+    return clause
+
+
+def _filter_sql(field_path, op, value):
+    """Traduce un filtro where() a (sql, parámetros)"""
+    column = field_sql(field_path)
+    if op in ('==', '!=') and value is None:
+        sql = f"{_type_sql(field_path)} = 'null'"
+        return (sql, []) if op == '==' else (f"{_type_sql(field_path)} NOT IN ('null')", [])
+
+    if op in ('in', 'not-in', 'array_contains_any'):
+        values = list(value)
+        placeholders = ', '.join('?' for _ in values)
+        params = [_param(v) for v in values]
+        if op == 'array_contains_any':
+            return (f"EXISTS (SELECT 1 FROM json_each(data, {_json_path(field_path)}) "
+                    f"WHERE value IN ({placeholders}))", params)
+        match = f"({column} IN ({placeholders}) AND {_types_clause(field_path, values)})"
+        if op == 'in':
+            return match, params
+        return f"({_type_sql(field_path)} NOT IN ('null') AND NOT {match})", params
+
+    if op == 'array_contains':
+        return f"EXISTS (SELECT 1 FROM json_each(data, {_json_path(field_path)}) WHERE value = ?)", [_param(value)]
+
+    if op == '!=':
+        return (f"({_type_sql(field_path)} NOT IN ('null') AND NOT ({column} = ? AND "
+                f"{_types_clause(field_path, [value])}))", [_param(value)])
+
+    if op not in ('==', '<', '<=', '>', '>='):
+        raise ValueError(f"Operador no soportado: {op}")
+    sql_op = '=' if op == '==' else op
+    return f"({column} {sql_op} ? AND {_types_clause(field_path, [value])})", [_param(value)]
+
+
+class SQLiteQuery(MemoryQuery):
+    """Consulta que se ejecuta en SQL sobre la tabla de documentos"""
+
+    def _sql(self, columns):
+        clauses = ["collection = ?"]
+        params = [self._collection_path]
+        for field_path, op, value in self._filters:
+            sql, values = _filter_sql(field_path, op, value)
+            clauses.append(sql)
+            params += values
+        # Firestore excluye los documentos que no tienen los campos de order_by
+        for field_path, _ in self._orders:
+            if field_path != DOCUMENT_ID:
+                clauses.append(f"{_type_sql(field_path)} IS NOT NULL")
+
+        last_direction = self._orders[-1][1] if self._orders else 'ASCENDING'
+        keys = [('id' if field_path == DOCUMENT_ID else field_sql(field_path), direction)
+                for field_path, direction in self._orders]
+        keys.append(('id', last_direction))
+
+        if self._cursor is not None:
+            cursor_key = self._cursor_key()
+            alternatives = []
+            for position, value in enumerate(cursor_key):
+                terms = []
+                for (column, _), previous in zip(keys[:position], cursor_key[:position]):
+                    terms.append(f"{column} IS ?")
+                    params.append(_param(previous))
+                column, direction = keys[position]
+                if value is None:
+                    # null es el valor más bajo: después de él en ascendente va todo lo no nulo
+                    terms.append(f"{column} IS NOT NULL" if direction != DESCENDING else "0")
+                else:
+                    terms.append(f"{column} {'<' if direction == DESCENDING else '>'} ?")
+                    params.append(_param(value))
+                alternatives.append('(' + ' AND '.join(terms) + ')')
+            clauses.append('(' + ' OR '.join(alternatives) + ')')
+
+        order = ', '.join(f"{column} {'DESC' if direction == DESCENDING else 'ASC'}" for column, direction in keys)
+        sql = f"SELECT {columns} FROM documents WHERE {' AND '.join(clauses)} ORDER BY {order}"
+        if self._limit is not None:
+            sql += " LIMIT ?"
+            params.append(self._limit)
+        return sql, params
+
+    def _run(self, count_reads=True):
+        sql, params = self._sql('id, data')
+        rows = self._client._execute(sql, params)
+        snapshots = [
+            MemoryDocumentSnapshot(MemoryDocumentReference(self._client, self._collection_path, doc_id), loads(data))
+            for doc_id, data in rows
+        ]
+        if count_reads:
+            self._client._record('queries', 1)
+            self._client._record('reads', max(1, len(snapshots)))
+        return snapshots
+
+    def _count(self):
+        sql, params = self._sql('id')
+        return self._client._execute(f"SELECT COUNT(*) FROM ({sql})", params)[0][0]
+
+    def _sum(self, field_path):
+        sql, params = self._sql(f"{field_sql(field_path)} AS value, {_type_sql(field_path)} AS kind")
+        query = f"SELECT COALESCE(SUM(value), 0) FROM ({sql}) WHERE kind IN ('integer', 'real')"
+        return self._client._execute(query, params)[0][0]
+
+
+class SQLiteCollectionReference(SQLiteQuery, MemoryCollectionReference):
+    """Colección de SQLiteFirestore (también actúa como consulta sin filtros)"""
+
+    def list_documents(self):
+        rows = self._client._execute("SELECT id FROM documents WHERE collection = ?", [self._collection_path])
+        return [self.document(doc_id) for doc_id, in rows]
+
+
+class SQLiteFirestore(MemoryFirestore):
+    """Cliente con la API de Firestore sobre un fichero SQLite (o ':memory:')"""
+
+    def __init__(self, path=':memory:', indexes_file=INDEXES_FILE):
+        super().__init__()
+        self.path = path
+        self._in_transaction = False
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " collection TEXT NOT NULL,"
+            " id TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (collection, id)"
+            ") WITHOUT ROWID"
+        )
+        for name, collection, fields in self.index_definitions(indexes_file):
+            self.create_index(name, collection, fields)
+        self._seed_statistics()
+
+    @staticmethod
+    def index_definitions(indexes_file=INDEXES_FILE):
+        """(nombre, colección, [(campo, dirección)]) de los índices a crear"""
+        definitions = []
+        if indexes_file and os.path.exists(indexes_file):
+            with open(indexes_file, encoding='utf-8') as f:
+                for index in json.load(f).get('indexes', []):
+                    fields = [(field['fieldPath'], field.get('order', 'ASCENDING')) for field in index['fields']]
+                    name = '_'.join([index['collectionGroup']] + [field for field, _ in fields])
+                    definitions.append((name, index['collectionGroup'], fields))
+        for collection, fields in SINGLE_FIELD_INDEXES.items():
+            for field in fields:
+                definitions.append((f"{collection}_{field}", collection, [(field, 'ASCENDING')]))
+        return definitions
+
+    def create_index(self, name, collection, fields):
+        """Índice de expresión (collection, campos...) para las consultas sobre `collection`"""
+        columns = [f"{field_sql(field)} {'DESC' if direction == DESCENDING else 'ASC'}" for field, direction in fields]
+        # El id desempata en la misma dirección que el último campo, como en las consultas
+        columns.append(f"id {'DESC' if fields[-1][1] == DESCENDING else 'ASC'}")
+        columns = ', '.join(columns)
+        with self._lock:
+            self._connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{name} ON documents (collection, {columns})")
+
+    def _seed_statistics(self):
+        """Estadísticas iniciales para el planificador si nunca se ejecutó ANALYZE.
+
+        Sin estadísticas SQLite prefiere recorrer la clave primaria de la
+        colección en lugar de los índices de campo; se declaran ~10 filas por
+        valor de campo hasta que analyze() mida las reales.
+        """
+        with self._lock:
+            connection = self._connection
+            connection.execute("ANALYZE sqlite_schema")
+            indexes = [row[0] for row in connection.execute("SELECT name FROM pragma_index_list('documents')")]
+            known = {row[0] for row in connection.execute("SELECT idx FROM sqlite_stat1").fetchall()}
+            missing = [name for name in indexes if name not in known]
+            if not missing:
+                return
+            for name in missing:
+                columns = connection.execute(f"SELECT COUNT(*) FROM pragma_index_info('{name}')").fetchone()[0]
+                # collection, campos..., id (la clave primaria es solo collection, id)
+                stat = ' '.join(['1000000', '100000'] + ['10'] * max(0, columns - 2) + ['1'])
+                connection.execute("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES ('documents', ?, ?)", (name, stat))
+            connection.execute("ANALYZE sqlite_schema")
+
+    def analyze(self):
+        """Recalcula las estadísticas del planificador (tras una carga masiva)"""
+        with self._lock:
+            self._connection.execute("ANALYZE")
+
+    def _collection_reference(self, collection_path):
+        return SQLiteCollectionReference(self, collection_path)
+
+    def _query(self, collection_path, **params):
+        return SQLiteQuery(self, collection_path, **params)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def _load(self, collection_path, document_id):
+        rows = self._connection.execute(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?", (collection_path, document_id)
+        ).fetchall()
+        return loads(rows[0][0]) if rows else None
+
+    def _get(self, reference):
+        with self._lock:
+            data = self._load(reference._collection_path, reference.id)
+        self._record('reads', 1)
+        return MemoryDocumentSnapshot(reference, data)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        references = list(references)
+        found = {}
+        with self._lock:
+            for collection_path in {reference._collection_path for reference in references}:
+                ids = [reference.id for reference in references if reference._collection_path == collection_path]
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    rows = self._connection.execute(
+                        f"SELECT id, data FROM documents WHERE collection = ? AND id IN ({', '.join('?' for _ in chunk)})",
+                        [collection_path, *chunk]
+                    ).fetchall()
+                    found.update({(collection_path, doc_id): data for doc_id, data in rows})
+        self._record('reads', len(references))
+        for reference in references:
+            data = found.get((reference._collection_path, reference.id))
+            yield MemoryDocumentSnapshot(reference, loads(data) if data is not None else None)
+
+    def collections(self):
+        rows = self._execute("SELECT DISTINCT collection FROM documents WHERE instr(collection, '/') = 0")
+        return [self.collection(name) for name, in rows]
+
+    def _commit(self, operations):
+        """Aplica una lista de escrituras en una transacción; si alguna falla no se aplica ninguna"""
+        with self._lock:
+            if self._in_transaction:
+                # Dentro de run_transaction(): BEGIN y COMMIT los pone ella
+                self._apply(operations)
+                return
+            connection = self._connection
+            # El bloqueo de escritura se toma antes de leer: otro proceso con el
+            # mismo fichero no puede cambiar los documentos entre la lectura
+            # (Increment, create) y la escritura
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._apply(operations)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+    def _apply(self, operations):
+        staged = stage_operations(operations, self._load)
+        deletes = [key for key, data in staged.items() if data is None]
+        upserts = [(*key, dumps(data)) for key, data in staged.items() if data is not None]
+        if deletes:
+            self._connection.executemany("DELETE FROM documents WHERE collection = ? AND id = ?", deletes)
+        if upserts:
+            self._connection.executemany("INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+                                         upserts)
+        self.stats['writes'] += len(operations)
+        self.stats['commits'] += 1
+
+    def run_transaction(self, function):
+        """Como en memoria, pero con el fichero bloqueado desde la primera lectura (BEGIN IMMEDIATE)"""
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._in_transaction = True
+            try:
+                result = super().run_transaction(function)
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            finally:
+                self._in_transaction = False
+        return result
+
+    def explain(self, query):
+        """Plan de SQLite de una consulta (para comprobar que usa un índice)"""
+        sql, params = query._sql('id, data')
+        return [row[-1] for row in self._execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
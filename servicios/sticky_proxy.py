@@ -0,0 +1,153 @@
+"""Proxy inverso con afinidad de sesión para varios procesos de Streamlit.
+
+Una petición sin la cookie COOKIE_NAME recibe una redirección 307 a la
+misma URL que la asigna, antes de elegir proceso: así la cookie está
+decidida una sola vez por navegador aunque abra varias conexiones a la vez,
+y todas (HTTP y el websocket /_stcore/stream) van al mismo proceso, elegido
+por rendezvous hashing entre los que responden. Si un proceso cae, solo se
+reparten sus navegadores y, cuando vuelve, los recupera. El estado que debe
+sobrevivir al cambio de proceso está en servicios/session_store.py.
+
+No se redirigen los websockets (no siguen redirecciones) ni las
+comprobaciones de salud; sin cookie van a un proceso cualquiera.
+
+Solo se lee la cabecera de la primera petición de cada conexión; el resto
+(keep-alive, websocket) se copia tal cual en los dos sentidos.
+"""
+import asyncio
+import hashlib
+import secrets
+import time
+
+from servicios.session_store import COOKIE_NAME
+
+# Segundos que un proceso que rechazó la conexión queda fuera del reparto
+RETRY_AFTER = 5
+
+# Tamaño máximo de la cabecera HTTP que se lee
+MAX_HEADER = 64 * 1024
+
+COPY_CHUNK = 64 * 1024
+
+# Rutas que nunca se redirigen para asignar la cookie
+NO_REDIRECT_PATHS = ('/_stcore/health',)
+
+
+def session_cookie(head):
+    """Valor de la cookie de sesión en la cabecera de una petición (None si no viene)"""
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        if name.strip().lower() != b'cookie':
+            continue
+        for cookie in value.decode('latin-1').split(';'):
+            key, _, cookie_value = cookie.strip().partition('=')
+            if key == COOKIE_NAME and cookie_value:
+                return cookie_value
+    return None
+
+
+def request_target(head):
+    """Método y ruta (con la consulta) de la primera línea de la petición"""
+    method, _, rest = head.split(b'\r\n', 1)[0].decode('latin-1').partition(' ')
+    return method, rest.rpartition(' ')[0] or '/'
+
+
+def is_upgrade(head):
+    """La petición pide cambiar de protocolo (websocket)"""
+    return any(line.partition(b':')[0].strip().lower() == b'upgrade' for line in head.split(b'\r\n')[1:])
+
+
+def cookie_redirect(path, session_id):
+    """Respuesta 307 que asigna la cookie de sesión y vuelve a pedir `path`"""
+    return (f"HTTP/1.1 307 Temporary Redirect\r\n"
+            f"Location: {path}\r\n"
+            f"Set-Cookie: {COOKIE_NAME}={session_id}; Path=/; HttpOnly; SameSite=Lax\r\n"
+            f"Cache-Control: no-store\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: close\r\n\r\n").encode('latin-1')
+
+
+class StickyProxy:
+    """Reparte navegadores entre `backends` [(host, puerto)] manteniendo cada uno en su proceso"""
+
+    def __init__(self, backends, retry_after=RETRY_AFTER):
+        self.backends = list(backends)
+        self.retry_after = retry_after
+        self._down_until = {}
+        self.stats = {'connections': 0, 'new_sessions': 0, 'failovers': 0}
+
+    def candidates(self, session_id):
+        """Procesos en orden de preferencia para esta sesión (los caídos al final)"""
+        def weight(backend):
+            key = f"{session_id}|{backend[0]}:{backend[1]}".encode()
+            return hashlib.blake2b(key, digest_size=8).digest()
+
+        now = time.monotonic()
+        ranked = sorted(self.backends, key=weight, reverse=True)
+        return ([backend for backend in ranked if self._down_until.get(backend, 0) <= now]
+                + [backend for backend in ranked if self._down_until.get(backend, 0) > now])
+
+    async def _connect(self, session_id):
+        for position, backend in enumerate(self.candidates(session_id)):
+            try:
+                reader, writer = await asyncio.open_connection(*backend)
+            except OSError:
+                self._down_until[backend] = time.monotonic() + self.retry_after
+                continue
+            self._down_until.pop(backend, None)
+            if position:
+                self.stats['failovers'] += 1
+            return reader, writer
+        return None
+
+    async def handle(self, client_reader, client_writer):
+        self.stats['connections'] += 1
+        try:
+            head = await client_reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+
+        session_id = session_cookie(head)
+        if session_id is None:
+            session_id = secrets.token_urlsafe(16)
+            path = request_target(head)[1]
+            if not is_upgrade(head) and path.split('?')[0] not in NO_REDIRECT_PATHS:
+                # La cookie se asigna antes de elegir proceso: el navegador repite la petición con ella
+                self.stats['new_sessions'] += 1
+                client_writer.write(cookie_redirect(path, session_id))
+                await client_writer.drain()
+                client_writer.close()
+                return
+
+        backend = await self._connect(session_id)
+        if backend is None:
+            client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await client_writer.drain()
+            client_writer.close()
+            return
+
+        backend_reader, backend_writer = backend
+        backend_writer.write(head)
+        await asyncio.gather(
+            self._pipe(client_reader, backend_writer),
+            self._pipe(backend_reader, client_writer),
+            return_exceptions=True
+        )
+
+    @staticmethod
+    async def _pipe(reader, writer):
+        try:
+            while True:
+                data = await reader.read(COPY_CHUNK)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host='0.0.0.0', port=8501):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER)
+        async with server:
+            await server.serve_forever()
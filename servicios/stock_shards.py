@@ -0,0 +1,219 @@
+"""Stock repartido en varios documentos para los productos más vendidos.
+
+Firestore admite del orden de una escritura sostenida por segundo en cada
+documento, así que en el lanzamiento de un producto todos los checkouts
+compiten por products/{id}. Un producto caliente tiene además N shards en
+products/{id}/stock_shards/{0..N-1} y cada escritura de stock o de unidades
+retenidas va a un shard al azar (Increment).
+
+El stock de un producto con shards es siempre el del documento más la suma
+de sus shards (una agregación sum() cacheada unos segundos), de modo que
+cambiar de modo no cambia el total y no pierde las escrituras en vuelo:
+
+* promote(): reparte el stock del documento entre los shards y marca el
+  producto (un lote).
+* decrement(): descuenta en una transacción sobre un shard con unidades y
+  solo pasa a otro cuando ese se agota.
+* demote(): vuelve a escribir en el documento y, en una transacción que lee
+  todos los shards, los suma al documento y los borra.
+"""
+import random
+import threading
+import time
+
+from servicios.firebase import firestore_sdk, run_transaction
+
+SHARDS_COLLECTION = 'stock_shards'
+
+# Shards por defecto de un producto caliente (~N escrituras por segundo)
+DEFAULT_SHARDS = 10
+
+# Segundos que se reutiliza la suma de los shards
+DEFAULT_TTL = 5
+
+# Segundos que espera demote() a las escrituras que aún iban a los shards
+# (solo evita reintentos: la transacción es la que no pierde unidades)
+DEMOTE_GRACE = 2
+
+# Campos que se reparten entre los shards
+SHARDED_FIELDS = ('stock', 'reserved')
+
+# Caché: (id(db), id del producto) -> (db, expira_en, totales)
+_cache = {}
+_lock = threading.Lock()
+
+
+def is_sharded(product):
+    """El producto tiene shards que cuentan en su stock"""
+    return product.get('stock_shards', 0) > 0
+
+
+def shard_collection(db, product_id):
+    return db.collection('products').document(product_id).collection(SHARDS_COLLECTION)
+
+
+def shard_totals(db, product_id, ttl=DEFAULT_TTL):
+    """Suma de stock y reserved de los shards (una agregación; ttl=0 la lee siempre)"""
+    key = (id(db), product_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(key)
+        if ttl and entry and entry[0] is db and entry[1] > now:
+            return dict(entry[2])
+
+    query = shard_collection(db, product_id)
+    result = query.sum('stock', alias='stock').sum('reserved', alias='reserved').get()
+    totals = {aggregate.alias: aggregate.value for aggregate in result[0]}
+    with _lock:
+        _cache[key] = (db, now + DEFAULT_TTL, totals)
+    return dict(totals)
+
+
+def with_sharded_stock(db, product_id, product, ttl=DEFAULT_TTL):
+    """Copia del producto con stock y reserved totales (documento + shards)"""
+    if not is_sharded(product):
+        return product
+    totals = shard_totals(db, product_id, ttl=ttl)
+    return {**product, **{field: product.get(field, 0) + totals.get(field, 0) for field in SHARDED_FIELDS}}
+
+
+def write_target(db, reference, product):
+    """Documento al que deben ir los Increment de stock/reserved de este producto"""
+    if product.get('shard_writes'):
+        return shard_collection(db, reference.id).document(str(random.randrange(product['stock_shards'])))
+    return reference
+
+
+def _take(db, reference, quantity):
+    """Descuenta hasta `quantity` unidades del stock positivo de un documento (transacción); devuelve cuántas"""
+    def take(transaction):
+        snapshot = reference.get(transaction=transaction)
+        taken = min(quantity, max(0, (snapshot.to_dict() or {}).get('stock', 0))) if snapshot.exists else 0
+        if taken:
+            transaction.update(reference, {'stock': firestore_sdk().Increment(-taken)})
+        return taken
+    return run_transaction(db, take)
+
+
+def _take_available(db, reference, product, quantity):
+    """Toma hasta `quantity` unidades de los shards (empezando por uno al azar) y del documento.
+
+    Devuelve ([(documento, unidades)], unidades que faltaron).
+    """
+    shards = [shard_collection(db, reference.id).document(str(index)) for index in range(product['stock_shards'])]
+    start = random.randrange(len(shards))
+    taken = []
+    remaining = quantity
+    for target in shards[start:] + shards[:start] + [reference]:
+        if not remaining:
+            break
+        units = _take(db, target, remaining)
+        if units:
+            taken.append((target, units))
+            remaining -= units
+    forget(reference.id)
+    return taken, remaining
+
+
+def decrement(db, reference, product, quantity):
+    """Descuenta `quantity` de un producto con shards; devuelve (antes, después) o lanza InsufficientStock.
+
+    Cada shard se descuenta en su propia transacción, que solo toma las
+    unidades que tiene: se empieza por un shard al azar y se pasa al
+    siguiente (y al final al documento) solo cuando se agota. Si el total no
+    alcanza se devuelven las unidades tomadas.
+    """
+    from servicios.reservations import InsufficientStock
+
+    taken, remaining = _take_available(db, reference, product, quantity)
+
+    # Las ventas de retenciones pueden dejar shards en negativo: el total manda
+    after = with_sharded_stock(db, reference.id, reference.get().to_dict() or {}, ttl=0).get('stock', 0)
+    if remaining or after < 0:
+        batch = db.batch()
+        for target, units in taken:
+            batch.update(target, {'stock': firestore_sdk().Increment(units)})
+        batch.commit()
+        forget(reference.id)
+        available = after + quantity - remaining
+        raise InsufficientStock([{'name': product.get('name', reference.id), 'requested': quantity,
+                                  'available': max(0, available)}])
+    return after + quantity, after
+
+
+def decrement_available(db, reference, product, quantity):
+    """Descuenta las unidades que haya (hasta `quantity`); devuelve (antes, después, faltantes)"""
+    taken, remaining = _take_available(db, reference, product, quantity)
+    after = with_sharded_stock(db, reference.id, reference.get().to_dict() or {}, ttl=0).get('stock', 0)
+    return after + quantity - remaining, after, remaining
+
+
+def forget(product_id=None):
+    """Descarta las sumas cacheadas (de un producto o de todos)"""
+    with _lock:
+        if product_id is None:
+            _cache.clear()
+        else:
+            for key in [key for key in _cache if key[1] == product_id]:
+                del _cache[key]
+
+
+def promote(db, product_id, shards=DEFAULT_SHARDS):
+    """Reparte las escrituras de stock del producto entre `shards` documentos"""
+    product_ref = db.collection('products').document(product_id)
+    doc = product_ref.get()
+    if not doc.exists:
+        raise ValueError(f"No existe el producto {product_id}")
+    if is_sharded(doc.to_dict()):
+        raise ValueError("El producto ya tiene shards")
+    if not 1 < shards <= 500:
+        raise ValueError("El número de shards debe estar entre 2 y 500")
+
+    # El stock del documento se reparte entre los shards (el total no cambia)
+    stock = max(0, doc.to_dict().get('stock', 0))
+    batch = db.batch()
+    for index in range(shards):
+        share = stock // shards + (index < stock % shards)
+        batch.set(shard_collection(db, product_id).document(str(index)), {'stock': share, 'reserved': 0})
+    batch.update(product_ref, {'stock_shards': shards, 'shard_writes': True,
+                               'stock': firestore_sdk().Increment(-stock)})
+    batch.commit()
+    forget(product_id)
+
+
+def demote(db, product_id, grace=DEMOTE_GRACE):
+    """Vuelve a guardar todo el stock del producto en su documento"""
+    product_ref = db.collection('products').document(product_id)
+    doc = product_ref.get()
+    if not doc.exists or not is_sharded(doc.to_dict()):
+        raise ValueError("El producto no tiene shards")
+
+    # 1. Las escrituras nuevas van al documento
+    product_ref.update({'shard_writes': False})
+    time.sleep(grace)
+
+    # 2. Leer los shards y sumarlos al documento en una transacción: un
+    #    descuento en vuelo sobre un shard entra en conflicto con ella, y una
+    #    liquidación que llegue después a un shard borrado falla con NotFound
+    #    y vuelve al documento
+    def fold(transaction):
+        product = product_ref.get(transaction=transaction).to_dict() or {}
+        if not is_sharded(product):
+            raise ValueError("El producto no tiene shards")
+        references = [shard_collection(db, product_id).document(str(index))
+                      for index in range(product['stock_shards'])]
+        shards = [reference.get(transaction=transaction) for reference in references]
+        totals = {field: sum((shard.to_dict() or {}).get(field, 0) for shard in shards if shard.exists)
+                  for field in SHARDED_FIELDS}
+        for shard in shards:
+            if shard.exists:
+                transaction.delete(shard.reference)
+        firestore = firestore_sdk()
+        transaction.update(product_ref, {
+            **{field: firestore.Increment(value) for field, value in totals.items()},
+            'stock_shards': firestore.DELETE_FIELD,
+            'shard_writes': firestore.DELETE_FIELD
+        })
+
+    run_transaction(db, fold)
+    forget(product_id)
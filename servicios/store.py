@@ -0,0 +1,387 @@
+"""Capa de acceso a datos de la tienda con motores intercambiables.
+
+Las páginas no llaman a db.collection(...) directamente: usan get_store(),
+que envuelve el cliente compartido del proceso. Los tres motores exponen la
+API de Firestore que usan Store y los servicios (rollups, consultas de
+órdenes, conteos), así que se eligen con STORAGE_BACKEND sin tocar código:
+
+* firestore (por defecto): producción; con FIRESTORE_EMULATOR_HOST, el emulador.
+* sqlite: un solo nodo y benchmarks locales (SQLITE_PATH, por defecto data/tienda.db).
+* memory: pruebas; los datos viven solo mientras dure el proceso.
+"""
+import os
+from datetime import datetime
+
+from servicios import catalog_maintenance, reservations, stock_shards
+from servicios.cart_validation import validate_cart
+from servicios.catalog import current_version, get_catalog, get_catalog_with_stamp, load_products, seed_sample_products
+from servicios.checkout_sessions import complete_checkout_session, get_checkout_session, save_checkout_session
+from servicios.collection_stats import get_collection_stats
+from servicios.currency import BASE_CURRENCY, get_rates, get_rates_with_stamp, set_rates
+from servicios.firebase import firestore_sdk, run_transaction
+from servicios.order_queries import latest_orders, user_orders
+from servicios.preferences import COLLECTION as PREFERENCES_COLLECTION
+from servicios.preferences import record_purchase
+from servicios.sales_rollups import get_daily_rollups, get_top_products, record_order
+
+BACKENDS = ('firestore', 'sqlite', 'memory')
+
+DEFAULT_SQLITE_PATH = os.path.join('data', 'tienda.db')
+
+# Valores admitidos por un filtro 'in' de Firestore
+MAX_IN_VALUES = 30
+
+# Unidades vendidas sin stock tras un pago, pendientes de revisión
+BACKORDERS_COLLECTION = 'backorders'
+
+
+def storage_backend():
+    """Motor configurado en STORAGE_BACKEND"""
+    backend = os.environ.get('STORAGE_BACKEND', 'firestore').lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND debe ser uno de {', '.join(BACKENDS)}: {backend}")
+    return backend
+
+
+def open_backend(backend=None):
+    """Crea el cliente del motor indicado (o el de STORAGE_BACKEND)"""
+    backend = backend or storage_backend()
+    if backend == 'sqlite':
+        from servicios.sqlite_firestore import SQLiteFirestore
+        return SQLiteFirestore(os.environ.get('SQLITE_PATH', DEFAULT_SQLITE_PATH))
+    if backend == 'memory':
+        from servicios.memory_firestore import MemoryFirestore
+        return MemoryFirestore()
+    from servicios.firebase import get_firestore_client
+    return get_firestore_client()
+
+
+def cart_document(user_id, items, when=None):
+    """Documento de 'carts' con las líneas en el formato guardado"""
+    when = when or datetime.now()
+    return {
+        'user_id': user_id,
+        'items': [{
+            'name': item['name'],
+            'price': item['price'],
+            'quantity': item['quantity'],
+            'image': item.get('image', ''),
+            'product_id': item.get('product_id', item['name']),
+            'category': item.get('category', ''),
+            'discount': item.get('discount', 0),
+            'added_at': when
+        } for item in items],
+        'updated_at': when
+    }
+
+
+class Store:
+    """Operaciones de productos, carritos, órdenes, usuarios y preferencias"""
+
+    def __init__(self, db):
+        self.db = db
+
+    # ---------- Productos ----------
+
+    def catalog(self):
+        """Catálogo completo desde la caché compartida del proceso"""
+        return get_catalog(self.db)
+
+    def catalog_with_stamp(self):
+        """(catálogo, marca de precios de esa carga): la marca solo cambia al publicar o ajustar precios"""
+        return get_catalog_with_stamp(self.db)
+
+    def list_products(self):
+        return load_products(self.db)
+
+    def seed_sample_products(self):
+        return seed_sample_products(self.db)
+
+    def catalog_status(self):
+        return catalog_maintenance.catalog_status(self.db)
+
+    def truncate_catalog(self, progress=None):
+        """Borra todos los productos en lotes; devuelve el resumen de escrituras"""
+        return catalog_maintenance.truncate_catalog(self.db, progress=progress)
+
+    def publish_catalog(self, products, progress=None):
+        """Publica `products` como una versión nueva del catálogo (cambio atómico)"""
+        return catalog_maintenance.publish_catalog(self.db, products, progress=progress)
+
+    def reseed_catalog(self, progress=None):
+        return catalog_maintenance.reseed_catalog(self.db, progress=progress)
+
+    def adjust_prices(self, percent, category=None, progress=None):
+        return catalog_maintenance.adjust_prices(self.db, percent, category, progress=progress)
+
+    def set_stock(self, stock=None, delta=None, category=None, progress=None):
+        return catalog_maintenance.set_stock(self.db, stock, delta, category, progress=progress)
+
+    def promote_product(self, product_id, shards=stock_shards.DEFAULT_SHARDS):
+        """Reparte el stock del producto en `shards` documentos (producto caliente)"""
+        stock_shards.promote(self.db, product_id, shards)
+
+    def demote_product(self, product_id):
+        stock_shards.demote(self.db, product_id)
+
+    def fx_rates(self):
+        """Tipos de cambio desde la caché del proceso"""
+        return get_rates(self.db)
+
+    def fx_rates_with_stamp(self):
+        """(tipos de cambio, fecha de la tabla) desde la caché del proceso"""
+        return get_rates_with_stamp(self.db)
+
+    def set_fx_rates(self, rates, source='manual'):
+        """Guarda los tipos de cambio; el catálogo recalcula sus columnas de precios"""
+        return set_rates(self.db, rates, source)
+
+    def categories_by_name(self, names):
+        """Categoría de cada producto por nombre (consultas 'in' de hasta 30 nombres)"""
+        names = list(names)
+        categories = {}
+        for start in range(0, len(names), MAX_IN_VALUES):
+            query = self.db.collection('products').where('name', 'in', names[start:start + MAX_IN_VALUES])
+            for doc in query.stream():
+                product = doc.to_dict()
+                categories[product['name']] = product.get('category', 'general')
+        return categories
+
+    def decrement_stock(self, name, quantity, order_number=None):
+        """Descuenta tras un pago `quantity` del stock del producto publicado con ese nombre.
+
+        El pago ya está cobrado: si no hay unidades suficientes el stock queda
+        en 0 y lo que falta se registra como pedido pendiente (BACKORDERS) para
+        revisarlo. Devuelve [(antes, después, pendientes)].
+        """
+        query = self.db.collection('products').where('name', '==', name)
+        version = current_version(self.db)
+        if version:
+            query = query.where('catalog_version', '==', version)
+
+        changes = []
+        for doc in query.stream():
+            product = doc.to_dict()
+            # Sin puntero, los productos con versión son de una publicación a medio terminar
+            if not version and 'catalog_version' in product:
+                continue
+            if stock_shards.is_sharded(product):
+                # Producto caliente: transacciones sobre sus shards, sin tocar su documento
+                change = stock_shards.decrement_available(self.db, doc.reference, product, quantity)
+            else:
+                change = run_transaction(self.db, lambda transaction, reference=doc.reference:
+                                         self._decrement_document(transaction, reference, quantity))
+            if change[2]:
+                self._record_backorder(doc.reference, name, change[2], order_number)
+            changes.append(change)
+        return changes
+
+    @staticmethod
+    def _decrement_document(transaction, reference, quantity):
+        """Descuenta dentro de una transacción las unidades que haya (sin bajar de 0)"""
+        snapshot = reference.get(transaction=transaction)
+        current_stock = (snapshot.to_dict() or {}).get('stock', 0)
+        taken = min(quantity, max(0, current_stock))
+        transaction.update(reference, {
+            'stock': firestore_sdk().Increment(-taken),
+            'last_updated': datetime.now()
+        })
+        return current_stock, current_stock - taken, quantity - taken
+
+    def _record_backorder(self, reference, name, quantity, order_number=None):
+        """Marca el producto y guarda el pedido pendiente en el mismo lote"""
+        batch = self.db.batch()
+        batch.update(reference, {'backordered': firestore_sdk().Increment(quantity)})
+        batch.set(self.db.collection(BACKORDERS_COLLECTION).document(), {
+            'product_id': reference.id,
+            'name': name,
+            'quantity': quantity,
+            'order_number': order_number,
+            'status': 'pending',
+            'created_at': datetime.now()
+        })
+        batch.commit()
+
+    def pending_backorders(self):
+        """Pedidos pendientes por falta de stock tras un pago"""
+        query = self.db.collection(BACKORDERS_COLLECTION).where('status', '==', 'pending')
+        return [{'id': doc.id, **doc.to_dict()} for doc in query.stream()]
+
+    # ---------- Carritos ----------
+
+    def _cart_ref(self, user_id):
+        return self.db.collection('carts').document(user_id)
+
+    def get_cart(self, user_id):
+        """Documento del carrito del usuario o None"""
+        doc = self._cart_ref(user_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def save_cart(self, user_id, items):
+        """Guarda las líneas del carrito (crea el documento si no existe)"""
+        self._cart_ref(user_id).set(cart_document(user_id, items), merge=True)
+
+    def replace_cart_items(self, user_id, items):
+        """Reescribe las líneas de un carrito que ya existe"""
+        document = cart_document(user_id, items)
+        self._cart_ref(user_id).update({'items': document['items'], 'updated_at': document['updated_at']})
+
+    def add_cart_product(self, user_id, product_id):
+        """Suma una unidad de `product_id` al carrito guardado (formato por id de producto)"""
+        cart_ref = self._cart_ref(user_id)
+        cart_doc = cart_ref.get()
+        if cart_doc.exists:
+            items = cart_doc.to_dict().get('items', [])
+            existing = next((item for item in items if item.get('product_id') == product_id), None)
+            if existing:
+                existing['quantity'] += 1
+            else:
+                items.append({'product_id': product_id, 'quantity': 1, 'added_at': datetime.now()})
+            cart_ref.update({'items': items})
+        else:
+            cart_ref.set({
+                'user_id': user_id,
+                'items': [{'product_id': product_id, 'quantity': 1, 'added_at': datetime.now()}],
+                'created_at': datetime.now()
+            })
+
+    def empty_cart(self, user_id):
+        """Deja el carrito sin líneas; devuelve False si no existía"""
+        cart_ref = self._cart_ref(user_id)
+        if not cart_ref.get().exists:
+            return False
+        cart_ref.update({
+            'items': [],
+            'updated_at': datetime.now(),
+            'cleared_at': datetime.now()
+        })
+        return True
+
+    def validate_cart(self, items):
+        """Compara las líneas con los productos actuales (un solo get_all) y las ajusta"""
+        return validate_cart(self.db, items)
+
+    def delete_cart(self, user_id, only_if_exists=False):
+        """Borra el documento del carrito; con only_if_exists devuelve si existía"""
+        cart_ref = self._cart_ref(user_id)
+        if only_if_exists and not cart_ref.get().exists:
+            return False
+        cart_ref.delete()
+        return True
+
+    # ---------- Usuarios ----------
+
+    def get_user(self, uid):
+        doc = self.db.collection('usuarios').document(uid).get()
+        return doc.to_dict() if doc.exists else None
+
+    def create_user(self, uid, data):
+        self.db.collection('usuarios').document(uid).set(data)
+
+    def touch_login(self, uid, when=None):
+        self.db.collection('usuarios').document(uid).update({'last_login': when or datetime.now()})
+
+    # ---------- Órdenes ----------
+
+    def record_order(self, order_data):
+        """Guarda la orden junto con los rollups de ventas (una escritura atómica)"""
+        return record_order(self.db, order_data)
+
+    def add_order(self, order_data):
+        """Guarda una orden suelta, sin rollups (datos de prueba)"""
+        _, order_ref = self.db.collection('orders').add(order_data)
+        return order_ref
+
+    def find_order(self, order_number):
+        """Primera orden con ese número o None"""
+        query = self.db.collection('orders').where('order_number', '==', order_number).limit(1)
+        for doc in query.stream():
+            return dict(doc.to_dict(), id=doc.id)
+        return None
+
+    def user_orders(self, user_id, limit, cursor=None):
+        return user_orders(self.db, user_id, limit=limit, cursor=cursor)
+
+    def latest_orders(self, limit=5, status=None):
+        return latest_orders(self.db, limit=limit, status=status)
+
+    def daily_sales(self, days=30):
+        """Rollups de ventas de los últimos `days` días"""
+        return get_daily_rollups(self.db, days=days)
+
+    def top_products(self, limit=10):
+        return get_top_products(self.db, limit=limit)
+
+    # ---------- Sesiones de pago ----------
+
+    def save_checkout_session(self, session_id, usuario, cart_items, reservation=None, currency=BASE_CURRENCY):
+        return save_checkout_session(self.db, session_id, usuario, cart_items, reservation=reservation,
+                                     currency=currency)
+
+    def get_checkout_session(self, session_id):
+        return get_checkout_session(self.db, session_id)
+
+    def complete_checkout_session(self, session_id, order_number=None):
+        return complete_checkout_session(self.db, session_id, order_number)
+
+    # ---------- Retenciones de stock ----------
+
+    def reserve_stock(self, items, user_id):
+        """Retiene las unidades del carrito durante el pago; lanza InsufficientStock si no hay"""
+        return reservations.reserve(self.db, items, user_id)
+
+    def convert_reservation(self, reservation_id):
+        return reservations.convert_reservation(self.db, reservation_id)
+
+    def release_reservation(self, reservation_id):
+        return reservations.release_reservation(self.db, reservation_id)
+
+    # ---------- Preferencias ----------
+
+    def get_preferences(self, user_id):
+        doc = self.db.collection(PREFERENCES_COLLECTION).document(user_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def record_purchase(self, user_id, items):
+        record_purchase(self.db, user_id, items)
+
+    # ---------- Diagnóstico ----------
+
+    def collection_stats(self, collections, status_breakdown=False):
+        return get_collection_stats(self.db, collections, status_breakdown=status_breakdown)
+
+    def ping(self):
+        """Escribe, lee y borra un documento de prueba; True si el motor responde"""
+        test_doc = self.db.collection('test').document('connection_test')
+        test_doc.set({'timestamp': datetime.now(), 'status': 'connected'})
+        if not test_doc.get().exists:
+            return False
+        test_doc.delete()
+        return True
+
+    def check_permissions(self):
+        """Crea, lee, actualiza y borra un documento; devuelve cada operación que funciona"""
+        test_ref = self.db.collection('test_permissions')
+        _, doc_ref = test_ref.add({'test': 'create', 'timestamp': datetime.now()})
+        yield 'CREATE'
+        if not doc_ref.get().exists:
+            return
+        yield 'READ'
+        doc_ref.update({'test': 'update'})
+        yield 'UPDATE'
+        doc_ref.delete()
+        yield 'DELETE'
+
+
+_stores = {}
+
+
+def get_store():
+    """Store sobre el cliente compartido del proceso (el que inicializa warm_up)"""
+    from servicios.warmup import get_db
+    db = get_db()
+    store = _stores.get(id(db))
+    if store is None or store.db is not db:
+        _stores.clear()
+        store = _stores[id(db)] = Store(db)
+    return store
@@ -0,0 +1,308 @@
+"""Datos sintéticos con el formato de la aplicación: catálogo, usuarios, carritos y órdenes.
+
+Todo se genera con una semilla (mismo resultado en cada ejecución) y con
+popularidad sesgada: los productos y los usuarios se eligen con pesos tipo
+Zipf (1 / rango^skew), así que unos pocos productos concentran la mayoría de
+las ventas y unos pocos clientes la mayoría de las órdenes. Los documentos se
+producen como (colección, id, datos) y por bloques, sin tener todo el volumen
+en memoria; los rollups de ventas y las preferencias se acumulan mientras se
+generan las órdenes y se emiten al final. Cada documento lleva generated=True.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from servicios.catalog import SAMPLE_PRODUCTS
+from servicios.preferences import COLLECTION as PREFERENCES_COLLECTION
+from servicios.preferences import decay_weight
+from servicios.sales_rollups import DAILY_COLLECTION, PRODUCT_COLLECTION, product_key
+
+# Órdenes generadas por bloque vectorizado
+ORDER_CHUNK = 10000
+
+# Productos como máximo en el desglose diario (el documento no puede pasar de 1 MiB)
+MAX_DAILY_PRODUCTS = 2000
+
+# Probabilidades de 1..4 líneas por orden y de 1..3 unidades por línea
+LINES_PER_ORDER = [0.5, 0.3, 0.15, 0.05]
+UNITS_PER_LINE = [0.75, 0.2, 0.05]
+
+# Proporción de órdenes pagadas con Stripe (el resto, pago simulado)
+STRIPE_SHARE = 0.7
+
+_NOUNS = {
+    'vestidos': ["Vestido", "Vestido Midi", "Vestido Largo", "Vestido Camisero", "Vestido Cóctel"],
+    'blusas': ["Blusa", "Camisa", "Top", "Blusa Fluida", "Camisola"],
+    'pantalones': ["Pantalón", "Pantalón Palazo", "Jean", "Culotte", "Pantalón Sastre"],
+    'chaquetas': ["Blazer", "Chaqueta", "Trench", "Cazadora", "Abrigo"],
+    'zapatos': ["Zapatos", "Botines", "Sandalias", "Mocasines", "Salones"],
+    'accesorios': ["Bolso", "Cinturón", "Pañuelo", "Cartera", "Collar"]
+}
+_ADJECTIVES = ["Elegante", "Casual", "Clásico", "Urbano", "Minimal", "Vintage", "Bohemio", "Esencial"]
+_MATERIALS = ["Lino", "Seda", "Algodón", "Lana", "Piel", "Satén", "Punto", "Denim"]
+_FIRST_NAMES = ["Ana", "Lucía", "María", "Sofía", "Carmen", "Elena", "Laura", "Paula", "Marta", "Julia",
+                "Carlos", "Javier", "Diego", "Pablo", "Andrés", "Miguel", "Sergio", "Daniel"]
+_LAST_NAMES = ["García", "Martínez", "López", "Sánchez", "Pérez", "Gómez", "Díaz", "Torres", "Ruiz",
+               "Romero", "Navarro", "Castro", "Ortega", "Rubio", "Molina", "Vargas"]
+
+_SAMPLE_BY_CATEGORY = {sample['category']: sample for sample in SAMPLE_PRODUCTS}
+CATEGORIES = list(_SAMPLE_BY_CATEGORY)
+
+
+def product_id(index):
+    return f"gen-p{index:07d}"
+
+
+def user_id(index):
+    return f"gen-u{index:07d}"
+
+
+def popularity_weights(count, skew, rng):
+    """Probabilidades tipo Zipf en un orden aleatorio (el más popular no es siempre el primero)"""
+    ranks = rng.permutation(count) + 1
+    weights = 1.0 / np.power(ranks, skew)
+    return weights / weights.sum()
+
+
+class SyntheticData:
+    """Generador reproducible de un conjunto de datos completo"""
+
+    def __init__(self, products=10000, users=5000, orders=50000, cart_ratio=0.1, days=90,
+                 skew=1.1, seed=0, now=None):
+        self.products = products
+        self.users = users
+        self.orders = orders
+        self.cart_ratio = cart_ratio
+        self.days = days
+        self.skew = skew
+        self.seed = seed
+        self.now = (now or datetime.now()).replace(microsecond=0)
+
+        rng = np.random.default_rng(seed)
+        self.product_weights = popularity_weights(products, skew, rng)
+        self.user_weights = popularity_weights(users, max(skew - 0.3, 0.5), rng)
+        self.product_categories = rng.integers(0, len(CATEGORIES), size=products)
+        # Precio de cada producto alrededor del precio de ejemplo de su categoría
+        base_prices = np.array([_SAMPLE_BY_CATEGORY[c]['price'] for c in CATEGORIES])[self.product_categories]
+        self.product_prices = np.round(base_prices * rng.lognormal(0.0, 0.35, size=products), 2).clip(9.99)
+
+    def product(self, index):
+        """Producto `index` del catálogo (determinista, sin generar el resto)"""
+        category = CATEGORIES[self.product_categories[index]]
+        sample = _SAMPLE_BY_CATEGORY[category]
+        nouns = _NOUNS[category]
+        noun = nouns[index % len(nouns)]
+        adjective = _ADJECTIVES[(index // len(nouns)) % len(_ADJECTIVES)]
+        material = _MATERIALS[(index // (len(nouns) * len(_ADJECTIVES))) % len(_MATERIALS)]
+        return {
+            'name': f"{noun} {adjective} {material} Ref. {index:06d}",
+            'price': float(self.product_prices[index]),
+            'image': sample['image'],
+            'description': f"{noun} {adjective.lower()} de {material.lower()}. {sample['description']}",
+            'category': category,
+            'stock': int((index * 7919) % 200) if index % 20 else 0,
+            'generated': True
+        }
+
+    def user(self, index):
+        """Usuario `index` con el formato de verificar_o_crear_usuario"""
+        uid = user_id(index)
+        first = _FIRST_NAMES[index % len(_FIRST_NAMES)]
+        last = _LAST_NAMES[(index // len(_FIRST_NAMES)) % len(_LAST_NAMES)]
+        created_at = self.now - timedelta(days=365 - (index * 37) % 365, seconds=index % 86400)
+        return {
+            'uid': uid,
+            'email': f"cliente{index:07d}@example.com",
+            'nombre': f"{first} {last}",
+            'foto': f"https://example.com/avatars/{uid}.png",
+            'verified_email': True,
+            'locale': 'es',
+            'created_at': created_at,
+            'last_login': max(created_at, self.now - timedelta(days=index % self.days)),
+            'generated': True
+        }
+
+    def _line(self, index, quantity):
+        product = self.product(index)
+        return {
+            'name': product['name'],
+            'price': product['price'],
+            'quantity': int(quantity),
+            'image': product['image'],
+            'product_id': product_id(index),
+            'category': product['category']
+        }
+
+    def iter_products(self):
+        for index in range(self.products):
+            yield 'products', product_id(index), self.product(index)
+
+    def iter_users(self):
+        for index in range(self.users):
+            yield 'usuarios', user_id(index), self.user(index)
+
+    def iter_carts(self):
+        """Carritos abiertos de una parte de los usuarios, con el formato de sync_cart_with_firebase"""
+        rng = np.random.default_rng(self.seed + 1)
+        count = int(self.users * self.cart_ratio)
+        owners = rng.choice(self.users, size=count, replace=False) if count else []
+        line_counts = rng.integers(1, 4, size=len(owners))
+        picks = rng.choice(self.products, size=int(line_counts.sum()), p=self.product_weights)
+        units = rng.choice(len(UNITS_PER_LINE), size=len(picks), p=UNITS_PER_LINE) + 1
+        offset = 0
+        for owner, line_count in zip(owners, line_counts):
+            updated_at = self.now - timedelta(minutes=int(rng.integers(0, 60 * 24 * 7)))
+            lines = dict(zip(picks[offset:offset + line_count].tolist(), units[offset:offset + line_count].tolist()))
+            offset += line_count
+            items = [dict(self._line(index, quantity), added_at=updated_at) for index, quantity in lines.items()]
+            yield 'carts', user_id(int(owner)), {
+                'user_id': user_id(int(owner)),
+                'items': items,
+                'updated_at': updated_at,
+                'generated': True
+            }
+
+    def iter_orders(self, rollups):
+        """Órdenes completadas (formato de record_order); acumula rollups y preferencias en `rollups`"""
+        rng = np.random.default_rng(self.seed + 2)
+        horizon = self.days * 86400
+        for start in range(0, self.orders, ORDER_CHUNK):
+            size = min(ORDER_CHUNK, self.orders - start)
+            buyers = rng.choice(self.users, size=size, p=self.user_weights)
+            line_counts = rng.choice(len(LINES_PER_ORDER), size=size, p=LINES_PER_ORDER) + 1
+            picks = rng.choice(self.products, size=int(line_counts.sum()), p=self.product_weights)
+            units = rng.choice(len(UNITS_PER_LINE), size=len(picks), p=UNITS_PER_LINE) + 1
+            # Más órdenes recientes que antiguas (crecimiento del negocio)
+            ages = np.sort(horizon * (1 - np.sqrt(rng.random(size))))[::-1]
+            stripe = rng.random(size) < STRIPE_SHARE
+
+            offset = 0
+            for i in range(size):
+                number = start + i
+                created_at = self.now - timedelta(seconds=int(ages[i]))
+                lines = {}
+                for index, quantity in zip(picks[offset:offset + line_counts[i]], units[offset:offset + line_counts[i]]):
+                    lines[int(index)] = lines.get(int(index), 0) + int(quantity)
+                offset += line_counts[i]
+
+                items = []
+                for index, quantity in lines.items():
+                    line = self._line(index, quantity)
+                    items.append({
+                        'name': line['name'],
+                        'price': line['price'],
+                        'quantity': quantity,
+                        'image': line['image'],
+                        'subtotal': round(line['price'] * quantity, 2),
+                        # Solo para acumular preferencias; no se guarda en la orden
+                        '_category': line['category']
+                    })
+
+                buyer = self.user(int(buyers[i]))
+                order = {
+                    'order_number': f"{'ORD' if stripe[i] else 'SIM'}-{int(created_at.timestamp())}-{number:07d}",
+                    'user_id': buyer['uid'],
+                    'user_name': buyer['nombre'],
+                    'user_email': buyer['email'],
+                    'items': items,
+                    'total': round(sum(item['subtotal'] for item in items), 2),
+                    'status': 'completed',
+                    'payment_method': 'stripe' if stripe[i] else 'simulated',
+                    'created_at': created_at,
+                    'currency': 'USD',
+                    'generated': True
+                }
+                if stripe[i]:
+                    order['session_id'] = f"cs_gen_{number:07d}"
+                else:
+                    order['simulation'] = True
+
+                rollups.add(order)
+                for item in items:
+                    del item['_category']
+                yield 'orders', f"gen-o{number:08d}", order
+
+
+class RollupAccumulator:
+    """Rollups de ventas y preferencias de las órdenes generadas, para escribirlos una vez"""
+
+    def __init__(self):
+        self.daily = {}
+        self.by_product = {}
+        self.preferences = {}
+
+    def add(self, order):
+        created_at = order['created_at']
+        day = self.daily.setdefault(created_at.strftime('%Y-%m-%d'), {
+            'revenue': 0.0, 'orders': 0, 'units': 0, 'products': {}
+        })
+        day['revenue'] += order['total']
+        day['orders'] += 1
+
+        weight = decay_weight(created_at)
+        preferences = self.preferences.setdefault(order['user_id'], {
+            'category_scores': {}, 'product_scores': {}, 'product_names': {}, 'purchases': 0
+        })
+        preferences['purchases'] += 1
+
+        for item in order['items']:
+            key = product_key(item['name'])
+            revenue = item['price'] * item['quantity']
+            day['units'] += item['quantity']
+            daily_product = day['products'].setdefault(key, {'name': item['name'], 'revenue': 0.0, 'units': 0})
+            daily_product['revenue'] += revenue
+            daily_product['units'] += item['quantity']
+
+            product = self.by_product.setdefault(key, {
+                'name': item['name'], 'revenue': 0.0, 'orders': 0, 'units': 0, 'last_sold_at': created_at
+            })
+            product['revenue'] += revenue
+            product['orders'] += 1
+            product['units'] += item['quantity']
+            product['last_sold_at'] = max(product['last_sold_at'], created_at)
+
+            category_scores = preferences['category_scores']
+            category_scores[item['_category']] = category_scores.get(item['_category'], 0.0) + weight * item['quantity']
+            product_scores = preferences['product_scores']
+            product_scores[key] = product_scores.get(key, 0.0) + weight * item['quantity']
+            preferences['product_names'][key] = item['name']
+
+    def iter_documents(self, increment):
+        """Documentos de sales_daily, sales_by_product y user_preferences (sumados con `increment`)"""
+        now = datetime.now()
+        for day, data in self.daily.items():
+            top = sorted(data['products'].items(), key=lambda entry: entry[1]['revenue'], reverse=True)
+            yield DAILY_COLLECTION, day, {
+                'date': day,
+                'revenue': increment(round(data['revenue'], 2)),
+                'orders': increment(data['orders']),
+                'units': increment(data['units']),
+                'products': {
+                    key: {
+                        'name': product['name'],
+                        'revenue': increment(round(product['revenue'], 2)),
+                        'units': increment(product['units'])
+                    }
+                    for key, product in top[:MAX_DAILY_PRODUCTS]
+                },
+                'updated_at': now
+            }
+
+        for key, product in self.by_product.items():
+            yield PRODUCT_COLLECTION, key, {
+                'name': product['name'],
+                'revenue': increment(round(product['revenue'], 2)),
+                'orders': increment(product['orders']),
+                'units': increment(product['units']),
+                'last_sold_at': product['last_sold_at']
+            }
+
+        for uid, preferences in self.preferences.items():
+            yield PREFERENCES_COLLECTION, uid, {
+                'user_id': uid,
+                'category_scores': {c: increment(s) for c, s in preferences['category_scores'].items()},
+                'product_scores': {k: increment(s) for k, s in preferences['product_scores'].items()},
+                'product_names': preferences['product_names'],
+                'purchases': increment(preferences['purchases']),
+                'scores_updated': now
+            }
@@ -0,0 +1,154 @@
+"""Calentamiento del servidor: prepara clientes y cachés una vez por proceso.
+
+warm_up() inicializa el motor de datos (STORAGE_BACKEND: Firestore por
+defecto) y Stripe, carga el catálogo, el CSS/logo y el modelo de
+recomendaciones antes de atender tráfico, y arranca el hilo que libera
+las retenciones de stock caducadas (tools/serve.py lo llama antes de
+arrancar Streamlit). El estado se expone en /healthz del sidecar:
+200 cuando el proceso está listo y 503 mientras no lo está.
+"""
+import importlib
+import json
+import threading
+import time
+
+from servicios.sidecar import register_route
+
+_state = {
+    'ready': False,
+    'started_at': None,
+    'finished_at': None,
+    'stages': {},
+    'errors': {}
+}
+_db = None
+_lock = threading.Lock()
+
+# Módulos que importan las páginas en su primera ejecución
+PRELOAD_MODULES = [
+    'PIL.Image',
+    'servicios.admin',
+    'servicios.checkout_sessions',
+    'servicios.collection_stats',
+    'servicios.fragments',
+    'servicios.offers',
+    'servicios.order_queries',
+    'servicios.preferences',
+    'servicios.reservations',
+    'servicios.sales_rollups',
+    'servicios.store'
+]
+
+# Etapas sin las que el proceso no puede atender tráfico
+CRITICAL_STAGES = ('firestore', 'catalog')
+
+
+def _init_firestore():
+    global _db
+    if _db is not None:
+        return
+    from servicios.firestore_metrics import instrument
+    from servicios.store import open_backend
+    _db = instrument(open_backend())
+
+
+def _init_stripe():
+    from servicios.payments import get_stripe
+    get_stripe()
+
+
+def _preload_modules():
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+
+
+def _prime_catalog():
+    from servicios.catalog import get_catalog
+    get_catalog(_db)
+
+
+def _prime_assets():
+    from servicios.assets import warm_assets
+    warm_assets()
+
+
+def _load_recommendations():
+    from servicios.recommendations import load_model
+    load_model()
+
+
+def _start_reservation_sweeper():
+    from servicios.reservations import start_sweeper
+    start_sweeper(_db)
+
+
+STAGES = [
+    ('firestore', _init_firestore),
+    ('stripe', _init_stripe),
+    ('imports', _preload_modules),
+    ('catalog', _prime_catalog),
+    ('assets', _prime_assets),
+    ('recommendations', _load_recommendations),
+    ('reservations', _start_reservation_sweeper)
+]
+
+
+def warm_up(progress=None):
+    """Ejecuta las etapas de calentamiento (solo la primera vez) y devuelve el estado"""
+    with _lock:
+        if _state['started_at'] is not None:
+            return health_status()
+
+        _state['started_at'] = time.time()
+        for name, stage in STAGES:
+            start = time.perf_counter()
+            try:
+                stage()
+            except Exception as e:
+                _state['errors'][name] = str(e)
+            _state['stages'][name] = round((time.perf_counter() - start) * 1000, 1)
+            if progress:
+                status = f"❌ {_state['errors'][name]}" if name in _state['errors'] else "✅"
+                progress(f"{status} {name}: {_state['stages'][name]} ms")
+
+        _state['finished_at'] = time.time()
+        _state['ready'] = not any(name in _state['errors'] for name in CRITICAL_STAGES)
+        return health_status()
+
+
+def get_db():
+    """Cliente de Firestore compartido por todas las sesiones (calienta el proceso si hace falta)"""
+    if _db is None:
+        warm_up()
+    if _db is None:
+        # El calentamiento falló: reintentar (y propagar el error real)
+        _init_firestore()
+    return _db
+
+
+def use_firestore_client(db):
+    """Sustituye el cliente compartido (p. ej. por MemoryFirestore en pruebas de carga)"""
+    global _db
+    from servicios.firestore_metrics import instrument
+    _db = instrument(db)
+    return _db
+
+
+def health_status():
+    """Copia del estado de calentamiento"""
+    return {
+        'ready': _state['ready'],
+        'started_at': _state['started_at'],
+        'finished_at': _state['finished_at'],
+        'stages_ms': dict(_state['stages']),
+        'errors': dict(_state['errors'])
+    }
+
+
+def healthz():
+    """Ruta /healthz del sidecar"""
+    status = health_status()
+    return (200 if status['ready'] else 503), 'application/json', json.dumps(status)
+
+
+register_route('/healthz', healthz)
@@ -4,6 +4,8 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 from datetime import datetime
 import time
+from servicios.collection_stats import count_documents
+from servicios.order_queries import latest_orders
 
 def create_test_orders():
     """Crea órdenes de prueba en Firebase"""
@@ -85,10 +87,9 @@ def create_test_orders():
         
         print(f"\n🎉 {len(created_orders)} órdenes de prueba creadas exitosamente!")
         
-        # Verificar que se crearon
-        orders_ref = db.collection('orders')
-        all_orders = list(orders_ref.stream())
-        print(f"📊 Total de órdenes en la base de datos: {len(all_orders)}")
+        # Verificar que se crearon (agregación count(), sin descargar las órdenes)
+        total_orders = count_documents(db, 'orders', ttl=0)
+        print(f"📊 Total de órdenes en la base de datos: {total_orders}")
         
         return created_orders
         
@@ -105,13 +106,10 @@ def verify_orders():
         
         db = firestore.client()
         
-        orders_ref = db.collection('orders')
-        orders = list(orders_ref.stream())
+        print(f"📋 Órdenes encontradas: {count_documents(db, 'orders', ttl=0)}")
         
-        print(f"📋 Órdenes encontradas: {len(orders)}")
-        
-        for i, order_doc in enumerate(orders[-5:], 1):  # Mostrar últimas 5
-            order_data = order_doc.to_dict()
+        # Solo se leen las 5 más recientes (índice sobre created_at desc)
+        for i, order_data in enumerate(latest_orders(db, limit=5), 1):
             print(f"\n--- Orden {i} ---")
             print(f"Número: {order_data.get('order_number', 'N/A')}")
             print(f"Usuario: {order_data.get('user_name', 'N/A')}")
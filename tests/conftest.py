@@ -0,0 +1,38 @@
+"""Fixtures comunes: los dos motores locales con la API de Firestore (sin credenciales)."""
+import pytest
+
+from servicios import catalog, collection_stats, currency, offers, stock_shards
+from servicios.memory_firestore import MemoryFirestore
+from servicios.sqlite_firestore import SQLiteFirestore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def db(request):
+    client = MemoryFirestore() if request.param == 'memory' else SQLiteFirestore(':memory:')
+    yield client
+    if request.param == 'sqlite':
+        client.close()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Las cachés de proceso van por id(db): se vacían para que no pasen de una prueba a otra"""
+    yield
+    stock_shards.forget()
+    collection_stats.clear_stats_cache()
+    currency.forget_rates()
+    catalog.invalidate_catalog()
+    offers.invalidate_offers()
+
+
+def add_product(db, product_id, **fields):
+    """Crea products/{product_id} con nombre, precio y stock por defecto"""
+    data = {'name': product_id.capitalize(), 'price': 10.0, 'stock': 10, 'reserved': 0, **fields}
+    db.collection('products').document(product_id).set(data)
+    return data
+
+
+def get_product(db, product_id):
+    """Producto con el stock y reserved totales (documento + shards)"""
+    data = db.collection('products').document(product_id).get().to_dict()
+    return stock_shards.with_sharded_stock(db, product_id, data, ttl=0)
@@ -0,0 +1,64 @@
+from servicios.cart_validation import (OK, OUT_OF_STOCK, PRICE_CHANGED, QUANTITY_REDUCED, UNAVAILABLE,
+                                       offer_name, validate_cart)
+from servicios.catalog import catalog_pointer
+from tests.conftest import add_product
+
+
+def line(product_id, name, price, quantity, **fields):
+    return {'product_id': product_id, 'name': name, 'price': price, 'quantity': quantity, **fields}
+
+
+def statuses(result):
+    return [entry['status'] for entry in result['lines']]
+
+
+def test_unchanged_cart(db):
+    add_product(db, 'a', price=20.0, stock=5)
+    result = validate_cart(db, [line('a', 'A', 20.0, 2)])
+
+    assert statuses(result) == [OK]
+    assert result['changed'] is False
+    assert result['total'] == 40.0
+
+
+def test_line_statuses(db):
+    add_product(db, 'a', price=25.0, stock=5)
+    add_product(db, 'b', price=10.0, stock=1)
+    add_product(db, 'c', price=10.0, stock=3, reserved=3)
+    items = [
+        line('a', 'A', 20.0, 1),
+        line('b', 'B', 10.0, 3),
+        line('c', 'C', 10.0, 1),
+        line('gone', 'Gone', 10.0, 1)
+    ]
+    result = validate_cart(db, items)
+
+    assert statuses(result) == [PRICE_CHANGED, QUANTITY_REDUCED, OUT_OF_STOCK, UNAVAILABLE]
+    assert result['changed'] is True
+    assert [(item['name'], item['price'], item['quantity']) for item in result['items']] == [
+        ('A', 25.0, 1), ('B', 10.0, 1)
+    ]
+
+
+def test_offer_line_keeps_discount(db):
+    add_product(db, 'a', price=50.0, stock=5)
+    result = validate_cart(db, [line('a', offer_name('A', 20), 40.0, 1, discount=20)])
+
+    assert statuses(result) == [OK]
+
+
+def test_normal_and_offer_lines_share_stock(db):
+    add_product(db, 'a', price=50.0, stock=3)
+    result = validate_cart(db, [line('a', 'A', 50.0, 2), line('a', offer_name('A', 20), 40.0, 2, discount=20)])
+
+    assert statuses(result) == [OK, QUANTITY_REDUCED]
+    assert sum(item['quantity'] for item in result['items']) == 3
+
+
+def test_relinks_by_name_after_republish(db):
+    add_product(db, 'new-a', name='A', price=20.0, stock=5, catalog_version='v2')
+    catalog_pointer(db).set({'version': 'v2'})
+    result = validate_cart(db, [line('old-a', 'A', 20.0, 1)])
+
+    assert statuses(result) == [OK]
+    assert result['items'][0]['product_id'] == 'new-a'
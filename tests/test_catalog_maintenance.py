@@ -0,0 +1,68 @@
+import pytest
+
+from servicios.bulk_writes import BulkLoader
+from servicios.catalog import current_version, load_products
+from servicios.catalog_maintenance import adjust_prices, catalog_status, publish_catalog, set_stock, truncate_catalog
+from tests.conftest import add_product
+
+
+def names(db):
+    return sorted(product['name'] for product in load_products(db))
+
+
+def test_bulk_loader_commits_in_batches(db):
+    with BulkLoader(db, batch_size=2, workers=2) as loader:
+        for index in range(5):
+            loader.set(db.collection('products').document(f"p{index}"), {'name': f"P{index}"})
+        loader.delete(db.collection('products').document('p0'))
+    summary = loader.summary()
+
+    assert (summary['writes'], summary['batches']) == (6, 3)
+    assert summary['by_collection'] == {'products': 6}
+    assert len(list(db.collection('products').stream())) == 4
+
+
+def test_bulk_loader_raises_failed_batches(db):
+    loader = BulkLoader(db, batch_size=1, workers=1)
+    loader.update(db.collection('products').document('nada'), {'stock': 1})
+    with pytest.raises(Exception):
+        loader.close()
+
+
+def test_publish_swaps_the_pointer_and_retires_the_previous_version(db):
+    add_product(db, 'legacy', name='Sin versión')
+    first = publish_catalog(db, [{'name': 'Blazer', 'price': 100.0}, {'name': 'Bolso', 'price': 50.0}])
+    assert current_version(db) == first['version']
+    assert names(db) == ['Blazer', 'Bolso']
+    assert first['retired']['writes'] == 1
+
+    second = publish_catalog(db, [{'name': 'Vestido', 'price': 80.0}])
+    assert catalog_status(db)['version'] == second['version']
+    assert catalog_status(db)['previous_version'] == first['version']
+    assert names(db) == ['Vestido']
+    assert len(list(db.collection('products').stream())) == 1
+
+
+def test_unpublished_version_is_invisible(db):
+    add_product(db, 'a', name='Blazer')
+    # Productos de una publicación que aún no ha cambiado el puntero
+    add_product(db, 'b', name='Nuevo', catalog_version='v-sin-publicar')
+    assert names(db) == ['Blazer']
+
+
+def test_price_and_stock_updates_touch_the_published_products(db):
+    publish_catalog(db, [{'name': 'Blazer', 'price': 100.0, 'category': 'chaquetas', 'stock': 2},
+                         {'name': 'Bolso', 'price': 50.0, 'category': 'accesorios', 'stock': 2}])
+    adjust_prices(db, -10, category='chaquetas')
+    set_stock(db, delta=-5)
+
+    products = {product['name']: product for product in load_products(db)}
+    assert (products['Blazer']['price'], products['Bolso']['price']) == (90.0, 50.0)
+    assert products['Blazer']['stock'] == products['Bolso']['stock'] == 0
+
+
+def test_truncate_removes_products_and_pointer(db):
+    publish_catalog(db, [{'name': 'Blazer', 'price': 100.0}])
+    truncate_catalog(db)
+    assert list(db.collection('products').stream()) == []
+    assert current_version(db) is None
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from servicios import catalog_snapshot
+from servicios.catalog_snapshot import CatalogSnapshot, get_products, invalidate, read_snapshot, write_snapshot
+
+if catalog_snapshot.fcntl is None:
+    pytest.skip("La instantánea compartida necesita fcntl", allow_module_level=True)
+
+PRODUCTS = [
+    {'id': 'a', 'name': 'Blusa Ñandú', 'category': 'blusas', 'image': 'a.jpg', 'description': '', 'price': 45.5,
+     'stock': 3, 'reserved': 1, 'prices': {'USD': 45.5, 'EUR': 41.86}, 'catalog_version': 'v1', 'color': 'rojo'},
+    {'id': 'b', 'name': 'Blazer', 'category': 'chaquetas', 'image': 'b.jpg', 'description': 'Lana', 'price': 129.99,
+     'stock': 0, 'reserved': 0, 'prices': {'USD': 129.99, 'EUR': 119.59}, 'stock_shards': 4, 'shard_writes': True}
+]
+
+
+def test_encode_decode_round_trip(tmp_path):
+    path = tmp_path / 'catalog.snap'
+    path.write_bytes(catalog_snapshot.encode(PRODUCTS))
+
+    snapshot = CatalogSnapshot(str(path))
+    assert snapshot.currencies == ('USD', 'EUR')
+    assert snapshot.products() == PRODUCTS
+    assert snapshot.stamp is None
+
+
+def test_stamp_travels_with_the_snapshot(tmp_path):
+    write_snapshot(str(tmp_path), PRODUCTS, stamp=['v1', '2026-06-01T10:00:00'])
+    assert read_snapshot(str(tmp_path)).stamp == ['v1', '2026-06-01T10:00:00']
+
+
+def test_each_version_is_decoded_once(tmp_path, monkeypatch):
+    write_snapshot(str(tmp_path), PRODUCTS)
+    snapshot = read_snapshot(str(tmp_path))
+    decodes = []
+    decode = snapshot.decode
+    monkeypatch.setattr(snapshot, 'decode', lambda: decodes.append(1) or decode())
+
+    first, second = snapshot.products(), snapshot.products()
+    assert first == second and len(decodes) == 1
+    # Cada lectura recibe copias: modificarlas no cambia la instantánea
+    first[0]['stock'] = 99
+    assert snapshot.products()[0]['stock'] == 3
+
+
+def test_refresh_loads_once_until_invalidated(tmp_path):
+    directory = str(tmp_path)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return [dict(PRODUCTS[0], stock=len(loads))], ['v1', None]
+
+    products, stamp = get_products(directory, load, ttl=60)
+    assert (products[0]['stock'], stamp) == (1, ['v1', None])
+    assert get_products(directory, load, ttl=60) == (products, stamp)
+    assert os.path.exists(os.path.join(directory, catalog_snapshot.LOCK_FILE))
+
+    invalidate(directory)
+    # La marca de invalidación es posterior a la instantánea
+    os.utime(os.path.join(directory, catalog_snapshot.INVALIDATED_FILE),
+             (read_snapshot(directory).created_at + 1,) * 2)
+    assert get_products(directory, load, ttl=60)[0][0]['stock'] == 2
+    assert read_snapshot(directory).products()[0]['stock'] == 2
+    assert len(loads) == 2
@@ -0,0 +1,34 @@
+from servicios.collection_stats import clear_stats_cache, count_documents, get_collection_stats
+from servicios.memory_firestore import MemoryFirestore
+
+
+def add_orders(db, *statuses):
+    for status in statuses:
+        db.collection('orders').add({'status': status})
+
+
+def test_counts_by_status(db):
+    add_orders(db, 'completed', 'completed', 'test')
+
+    stats = get_collection_stats(db, ['orders', 'carts'], status_breakdown=True)
+    assert stats['orders'] == {'total': 3, 'by_status': {'completed': 2, 'test': 1}}
+    assert stats['carts'] == {'total': 0}
+
+
+def test_counts_are_cached_until_cleared(db):
+    add_orders(db, 'completed')
+    assert count_documents(db, 'orders') == 1
+
+    add_orders(db, 'completed')
+    assert count_documents(db, 'orders') == 1
+    assert count_documents(db, 'orders', ttl=0) == 2
+    clear_stats_cache()
+    assert count_documents(db, 'orders') == 2
+
+
+def test_each_client_has_its_own_counts(db):
+    other = MemoryFirestore()
+    add_orders(db, 'completed', 'completed')
+
+    assert count_documents(db, 'orders') == 2
+    assert count_documents(other, 'orders') == 0
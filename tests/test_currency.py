@@ -0,0 +1,58 @@
+import pytest
+
+from servicios.currency import (BASE_CURRENCY, add_price_columns, get_rates, minor_units, price_formatter,
+                                set_rates, user_currency)
+
+RATES = {'USD': 1.0, 'EUR': 0.92, 'CLP': 940.0, 'MXN': 18.3}
+
+
+@pytest.mark.parametrize('amount, currency, expected', [
+    (89.99, 'USD', 8999),
+    (0.1 + 0.2, 'EUR', 30),
+    (19.999, 'MXN', 2000),
+    (84591.0, 'CLP', 84591),
+    (84590.6, 'CLP', 84591)
+])
+def test_minor_units(amount, currency, expected):
+    assert minor_units(amount, currency) == expected
+
+
+def test_price_columns_round_to_currency_decimals():
+    products = add_price_columns([{'price': 89.99}, {'price': 10.0}], RATES)
+
+    assert products[0]['prices'] == {'USD': 89.99, 'EUR': 82.79, 'CLP': 84591.0, 'MXN': 1646.82}
+    assert products[1]['prices']['CLP'] == 9400.0
+
+
+@pytest.mark.parametrize('locale, expected', [
+    ('es-MX', 'MXN'),
+    ('fr', 'EUR'),
+    ('es', BASE_CURRENCY),
+    ('es-419', BASE_CURRENCY),
+    ('fr-CA', BASE_CURRENCY),
+    (None, BASE_CURRENCY)
+])
+def test_user_currency(locale, expected):
+    assert user_currency({'locale': locale}, RATES) == expected
+
+
+def test_user_currency_prefers_choice_and_ignores_unknown(monkeypatch):
+    assert user_currency({'locale': 'es-MX', 'currency': 'EUR'}, RATES) == 'EUR'
+    # Moneda de la región sin tipo de cambio: DEFAULT_CURRENCY
+    monkeypatch.setenv('DEFAULT_CURRENCY', 'eur')
+    assert user_currency({'locale': 'en-GB'}, RATES) == 'EUR'
+
+
+def test_price_formatter():
+    assert price_formatter('EUR', 'es-ES')(1234.5) == '1.234,50 €'
+    assert price_formatter('MXN', 'es-MX')(1234.5) == 'MX$1,234.50'
+    assert price_formatter('CLP', 'es-CL')(84591) == 'CLP$84.591'
+
+
+def test_rates_round_trip(db):
+    assert get_rates(db) == {BASE_CURRENCY: 1.0}
+    set_rates(db, {'EUR': 0.92})
+
+    assert get_rates(db) == {'EUR': 0.92, BASE_CURRENCY: 1.0}
+    with pytest.raises(ValueError):
+        set_rates(db, {'XYZ': 1.0})
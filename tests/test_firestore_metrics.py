@@ -0,0 +1,71 @@
+import socket
+import urllib.request
+
+import pytest
+
+from servicios import sidecar
+from servicios.firestore_metrics import instrument, metrics
+
+
+@pytest.fixture
+def counted(db):
+    metrics.reset()
+    yield instrument(db)
+    metrics.reset()
+
+
+def test_counts_reads_queries_and_writes(counted):
+    metrics.begin_run('catalogo')
+    batch = counted.batch()
+    for product_id in ('a', 'b', 'c'):
+        batch.set(counted.collection('products').document(product_id), {'stock': 1})
+    batch.commit()
+    counted.collection('products').document('a').get()
+    counted.collection('products').document('zz').get()
+    list(counted.collection('products').where('stock', '==', 1).stream())
+    counted.collection('products').count().get()
+
+    run = metrics.current_run()
+    assert (run['writes'], run['reads'], run['queries'], run['aggregations']) == (3, 4, 1, 1)
+
+    calls = {row['operation']: row['calls'] for row in metrics.summary() if row['page'] == 'catalogo'}
+    assert calls == {'write': 1, 'read': 2, 'query': 1, 'aggregation': 1}
+    assert 'firestore_documents_total{page="catalogo",operation="write"} 3' in metrics.prometheus()
+
+
+def test_errors_are_counted(counted):
+    metrics.begin_run('compraok')
+    with pytest.raises(Exception):
+        counted.collection('orders').document('nada').update({'status': 'x'})
+    [row] = metrics.summary()
+    assert (row['operation'], row['errors']) == ('write', 1)
+
+
+def test_instrument_is_idempotent(db):
+    wrapped = instrument(db)
+    assert instrument(wrapped) is wrapped
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def test_sidecar_is_local_and_only_static_allows_other_origins(tmp_path, monkeypatch):
+    (tmp_path / 'app.0123456789.css').write_text('body{}')
+    monkeypatch.setattr(sidecar, 'STATIC_DIR', str(tmp_path))
+    monkeypatch.setattr(sidecar, '_server', None)
+    monkeypatch.delenv('SIDECAR_HOST', raising=False)
+    server = sidecar.start_sidecar(port=free_port())
+    try:
+        host, port = server.server_address
+        assert host == '127.0.0.1'
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.headers['Access-Control-Allow-Origin'] is None
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/static/app.0123456789.css") as response:
+            assert response.headers['Access-Control-Allow-Origin'] == '*'
+            assert 'immutable' in response.headers['Cache-Control']
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from servicios import catalog_maintenance
+from servicios.catalog import get_catalog_with_stamp
+from servicios.currency import get_rates_with_stamp, set_rates
+from servicios.offers import get_offer_set, invalidate_offers, offer_discount
+
+from tests.conftest import add_product
+
+NOW = datetime(2026, 6, 1, 10)
+
+
+def counting(result):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return result
+    return compute, calls
+
+
+def test_offers_are_computed_once_per_user_day_and_version():
+    compute, calls = counting(['oferta'])
+
+    assert get_offer_set('u1', compute, now=NOW, version=('v1', None)) == ['oferta']
+    get_offer_set('u1', compute, now=NOW.replace(hour=20), version=('v1', None))
+    assert len(calls) == 1
+
+    get_offer_set('u1', compute, now=NOW, version=('v2', None))
+    get_offer_set('u2', compute, now=NOW, version=('v1', None))
+    get_offer_set('u1', compute, now=datetime(2026, 6, 2, 10), version=('v1', None))
+    assert len(calls) == 4
+
+
+def test_invalidate_offers_of_one_user():
+    compute, calls = counting([])
+    get_offer_set('u1', compute, now=NOW)
+    get_offer_set('u2', compute, now=NOW)
+
+    invalidate_offers('u1')
+    get_offer_set('u1', compute, now=NOW)
+    get_offer_set('u2', compute, now=NOW)
+    assert len(calls) == 3
+
+
+def test_discount_is_stable_for_user_day_and_product():
+    first = offer_discount('u1', 'Blazer (OFERTA -20%)', 10, 30, day='2026-06-01')
+    assert first == offer_discount('u1', 'Blazer', 10, 30, day='2026-06-01')
+    assert 10 <= first <= 30
+
+
+def test_catalog_stamp_changes_only_with_prices(db):
+    add_product(db, 'a', price=10.0)
+    products, stamp = get_catalog_with_stamp(db)
+    assert get_catalog_with_stamp(db)[1] == stamp
+
+    catalog_maintenance.set_stock(db, stock=3)
+    assert get_catalog_with_stamp(db)[1] == stamp
+
+    catalog_maintenance.adjust_prices(db, 10)
+    products, new_stamp = get_catalog_with_stamp(db)
+    assert new_stamp != stamp
+    assert products[0]['price'] == 11.0
+
+
+def test_rates_stamp_changes_with_the_rates(db):
+    assert get_rates_with_stamp(db)[1] is None
+    set_rates(db, {'EUR': 0.9})
+    rates, stamp = get_rates_with_stamp(db)
+    assert rates['EUR'] == 0.9 and stamp is not None
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+
+from servicios.order_export import export_orders, load_export_state
+
+CREATED_AT = datetime(2026, 1, 1, 12)
+
+
+def add_order(db, order_id, created_at=CREATED_AT):
+    db.collection('orders').document(order_id).set({
+        'order_number': f"ORD-{order_id}",
+        'created_at': created_at,
+        'items': [{'name': 'A', 'price': 10.0, 'quantity': 1}],
+        'total': 10.0
+    })
+
+
+def test_incremental_export_keeps_same_timestamp_orders(db, tmp_path):
+    add_order(db, 'b')
+    add_order(db, 'd')
+    assert export_orders(db, str(tmp_path), 'csv', page_size=1)['orders'] == 2
+    assert load_export_state(str(tmp_path))['last_order_id'] == 'd'
+
+    # Misma fecha que la marca de agua pero después por ID, y una posterior
+    add_order(db, 'e')
+    add_order(db, 'a', datetime(2026, 1, 1, 13))
+    summary = export_orders(db, str(tmp_path), 'csv', page_size=1)
+
+    assert summary['orders'] == 2
+    assert summary['state']['last_order_id'] == 'a'
+    assert summary['state']['exported_orders'] == 4
+    assert export_orders(db, str(tmp_path), 'csv')['orders'] == 0
+
+
+def test_legacy_watermark_without_id(db, tmp_path):
+    add_order(db, 'a')
+    add_order(db, 'b', datetime(2026, 1, 1, 13))
+    (tmp_path / 'export_state.json').write_text('{"last_created_at": "2026-01-01T12:00:00"}')
+
+    assert export_orders(db, str(tmp_path), 'csv')['orders'] == 1
+
+
+def test_full_export_needs_overwrite(db, tmp_path):
+    add_order(db, 'a')
+    export_orders(db, str(tmp_path), 'csv')
+
+    with pytest.raises(ValueError):
+        export_orders(db, str(tmp_path), 'csv', incremental=False)
+
+    summary = export_orders(db, str(tmp_path), 'csv', incremental=False, overwrite=True)
+    assert summary['orders'] == 1
+    assert len(list((tmp_path / 'orders').iterdir())) == 1
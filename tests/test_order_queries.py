@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from servicios.order_queries import latest_orders, query_orders, user_orders
+
+START = datetime(2026, 6, 1)
+
+
+def add_orders(db, count, user_id='u1', status='completed'):
+    for index in range(count):
+        db.collection('orders').add({'order_number': f"{user_id}-{index}", 'user_id': user_id, 'status': status,
+                                     'created_at': START + timedelta(minutes=index)})
+
+
+def numbers(orders):
+    return [order['order_number'] for order in orders]
+
+
+def test_pages_walk_newest_first_until_the_end(db):
+    add_orders(db, 5)
+
+    first, cursor = user_orders(db, 'u1', limit=2)
+    second, cursor = user_orders(db, 'u1', limit=2, cursor=cursor)
+    third, cursor = user_orders(db, 'u1', limit=2, cursor=cursor)
+
+    assert numbers(first + second + third) == ['u1-4', 'u1-3', 'u1-2', 'u1-1', 'u1-0']
+    assert cursor is None
+
+
+def test_full_last_page_has_no_next_cursor(db):
+    add_orders(db, 4)
+
+    _, cursor = query_orders(db, limit=2)
+    last, cursor = query_orders(db, limit=2, cursor=cursor)
+    assert numbers(last) == ['u1-1', 'u1-0']
+    assert cursor is None
+
+
+def test_filters_by_user_and_status(db):
+    add_orders(db, 2, user_id='u1')
+    add_orders(db, 2, user_id='u2', status='test')
+
+    orders, _ = user_orders(db, 'u2')
+    assert numbers(orders) == ['u2-1', 'u2-0']
+    assert numbers(latest_orders(db, limit=1, status='completed')) == ['u1-1']
+    assert all('id' in order for order in orders)
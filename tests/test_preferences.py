@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from servicios.preferences import (COLLECTION, HALF_LIFE_DAYS, decay_weight, get_preference_scores,
+                                   record_purchase, top_k)
+
+NOW = datetime(2026, 6, 1)
+
+
+def preferences(db, user_id):
+    return db.collection(COLLECTION).document(user_id).get().to_dict()
+
+
+def test_weight_doubles_every_half_life():
+    assert decay_weight(NOW + timedelta(days=HALF_LIFE_DAYS)) == pytest.approx(2 * decay_weight(NOW))
+
+
+def test_old_purchases_count_half(db):
+    item = {'name': 'Blazer', 'category': 'chaquetas', 'quantity': 1}
+    record_purchase(db, 'u1', [item], when=NOW - timedelta(days=HALF_LIFE_DAYS))
+    record_purchase(db, 'u1', [dict(item, name='Vestido (OFERTA -20%)', category='vestidos')], when=NOW)
+
+    scores = get_preference_scores(preferences(db, 'u1'), when=NOW)
+    assert scores['categories']['chaquetas'] == pytest.approx(0.5)
+    assert scores['categories']['vestidos'] == pytest.approx(1.0)
+    # Las ofertas cuentan para el producto base
+    assert scores['products']['vestido'] == pytest.approx(1.0)
+    assert preferences(db, 'u1')['purchases'] == 2
+
+
+def test_repeat_purchases_accumulate(db):
+    item = {'name': 'Blazer', 'category': 'chaquetas', 'quantity': 2}
+    record_purchase(db, 'u1', [item], when=NOW)
+    record_purchase(db, 'u1', [item], when=NOW)
+
+    scores = get_preference_scores(preferences(db, 'u1'), when=NOW)
+    assert scores['products']['blazer'] == pytest.approx(4.0)
+
+
+def test_legacy_lists_are_dated_at_last_update():
+    legacy = {
+        'preferred_categories': ['vestidos', 'vestidos', 'bolsos'],
+        'last_updated': NOW - timedelta(days=HALF_LIFE_DAYS)
+    }
+    scores = get_preference_scores(legacy, when=NOW)
+
+    assert scores['categories'] == pytest.approx({'vestidos': 1.0, 'bolsos': 0.5})
+    assert top_k(scores['categories'], 1) == [('vestidos', pytest.approx(1.0))]
+
+
+def test_legacy_lists_keep_decaying_after_new_purchases(db):
+    year = timedelta(days=365)
+    db.collection(COLLECTION).document('u1').set({
+        'preferred_categories': ['vestidos'],
+        'last_updated': NOW - 2 * year
+    })
+    item = {'name': 'Blazer', 'category': 'chaquetas', 'quantity': 1}
+    record_purchase(db, 'u1', [item], when=NOW - year)
+    record_purchase(db, 'u1', [item], when=NOW)
+
+    scores = get_preference_scores(preferences(db, 'u1'), when=NOW)
+    # Las compras nuevas no vuelven a fechar las listas antiguas
+    assert scores['categories']['vestidos'] == pytest.approx(decay_weight(NOW - 2 * year) / decay_weight(NOW))
+    assert scores['categories']['chaquetas'] == pytest.approx(1 + decay_weight(NOW - year) / decay_weight(NOW))
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from servicios.recommendations import CoPurchaseMatrixBuilder, load_model
+from tools.build_recommendations import build_recommendations
+
+BASKETS = [
+    ['Blazer', 'Pantalón'],
+    ['Blazer', 'Pantalón'],
+    ['Blazer', 'Pantalón', 'Bolso'],
+    ['Blazer', 'Bolso'],
+    ['Vestido', 'Zapatos (OFERTA -20%)'],
+]
+
+
+def add_orders(db, baskets):
+    for index, names in enumerate(baskets):
+        db.collection('orders').add({'created_at': datetime(2026, 6, 1) + timedelta(minutes=index),
+                                     'items': [{'name': name, 'quantity': 1} for name in names]})
+
+
+def test_builder_scores_pairs_with_cosine_similarity():
+    builder = CoPurchaseMatrixBuilder()
+    for names in BASKETS:
+        builder.add_order([{'name': name} for name in names])
+    keys, names, neighbors, scores = builder.build(top_n=2)
+
+    blazer = list(keys).index('blazer')
+    assert [keys[neighbor] for neighbor in neighbors[blazer]] == ['pantalon', 'bolso']
+    # 3 co-compras, 4 órdenes con blazer y 3 con pantalón
+    assert scores[blazer][0] == pytest.approx(3 / (4 * 3) ** 0.5)
+    # Las ofertas cuentan como el producto base
+    assert 'zapatos' in list(keys)
+
+
+def test_model_round_trips_through_npz(db, tmp_path):
+    add_orders(db, BASKETS)
+    path = str(tmp_path / 'copurchase.npz')
+
+    summary = build_recommendations(db, path, top_n=3, page_size=2)
+    assert (summary['orders'], summary['products']) == (5, 5)
+
+    model = load_model(path)
+    assert model is load_model(path)
+    assert model.recommend({'blazer': 1.0}, k=2) == ['pantalon', 'bolso']
+    assert model.recommend({'vestido': 1.0}, k=2) == ['zapatos']
+    assert model.recommend({'blazer': 1.0}, k=2, exclude=['pantalon']) == ['bolso']
+    assert model.name_of('pantalon') == 'Pantalón'
+
+
+def test_missing_model_is_none(tmp_path):
+    assert load_model(str(tmp_path / 'nada.npz')) is None
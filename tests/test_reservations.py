@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from servicios import reservations
+from servicios.reservations import CONVERTED, HELD, MISSING, RELEASED, InsufficientStock
+from tests.conftest import add_product, get_product
+
+
+def cart(*lines):
+    return [{'product_id': product_id, 'name': product_id.capitalize(), 'quantity': quantity}
+            for product_id, quantity in lines]
+
+
+def status(db, reservation_id):
+    return db.collection(reservations.COLLECTION).document(reservation_id).get().to_dict()['status']
+
+
+def test_reserve_holds_units(db):
+    add_product(db, 'a', stock=5)
+    reservation = reservations.reserve(db, cart(('a', 2)), 'u1')
+
+    assert status(db, reservation['id']) == HELD
+    assert get_product(db, 'a')['reserved'] == 2
+    assert reservations.available_stock(get_product(db, 'a')) == 3
+
+
+def test_reserve_rolls_back_when_short(db):
+    add_product(db, 'a', stock=5)
+    add_product(db, 'b', stock=1)
+    reservations.reserve(db, cart(('a', 4)), 'u1')
+
+    with pytest.raises(InsufficientStock) as error:
+        reservations.reserve(db, cart(('a', 2), ('b', 1)), 'u2')
+
+    assert [(line['name'], line['available']) for line in error.value.lines] == [('A', 1)]
+    # La retención fallida no deja nada retenido
+    assert get_product(db, 'a')['reserved'] == 4
+    assert get_product(db, 'b')['reserved'] == 0
+
+
+def test_convert_fulfils_once(db):
+    add_product(db, 'a', stock=5)
+    reservation = reservations.reserve(db, cart(('a', 2)), 'u1')
+
+    assert reservations.convert_reservation(db, reservation['id']) == CONVERTED
+    assert reservations.convert_reservation(db, reservation['id']) == CONVERTED
+    product = get_product(db, 'a')
+    assert (product['stock'], product['reserved']) == (3, 0)
+    assert status(db, reservation['id']) == CONVERTED
+
+
+def test_convert_after_product_removed(db):
+    add_product(db, 'a', stock=5)
+    add_product(db, 'b', stock=5)
+    reservation = reservations.reserve(db, cart(('a', 1), ('b', 1)), 'u1')
+    db.collection('products').document('b').delete()
+
+    assert reservations.convert_reservation(db, reservation['id']) == CONVERTED
+    assert get_product(db, 'a')['stock'] == 4
+
+
+def test_release_returns_units(db):
+    add_product(db, 'a', stock=5)
+    reservation = reservations.reserve(db, cart(('a', 2)), 'u1')
+
+    assert reservations.release_reservation(db, reservation['id']) is True
+    assert reservations.release_reservation(db, reservation['id']) is False
+    # Un pago que vuelve después de liberar no descuenta stock
+    assert reservations.convert_reservation(db, reservation['id']) == RELEASED
+    product = get_product(db, 'a')
+    assert (product['stock'], product['reserved']) == (5, 0)
+
+
+def test_convert_missing_reservation(db):
+    assert reservations.convert_reservation(db, 'no-existe') == MISSING
+
+
+def test_sweep_releases_only_expired(db):
+    add_product(db, 'a', stock=10)
+    now = datetime.now()
+    expired = reservations.reserve(db, cart(('a', 3)), 'u1', now=now - timedelta(hours=2))
+    active = reservations.reserve(db, cart(('a', 2)), 'u2', now=now)
+
+    assert reservations.sweep_expired(db, now=now) == 1
+    assert reservations.sweep_expired(db, now=now) == 0
+    assert status(db, expired['id']) == RELEASED
+    assert status(db, active['id']) == HELD
+    assert get_product(db, 'a')['reserved'] == 2
+
+
+def test_checkout_expiry_within_stripe_window():
+    now = datetime(2026, 1, 1, 12)
+    short = {'expires_at': now + timedelta(minutes=5)}
+    long = {'expires_at': now + timedelta(days=3)}
+
+    assert reservations.checkout_expires_at(short, now) - now.timestamp() > 30 * 60
+    assert reservations.checkout_expires_at(long, now) - now.timestamp() <= 24 * 3600
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import pytest
+
+from servicios.sales_rollups import (DAILY_COLLECTION, daily_shard_id, get_daily_rollups, get_top_products,
+                                     product_key, record_order)
+
+TODAY = datetime(2026, 6, 10, 12)
+
+
+def order(total, *items, created_at=TODAY):
+    return {'total': total, 'created_at': created_at,
+            'items': [{'name': name, 'price': price, 'quantity': quantity} for name, price, quantity in items]}
+
+
+def test_product_key_ignores_offers_and_accents():
+    assert product_key('Vestido Élite (OFERTA -20%)') == 'vestido-elite'
+
+
+def test_orders_spread_over_daily_shards_and_sum_back(db):
+    for _ in range(30):
+        record_order(db, order(10.0, ('Blazer', 5.0, 2)))
+
+    shards = list(db.collection(DAILY_COLLECTION).stream())
+    assert 1 < len(shards) and all(doc.id.startswith('2026-06-10-') for doc in shards)
+
+    today = get_daily_rollups(db, days=1, today=TODAY)[0]
+    assert (today['orders'], today['units']) == (30, 60)
+    assert today['revenue'] == pytest.approx(300.0)
+    assert today['products']['blazer']['units'] == 60
+
+
+def test_daily_rollups_cover_the_range_and_legacy_documents(db):
+    record_order(db, order(8.0, ('Bolso', 8.0, 1), created_at=datetime(2026, 6, 8)))
+    record_order(db, order(9.0, ('Bolso', 9.0, 1), created_at=datetime(2026, 5, 1)))
+    # Rollup de un solo documento por día (antes de los shards)
+    db.collection(DAILY_COLLECTION).document('2026-06-09').set({'date': '2026-06-09', 'revenue': 4.0,
+                                                                'orders': 1, 'units': 1, 'products': {}})
+
+    rollups = get_daily_rollups(db, days=3, today=TODAY)
+    assert [day['date'] for day in rollups] == ['2026-06-08', '2026-06-09', '2026-06-10']
+    assert [day['orders'] for day in rollups] == [1, 1, 0]
+
+
+def test_top_products_by_revenue(db):
+    record_order(db, order(30.0, ('Blazer', 10.0, 1), ('Vestido (OFERTA -20%)', 20.0, 1)))
+    record_order(db, order(20.0, ('Vestido', 20.0, 1)))
+
+    top = get_top_products(db, limit=1)
+    assert [(product['name'], product['orders'], product['units']) for product in top] == [('Vestido', 2, 2)]
+
+
+def test_daily_shard_id():
+    assert daily_shard_id('2026-06-10', 3) == '2026-06-10-3'
@@ -0,0 +1,51 @@
+import pickle
+import types
+
+from servicios import session_store
+from servicios.session_store import SQLiteSessionStore
+
+
+def test_sessions_round_trip_between_processes(tmp_path):
+    path = str(tmp_path / 'sesiones.db')
+    writer, reader = SQLiteSessionStore(path), SQLiteSessionStore(path)
+
+    writer.put('b1', pickle.dumps({'login': True, 'cart': [{'name': 'Blazer', 'quantity': 2}]}))
+    assert reader.get('b1') == {'login': True, 'cart': [{'name': 'Blazer', 'quantity': 2}]}
+    reader.delete('b1')
+    assert writer.get('b1') is None
+
+
+def test_expired_sessions_are_ignored_and_purged(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'sesiones.db'), ttl_hours=0)
+    store.put('b1', pickle.dumps({'login': True}))
+    assert store.get('b1') is None
+    assert store.purge() == 1
+
+
+def test_store_is_off_without_session_store(monkeypatch):
+    monkeypatch.delenv('SESSION_STORE', raising=False)
+    assert session_store.get_session_store() is None
+
+
+def test_sync_restores_then_persists_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv('SESSION_STORE', 'sqlite')
+    monkeypatch.setenv('SESSION_STORE_PATH', str(tmp_path / 'sesiones.db'))
+    monkeypatch.setattr(session_store, 'browser_session_id', lambda: 'b1')
+
+    # Primer proceso: el comprador inicia sesión y llena el carrito
+    first = types.SimpleNamespace(session_state={'login': True, 'cart': [], 'db': object()})
+    monkeypatch.setattr(session_store, 'st', first)
+    session_store.sync_session()
+    first.session_state['cart'].append({'name': 'Blazer', 'quantity': 1})
+    session_store.sync_session()
+
+    # Otro proceso recibe la reconexión del mismo navegador
+    second = types.SimpleNamespace(session_state={})
+    monkeypatch.setattr(session_store, 'st', second)
+    session_store.sync_session()
+    assert second.session_state['login'] is True
+    assert second.session_state['cart'] == [{'name': 'Blazer', 'quantity': 1}]
+    assert 'db' not in second.session_state
+
+    session_store.forget_session()
+    assert session_store.get_session_store().get('b1') is None
@@ -0,0 +1,82 @@
+import pytest
+
+from servicios import reservations, stock_shards
+from servicios.reservations import InsufficientStock
+from tests.conftest import add_product, get_product
+
+
+def shard_stocks(db, product_id):
+    return sorted(doc.to_dict()['stock'] for doc in stock_shards.shard_collection(db, product_id).stream())
+
+
+def product_ref(db, product_id):
+    return db.collection('products').document(product_id)
+
+
+def test_promote_spreads_stock(db):
+    add_product(db, 'a', stock=25)
+    stock_shards.promote(db, 'a', shards=4)
+
+    assert shard_stocks(db, 'a') == [6, 6, 6, 7]
+    assert product_ref(db, 'a').get().to_dict()['stock'] == 0
+    assert get_product(db, 'a')['stock'] == 25
+
+
+def test_promote_rejects_bad_input(db):
+    add_product(db, 'a')
+    with pytest.raises(ValueError):
+        stock_shards.promote(db, 'a', shards=1)
+    with pytest.raises(ValueError):
+        stock_shards.promote(db, 'no-existe')
+    stock_shards.promote(db, 'a', shards=2)
+    with pytest.raises(ValueError):
+        stock_shards.promote(db, 'a', shards=2)
+
+
+def test_decrement_moves_to_other_shards(db):
+    add_product(db, 'a', stock=10)
+    stock_shards.promote(db, 'a', shards=5)
+    product = product_ref(db, 'a').get().to_dict()
+
+    # Más unidades de las que tiene cualquier shard
+    assert stock_shards.decrement(db, product_ref(db, 'a'), product, 7) == (10, 3)
+    assert sum(shard_stocks(db, 'a')) == 3
+    assert min(shard_stocks(db, 'a')) >= 0
+
+
+def test_decrement_refuses_overselling(db):
+    add_product(db, 'a', stock=4)
+    stock_shards.promote(db, 'a', shards=2)
+    product = product_ref(db, 'a').get().to_dict()
+
+    with pytest.raises(InsufficientStock) as error:
+        stock_shards.decrement(db, product_ref(db, 'a'), product, 5)
+
+    assert error.value.lines[0]['available'] == 4
+    assert get_product(db, 'a')['stock'] == 4
+
+
+def test_demote_folds_shards_back(db):
+    add_product(db, 'a', stock=9)
+    stock_shards.promote(db, 'a', shards=3)
+    product = product_ref(db, 'a').get().to_dict()
+    stock_shards.decrement(db, product_ref(db, 'a'), product, 2)
+    stock_shards.demote(db, 'a', grace=0)
+
+    data = product_ref(db, 'a').get().to_dict()
+    assert data['stock'] == 7
+    assert 'stock_shards' not in data and 'shard_writes' not in data
+    assert shard_stocks(db, 'a') == []
+
+
+def test_settlement_after_demote_lands_on_the_product(db):
+    add_product(db, 'a', stock=6)
+    stock_shards.promote(db, 'a', shards=2)
+    reservation = reservations.reserve(db, [{'product_id': 'a', 'name': 'A', 'quantity': 2}], 'u1')
+    # La retención guardó el shard que recibió su Increment
+    stock_shards.demote(db, 'a', grace=0)
+    reservations.convert_reservation(db, reservation['id'])
+
+    data = get_product(db, 'a')
+    assert (data['stock'], data['reserved']) == (4, 0)
+    assert shard_stocks(db, 'a') == []
@@ -0,0 +1,42 @@
+from servicios import stock_shards
+from servicios.catalog import catalog_pointer
+from servicios.store import BACKORDERS_COLLECTION, Store
+
+from tests.conftest import add_product, get_product
+
+
+def test_decrement_stock_takes_available_units(db):
+    add_product(db, 'a', name='Blazer', stock=5)
+
+    assert Store(db).decrement_stock('Blazer', 3) == [(5, 2, 0)]
+    assert get_product(db, 'a')['stock'] == 2
+    assert Store(db).pending_backorders() == []
+
+
+def test_short_stock_after_payment_is_backordered(db):
+    add_product(db, 'a', name='Blazer', stock=2)
+
+    assert Store(db).decrement_stock('Blazer', 5, order_number='ORD-1') == [(2, 0, 3)]
+    assert get_product(db, 'a')['stock'] == 0
+    assert get_product(db, 'a')['backordered'] == 3
+    [backorder] = Store(db).pending_backorders()
+    assert (backorder['product_id'], backorder['quantity'], backorder['order_number']) == ('a', 3, 'ORD-1')
+
+
+def test_short_sharded_stock_is_backordered(db):
+    add_product(db, 'a', name='Blazer', stock=4)
+    stock_shards.promote(db, 'a', shards=2)
+
+    assert Store(db).decrement_stock('Blazer', 6) == [(4, 0, 2)]
+    assert get_product(db, 'a')['stock'] == 0
+    assert len(list(db.collection(BACKORDERS_COLLECTION).stream())) == 1
+
+
+def test_decrement_stock_only_touches_the_published_version(db):
+    add_product(db, 'old', name='Blazer', stock=5, catalog_version='v1')
+    add_product(db, 'new', name='Blazer', stock=5, catalog_version='v2')
+    catalog_pointer(db).set({'version': 'v2'})
+
+    assert Store(db).decrement_stock('Blazer', 1) == [(5, 4, 0)]
+    assert get_product(db, 'old')['stock'] == 5
+    assert get_product(db, 'new')['stock'] == 4
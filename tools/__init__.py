@@ -0,0 +1 @@
+"""Herramientas de línea de comandos (ejecutar con `python -m tools.<nombre>`)"""
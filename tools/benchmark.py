@@ -0,0 +1,352 @@
+"""Benchmarks offline de las páginas con Firestore y Stripe en memoria.
+
+Uso:
+    python -m tools.benchmark                       # todos los escenarios, 20 iteraciones
+    python -m tools.benchmark --iterations 50 --scenario add_to_cart
+    python -m tools.benchmark --json bench.json     # guarda los resultados
+    python -m tools.benchmark --baseline bench.json # compara y falla si la mediana empeora
+    python -m tools.benchmark --backend sqlite      # motor SQLite en lugar de memoria
+
+Ejecuta app.py, pages/catalogo.py y pages/compraok.py sin navegador con el
+AppTest de Streamlit, contra MemoryFirestore (o SQLiteFirestore en un fichero
+temporal) y MemoryStripe. Por escenario
+informa los percentiles de latencia y las lecturas/escrituras de Firestore
+por operación.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+from servicios.catalog import invalidate_catalog, seed_sample_products
+from servicios.checkout_sessions import save_checkout_session
+from servicios.memory_firestore import MemoryFirestore
+from servicios.memory_stripe import MemoryStripe
+from servicios.payments import use_stripe_client
+from servicios.reservations import reserve
+from servicios.sqlite_firestore import SQLiteFirestore
+from servicios.warmup import use_firestore_client
+
+APP_PATH = os.path.abspath('app.py')
+CATALOG_PATH = os.path.abspath('pages/catalogo.py')
+
+DEFAULT_ITERATIONS = 20
+DEFAULT_TIMEOUT = 30
+
+BACKENDS = ('memory', 'sqlite')
+
+# Stock de cada producto, para que las compras y retenciones no lo agoten
+BENCH_STOCK = 1_000_000
+
+BENCH_USER = {
+    'uid': 'bench-user-0001',
+    'nombre': 'Usuario Benchmark',
+    'email': 'benchmark@example.com',
+    'foto': ''
+}
+
+
+def cart_item(product, quantity=1):
+    """Línea de carrito con el mismo formato que add_to_cart_improved"""
+    return {
+        'name': product['name'],
+        'price': product['price'],
+        'quantity': quantity,
+        'image': product.get('image', ''),
+        'product_id': product.get('id', ''),
+        'category': product.get('category', 'general')
+    }
+
+
+class BenchContext:
+    """Base de datos, Stripe y catálogo compartidos por los escenarios"""
+
+    def __init__(self, user=BENCH_USER, backend='memory'):
+        if backend == 'sqlite':
+            self.db = SQLiteFirestore(os.path.join(tempfile.mkdtemp(prefix='bench-'), 'tienda.db'))
+        else:
+            self.db = MemoryFirestore()
+        # Las páginas usan el cliente compartido instrumentado, como en producción
+        self.client = use_firestore_client(self.db)
+        self.stripe = MemoryStripe()
+        use_stripe_client(self.stripe)
+        invalidate_catalog()
+        self.products = seed_sample_products(self.db)
+        for product in self.products:
+            product['stock'] = BENCH_STOCK
+            self.db.collection('products').document(product['id']).update({'stock': BENCH_STOCK})
+        self.user = dict(user)
+
+    def catalog_session(self, cart=None):
+        """Sesión de catálogo con el usuario ya logueado (sin ejecutar)"""
+        at = AppTest.from_file(CATALOG_PATH, default_timeout=DEFAULT_TIMEOUT)
+        at.session_state['login'] = True
+        at.session_state['usuario'] = dict(self.user)
+        at.session_state['db'] = self.client
+        at.session_state['cart'] = [dict(item) for item in (cart or [])]
+        at.session_state['cart_loaded'] = True
+        if cart:
+            # El carrito persistido, como lo deja add_to_cart_improved
+            self.db.collection('carts').document(self.user['uid']).set({
+                'user_id': self.user['uid'],
+                'items': [dict(item) for item in cart]
+            })
+        return at
+
+    def app_session(self, query_params=None):
+        """Sesión de app.py con la inicialización de has_run ya hecha (sin ejecutar)"""
+        at = AppTest.from_file(APP_PATH, default_timeout=DEFAULT_TIMEOUT)
+        at.session_state['has_run'] = True
+        at.session_state['db'] = self.client
+        at.session_state['redirect_uri'] = 'http://localhost:8501'
+        at.session_state['google_client_id'] = 'bench-client-id'
+        at.session_state['google_client_secret'] = 'bench-client-secret'
+        at.session_state['cart'] = []
+        for name, value in (query_params or {}).items():
+            at.query_params[name] = value
+        return at
+
+    def paid_checkout_session(self, cart):
+        """Crea una sesión de Stripe pagada, con su retención de stock y su checkout_session"""
+        session = self.stripe.checkout.Session.create(
+            mode='payment',
+            customer_email=self.user['email'],
+            line_items=[{
+                'price_data': {'currency': 'usd', 'unit_amount': int(item['price'] * 100)},
+                'quantity': item['quantity']
+            } for item in cart]
+        )
+        reservation = reserve(self.db, cart, self.user['uid'])
+        save_checkout_session(self.db, session.id, self.user, cart, reservation=reservation)
+        return session.id
+
+
+def button_key(at, prefix):
+    """Key del primer botón cuya key empieza por `prefix`"""
+    for button in at.button:
+        if button.key and button.key.startswith(prefix):
+            return button.key
+    raise LookupError(f"No hay ningún botón '{prefix}*' en la página")
+
+
+def fragment_ids(at, fragment_hint):
+    """Ids de los fragmentos registrados cuya función contiene `fragment_hint` en el nombre"""
+    found = []
+    for fragment_id, fragment in at._fragment_storage._fragments.items():
+        # Los ids son hashes: el nombre está en la función original que envuelve st.fragment
+        cells = dict(zip(fragment.__code__.co_freevars, fragment.__closure__ or ()))
+        func = cells['non_optional_func'].cell_contents if 'non_optional_func' in cells else None
+        if func is not None and fragment_hint in func.__name__:
+            found.append(fragment_id)
+    if not found:
+        raise LookupError(f"No hay ningún fragmento '{fragment_hint}' registrado")
+    return found
+
+
+@contextmanager
+def fragment_click(at, fragment_hint):
+    """Simula al navegador: un widget dentro de un fragmento solo reejecuta ese fragmento.
+
+    AppTest siempre envía ejecuciones completas, así que se añade el id del
+    fragmento (el que contiene `fragment_hint`) a la petición de reejecución.
+    """
+    fragment_id_queue = fragment_ids(at, fragment_hint)[:1]
+    original = local_script_runner.RerunData
+
+    def rerun_data(**kwargs):
+        kwargs['fragment_id_queue'] = fragment_id_queue
+        return original(**kwargs)
+
+    local_script_runner.RerunData = rerun_data
+    try:
+        yield
+    finally:
+        local_script_runner.RerunData = original
+
+
+def timed(ctx, action):
+    """Ejecuta `action` y devuelve (ms, lecturas, escrituras, consultas)"""
+    ctx.db.reset_stats()
+    start = time.perf_counter()
+    at = action()
+    elapsed = (time.perf_counter() - start) * 1000
+    if at is not None and at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return elapsed, ctx.db.stats['reads'], ctx.db.stats['writes'], ctx.db.stats['queries']
+
+
+# --- ESCENARIOS ---
+
+def scenario_login_page(ctx, iterations):
+    """app.py sin usuario: tarjeta de login"""
+    return [timed(ctx, lambda: ctx.app_session().run()) for _ in range(iterations)]
+
+
+def scenario_catalog_load(ctx, iterations):
+    """Primera ejecución del catálogo en una sesión nueva"""
+    return [timed(ctx, lambda: ctx.catalog_session().run()) for _ in range(iterations)]
+
+
+def scenario_add_to_cart(ctx, iterations):
+    """Clic en 'Agregar al Carrito' (el callback reejecuta solo el carrito)"""
+    at = ctx.catalog_session()
+    at.run()
+    samples = []
+    for _ in range(iterations):
+        key = button_key(at, 'add_product_')
+        samples.append(timed(ctx, lambda: at.button(key=key).click().run()))
+        # Volver a pintar la página completa para tener el grid en el árbol de AppTest
+        at.run()
+    return samples
+
+
+def scenario_quantity_change(ctx, iterations):
+    """Clic en '+' de una línea del carrito (ejecución del fragmento del carrito)"""
+    at = ctx.catalog_session(cart=[cart_item(ctx.products[0])])
+    at.run()
+    samples = []
+    for _ in range(iterations):
+        key = button_key(at, 'increase_0')
+        with fragment_click(at, 'cart'):
+            samples.append(timed(ctx, lambda: at.button(key=key).click().run()))
+    return samples
+
+
+def scenario_simulated_checkout(ctx, iterations):
+    """Compra simulada completa desde el carrito (orden, stock, preferencias, limpieza)"""
+    samples = []
+    for _ in range(iterations):
+        at = ctx.catalog_session(cart=[cart_item(ctx.products[0]), cart_item(ctx.products[1], 2)])
+        at.run()
+        key = button_key(at, 'simulated_checkout_')
+        samples.append(timed(ctx, lambda: at.button(key=key).click().run()))
+    return samples
+
+
+def scenario_stripe_return(ctx, iterations):
+    """Vuelta de Stripe: app.py con ?payment=success redirige a compraok.py y guarda la orden"""
+    samples = []
+    for _ in range(iterations):
+        cart = [cart_item(ctx.products[2]), cart_item(ctx.products[3])]
+        session_id = ctx.paid_checkout_session(cart)
+        samples.append(timed(ctx, lambda: ctx.app_session({'payment': 'success', 'session_id': session_id}).run()))
+    return samples
+
+
+SCENARIOS = {
+    'login_page': scenario_login_page,
+    'catalog_load': scenario_catalog_load,
+    'add_to_cart': scenario_add_to_cart,
+    'quantity_change': scenario_quantity_change,
+    'simulated_checkout': scenario_simulated_checkout,
+    'stripe_return': scenario_stripe_return
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    """Percentiles de latencia y operaciones de Firestore por iteración"""
+    latencies = [sample[0] for sample in samples]
+    return {
+        'iterations': len(samples),
+        'p50_ms': round(percentile(latencies, 0.50), 1),
+        'p90_ms': round(percentile(latencies, 0.90), 1),
+        'p99_ms': round(percentile(latencies, 0.99), 1),
+        'max_ms': round(max(latencies), 1),
+        'reads': round(statistics.mean(sample[1] for sample in samples), 1),
+        'writes': round(statistics.mean(sample[2] for sample in samples), 1),
+        'queries': round(statistics.mean(sample[3] for sample in samples), 1)
+    }
+
+
+def run_benchmarks(names, iterations, warmup=1, backend='memory'):
+    """Ejecuta los escenarios indicados y devuelve {escenario: resumen}"""
+    results = {}
+    for name in names:
+        ctx = BenchContext(backend=backend)
+        samples = SCENARIOS[name](ctx, iterations + warmup)[warmup:]
+        results[name] = summarize(samples)
+    return results
+
+
+def print_results(results, baseline=None):
+    print(f"{'Escenario':<20}{'n':>4}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'lect.':>8}{'escr.':>8}{'cons.':>8}")
+    for name, result in results.items():
+        line = (f"{name:<20}{result['iterations']:>4}{result['p50_ms']:>9.1f}{result['p90_ms']:>9.1f}"
+                f"{result['p99_ms']:>9.1f}{result['max_ms']:>9.1f}{result['reads']:>8.1f}"
+                f"{result['writes']:>8.1f}{result['queries']:>8.1f}")
+        if baseline and name in baseline:
+            previous = baseline[name]['p50_ms']
+            line += f"   p50 {((result['p50_ms'] - previous) / previous * 100 if previous else 0):+.0f}%"
+        print(line)
+
+
+def regressions(results, baseline, tolerance):
+    """Escenarios cuya mediana o lecturas/escrituras empeoran respecto a la referencia"""
+    found = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if result['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+            found.append(f"{name}: p50 {previous['p50_ms']} -> {result['p50_ms']} ms")
+        for field in ('reads', 'writes'):
+            if result[field] > previous[field]:
+                found.append(f"{name}: {field} {previous[field]} -> {result[field]}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline de las páginas (AppTest + Firestore/Stripe en memoria)")
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help="Escenario (repetible; por defecto todos)")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help="Iteraciones medidas por escenario")
+    parser.add_argument('--warmup', type=int, default=1, help="Iteraciones iniciales descartadas")
+    parser.add_argument('--backend', default='memory', choices=BACKENDS, help="Motor de datos de las páginas")
+    parser.add_argument('--payment-delay', type=float, default=0.0, help="Segundos del pago simulado (por defecto 0)")
+    parser.add_argument('--json', help="Guarda los resultados en este fichero")
+    parser.add_argument('--baseline', help="Resultados de referencia para comparar")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Empeoramiento de p50 tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    os.environ['SIMULATED_PAYMENT_DELAY'] = str(args.payment_delay)
+    # AppTest avisa de cada llamada fuera de una ejecución de script
+    for logger_name in ('streamlit.runtime.scriptrunner_utils.script_run_context',
+                        'streamlit.runtime.state.session_state_proxy'):
+        logging.getLogger(logger_name).addFilter(lambda record: record.levelno >= logging.ERROR)
+
+    results = run_benchmarks(args.scenario or list(SCENARIOS), args.iterations, args.warmup, args.backend)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if baseline:
+        found = regressions(results, baseline, args.tolerance)
+        if found:
+            print("❌ Regresiones:")
+            for regression in found:
+                print(f"   {regression}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Genera los recursos estáticos con huella en static/.
+
+Uso:
+    python -m tools.build_assets
+
+Minifica el CSS de estilos/css_<nombre>.html, genera las variantes del logo
+y escribe static/manifest.json. Las páginas los usan automáticamente; con
+ASSETS_BASE_URL definida se sirven por URL (p. ej. el sidecar con
+SIDECAR_PORT=8502 y ASSETS_BASE_URL=http://localhost:8502/static).
+"""
+import argparse
+import json
+import os
+import shutil
+
+from servicios.assets import (LOGO_PATH, LOGO_VARIANTS, MANIFEST_PATH, STATIC_DIR, STYLESHEETS,
+                              fingerprint, read_stylesheet, render_logo)
+
+
+def write_asset(directory, stem, extension, content):
+    """Escribe `content` como <directorio>/<stem>.<hash>.<ext> y devuelve la ruta relativa a static/"""
+    relative_path = f"{directory}/{stem}.{fingerprint(content)}.{extension}"
+    full_path = os.path.join(STATIC_DIR, relative_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, 'wb') as file:
+        file.write(content)
+    return relative_path
+
+
+def build_assets(clean=True):
+    """Construye CSS y logos y devuelve el manifiesto"""
+    if clean:
+        for directory in ('css', 'img'):
+            shutil.rmtree(os.path.join(STATIC_DIR, directory), ignore_errors=True)
+
+    manifest = {'css': {}, 'images': {}}
+    for name in STYLESHEETS:
+        css, links = read_stylesheet(name)
+        manifest['css'][name] = {
+            'file': write_asset('css', name, 'css', css.encode('utf-8')),
+            'links': links
+        }
+
+    for variant, (width, image_format) in LOGO_VARIANTS.items():
+        extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+        manifest['images'][variant] = write_asset('img', variant, extension, render_logo(width, image_format, LOGO_PATH))
+
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minifica y versiona el CSS y el logo en static/")
+    parser.add_argument('--keep', action='store_true', help="No borra los recursos de builds anteriores")
+    args = parser.parse_args()
+
+    manifest = build_assets(clean=not args.keep)
+
+    for name, entry in manifest['css'].items():
+        original = os.path.getsize(os.path.join('estilos', f"css_{name}.html"))
+        built = os.path.getsize(os.path.join(STATIC_DIR, entry['file']))
+        print(f"🎨 {entry['file']}: {original / 1024:.1f} KB -> {built / 1024:.1f} KB")
+    for variant, path in manifest['images'].items():
+        print(f"🖼️ {path}: {os.path.getsize(os.path.join(STATIC_DIR, path)) / 1024:.1f} KB")
+    print(f"✅ Manifiesto escrito en {MANIFEST_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Construye el modelo de co-compra a partir de la colección 'orders'.
+
+Uso:
+    python -m tools.build_recommendations --out models/copurchase.npz --top-n 20
+
+Lee las órdenes por páginas con cursores y guarda un .npz con los `top-n`
+productos más similares (coseno sobre co-compras) de cada producto. La web
+lo recarga automáticamente cuando el fichero cambia.
+"""
+import argparse
+import time
+
+from servicios.firebase import get_firestore_client
+from servicios.order_export import iter_orders
+from servicios.recommendations import DEFAULT_TOP_N, MODEL_PATH, CoPurchaseMatrixBuilder, save_model
+
+
+def build_recommendations(db, out_path, top_n=DEFAULT_TOP_N, min_support=1, page_size=500, progress=None):
+    """Recorre las órdenes, construye la tabla de vecinos y la guarda en `out_path`"""
+    builder = CoPurchaseMatrixBuilder()
+    orders = 0
+    for doc in iter_orders(db, page_size=page_size):
+        builder.add_order(doc.to_dict().get('items', []))
+        orders += 1
+        if progress and orders % 10_000 == 0:
+            progress(f"📦 {orders} órdenes procesadas...")
+
+    keys, names, neighbors, scores = builder.build(top_n=top_n, min_support=min_support)
+    save_model(out_path, keys, names, neighbors, scores)
+    return {'orders': orders, 'products': len(keys), 'pairs': int((neighbors >= 0).sum())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el modelo de recomendaciones por co-compra")
+    parser.add_argument('--out', default=MODEL_PATH, help="Ruta del modelo .npz")
+    parser.add_argument('--top-n', type=int, default=DEFAULT_TOP_N, help="Vecinos guardados por producto")
+    parser.add_argument('--min-support', type=int, default=1, help="Mínimo de órdenes compartidas por par")
+    parser.add_argument('--page-size', type=int, default=500, help="Órdenes leídas por consulta")
+    parser.add_argument('--key', default='serviceAccountKey.json', help="Credenciales de Firebase")
+    args = parser.parse_args()
+
+    db = get_firestore_client(args.key)
+
+    start = time.perf_counter()
+    summary = build_recommendations(db, args.out, args.top_n, args.min_support, args.page_size, progress=print)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Modelo guardado en {args.out} ({summary['products']} productos, "
+          f"{summary['pairs']} vecinos) a partir de {summary['orders']} órdenes en {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Mantenimiento masivo del catálogo desde la línea de comandos.
+
+Uso:
+    python -m tools.catalog_admin status
+    python -m tools.catalog_admin publish catalogo.json --workers 16
+    python -m tools.catalog_admin prices --percent -10 --category vestidos
+    python -m tools.catalog_admin stock --add 5
+    python -m tools.catalog_admin reseed
+    python -m tools.catalog_admin truncate --force
+    python -m tools.catalog_admin promote --product <id> --shards 20   # producto caliente
+    python -m tools.catalog_admin demote --product <id>
+
+Las escrituras van en lotes de 500 confirmados en paralelo (o con el
+BulkWriter de Firestore, --method bulk_writer). publish y reseed escriben una
+versión nueva y cambian el puntero del catálogo al final, así que la tienda
+nunca muestra un catálogo a medias. promote y demote reparten (o juntan)
+el stock de un producto en shards sin parar las ventas. --target elige el
+motor igual que tools.generate_data (firestore, emulator, sqlite).
+"""
+import argparse
+import json
+import sys
+
+from servicios import catalog_maintenance, stock_shards
+from servicios.bulk_writes import DEFAULT_WORKERS, MAX_BATCH_SIZE
+from servicios.stock_shards import DEFAULT_SHARDS
+from servicios.store import DEFAULT_SQLITE_PATH
+from tools.generate_data import connect
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vacía, publica o actualiza el catálogo en lotes")
+    parser.add_argument('action', choices=['status', 'publish', 'reseed', 'prices', 'stock', 'truncate',
+                                           'promote', 'demote'])
+    parser.add_argument('file', nargs='?', help="JSON con la lista de productos (publish)")
+    parser.add_argument('--percent', type=float, help="Cambio de precio en % (prices)")
+    parser.add_argument('--set', type=int, dest='stock', help="Stock fijo (stock)")
+    parser.add_argument('--add', type=int, dest='delta', help="Unidades a sumar o restar (stock)")
+    parser.add_argument('--category', help="Solo los productos de esta categoría (prices, stock)")
+    parser.add_argument('--product', help="ID del producto (promote, demote)")
+    parser.add_argument('--shards', type=int, default=DEFAULT_SHARDS, help="Shards del producto caliente (promote)")
+    parser.add_argument('--target', default='firestore', choices=['sqlite', 'emulator', 'firestore'])
+    parser.add_argument('--sqlite-path', default=DEFAULT_SQLITE_PATH, help="Fichero del motor SQLite")
+    parser.add_argument('--method', default='batch', choices=['batch', 'bulk_writer'],
+                        help="Lotes paralelos propios o BulkWriter de Firestore")
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE, help="Escrituras por lote")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Lotes confirmados en paralelo")
+    parser.add_argument('--force', action='store_true', help="Necesario para truncate")
+    parser.add_argument('--key', default='serviceAccountKey.json', help="Credenciales de Firebase")
+    args = parser.parse_args()
+
+    if args.action == 'truncate' and not args.force:
+        print("❌ Vaciar el catálogo requiere --force")
+        sys.exit(1)
+    if args.action == 'publish' and not args.file:
+        parser.error("publish necesita el fichero JSON con los productos")
+    if args.action == 'prices' and args.percent is None:
+        parser.error("prices necesita --percent")
+    if args.action in ('promote', 'demote') and not args.product:
+        parser.error(f"{args.action} necesita --product")
+
+    db = connect(args.target, args.key, args.sqlite_path)
+    options = {'loader_options': {'batch_size': args.batch_size, 'workers': args.workers, 'method': args.method},
+               'progress': print}
+
+    if args.action == 'status':
+        status = catalog_maintenance.catalog_status(db)
+        if status:
+            print(f"📚 Versión {status['version']} · {status['products']:,} productos · publicada {status['published_at']}")
+        else:
+            print("📚 El catálogo no tiene versiones publicadas")
+    elif args.action == 'publish':
+        with open(args.file, encoding='utf-8') as f:
+            catalog_maintenance.publish_catalog(db, json.load(f), **options)
+    elif args.action == 'reseed':
+        catalog_maintenance.reseed_catalog(db, **options)
+    elif args.action == 'prices':
+        catalog_maintenance.adjust_prices(db, args.percent, args.category, **options)
+    elif args.action == 'stock':
+        catalog_maintenance.set_stock(db, args.stock, args.delta, args.category, **options)
+    elif args.action == 'promote':
+        stock_shards.promote(db, args.product, args.shards)
+        print(f"🔥 {args.product}: stock repartido en {args.shards} shards")
+    elif args.action == 'demote':
+        stock_shards.demote(db, args.product)
+        print(f"❄️ {args.product}: stock de vuelta en un solo documento")
+    else:
+        catalog_maintenance.truncate_catalog(db, **options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Varios procesos de Streamlit detrás de un proxy con afinidad de sesión.
+
+Uso:
+    python -m tools.cluster --workers 4                       # http://localhost:8501
+    python -m tools.cluster --workers 4 --port 8080 -- --server.maxUploadSize 5
+    python -m tools.cluster --workers 2 --offline --stock 1000000   # sin credenciales (pruebas de carga)
+
+Arranca `--workers` servidores (tools.serve, o tools.offline_server con
+--offline) en los puertos siguientes a --port y delante el proxy de
+servicios/sticky_proxy.py. Los procesos comparten el estado de sesión
+(SESSION_STORE=sqlite) y el catálogo (CATALOG_SNAPSHOT_DIR); en modo
+--offline comparten además un motor SQLite en lugar de Firestore. Si un
+proceso termina se vuelve a arrancar, y sus compradores siguen con su login
+y su carrito en otro proceso mientras tanto.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from servicios.sticky_proxy import StickyProxy
+
+# Segundos de espera a que cada proceso responda en /_stcore/health
+STARTUP_TIMEOUT = 90
+
+# Segundos entre comprobaciones de los procesos
+SUPERVISE_EVERY = 1
+
+
+def worker_command(port, offline, sqlite_path, stock, payment_delay, streamlit_args):
+    if offline:
+        command = [sys.executable, '-m', 'tools.offline_server', '--port', str(port), '--sqlite-path', sqlite_path,
+                   '--payment-delay', str(payment_delay)]
+        if stock is not None:
+            command += ['--stock', str(stock)]
+        return command + list(streamlit_args)
+    return [sys.executable, '-m', 'tools.serve', '--', '--server.port', str(port), '--server.headless', 'true',
+            *streamlit_args]
+
+
+def wait_healthy(port, process, timeout=STARTUP_TIMEOUT):
+    """Espera a que el proceso responda en /_stcore/health"""
+    health_url = f"http://127.0.0.1:{port}/_stcore/health"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El proceso del puerto {port} terminó con código {process.returncode}")
+        try:
+            with urllib.request.urlopen(health_url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"El proceso del puerto {port} no respondió en {health_url}")
+
+
+class Cluster:
+    """Procesos de Streamlit supervisados: se reinician si terminan"""
+
+    def __init__(self, ports, command, env, quiet=False):
+        self.ports = ports
+        self.command = command
+        self.env = env
+        self.output = subprocess.DEVNULL if quiet else None
+        self.processes = {}
+        self.restarts = 0
+        self._stopping = threading.Event()
+
+    def start(self):
+        for port in self.ports:
+            self.processes[port] = subprocess.Popen(self.command(port), env=self.env,
+                                                    stdout=self.output, stderr=self.output)
+        for port in self.ports:
+            wait_healthy(port, self.processes[port])
+
+    def supervise(self):
+        while not self._stopping.wait(SUPERVISE_EVERY):
+            for port, process in list(self.processes.items()):
+                if process.poll() is not None and not self._stopping.is_set():
+                    print(f"♻️ El proceso del puerto {port} terminó ({process.returncode}); reiniciando", flush=True)
+                    self.processes[port] = subprocess.Popen(self.command(port), env=self.env,
+                                                            stdout=self.output, stderr=self.output)
+                    self.restarts += 1
+
+    def stop(self):
+        self._stopping.set()
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def prepare_offline_database(sqlite_path, stock):
+    """Siembra el motor SQLite compartido una sola vez, antes de arrancar los procesos"""
+    from servicios.sqlite_firestore import SQLiteFirestore
+    from tools.offline_server import seed_database
+
+    db = SQLiteFirestore(sqlite_path)
+    seed_database(db, stock)
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arranca varios procesos de Streamlit tras un proxy con afinidad")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Procesos de Streamlit")
+    parser.add_argument('--port', type=int, default=8501, help="Puerto del proxy (los procesos usan los siguientes)")
+    parser.add_argument('--host', default='0.0.0.0', help="Interfaz del proxy")
+    parser.add_argument('--offline', action='store_true', help="Procesos de tools.offline_server sobre un SQLite común")
+    parser.add_argument('--stock', type=int, help="Stock inicial de cada producto (--offline)")
+    parser.add_argument('--payment-delay', type=float, default=0.0, help="Segundos del pago simulado (--offline)")
+    parser.add_argument('--state-dir', help="Directorio de sesiones, instantánea del catálogo y SQLite (--offline)")
+    parser.add_argument('--quiet', action='store_true', help="Sin la salida de los procesos")
+    parser.add_argument('streamlit_args', nargs='*', help="Opciones adicionales para streamlit run")
+    args = parser.parse_args()
+
+    state_dir = args.state_dir or tempfile.mkdtemp(prefix='tienda-cluster-')
+    os.makedirs(state_dir, exist_ok=True)
+    sqlite_path = os.path.join(state_dir, 'tienda.db')
+
+    env = dict(os.environ)
+    env.setdefault('SESSION_STORE', 'sqlite')
+    env.setdefault('SESSION_STORE_PATH', os.path.join(state_dir, 'sesiones.db'))
+    env.setdefault('CATALOG_SNAPSHOT_DIR', os.path.join(state_dir, 'catalogo'))
+    # El sidecar usa un puerto fijo: con varios procesos solo podría arrancar uno
+    env.pop('SIDECAR_PORT', None)
+    if args.offline:
+        prepare_offline_database(sqlite_path, args.stock)
+
+    ports = [args.port + 1 + index for index in range(args.workers)]
+    def command(port):
+        return worker_command(port, args.offline, sqlite_path, args.stock, args.payment_delay, args.streamlit_args)
+
+    cluster = Cluster(ports, command, env, quiet=args.quiet)
+    # terminate() del proceso padre (p. ej. tools.load_test) también para los procesos
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"🚀 Arrancando {args.workers} procesos ({', '.join(map(str, ports))})...", flush=True)
+    try:
+        cluster.start()
+        threading.Thread(target=cluster.supervise, name='cluster-supervisor', daemon=True).start()
+
+        proxy = StickyProxy([('127.0.0.1', port) for port in ports])
+        print(f"✅ Proxy con afinidad en http://{args.host}:{args.port} · estado en {state_dir}", flush=True)
+        asyncio.run(proxy.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cluster.stop()
+        if not args.state_dir:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Exporta la colección 'orders' a ficheros Parquet/CSV para análisis offline.
+
+Uso:
+    python -m tools.export_orders --out exports/orders
+    python -m tools.export_orders --out exports/orders --format csv --full --overwrite
+
+Por defecto es incremental: solo lee las órdenes posteriores, por
+(created_at, ID), a la última exportación guardada en
+<out>/export_state.json. --full no escribe sobre una exportación anterior
+salvo con --overwrite, que la borra. Con la variable FIRESTORE_EMULATOR_HOST
+definida se conecta al emulador de Firestore.
+"""
+import argparse
+import sys
+import time
+
+from servicios.firebase import get_firestore_client
+from servicios.order_export import DEFAULT_CHUNK_ROWS, DEFAULT_PAGE_SIZE, export_orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta órdenes de Firestore a Parquet/CSV")
+    parser.add_argument('--out', default='exports/orders', help="Directorio de salida")
+    parser.add_argument('--format', default='auto', choices=['auto', 'parquet', 'csv'])
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help="Órdenes leídas por consulta")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help="Filas máximas por fichero")
+    parser.add_argument('--full', action='store_true', help="Ignora la marca de agua y exporta todo")
+    parser.add_argument('--overwrite', action='store_true', help="Con --full, borra antes la exportación de --out")
+    parser.add_argument('--key', default='serviceAccountKey.json', help="Credenciales de Firebase")
+    args = parser.parse_args()
+
+    db = get_firestore_client(args.key)
+
+    start = time.perf_counter()
+    try:
+        summary = export_orders(
+            db,
+            args.out,
+            file_format=args.format,
+            page_size=args.page_size,
+            chunk_rows=args.chunk_rows,
+            incremental=not args.full,
+            progress=print,
+            overwrite=args.overwrite
+        )
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ {summary['orders']} órdenes y {summary['line_items']} líneas exportadas en {elapsed:.1f}s")
+    print(f"📁 {len(summary['files'])} ficheros escritos en {args.out}")
+    print(f"🔖 Marca de agua: {summary['state']['last_created_at']}")
+
+
+if __name__ == "__main__":
+    main()
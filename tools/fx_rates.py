@@ -0,0 +1,83 @@
+"""Tabla de tipos de cambio de la tienda (settings/fx_rates).
+
+Uso:
+    python -m tools.fx_rates show
+    python -m tools.fx_rates set EUR=0.92 MXN=18.3 CLP=940
+    python -m tools.fx_rates fetch --url https://open.er-api.com/v6/latest/USD
+
+Los tipos son unidades de cada moneda por 1 USD (BASE_CURRENCY). fetch
+acepta cualquier JSON con una clave 'rates' sobre esa base y guarda solo
+las monedas admitidas (servicios/currency.py). Los procesos de la tienda
+recalculan las columnas de precios al recargar el catálogo; en este nodo
+la instantánea compartida se invalida al momento. --target elige el motor
+igual que tools.generate_data (firestore, emulator, sqlite).
+"""
+import argparse
+import sys
+
+from servicios.currency import BASE_CURRENCY, CURRENCIES, get_rates, set_rates
+from servicios.store import DEFAULT_SQLITE_PATH
+from tools.generate_data import connect
+
+# Segundos de espera a la API de tipos de cambio
+FETCH_TIMEOUT = 10
+
+
+def parse_rates(pairs):
+    """['EUR=0.92', ...] -> {'EUR': 0.92, ...}"""
+    rates = {}
+    for pair in pairs:
+        currency, _, rate = pair.partition('=')
+        try:
+            rates[currency.strip().upper()] = float(rate)
+        except ValueError:
+            raise ValueError(f"Tipo no válido: {pair} (formato MONEDA=tipo)")
+    return rates
+
+
+def fetch_rates(url):
+    """Tipos de las monedas admitidas desde una API JSON con base BASE_CURRENCY"""
+    import requests
+
+    response = requests.get(url, timeout=FETCH_TIMEOUT)
+    response.raise_for_status()
+    data = response.json()
+    base = data.get('base') or data.get('base_code') or BASE_CURRENCY
+    if base.upper() != BASE_CURRENCY:
+        raise ValueError(f"La API devuelve tipos sobre {base}, no sobre {BASE_CURRENCY}")
+    return {currency: rate for currency, rate in data['rates'].items() if currency in CURRENCIES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta o actualiza los tipos de cambio de la tienda")
+    parser.add_argument('action', choices=['show', 'set', 'fetch'])
+    parser.add_argument('rates', nargs='*', help="Tipos MONEDA=tipo por 1 USD (set)")
+    parser.add_argument('--url', help="API JSON con los tipos (fetch)")
+    parser.add_argument('--target', default='firestore', choices=['sqlite', 'emulator', 'firestore'])
+    parser.add_argument('--sqlite-path', default=DEFAULT_SQLITE_PATH, help="Fichero del motor SQLite")
+    parser.add_argument('--key', default='serviceAccountKey.json', help="Credenciales de Firebase")
+    args = parser.parse_args()
+
+    if args.action == 'set' and not args.rates:
+        parser.error("set necesita al menos un tipo MONEDA=tipo")
+    if args.action == 'fetch' and not args.url:
+        parser.error("fetch necesita --url")
+
+    db = connect(args.target, args.key, args.sqlite_path)
+    try:
+        if args.action == 'set':
+            rates = set_rates(db, parse_rates(args.rates))
+        elif args.action == 'fetch':
+            rates = set_rates(db, fetch_rates(args.url), source=args.url)
+        else:
+            rates = get_rates(db)
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+
+    for currency, rate in sorted(rates.items()):
+        print(f"💱 1 {BASE_CURRENCY} = {rate:g} {currency}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Mide el tiempo de importación de cada página y lo compara con su presupuesto.
+
+Uso:
+    python -m tools.import_budget               # informe; sale con código 1 si alguna página se pasa
+    python -m tools.import_budget --update      # recalcula import_budget.json
+    python -m tools.import_budget --report importtime.json
+
+Para cada página se ejecutan sus imports de nivel superior en un intérprete
+nuevo con `python -X importtime`, después de importar streamlit (que el
+servidor ya tiene cargado). Se toma la mediana de varias ejecuciones.
+"""
+import argparse
+import ast
+import json
+import statistics
+import subprocess
+import sys
+
+PAGES = ['app.py', 'pages/catalogo.py', 'pages/compraok.py', 'pages/mis_pedidos.py', 'pages/admin.py']
+
+BUDGET_PATH = 'import_budget.json'
+
+# Margen al recalcular presupuestos: mediana * factor + ms fijos
+BUDGET_FACTOR = 1.5
+BUDGET_SLACK_MS = 10
+
+
+def page_imports(path):
+    """Sentencias import de nivel superior de una página, como código fuente"""
+    with open(path, 'r', encoding='utf-8') as file:
+        tree = ast.parse(file.read(), filename=path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def parse_importtime(stderr):
+    """Convierte la salida de -X importtime en [(módulo, acumulado_us, nivel)]"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(cumulative), depth))
+    return entries
+
+
+def measure_page(path):
+    """(ms de importación, [(módulo, ms)] de nivel superior) de una ejecución"""
+    code = '\n'.join(['import streamlit'] + page_imports(path))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True)
+    entries = parse_importtime(result.stderr)
+
+    # Todo lo importado después de streamlit es coste de la página
+    streamlit_index = next(i for i, (name, _, depth) in enumerate(entries)
+                           if name == 'streamlit' and depth == 0)
+    modules = [(name, cumulative / 1000) for name, cumulative, depth in entries[streamlit_index + 1:]
+               if depth == 0]
+    return sum(ms for _, ms in modules), modules
+
+
+def profile_pages(runs):
+    """Mediana del tiempo de importación por página y los módulos más costosos"""
+    report = {}
+    for path in PAGES:
+        samples = [measure_page(path) for _ in range(runs)]
+        total = statistics.median(ms for ms, _ in samples)
+        heaviest = sorted(samples[-1][1], key=lambda module: module[1], reverse=True)[:5]
+        report[path] = {
+            'ms': round(total, 1),
+            'top_modules': [{'module': name, 'ms': round(ms, 1)} for name, ms in heaviest]
+        }
+    return report
+
+
+def load_budget():
+    try:
+        with open(BUDGET_PATH, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Presupuesto de tiempo de importación por página")
+    parser.add_argument('--runs', type=int, default=5, help="Ejecuciones por página (se usa la mediana)")
+    parser.add_argument('--update', action='store_true', help=f"Reescribe {BUDGET_PATH} con los valores actuales")
+    parser.add_argument('--report', help="Guarda el informe completo en JSON")
+    args = parser.parse_args()
+
+    report = profile_pages(args.runs)
+    budget = load_budget()
+
+    over_budget = []
+    for path, page in report.items():
+        limit = budget.get(path)
+        status = "—" if limit is None else ("✅" if page['ms'] <= limit else "❌")
+        if limit is not None and page['ms'] > limit:
+            over_budget.append(path)
+        print(f"{status} {path}: {page['ms']:.1f} ms (presupuesto: {limit if limit is not None else 'sin definir'} ms)")
+        for module in page['top_modules']:
+            print(f"      {module['module']}: {module['ms']:.1f} ms")
+
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump({'budget': budget, 'pages': report}, file, indent=2)
+
+    if args.update:
+        new_budget = {path: round(page['ms'] * BUDGET_FACTOR + BUDGET_SLACK_MS) for path, page in report.items()}
+        with open(BUDGET_PATH, 'w') as file:
+            json.dump(new_budget, file, indent=2)
+            file.write('\n')
+        print(f"📝 Presupuesto actualizado en {BUDGET_PATH}")
+    elif over_budget:
+        print(f"❌ Fuera de presupuesto: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
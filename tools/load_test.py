@@ -0,0 +1,510 @@
+"""Prueba de carga: N compradores virtuales contra un servidor de Streamlit.
+
+Uso:
+    python -m tools.load_test                          # niveles 1, 5, 10 y 20 usuarios
+    python -m tools.load_test --users 1,10,50 --journeys 5
+    python -m tools.load_test --json carga.json --slo-ms 1500
+    python -m tools.load_test --url http://localhost:8599 --pid 1234   # servidor ya arrancado
+    python -m tools.load_test --workers 1,2,4 --users 20    # tools.cluster con 1, 2 y 4 procesos
+
+Arranca tools/offline_server.py (Firestore, Stripe y Google en memoria) en
+un proceso aparte y lo recorre con clientes sin navegador que hablan el
+protocolo de websocket de Streamlit, como lo haría la página: cada usuario
+virtual inicia sesión con Google, cambia de categoría, añade dos productos,
+sube una cantidad y paga, alternando la compra simulada y Stripe con la
+vuelta a compraok.py. Los widgets dentro de un fragmento reejecutan solo ese
+fragmento. Por nivel de concurrencia se informa del rendimiento, la latencia
+de cola por paso y la memoria del proceso servidor.
+
+Con --workers la prueba se repite contra tools.cluster --offline con cada
+número de procesos (detrás del proxy con afinidad; cada usuario virtual
+conserva su cookie como un navegador) y se muestra cuánto crece el
+rendimiento al añadir procesos. La memoria es la suma de todos los procesos.
+La columna × solo se acerca a `ideal` si cada proceso tiene un núcleo libre
+(el generador de carga corre en la misma máquina); con menos núcleos que
+procesos se avisa y el resultado no dice nada de cómo escala la tienda.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import ExitStack
+from urllib.parse import urlparse
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState, WidgetStates
+from streamlit.testing.v1.element_tree import Widget, parse_tree_from_messages
+from websockets.sync.client import connect
+
+from servicios.session_store import COOKIE_NAME
+from tools.benchmark import percentile
+
+DEFAULT_LEVELS = '1,5,10,20'
+DEFAULT_JOURNEYS = 3
+DEFAULT_PORT = 8599
+DEFAULT_TIMEOUT = 60
+
+# Stock de los productos de ejemplo durante la prueba (las compras lo descuentan)
+LOAD_STOCK = 1_000_000
+
+STEPS = ['login', 'browse', 'add_to_cart', 'update_quantity', 'simulated_checkout', 'stripe_checkout', 'stripe_return']
+
+# Pasos del carrito y del pago: los que deciden si el servidor se degrada
+CART_AND_CHECKOUT_STEPS = ['add_to_cart', 'update_quantity', 'simulated_checkout', 'stripe_checkout', 'stripe_return']
+
+_FINISHED = (
+    ForwardMsg.ScriptFinishedStatus.FINISHED_SUCCESSFULLY,
+    ForwardMsg.ScriptFinishedStatus.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+    ForwardMsg.ScriptFinishedStatus.FINISHED_WITH_COMPILE_ERROR
+)
+
+
+class StepFailed(Exception):
+    """Un paso del recorrido terminó con excepción o con un st.error en pantalla"""
+
+
+class StreamlitClient:
+    """Sesión de navegador mínima: envía reejecuciones y reconstruye la página recibida.
+
+    Como el navegador, conserva los widgets de toda la página entre ejecuciones
+    (las de un fragmento solo sustituyen los de ese fragmento) y manda el id del
+    fragmento cuando se interactúa con un widget que está dentro de uno.
+    """
+
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT, cookie=None):
+        parsed = urlparse(base_url)
+        self.stream_url = f"ws://{parsed.netloc}{parsed.path.rstrip('/')}/_stcore/stream"
+        self.timeout = timeout
+        self.headers = {'Cookie': cookie} if cookie else None
+        self._connection = ExitStack()
+        self.websocket = None
+        self.page_hash = ''
+        self.query_string = ''
+        self.widgets = {}
+        self.fragment_of = {}
+        self.values = {}
+        self.tree = None
+
+    def open(self, query_string=''):
+        """Abre la sesión en la URL con `query_string` y ejecuta la página"""
+        self.websocket = self._connection.enter_context(
+            connect(self.stream_url, subprotocols=['streamlit'], open_timeout=self.timeout, max_size=None,
+                    additional_headers=self.headers))
+        self.query_string = query_string
+        return self.rerun()
+
+    def close(self):
+        self._connection.close()
+        self.websocket = None
+
+    def rerun(self, widget_states=None, fragment_id=''):
+        """Envía una petición de ejecución y espera a que termine (incluidos st.rerun y switch_page)"""
+        message = BackMsg()
+        message.rerun_script.query_string = self.query_string
+        message.rerun_script.page_script_hash = self.page_hash
+        message.rerun_script.fragment_id = fragment_id
+        if widget_states is not None:
+            message.rerun_script.widget_states.CopyFrom(widget_states)
+        self.websocket.send(message.SerializeToString())
+
+        deltas = []
+        fragment_ids = []
+        deadline = time.monotonic() + self.timeout
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(self.websocket.recv(timeout=max(0.1, deadline - time.monotonic())))
+            kind = forward.WhichOneof('type')
+            if kind == 'new_session':
+                # Cada ejecución empieza con new_session: lo anterior ya no está en pantalla
+                if forward.new_session.page_script_hash != self.page_hash:
+                    self.page_hash = forward.new_session.page_script_hash
+                    self.widgets, self.fragment_of, self.values = {}, {}, {}
+                fragment_ids = list(forward.new_session.fragment_ids_this_run)
+                deltas = []
+            elif kind == 'page_info_changed':
+                self.query_string = forward.page_info_changed.query_string
+            elif kind == 'delta':
+                deltas.append(forward)
+            elif kind == 'script_finished' and forward.script_finished in _FINISHED:
+                break
+
+        self.tree = parse_tree_from_messages(deltas)
+        self._update_widgets(deltas, fragment_ids)
+        return self.tree
+
+    def _update_widgets(self, deltas, fragment_ids):
+        if fragment_ids:
+            self.widgets = {widget_id: widget for widget_id, widget in self.widgets.items()
+                            if self.fragment_of.get(widget_id) not in fragment_ids}
+        else:
+            self.widgets, self.fragment_of = {}, {}
+        for forward in deltas:
+            element = forward.delta.new_element
+            kind = element.WhichOneof('type') if forward.delta.HasField('new_element') else None
+            if kind and getattr(getattr(element, kind), 'id', ''):
+                self.fragment_of[getattr(element, kind).id] = forward.delta.fragment_id
+        for node in self.tree:
+            if isinstance(node, Widget):
+                self.widgets[node.id] = node
+
+    def widget(self, key):
+        """Widget visible con la key `key`"""
+        for widget in self.widgets.values():
+            if widget.key == key:
+                return widget
+        raise LookupError(f"No hay ningún widget '{key}' en la página")
+
+    def keys(self, prefix):
+        """Keys de los widgets visibles que empiezan por `prefix`"""
+        return [widget.key for widget in self.widgets.values() if widget.key and widget.key.startswith(prefix)]
+
+    def interact(self, widget, **value):
+        """Reejecuta con el nuevo valor de `widget` (y el fragmento que lo contiene)"""
+        state = WidgetState(id=widget.id, **value)
+        states = WidgetStates()
+        # Como el navegador, se reenvían los valores ya elegidos; los botones solo al pulsarlos
+        states.widgets.extend(other for widget_id, other in self.values.items() if widget_id != widget.id)
+        states.widgets.append(state)
+        if 'trigger_value' not in value:
+            self.values[widget.id] = state
+        return self.rerun(states, fragment_id=self.fragment_of.get(widget.id, ''))
+
+    def click(self, key):
+        return self.interact(self.widget(key), trigger_value=True)
+
+    def select(self, key, value):
+        return self.interact(self.widget(key), string_value=value)
+
+
+class VirtualUser:
+    """Comprador virtual: repite el recorrido y guarda (paso, ms, ok) de cada paso"""
+
+    def __init__(self, base_url, number, think_time=0.0, seed=0):
+        self.base_url = base_url
+        self.code = f"vu{number:04d}"
+        # Como un navegador, conserva la cookie del proxy (misma sesión y mismo proceso)
+        self.cookie = f"{COOKIE_NAME}={self.code}-{seed}"
+        self.think_time = think_time
+        self.random = random.Random(seed + number)
+        self.samples = []
+        self.errors = []
+
+    def step(self, name, action):
+        start = time.perf_counter()
+        ok = False
+        try:
+            tree = action()
+            problems = list(tree.exception) + list(tree.error)
+            if problems:
+                raise StepFailed(f"{name}: {problems[0].value if hasattr(problems[0], 'value') else problems[0].message}")
+            ok = True
+            return tree
+        finally:
+            self.samples.append((name, (time.perf_counter() - start) * 1000, ok))
+            if self.think_time:
+                time.sleep(self.random.uniform(0, 2 * self.think_time))
+
+    def journey(self, index):
+        client = StreamlitClient(self.base_url, cookie=self.cookie)
+        try:
+            self.shop(client, index)
+        finally:
+            client.close()
+
+    def shop(self, client, index):
+        # 1. Login con Google: app.py intercambia el código y redirige al catálogo
+        self.step('login', lambda: client.open(f"code={self.code}"))
+
+        # 2. Cambiar de categoría (solo se reejecuta el grid)
+        options = client.widget('category_filter_main').options
+        self.step('browse', lambda: client.select('category_filter_main', self.random.choice(options)))
+        if not client.keys('add_product_'):
+            # Categoría sin productos: volver a 'todos'
+            self.step('browse', lambda: client.select('category_filter_main', options[0]))
+
+        # 3. Dos productos al carrito (el callback reejecuta el carrito)
+        for _ in range(2):
+            key = self.random.choice(client.keys('add_product_'))
+            self.step('add_to_cart', lambda: client.click(key))
+
+        # 4. Subir la cantidad de la primera línea
+        key = client.keys('increase_0')[0]
+        self.step('update_quantity', lambda: client.click(key))
+
+        # 5. Pago: compra simulada o Stripe con vuelta a compraok.py
+        key_prefix = 'simulated_checkout_' if index % 2 == 0 else 'stripe_checkout_'
+        key = client.keys(key_prefix)[0]
+        if index % 2 == 0:
+            self.step('simulated_checkout', lambda: client.click(key))
+            return
+
+        tree = self.step('stripe_checkout', lambda: client.click(key))
+        checkout_url = next(node.proto.url for node in tree if getattr(node, 'type', None) == 'link_button')
+        session_id = checkout_url.rsplit('/', 1)[-1]
+
+        # El navegador vuelve de Stripe a la success_url en una sesión nueva
+        back = StreamlitClient(self.base_url, cookie=self.cookie)
+        try:
+            self.step('stripe_return', lambda: back.open(f"payment=success&session_id={session_id}"))
+        finally:
+            back.close()
+
+    def run(self, journeys, start_event):
+        start_event.wait()
+        completed = 0
+        for index in range(journeys):
+            try:
+                self.journey(index)
+                completed += 1
+            except Exception as e:
+                self.errors.append(f"{type(e).__name__}: {e}")
+        return completed
+
+
+def process_tree(pid):
+    """El proceso y todos sus descendientes (los procesos de tools.cluster)"""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f'/proc/{current}/task/{current}/children', 'r') as file:
+                pids.extend(int(child) for child in file.read().split())
+        except (OSError, TypeError, ValueError):
+            pass
+    return pids
+
+
+def server_memory_mb(pid):
+    """(RSS actual, pico de RSS) del servidor y sus procesos hijos en MB (None si no se puede leer)"""
+    values = {}
+    for current in process_tree(pid):
+        try:
+            with open(f'/proc/{current}/status', 'r') as file:
+                for line in file:
+                    name, _, value = line.partition(':')
+                    if name in ('VmRSS', 'VmHWM'):
+                        values[name] = round(values.get(name, 0) + int(value.split()[0]) / 1024, 1)
+        except (OSError, TypeError, ValueError):
+            pass
+    return values.get('VmRSS'), values.get('VmHWM')
+
+
+def start_server(port, payment_delay, workers=None):
+    """Arranca tools.offline_server (o tools.cluster con `workers` procesos) y espera a /_stcore/health"""
+    if workers:
+        command = [sys.executable, '-m', 'tools.cluster', '--offline', '--quiet', '--workers', str(workers),
+                   '--port', str(port), '--stock', str(LOAD_STOCK), '--payment-delay', str(payment_delay)]
+    else:
+        command = [sys.executable, '-m', 'tools.offline_server', '--port', str(port), '--stock', str(LOAD_STOCK),
+                   '--payment-delay', str(payment_delay)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    health_url = f"http://127.0.0.1:{port}/_stcore/health"
+    # Con varios procesos el proxy solo escucha cuando todos han arrancado
+    deadline = time.monotonic() + DEFAULT_TIMEOUT * (1 + (workers or 0))
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El servidor terminó con código {process.returncode}")
+        try:
+            with urllib.request.urlopen(health_url, timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"El servidor no respondió en {health_url}")
+
+
+def run_level(base_url, pid, users, journeys, think_time=0.0, ramp=0.0, seed=0):
+    """Ejecuta `users` usuarios concurrentes con `journeys` recorridos cada uno"""
+    rss_before, _ = server_memory_mb(pid)
+
+    virtual_users = [VirtualUser(base_url, number, think_time, seed) for number in range(users)]
+    completed = [0] * users
+    start_event = threading.Event()
+
+    def worker(index):
+        if ramp:
+            time.sleep(ramp * index / users)
+        completed[index] = virtual_users[index].run(journeys, start_event)
+
+    threads = [threading.Thread(target=worker, args=(index,), name=f"vu-{index}") for index in range(users)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    start_event.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    rss_after, rss_peak = server_memory_mb(pid)
+    samples = [sample for user in virtual_users for sample in user.samples]
+    errors = [error for user in virtual_users for error in user.errors]
+    return summarize_level(users, samples, sum(completed), errors, elapsed, rss_before, rss_after, rss_peak)
+
+
+def latency_summary(latencies):
+    return {
+        'count': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50), 1),
+        'p95_ms': round(percentile(latencies, 0.95), 1),
+        'p99_ms': round(percentile(latencies, 0.99), 1),
+        'max_ms': round(max(latencies), 1)
+    }
+
+
+def summarize_level(users, samples, completed, errors, elapsed, rss_before, rss_after, rss_peak):
+    """Rendimiento, latencias por paso y memoria de un nivel de concurrencia"""
+    ok_samples = [sample for sample in samples if sample[2]]
+    steps = {}
+    for name in STEPS:
+        latencies = [ms for step, ms, _ in ok_samples if step == name]
+        if latencies:
+            steps[name] = latency_summary(latencies)
+
+    cart_latencies = [ms for step, ms, _ in ok_samples if step in CART_AND_CHECKOUT_STEPS]
+    return {
+        'users': users,
+        'journeys': completed,
+        'failed_journeys': len(errors),
+        'errors': sorted(set(errors))[:5],
+        'seconds': round(elapsed, 2),
+        'journeys_per_s': round(completed / elapsed, 2) if elapsed else 0.0,
+        'steps_per_s': round(len(ok_samples) / elapsed, 1) if elapsed else 0.0,
+        'all_steps': latency_summary([ms for _, ms, _ in ok_samples]) if ok_samples else None,
+        'cart_checkout': latency_summary(cart_latencies) if cart_latencies else None,
+        'steps': steps,
+        'rss_mb': rss_after,
+        'rss_delta_mb': round(rss_after - rss_before, 1) if rss_after is not None and rss_before is not None else None,
+        'rss_peak_mb': rss_peak
+    }
+
+
+def max_users_within_slo(results, slo_ms):
+    """Mayor nivel cuyo p95 de carrito y pago cumple el SLO sin recorridos fallidos"""
+    passing = [result['users'] for result in results
+               if result['cart_checkout'] and result['cart_checkout']['p95_ms'] <= slo_ms
+               and not result['failed_journeys']]
+    return max(passing) if passing else None
+
+
+def print_results(results, slo_ms):
+    print(f"{'Usuarios':>8}{'recorr.':>9}{'fallos':>8}{'rec/s':>8}{'pasos/s':>9}"
+          f"{'p50':>8}{'p95':>8}{'p99':>8}{'RSS MB':>9}{'Δ MB':>8}")
+    for result in results:
+        cart = result['cart_checkout'] or {'p50_ms': 0, 'p95_ms': 0, 'p99_ms': 0}
+        rss = f"{result['rss_mb']:>9.1f}{result['rss_delta_mb']:>+8.1f}" if result['rss_mb'] is not None else f"{'—':>9}{'—':>8}"
+        print(f"{result['users']:>8}{result['journeys']:>9}{result['failed_journeys']:>8}"
+              f"{result['journeys_per_s']:>8.2f}{result['steps_per_s']:>9.1f}"
+              f"{cart['p50_ms']:>8.0f}{cart['p95_ms']:>8.0f}{cart['p99_ms']:>8.0f}{rss}")
+    print("(p50/p95/p99 en ms de los pasos de carrito y pago; RSS del proceso servidor)")
+
+    print(f"\n{'Paso':<20}" + ''.join(f"{'p95@' + str(result['users']):>10}" for result in results))
+    for name in STEPS:
+        row = f"{name:<20}"
+        for result in results:
+            step = result['steps'].get(name)
+            row += f"{step['p95_ms']:>10.0f}" if step else f"{'—':>10}"
+        print(row)
+
+    for result in results:
+        for error in result['errors']:
+            print(f"❌ {result['users']} usuarios: {error}")
+
+    capacity = max_users_within_slo(results, slo_ms)
+    if capacity is None:
+        print(f"\n⚠️ Ningún nivel cumple p95 ≤ {slo_ms:.0f} ms en carrito y pago")
+    else:
+        print(f"\n✅ Hasta {capacity} usuarios concurrentes con p95 ≤ {slo_ms:.0f} ms en carrito y pago")
+
+
+def run_levels(base_url, pid, levels, args, workers=None):
+    """Recorridos previos (compilan páginas y llenan cachés) y después cada nivel de concurrencia"""
+    # Con varios procesos, varios compradores para que el proxy los reparta entre todos
+    for number in range(2 * (workers or 0) + 1):
+        VirtualUser(base_url, 9999 - number).journey(1)
+
+    results = []
+    for users in levels:
+        print(f"👥 {users} usuarios...", file=sys.stderr)
+        results.append(run_level(base_url, pid, users, args.journeys, args.think_time, args.ramp, args.seed))
+    return results
+
+
+def print_scaling(runs):
+    """Rendimiento del nivel más alto con cada número de procesos, relativo al primero"""
+    print(f"\n{'Procesos':>8}{'rec/s':>8}{'pasos/s':>9}{'p95':>8}{'×':>7}{'ideal':>7}{'RSS MB':>9}")
+    base_workers, base = runs[0][0], runs[0][1][-1]
+    for workers, results in runs:
+        top = results[-1]
+        cart = top['cart_checkout'] or {'p95_ms': 0}
+        speedup = top['journeys_per_s'] / base['journeys_per_s'] if base['journeys_per_s'] else 0.0
+        rss = f"{top['rss_mb']:>9.1f}" if top['rss_mb'] is not None else f"{'—':>9}"
+        print(f"{workers:>8}{top['journeys_per_s']:>8.2f}{top['steps_per_s']:>9.1f}{cart['p95_ms']:>8.0f}"
+              f"{speedup:>7.2f}{workers / base_workers:>7.2f}{rss}")
+    print(f"(nivel de {base['users']} usuarios; × es el rendimiento relativo a {base_workers} proceso(s))")
+    cores = os.cpu_count() or 1
+    if max(workers for workers, _ in runs) >= cores:
+        print(f"⚠️ Solo hay {cores} núcleo(s) para los procesos y el generador de carga: "
+              f"mide la escalabilidad en una máquina con más núcleos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga con compradores virtuales contra un servidor offline")
+    parser.add_argument('--users', default=DEFAULT_LEVELS, help="Niveles de concurrencia separados por comas")
+    parser.add_argument('--journeys', type=int, default=DEFAULT_JOURNEYS, help="Recorridos por usuario y nivel")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Pausa media entre pasos (segundos)")
+    parser.add_argument('--ramp', type=float, default=0.0, help="Segundos para incorporar a todos los usuarios")
+    parser.add_argument('--payment-delay', type=float, default=0.0, help="Segundos del pago simulado (por defecto 0)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Puerto del servidor que se arranca")
+    parser.add_argument('--workers', help="Procesos de tools.cluster a probar, separados por comas (p. ej. 1,2,4)")
+    parser.add_argument('--url', help="Usar un servidor ya arrancado (tools.offline_server) en esta URL")
+    parser.add_argument('--pid', type=int, help="PID de ese servidor, para medir su memoria")
+    parser.add_argument('--slo-ms', type=float, default=1000.0, help="p95 máximo aceptable en carrito y pago")
+    parser.add_argument('--seed', type=int, default=0, help="Semilla de las elecciones de los usuarios")
+    parser.add_argument('--json', help="Guarda los resultados en este fichero")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.users.split(',') if level.strip()]
+    if args.url:
+        runs = [(None, run_levels(args.url, args.pid, levels, args))]
+    else:
+        worker_counts = [int(count) for count in args.workers.split(',') if count.strip()] if args.workers else [None]
+        runs = []
+        for workers in worker_counts:
+            label = f"tools.cluster con {workers} procesos" if workers else "el servidor offline"
+            print(f"🚀 Arrancando {label} en el puerto {args.port}...", file=sys.stderr)
+            process = start_server(args.port, args.payment_delay, workers)
+            try:
+                runs.append((workers, run_levels(f"http://127.0.0.1:{args.port}", process.pid, levels, args, workers)))
+            finally:
+                process.terminate()
+                process.wait()
+
+    for workers, results in runs:
+        if workers:
+            print(f"\n=== {workers} proceso(s) ===")
+        print_results(results, args.slo_ms)
+    if len(runs) > 1:
+        print_scaling(runs)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            if len(runs) == 1:
+                results = runs[0][1]
+                json.dump({'slo_ms': args.slo_ms, 'max_users_within_slo': max_users_within_slo(results, args.slo_ms),
+                           'levels': results}, file, indent=2)
+            else:
+                json.dump({'slo_ms': args.slo_ms, 'workers': [{
+                    'workers': workers,
+                    'max_users_within_slo': max_users_within_slo(results, args.slo_ms),
+                    'levels': results
+                } for workers, results in runs]}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Arranca la aplicación sin servicios externos: Firestore, Stripe y Google en memoria.
+
+Uso:
+    python -m tools.offline_server                          # http://localhost:8501
+    python -m tools.offline_server --port 8599 --stock 1000000
+    python -m tools.offline_server --products 10000          # catálogo sintético
+    python -m tools.offline_server --sqlite-path /tmp/tienda.db   # datos compartidos (tools.cluster)
+
+Sirve para pruebas de carga (tools/load_test.py) y para probar la tienda sin
+credenciales. Firestore es un MemoryFirestore con los productos de ejemplo
+(o un catálogo sintético de --products productos, servicios/synthetic_data.py),
+Stripe un MemoryStripe (las sesiones se crean pagadas) y el login de Google
+un MemoryGoogleOAuth que acepta cualquier código: ?code=ana inicia sesión
+como "Usuario ana". Con --sqlite-path los datos van a un SQLite que pueden
+compartir varios procesos (tools.cluster --offline).
+"""
+import argparse
+import os
+
+from servicios.bulk_writes import BulkLoader
+from servicios.catalog import seed_sample_products
+from servicios.memory_firestore import MemoryFirestore
+from servicios.memory_google import MemoryGoogleOAuth
+from servicios.memory_stripe import MemoryStripe
+from servicios.payments import use_stripe_client
+from servicios.sqlite_firestore import SQLiteFirestore
+from servicios.synthetic_data import SyntheticData
+from servicios.warmup import use_firestore_client, warm_up
+
+
+def seed_synthetic_products(db, count, stock=None):
+    """Carga un catálogo sintético de `count` productos en lotes paralelos"""
+    with BulkLoader(db) as loader:
+        for collection, document_id, product in SyntheticData(products=count, users=0, orders=0).iter_products():
+            if stock is not None:
+                product['stock'] = stock
+            loader.set(db.collection(collection).document(document_id), product)
+    return loader.summary()
+
+
+def seed_database(db, stock=None, products=None):
+    """Carga el catálogo de ejemplo (o uno sintético) si la base de datos no tiene productos"""
+    if db.collection('products').limit(1).get():
+        return
+    if products:
+        seed_synthetic_products(db, products, stock)
+    else:
+        for product in seed_sample_products(db):
+            if stock is not None:
+                db.collection('products').document(product['id']).update({'stock': stock})
+
+
+def install_fakes(stock=None, products=None, sqlite_path=None):
+    """Instala los sustitutos en memoria en este proceso y devuelve (db, stripe, google)"""
+    db = SQLiteFirestore(sqlite_path) if sqlite_path else MemoryFirestore()
+    seed_database(db, stock, products)
+    use_firestore_client(db)
+
+    stripe = MemoryStripe()
+    use_stripe_client(stripe)
+
+    google = MemoryGoogleOAuth().start()
+    os.environ['GOOGLE_TOKEN_URL'] = google.token_url
+    os.environ['GOOGLE_USERINFO_URL'] = google.userinfo_url
+    return db, stripe, google
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arranca la app con Firestore, Stripe y Google en memoria")
+    parser.add_argument('--app', default='app.py', help="Script principal de Streamlit")
+    parser.add_argument('--port', type=int, default=8501, help="Puerto de Streamlit")
+    parser.add_argument('--stock', type=int, help="Stock inicial de cada producto de ejemplo")
+    parser.add_argument('--products', type=int, help="Catálogo sintético de este tamaño en lugar del de ejemplo")
+    parser.add_argument('--sqlite-path', help="Datos en este fichero SQLite en lugar de en memoria")
+    parser.add_argument('--payment-delay', type=float, default=0.0, help="Segundos del pago simulado (por defecto 0)")
+    parser.add_argument('streamlit_args', nargs='*', help="Opciones adicionales para streamlit run")
+    args = parser.parse_args()
+
+    os.environ['SIMULATED_PAYMENT_DELAY'] = str(args.payment_delay)
+    install_fakes(args.stock, args.products, args.sqlite_path)
+
+    # El resto del calentamiento (módulos, catálogo, CSS, recomendaciones) con los fakes ya instalados
+    status = warm_up(progress=print)
+    if not status['ready']:
+        print(f"⚠️ Calentamiento incompleto: {status['errors']}")
+
+    from streamlit.web import cli
+    cli.main(['run', args.app,
+              '--server.port', str(args.port),
+              '--server.headless', 'true',
+              '--server.fileWatcherType', 'none',
+              '--browser.gatherUsageStats', 'false',
+              *args.streamlit_args], prog_name='streamlit')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Arranca la aplicación con el proceso ya calentado.
+
+Uso:
+    python -m tools.serve                       # equivale a streamlit run app.py
+    python -m tools.serve -- --server.port 8080
+
+Antes de aceptar tráfico arranca el sidecar (si SIDECAR_PORT está definido,
+con /healthz), inicializa Firestore y Stripe y carga catálogo, CSS, logo y
+modelo de recomendaciones en el mismo proceso que luego ejecuta Streamlit.
+"""
+import argparse
+import sys
+
+from dotenv import load_dotenv
+
+from servicios.sidecar import start_sidecar
+from servicios.warmup import warm_up
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calienta el proceso y arranca Streamlit")
+    parser.add_argument('--app', default='app.py', help="Script principal de Streamlit")
+    parser.add_argument('--strict', action='store_true', help="No arranca si el calentamiento falla")
+    parser.add_argument('streamlit_args', nargs='*', help="Opciones adicionales para streamlit run")
+    args = parser.parse_args()
+
+    load_dotenv()
+    start_sidecar()
+
+    print("🔥 Calentando el servidor...")
+    status = warm_up(progress=print)
+    if not status['ready']:
+        print(f"⚠️ Calentamiento incompleto: {status['errors']}")
+        if args.strict:
+            sys.exit(1)
+
+    from streamlit.web import cli
+    cli.main(['run', args.app, *args.streamlit_args], prog_name='streamlit')
+
+
+if __name__ == "__main__":
+    main()
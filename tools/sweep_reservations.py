@@ -0,0 +1,41 @@
+"""Libera las retenciones de stock caducadas (pagos de Stripe abandonados).
+
+Uso:
+    python -m tools.sweep_reservations                  # una pasada
+    python -m tools.sweep_reservations --every 60       # en bucle, p. ej. como servicio aparte
+
+Cada servidor arrancado con tools.serve ya barre cada RESERVATION_SWEEP_SECONDS;
+esta herramienta sirve para hacerlo desde cron o con los servidores parados.
+Con FIRESTORE_EMULATOR_HOST definida se conecta al emulador; con
+STORAGE_BACKEND=sqlite, al motor SQLite.
+"""
+import argparse
+import time
+from datetime import datetime
+
+from servicios.reservations import sweep_expired
+from servicios.store import open_backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Libera en lotes las retenciones de stock caducadas")
+    parser.add_argument('--every', type=float, default=0, help="Segundos entre pasadas (0: una sola)")
+    args = parser.parse_args()
+
+    db = open_backend()
+    while True:
+        released = 0
+        # Cada pasada libera como mucho un lote; se repite hasta vaciar la cola
+        while True:
+            batch_released = sweep_expired(db)
+            released += batch_released
+            if not batch_released:
+                break
+        print(f"🧹 {datetime.now():%H:%M:%S} {released} retenciones liberadas")
+        if args.every <= 0:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()